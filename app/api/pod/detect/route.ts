@@ -3,6 +3,12 @@ import { supabaseServer } from '@/lib/supabase-server';
 
 export const dynamic = 'force-dynamic';
 
+// A hedged copy of a request waits this long for the first copy's answer
+const DUPLICATE_WAIT_MS = 10000;
+const DUPLICATE_POLL_MS = 200;
+
+type Decision = { status: number; body: any };
+
 async function hashApiKey(apiKey: string): Promise<string> {
   const encoder = new TextEncoder();
   const data = encoder.encode(apiKey);
@@ -52,131 +58,113 @@ async function verifyApiKey(authHeader: string | null): Promise<{ valid: boolean
   }
 }
 
-export async function POST(request: NextRequest) {
-  try {
-    const authHeader = request.headers.get('Authorization');
-    const keyVerification = await verifyApiKey(authHeader);
+async function decide(body: any, community_id: string | undefined): Promise<Decision> {
+  const { site_id, plate, camera, pod_name } = body;
 
-    if (!keyVerification.valid) {
-      return NextResponse.json(
-        { success: false, error: 'Invalid or missing API key', action: 'deny' },
-        { status: 401 }
-      );
-    }
+  if (!site_id || !plate) {
+    return { status: 400, body: { success: false, error: 'site_id and plate are required' } };
+  }
 
-    const body = await request.json();
-    const { site_id, plate, camera, pod_name } = body;
+  console.log(`[POD Detection] Site: ${site_id}, Plate: ${plate}, Camera: ${camera}`);
 
-    if (!site_id || !plate) {
-      return NextResponse.json(
-        { success: false, error: 'site_id and plate are required' },
-        { status: 400 }
-      );
-    }
+  const { data: site, error: siteError } = await supabaseServer
+    .from('sites')
+    .select('id, community_id, name')
+    .eq('site_id', site_id)
+    .maybeSingle();
 
-    console.log(`[POD Detection] Site: ${site_id}, Plate: ${plate}, Camera: ${camera}`);
+  if (siteError || !site) {
+    console.error('[POD Detection] Site not found:', site_id);
+    return { status: 404, body: { success: false, error: 'Site not found', action: 'deny' } };
+  }
 
-    const { data: site, error: siteError } = await supabaseServer
-      .from('sites')
-      .select('id, community_id, name')
-      .eq('site_id', site_id)
-      .maybeSingle();
+  if (site.community_id !== community_id) {
+    console.error('[POD Detection] Community mismatch - POD not authorized for this site');
+    return { status: 403, body: { success: false, error: 'Unauthorized: POD not authorized for this community', action: 'deny' } };
+  }
 
-    if (siteError || !site) {
-      console.error('[POD Detection] Site not found:', site_id);
-      return NextResponse.json(
-        { success: false, error: 'Site not found', action: 'deny' },
-        { status: 404 }
-      );
-    }
+  const { data: plateEntry, error: plateError } = await supabaseServer
+    .from('plates')
+    .select('*')
+    .eq('community_id', site.community_id)
+    .eq('plate', plate.toUpperCase())
+    .eq('enabled', true)
+    .maybeSingle();
+
+  if (plateError) {
+    console.error('[POD Detection] Error checking plate:', plateError);
+    return { status: 500, body: { success: false, error: 'Database error', action: 'deny' } };
+  }
 
-    if (site.community_id !== keyVerification.community_id) {
-      console.error('[POD Detection] Community mismatch - POD not authorized for this site');
-      return NextResponse.json(
-        { success: false, error: 'Unauthorized: POD not authorized for this community', action: 'deny' },
-        { status: 403 }
-      );
-    }
+  if (body.backfill) {
+    return recordBackfill(body, site.community_id, plateEntry);
+  }
 
-    const { data: plateEntry, error: plateError } = await supabaseServer
-      .from('plates')
+  const isAuthorized = !!plateEntry;
+
+  await supabaseServer.from('audit').insert({
+    community_id: site.community_id,
+    site_id: site_id,
+    plate: plate.toUpperCase(),
+    camera: camera || 'unknown',
+    action: 'plate_detected',
+    result: isAuthorized ? 'authorized' : 'unauthorized',
+    by: pod_name || 'pod',
+    metadata: {
+      unit: plateEntry?.unit,
+      tenant: plateEntry?.tenant,
+      vehicle: plateEntry?.vehicle,
+    },
+  });
+
+  if (isAuthorized) {
+    console.log(`[POD Detection] Plate ${plate} authorized, checking Gatewise integration...`);
+
+    const { data: gatewiseConfig, error: gatewiseError } = await supabaseServer
+      .from('gatewise_config')
       .select('*')
       .eq('community_id', site.community_id)
-      .eq('plate', plate.toUpperCase())
       .eq('enabled', true)
       .maybeSingle();
 
-    if (plateError) {
-      console.error('[POD Detection] Error checking plate:', plateError);
-      return NextResponse.json(
-        { success: false, error: 'Database error', action: 'deny' },
-        { status: 500 }
-      );
-    }
+    if (!gatewiseError && gatewiseConfig && gatewiseConfig.gatewise_access_point_id) {
+      console.log(`[POD Detection] Triggering Gatewise gate for community ${site.community_id}`);
 
-    const isAuthorized = !!plateEntry;
-
-    await supabaseServer.from('audit').insert({
-      community_id: site.community_id,
-      site_id: site_id,
-      plate: plate.toUpperCase(),
-      camera: camera || 'unknown',
-      action: 'plate_detected',
-      result: isAuthorized ? 'authorized' : 'unauthorized',
-      by: pod_name || 'pod',
-      metadata: {
-        unit: plateEntry?.unit,
-        tenant: plateEntry?.tenant,
-        vehicle: plateEntry?.vehicle,
-      },
-    });
-
-    if (isAuthorized) {
-      console.log(`[POD Detection] Plate ${plate} authorized, checking Gatewise integration...`);
-
-      const { data: gatewiseConfig, error: gatewiseError } = await supabaseServer
-        .from('gatewise_config')
-        .select('*')
-        .eq('community_id', site.community_id)
-        .eq('enabled', true)
-        .maybeSingle();
-
-      if (!gatewiseError && gatewiseConfig && gatewiseConfig.gatewise_access_point_id) {
-        console.log(`[POD Detection] Triggering Gatewise gate for community ${site.community_id}`);
-
-        try {
-          const baseUrl = gatewiseConfig.api_endpoint.replace(/\/+$/, '');
-          const openEndpoint = `${baseUrl}/community/${gatewiseConfig.gatewise_community_id}/access-point/${gatewiseConfig.gatewise_access_point_id}/open`;
-
-          const gateResponse = await fetch(openEndpoint, {
-            method: 'POST',
-            headers: {
-              'Authorization': `Bearer ${gatewiseConfig.api_key}`,
-              'Accept': 'application/json',
-              'Content-Type': 'application/json',
+      try {
+        const baseUrl = gatewiseConfig.api_endpoint.replace(/\/+$/, '');
+        const openEndpoint = `${baseUrl}/community/${gatewiseConfig.gatewise_community_id}/access-point/${gatewiseConfig.gatewise_access_point_id}/open`;
+
+        const gateResponse = await fetch(openEndpoint, {
+          method: 'POST',
+          headers: {
+            'Authorization': `Bearer ${gatewiseConfig.api_key}`,
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+          },
+          signal: AbortSignal.timeout(10000),
+        });
+
+        if (gateResponse.ok) {
+          console.log(`[POD Detection] Gate opened successfully for plate ${plate}`);
+
+          await supabaseServer.from('audit').insert({
+            community_id: site.community_id,
+            site_id: site_id,
+            plate: plate.toUpperCase(),
+            camera: camera || 'unknown',
+            action: 'gate_opened',
+            result: 'success',
+            by: 'gatewise',
+            metadata: {
+              access_point_id: gatewiseConfig.gatewise_access_point_id,
+              unit: plateEntry?.unit,
+              tenant: plateEntry?.tenant,
             },
-            signal: AbortSignal.timeout(10000),
           });
 
-          if (gateResponse.ok) {
-            console.log(`[POD Detection] Gate opened successfully for plate ${plate}`);
-
-            await supabaseServer.from('audit').insert({
-              community_id: site.community_id,
-              site_id: site_id,
-              plate: plate.toUpperCase(),
-              camera: camera || 'unknown',
-              action: 'gate_opened',
-              result: 'success',
-              by: 'gatewise',
-              metadata: {
-                access_point_id: gatewiseConfig.gatewise_access_point_id,
-                unit: plateEntry?.unit,
-                tenant: plateEntry?.tenant,
-              },
-            });
-
-            return NextResponse.json({
+          return {
+            status: 200,
+            body: {
               success: true,
               action: 'allow',
               gate_opened: true,
@@ -185,26 +173,10 @@ export async function POST(request: NextRequest) {
                 tenant: plateEntry.tenant,
                 vehicle: plateEntry.vehicle,
               },
-            });
-          } else {
-            console.error(`[POD Detection] Failed to open gate: ${gateResponse.status}`);
-
-            await supabaseServer.from('audit').insert({
-              community_id: site.community_id,
-              site_id: site_id,
-              plate: plate.toUpperCase(),
-              camera: camera || 'unknown',
-              action: 'gate_open_failed',
-              result: 'error',
-              by: 'gatewise',
-              metadata: {
-                error: `HTTP ${gateResponse.status}`,
-                access_point_id: gatewiseConfig.gatewise_access_point_id,
-              },
-            });
-          }
-        } catch (error: any) {
-          console.error('[POD Detection] Gatewise API error:', error);
+            },
+          };
+        } else {
+          console.error(`[POD Detection] Failed to open gate: ${gateResponse.status}`);
 
           await supabaseServer.from('audit').insert({
             community_id: site.community_id,
@@ -215,15 +187,34 @@ export async function POST(request: NextRequest) {
             result: 'error',
             by: 'gatewise',
             metadata: {
-              error: error.message,
+              error: `HTTP ${gateResponse.status}`,
+              access_point_id: gatewiseConfig.gatewise_access_point_id,
             },
           });
         }
-      } else {
-        console.log(`[POD Detection] No Gatewise integration configured for community ${site.community_id}`);
+      } catch (error: any) {
+        console.error('[POD Detection] Gatewise API error:', error);
+
+        await supabaseServer.from('audit').insert({
+          community_id: site.community_id,
+          site_id: site_id,
+          plate: plate.toUpperCase(),
+          camera: camera || 'unknown',
+          action: 'gate_open_failed',
+          result: 'error',
+          by: 'gatewise',
+          metadata: {
+            error: error.message,
+          },
+        });
       }
+    } else {
+      console.log(`[POD Detection] No Gatewise integration configured for community ${site.community_id}`);
+    }
 
-      return NextResponse.json({
+    return {
+      status: 200,
+      body: {
         success: true,
         action: 'allow',
         gate_opened: false,
@@ -232,17 +223,168 @@ export async function POST(request: NextRequest) {
           tenant: plateEntry.tenant,
           vehicle: plateEntry.vehicle,
         },
-      });
-    } else {
-      console.log(`[POD Detection] Plate ${plate} not authorized`);
+      },
+    };
+  } else {
+    console.log(`[POD Detection] Plate ${plate} not authorized`);
 
-      return NextResponse.json({
+    return {
+      status: 200,
+      body: {
         success: true,
         action: 'deny',
         gate_opened: false,
         message: 'Plate not in whitelist',
-      });
+      },
+    };
+  }
+}
+
+// A detection the pod missed during an outage and replays later: the car is long gone,
+// so record it at the time it happened and never open the gate
+async function recordBackfill(body: any, community_id: string, plateEntry: any): Promise<Decision> {
+  const { site_id, plate, camera, pod_name, timestamp, confidence } = body;
+  const isAuthorized = !!plateEntry;
+
+  let detectedAt = timestamp ? new Date(timestamp) : new Date();
+  if (isNaN(detectedAt.getTime())) {
+    return { status: 400, body: { success: false, error: 'Invalid timestamp', action: 'deny' } };
+  }
+  if (detectedAt.getTime() > Date.now()) {
+    // Pod clock ahead of ours
+    detectedAt = new Date();
+  }
+
+  console.log(`[POD Detection] Backfill: Site: ${site_id}, Plate: ${plate}, At: ${detectedAt.toISOString()}`);
+
+  const { error } = await supabaseServer.from('audit').insert({
+    community_id,
+    site_id: site_id,
+    plate: plate.toUpperCase(),
+    camera: camera || 'unknown',
+    action: 'plate_detected',
+    result: isAuthorized ? 'authorized' : 'unauthorized',
+    by: pod_name || 'pod',
+    created_at: detectedAt.toISOString(),
+    metadata: {
+      backfill: true,
+      confidence,
+      unit: plateEntry?.unit,
+      tenant: plateEntry?.tenant,
+      vehicle: plateEntry?.vehicle,
+    },
+  });
+
+  if (error) {
+    // The pod keeps the event and replays it later
+    console.error('[POD Detection] Error recording backfilled detection:', error);
+    return { status: 500, body: { success: false, error: 'Database error', action: 'deny' } };
+  }
+
+  return {
+    status: 200,
+    body: {
+      success: true,
+      action: isAuthorized ? 'allow' : 'deny',
+      gate_opened: false,
+      backfilled: true,
+    },
+  };
+}
+
+// Claim the Idempotency-Key; the stored answer if another request already has it
+async function claimKey(community_id: string, key: string): Promise<Decision | null> {
+  const { error } = await supabaseServer
+    .from('pod_detect_requests')
+    .insert({ community_id, idempotency_key: key });
+
+  if (!error) {
+    return null;
+  }
+  if (error.code !== '23505') {
+    // Can't dedupe; better a duplicate audit row than no decision
+    console.error('[POD Detection] Idempotency claim failed:', error);
+    return null;
+  }
+
+  // A copy of this request is (or was) being decided: wait for its answer
+  const deadline = Date.now() + DUPLICATE_WAIT_MS;
+  while (Date.now() < deadline) {
+    const { data: claimed } = await supabaseServer
+      .from('pod_detect_requests')
+      .select('status, result')
+      .eq('community_id', community_id)
+      .eq('idempotency_key', key)
+      .maybeSingle();
+
+    if (claimed?.result) {
+      return { status: claimed.status, body: claimed.result };
     }
+    if (!claimed) {
+      // The first copy failed and gave the key up; decide this one
+      return claimKey(community_id, key);
+    }
+    await new Promise(resolve => setTimeout(resolve, DUPLICATE_POLL_MS));
+  }
+
+  return { status: 503, body: { success: false, error: 'Duplicate request still in progress', action: 'deny' } };
+}
+
+// Keep the answer for copies of the request; give the key up on a server error so a retry is decided afresh
+async function storeDecision(community_id: string, key: string, decision: Decision) {
+  const row = supabaseServer.from('pod_detect_requests');
+  if (decision.status >= 500) {
+    await row.delete().eq('community_id', community_id).eq('idempotency_key', key);
+  } else {
+    await row
+      .update({ status: decision.status, result: decision.body })
+      .eq('community_id', community_id)
+      .eq('idempotency_key', key);
+  }
+
+  // Keys only matter for seconds; prune now and then
+  if (Math.random() < 0.01) {
+    await supabaseServer
+      .from('pod_detect_requests')
+      .delete()
+      .lt('created_at', new Date(Date.now() - 86400000).toISOString());
+  }
+}
+
+export async function POST(request: NextRequest) {
+  try {
+    const authHeader = request.headers.get('Authorization');
+    const keyVerification = await verifyApiKey(authHeader);
+
+    if (!keyVerification.valid) {
+      return NextResponse.json(
+        { success: false, error: 'Invalid or missing API key', action: 'deny' },
+        { status: 401 }
+      );
+    }
+
+    const body = await request.json();
+
+    // Hedged requests from the pod carry the same key: decide (and open the gate) once
+    const idempotencyKey = request.headers.get('Idempotency-Key')?.slice(0, 200);
+    const community_id = keyVerification.community_id;
+    if (idempotencyKey && community_id) {
+      const stored = await claimKey(community_id, idempotencyKey);
+      if (stored) {
+        return NextResponse.json(stored.body, { status: stored.status });
+      }
+    }
+
+    let decision: Decision = { status: 500, body: { success: false, error: 'Internal server error', action: 'deny' } };
+    try {
+      decision = await decide(body, community_id);
+    } finally {
+      if (idempotencyKey && community_id) {
+        await storeDecision(community_id, idempotencyKey, decision);
+      }
+    }
+
+    return NextResponse.json(decision.body, { status: decision.status });
   } catch (error: any) {
     console.error('[POD Detection] Error:', error);
     return NextResponse.json(
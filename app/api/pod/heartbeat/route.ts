@@ -1,8 +1,79 @@
 import { NextRequest, NextResponse } from 'next/server';
+import { gunzipSync } from 'zlib';
 import { supabaseServer } from '@/lib/supabase-server';
 
 export const dynamic = 'force-dynamic';
 
+// Heartbeat protocol offered to pods; see pod-agent/pod_heartbeat.py
+const HEARTBEAT_PROTOCOL = 2;
+
+// Payload keys that describe the pod rather than its current load
+const STATIC_KEYS = [
+  'ip_address', 'firmware_version', 'status', 'cameras',
+  'tailscale_ip', 'tailscale_hostname', 'tailscale_funnel_url'
+];
+
+type HeartbeatState = {
+  session: string;
+  seq: number;
+  static: Record<string, any>;
+  stats: Record<string, any>;
+};
+
+async function readBody(request: NextRequest): Promise<any> {
+  const raw = Buffer.from(await request.arrayBuffer());
+  const text = request.headers.get('Content-Encoding') === 'gzip'
+    ? gunzipSync(raw).toString('utf8')
+    : raw.toString('utf8');
+  return JSON.parse(text);
+}
+
+// Same as apply_heartbeat in pod_heartbeat.py: the pod's new state, or null if it must resync
+function applyHeartbeat(state: HeartbeatState | null, envelope: any): HeartbeatState | null {
+  let stats: Record<string, any>;
+  let staticData: Record<string, any>;
+
+  if (envelope.base === null || envelope.base === undefined) {
+    stats = { ...(envelope.stats || {}) };
+    staticData = { ...(envelope.static || {}) };
+  } else {
+    if (!state || state.session !== envelope.session || state.seq !== envelope.base) {
+      return null;
+    }
+    stats = { ...state.stats, ...(envelope.stats || {}) };
+    for (const path of envelope.removed || []) {
+      delete stats[path];
+    }
+    staticData = 'static' in envelope ? envelope.static : state.static;
+  }
+
+  return { session: envelope.session, seq: envelope.seq, static: staticData, stats };
+}
+
+function unflatten(flat: Record<string, any>): Record<string, any> {
+  const data: Record<string, any> = {};
+  for (const [path, value] of Object.entries(flat)) {
+    const parts = path.split('.');
+    const leaf = parts.pop()!;
+    let node = data;
+    for (const part of parts) {
+      node = node[part] = node[part] || {};
+    }
+    node[leaf] = value;
+  }
+  return data;
+}
+
+function statsOf(payload: Record<string, any>): Record<string, any> {
+  const stats: Record<string, any> = {};
+  for (const [key, value] of Object.entries(payload)) {
+    if (key !== 'pod_id' && key !== 'protocol' && !STATIC_KEYS.includes(key)) {
+      stats[key] = value;
+    }
+  }
+  return stats;
+}
+
 async function hashApiKey(apiKey: string): Promise<string> {
   const encoder = new TextEncoder();
   const data = encoder.encode(apiKey);
@@ -54,7 +125,56 @@ export async function POST(request: NextRequest) {
       );
     }
 
-    const body = await request.json();
+    let body: any;
+    try {
+      body = await readBody(request);
+    } catch (error) {
+      return NextResponse.json({ error: 'Invalid heartbeat body' }, { status: 400 });
+    }
+
+    // Protocol 2: rebuild the full payload from the stored state plus this delta
+    let heartbeatState: HeartbeatState | null = null;
+    if (body.protocol === HEARTBEAT_PROTOCOL) {
+      if (!body.pod_id) {
+        return NextResponse.json({ error: 'pod_id is required' }, { status: 400 });
+      }
+
+      const { data: stored } = await supabaseServer
+        .from('pods')
+        .select('heartbeat_state')
+        .eq('id', body.pod_id)
+        .maybeSingle();
+
+      heartbeatState = applyHeartbeat(stored?.heartbeat_state || null, body);
+      if (!heartbeatState) {
+        return NextResponse.json(
+          { error: 'Heartbeat state out of sync', heartbeat: { protocol: HEARTBEAT_PROTOCOL, resync: true } },
+          { status: 409 }
+        );
+      }
+
+      // Only stats moved: the pod row's static fields and its cameras are unchanged, so
+      // keep this beat to one narrow write
+      if (body.base !== null && body.base !== undefined && !('static' in body)) {
+        await supabaseServer
+          .from('pods')
+          .update({ last_heartbeat: new Date().toISOString(), heartbeat_state: heartbeatState })
+          .eq('id', body.pod_id);
+
+        return NextResponse.json({
+          success: true,
+          pod_id: body.pod_id,
+          heartbeat: { protocol: HEARTBEAT_PROTOCOL, ack: heartbeatState.seq }
+        });
+      }
+
+      body = { pod_id: body.pod_id, ...heartbeatState.static, ...unflatten(heartbeatState.stats) };
+    } else if (body.protocol && body.protocol > HEARTBEAT_PROTOCOL) {
+      return NextResponse.json({ error: 'Unsupported heartbeat protocol' }, { status: 400 });
+    }
+
+    const heartbeatStats = statsOf(body);
+
     const {
       pod_id,
       ip_address,
@@ -112,6 +232,8 @@ export async function POST(request: NextRequest) {
         status,
         ip_address,
         firmware_version,
+        heartbeat_stats: heartbeatStats,
+        heartbeat_state: heartbeatState,
         updated_at: new Date().toISOString()
       };
 
@@ -143,7 +265,9 @@ export async function POST(request: NextRequest) {
           last_heartbeat: new Date().toISOString(),
           status,
           ip_address,
-          firmware_version
+          firmware_version,
+          heartbeat_stats: heartbeatStats,
+          heartbeat_state: heartbeatState
         });
     }
 
@@ -203,7 +327,10 @@ export async function POST(request: NextRequest) {
       success: true,
       pod_id,
       community_id: keyDetails.community_id,
-      cameras_registered: cameras.length
+      cameras_registered: cameras.length,
+      heartbeat: heartbeatState
+        ? { protocol: HEARTBEAT_PROTOCOL, ack: heartbeatState.seq }
+        : { protocol: HEARTBEAT_PROTOCOL }
     });
   } catch (error: any) {
     console.error('[POD Heartbeat] Error:', error);
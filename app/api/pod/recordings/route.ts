@@ -305,3 +305,90 @@ export async function POST(request: NextRequest) {
     );
   }
 }
+
+export async function PATCH(request: NextRequest) {
+  try {
+    const authHeader = request.headers.get('Authorization');
+    const apiKeyData = await verifyPodApiKey(authHeader);
+
+    if (!apiKeyData) {
+      return NextResponse.json(
+        { error: 'Invalid or revoked API key' },
+        { status: 401 }
+      );
+    }
+
+    const { storage_key, upload_status, storage_url } = await request.json();
+
+    if (!storage_key || !['uploaded', 'failed'].includes(upload_status)) {
+      return NextResponse.json(
+        { error: 'storage_key and upload_status (uploaded or failed) are required' },
+        { status: 400 }
+      );
+    }
+
+    // The pod uploads the clip and its thumbnail as separate objects
+    let field = 'storage_key';
+    let { data: recording, error: lookupError } = await supabaseServer
+      .from('camera_recordings')
+      .select('id, metadata')
+      .eq('pod_id', apiKeyData.pod_id)
+      .eq('metadata->>storage_key', storage_key)
+      .maybeSingle();
+
+    if (!lookupError && !recording) {
+      field = 'thumbnail_storage_key';
+      ({ data: recording, error: lookupError } = await supabaseServer
+        .from('camera_recordings')
+        .select('id, metadata')
+        .eq('pod_id', apiKeyData.pod_id)
+        .eq('metadata->>thumbnail_storage_key', storage_key)
+        .maybeSingle());
+    }
+
+    if (lookupError) {
+      console.error('[Recording Upload] Lookup failed:', lookupError);
+      return NextResponse.json(
+        { error: 'Failed to look up recording', details: lookupError.message },
+        { status: 500 }
+      );
+    }
+
+    if (!recording) {
+      // Not registered yet; the pod retries
+      return NextResponse.json(
+        { error: 'Recording not found' },
+        { status: 404 }
+      );
+    }
+
+    const prefix = field === 'storage_key' ? '' : 'thumbnail_';
+    const metadata = {
+      ...(recording.metadata || {}),
+      [`${prefix}upload_status`]: upload_status,
+      [`${prefix}uploaded_at`]: upload_status === 'uploaded' ? new Date().toISOString() : null,
+      ...(storage_url ? { [`${prefix}storage_url`]: storage_url } : {})
+    };
+
+    const { error: updateError } = await supabaseServer
+      .from('camera_recordings')
+      .update({ metadata })
+      .eq('id', recording.id);
+
+    if (updateError) {
+      console.error('[Recording Upload] Failed to update record:', updateError);
+      return NextResponse.json(
+        { error: 'Failed to update recording', details: updateError.message },
+        { status: 500 }
+      );
+    }
+
+    return NextResponse.json({ success: true, recording_id: recording.id });
+  } catch (error: any) {
+    console.error('[Recording Upload] Error:', error);
+    return NextResponse.json(
+      { error: 'Internal server error', details: error.message },
+      { status: 500 }
+    );
+  }
+}
@@ -1,6 +1,45 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { supabaseServer } from '@/lib/supabase-server';
 
+async function hashApiKey(apiKey: string): Promise<string> {
+  const encoder = new TextEncoder();
+  const data = encoder.encode(apiKey);
+  const hashBuffer = await crypto.subtle.digest('SHA-256', data);
+  const hashArray = Array.from(new Uint8Array(hashBuffer));
+  const hashHex = hashArray.map(b => b.toString(16).padStart(2, '0')).join('');
+  return hashHex;
+}
+
+async function verifyApiKey(authHeader: string | null) {
+  if (!authHeader || !authHeader.startsWith('Bearer ')) {
+    return null;
+  }
+
+  const apiKey = authHeader.substring(7);
+
+  if (!apiKey.startsWith('pbk_')) {
+    return null;
+  }
+
+  try {
+    const keyHash = await hashApiKey(apiKey);
+
+    const { data: keyData, error } = await supabaseServer
+      .from('pod_api_keys')
+      .select('id, community_id, revoked_at')
+      .eq('key_hash', keyHash)
+      .maybeSingle();
+
+    if (error || !keyData || keyData.revoked_at) {
+      return null;
+    }
+
+    return keyData;
+  } catch (error) {
+    return null;
+  }
+}
+
 export async function GET(
   request: NextRequest,
   { params }: { params: { id: string } }
@@ -41,6 +80,26 @@ export async function GET(
       );
     }
 
+    const format = request.nextUrl.searchParams.get('format') || 'json';
+
+    // Agent runtime config (overlaid on the pod's config.yaml, applied without restart)
+    if (format === 'agent') {
+      const apiKeyData = await verifyApiKey(request.headers.get('Authorization'));
+
+      if (!apiKeyData || apiKeyData.community_id !== pod.site?.community?.id) {
+        return NextResponse.json(
+          { error: 'Invalid or revoked API key' },
+          { status: 401 }
+        );
+      }
+
+      return NextResponse.json({
+        pod_id: pod.id,
+        config_version: pod.agent_config_version || 0,
+        config: pod.agent_config || {},
+      });
+    }
+
     // Generate docker-compose.yml
     const dockerCompose = `version: '3.8'
 
@@ -115,8 +174,6 @@ MAX_STORAGE_GB=100
 RETENTION_DAYS=30
 `;
 
-    const format = request.nextUrl.searchParams.get('format') || 'json';
-
     if (format === 'compose') {
       return new NextResponse(dockerCompose, {
         headers: {
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Backfill after an MQTT outage, end to end.
+
+Records --events plate events in the stub's Frigate events API, spread
+over the hour before now, as if they had happened while the agent was
+disconnected, then connects the agent (on_mqtt_connect, with
+enable_backfill on) and waits for the backfill to finish. --max-events is
+kept below --events so the gap is replayed in batches, and the stub
+portal fails --fail-rate of detect requests so the backfill has to stop
+and resume. A live plate is decided afterwards.
+
+Fails unless every missed event reached the portal exactly once, oldest
+first, with its original timestamp, no replayed event opened the gate and
+the live plate did.
+
+Examples:
+  python3 bench/backfill.py
+  python3 bench/backfill.py --events 1000 --max-events 100 --fail-rate 0.2 --json backfill.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import BenchEnvironment, synthetic_event  # noqa: E402
+
+
+class FakeClient:
+    def subscribe(self, topic):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill of missed plate events after an outage')
+    parser.add_argument('--events', type=int, default=300, help='Events missed during the outage')
+    parser.add_argument('--max-events', type=int, default=50, help='backfill_max_events (events per batch)')
+    parser.add_argument('--fail-rate', type=float, default=0.1, help='Share of detect requests answering 503')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--json', help='Write results here')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    overrides = {
+        'enable_backfill': True,
+        'backfill_rate': 1000,
+        'backfill_max_events': args.max_events,
+        'backfill_retry_interval': 0.2,
+        'record_on_detection': False,
+        'save_snapshots': False,
+        'enable_media_probe': False,
+        'enable_governor': False
+    }
+
+    with BenchEnvironment(overrides) as env:
+        agent = env.make_agent()
+        agent.apply_access_list(env.portal.access_list(), 'bench')
+
+        # The agent last saw an event an hour ago; these happened since
+        now = time.time()
+        agent.event_journal.last_event_time = now - 3600
+        expected = []
+        for i in range(args.events):
+            ts = now - 3600 + (i + 1) * 3000 / args.events
+            plate = random.choice(env.portal.plates) if i % 3 else f"ZZ{i:05d}"
+            event = dict(synthetic_event(plate)['after'], id=f"missed-{i:05d}", start_time=ts)
+            env.portal.add_frigate_event(event)
+            expected.append((plate, datetime.fromtimestamp(ts, timezone.utc).isoformat()))
+
+        env.portal.configure('detect', fail_rate=args.fail_rate)
+        started = time.perf_counter()
+        agent.on_mqtt_connect(FakeClient(), None, None, 0)
+
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            if agent.backfill_stats['events'] >= args.events and agent.event_journal.backfill_since is None \
+                    and not agent.backfill_lock.locked():
+                break
+        elapsed = time.perf_counter() - started
+
+        env.portal.configure('detect', fail_rate=0)
+        live = synthetic_event(env.portal.plates[0])['after']
+        agent.handle_plate_event(live)
+
+        stats = env.portal.get_stats()
+        with env.portal.lock:
+            replayed = [(d['plate'], d.get('timestamp')) for d in env.portal.detections if d.get('backfill')]
+        agent.portal_client.stop()
+
+    result = {
+        'events': args.events,
+        'replayed': len(replayed),
+        'missing': len(set(expected) - set(replayed)),
+        'duplicates': len(replayed) - len(set(replayed)),
+        'in_order': [ts for _, ts in replayed] == sorted(ts for _, ts in replayed),
+        'backfill_gate_opens': stats['gate_opens'] - 1,
+        'live_gate_opened': stats['gate_opens'] >= 1,
+        'detect_failures': stats['failures'].get('detect', 0),
+        'backfill_runs': agent.backfill_stats['runs'],
+        'elapsed_seconds': round(elapsed, 2)
+    }
+
+    print("=" * 60)
+    print(f"Backfill of {args.events} missed events, {args.max_events} per batch, "
+          f"{args.fail_rate:.0%} detect failures")
+    print("=" * 60)
+    for key, value in result.items():
+        print(f"{key:<22} {value}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    ok = (result['replayed'] == args.events and not result['missing'] and not result['duplicates']
+          and result['in_order'] and result['backfill_gate_opens'] == 0 and result['live_gate_opened'])
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
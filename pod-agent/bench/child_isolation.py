@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Gate-decision latency and HLS segment timing while recordings write to
+disk, with and without child-process priorities.
+
+Starts --recordings stand-in recordings through the agent's ChildLauncher
+as the "recording" work class: each encodes (zlib, for the CPU side of
+ffmpeg) and writes 1 MB blocks with an fsync after every --fsync-mb, like
+ffmpeg flushing MP4 fragments. The HLS pipeline (fake ffmpeg, "streaming"
+class) runs alongside. Meanwhile plate events go through
+handle_plate_event at --rate per second.
+
+Three runs: "idle" (no recordings), "default" (child_priorities: false,
+everything at the agent's priority, as before) and "isolated" (the default
+work classes). Reports decision latency, the largest gap between HLS
+segments against the expected interval, and the CPU and bytes written by
+the recordings (from the launcher's per-child accounting).
+
+I/O priorities only take effect on a disk using the BFQ scheduler; on
+"none" or mq-deadline the difference comes from the CPU side.
+
+Examples:
+  python3 bench/child_isolation.py --duration 20
+  python3 bench/child_isolation.py --recordings 3 --rate 10 --json isolation.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import BenchEnvironment, latency_summary, synthetic_event  # noqa: E402
+
+WRITER = """
+import os, sys, time, zlib
+path, fsync_mb, stop_at = sys.argv[1], int(sys.argv[2]), float(sys.argv[3])
+block = os.urandom(1 << 20)
+with open(path, 'wb') as f:
+    written = 0
+    while time.time() < stop_at:
+        f.write(zlib.compress(block, 6))
+        written += 1
+        if written % fsync_mb == 0:
+            f.flush()
+            os.fsync(f.fileno())
+        if written % 256 == 0:
+            f.seek(0)
+            f.truncate()
+"""
+
+
+def segment_gaps(directory: str, stop: threading.Event, gaps: list):
+    """Time between new HLS segments appearing"""
+    seen = set()
+    last = None
+    while not stop.is_set():
+        try:
+            names = {name for name in os.listdir(directory) if name.endswith('.ts')}
+        except OSError:
+            names = set()
+        new = names - seen
+        if new:
+            now = time.monotonic()
+            if last is not None:
+                gaps.append(now - last)
+            last = now
+            seen |= new
+        time.sleep(0.02)
+
+
+def run(mode: str, args) -> dict:
+    overrides = {
+        'child_priorities': mode == 'isolated',
+        'enable_streaming': True,
+        'stream_on_demand': False,
+        'enable_media_probe': False,
+        'record_on_detection': False,
+        'save_snapshots': False,
+        'enable_governor': False,
+        'child_sample_interval': 0.5
+    }
+
+    with BenchEnvironment(overrides, ffmpeg_speed=args.speed) as env:
+        agent = env.make_agent()
+        agent.apply_access_list(env.portal.access_list(), 'bench')
+        if agent.detection_history:
+            agent.detection_history.start()
+        agent.children.start()
+        plates = env.portal.plates
+
+        agent.start_ffmpeg_stream()
+        agent.wait_for_playlist(10)
+
+        stop_at = time.time() + args.duration
+        writers = []
+        if mode != 'idle':
+            for i in range(args.recordings):
+                writers.append(agent.children.popen('recording', [
+                    sys.executable, '-c', WRITER, os.path.join(env.workdir, f"recording_{i}.bin"),
+                    str(args.fsync_mb), str(stop_at)
+                ]))
+
+        stop = threading.Event()
+        gaps: list = []
+        watcher = threading.Thread(target=segment_gaps, args=(agent.hls_output_dir, stop, gaps), daemon=True)
+        watcher.start()
+
+        latencies = []
+        interval = 1 / args.rate
+        next_at = time.monotonic()
+        i = 0
+        while time.time() < stop_at:
+            event = synthetic_event(plates[i % len(plates)] if i % 3 else f"UNK{i:05d}")['after']
+            started = time.perf_counter()
+            agent.handle_plate_event(event)
+            latencies.append(time.perf_counter() - started)
+            i += 1
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.monotonic()))
+
+        for writer in writers:
+            writer.wait(timeout=10)
+        stop.set()
+        watcher.join()
+        agent.children.sample(0.5)
+        recording = agent.children.get_stats()['classes'].get('recording', {})
+        agent.children.stop()
+        agent.stop_ffmpeg_stream()
+        if agent.detection_history:
+            agent.detection_history.stop()
+        agent.portal_client.stop()
+
+    expected = 2 * args.speed
+    return {
+        'mode': mode,
+        'events': len(latencies),
+        'latency': latency_summary(latencies),
+        'segment_gap_expected_ms': round(expected * 1000),
+        'segment_gap_max_ms': round(max(gaps) * 1000) if gaps else None,
+        'late_segments': sum(1 for gap in gaps if gap > expected * 1.5),
+        'segments': len(gaps) + 1 if gaps else 0,
+        'recording_cpu_seconds': recording.get('cpu_seconds', 0),
+        'recording_write_mb': recording.get('write_mb', 0)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Decision latency while recordings write, with child priorities')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--recordings', type=int, default=2)
+    parser.add_argument('--rate', type=float, default=5, help='Plate events per second')
+    parser.add_argument('--fsync-mb', type=int, default=8)
+    parser.add_argument('--speed', type=float, default=0.5, help='Fake ffmpeg speed (0.5 = a segment per second)')
+    parser.add_argument('--json', help='Write results here')
+    args = parser.parse_args()
+
+    results = [run(mode, args) for mode in ('idle', 'default', 'isolated')]
+
+    print("=" * 92)
+    print(f"Decisions at {args.rate:g}/s with {args.recordings} recordings writing, {args.duration:g}s per run")
+    print("=" * 92)
+    print(f"{'mode':<9} {'events':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'seg gap max':>12} "
+          f"{'late segs':>10} {'rec cpu':>8} {'rec MB':>8}")
+    for r in results:
+        print(f"{r['mode']:<9} {r['events']:>7} {r['latency']['p50_ms']:>6.0f}ms {r['latency']['p95_ms']:>6.0f}ms "
+              f"{r['latency']['p99_ms']:>6.0f}ms {r['latency']['max_ms']:>6.0f}ms "
+              f"{str(r['segment_gap_max_ms']) + 'ms':>12} {r['late_segments']:>10} "
+              f"{r['recording_cpu_seconds']:>7.1f}s {r['recording_write_mb']:>8.0f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Boot-to-first-decision benchmark.
+
+Starts complete_pod_agent.py as a fresh process (real interpreter start and
+imports) against the stub portal and a stub MQTT broker. As soon as the
+agent subscribes, the broker publishes a plate event; the clock stops when
+the portal receives the detection. The portal's access list endpoint is
+slowed down (--whitelist-latency) to check that a slow whitelist refresh
+does not hold up the first decision.
+
+Exits non-zero if the median boot-to-first-decision time is over
+--budget-ms, so it can gate changes to startup.
+
+Examples:
+  python3 bench/cold_start.py --runs 5
+  python3 bench/cold_start.py --runs 3 --set enable_streaming=false --budget-ms 800
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import AGENT_DIR, BenchEnvironment, free_port, synthetic_event  # noqa: E402
+from stub_mqtt import StubBroker  # noqa: E402
+
+
+def boot_once(overrides, whitelist_latency: float, timeout: float) -> dict:
+    broker = StubBroker()
+    broker_port = broker.start()
+
+    config = {
+        'enable_mqtt': True,
+        'mqtt_host': '127.0.0.1',
+        'mqtt_port': broker_port,
+        'enable_streaming': True,
+        'stream_port': free_port(),
+        'enable_backfill': False
+    }
+    config.update(overrides)
+
+    with BenchEnvironment(config) as env:
+        env.portal.configure('access_list', latency=whitelist_latency)
+
+        plate = env.portal.plates[0]
+        topic = 'frigate/events'
+        broker.on_subscribe = lambda topic_filter: broker.publish(
+            topic, json.dumps(synthetic_event(plate)).encode())
+
+        started = time.time()
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(AGENT_DIR, 'complete_pod_agent.py'), env.config_path],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+        decided_at = None
+        deadline = started + timeout
+        while time.time() < deadline and process.poll() is None:
+            if env.portal.detection_times:
+                decided_at = env.portal.detection_times[0]
+                break
+            time.sleep(0.002)
+
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        broker.stop()
+
+        stats = env.portal.get_stats()
+
+    def ms(at):
+        return round((at - started) * 1000, 1) if at else None
+
+    return {
+        'subscribed_ms': ms(broker.first_subscribe_at),
+        'first_decision_ms': ms(decided_at),
+        'whitelist_requests': stats['requests'].get('access_list', 0)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Boot-to-first-decision benchmark')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1500, help='Fail if the median exceeds this')
+    parser.add_argument('--whitelist-latency', type=float, default=3.0,
+                        help='Seconds the stub portal takes to answer the access list')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--set', action='append', default=[], help='Extra agent config, key=yaml-value')
+    parser.add_argument('--json', help='Write the full report here')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    overrides = {}
+    for item in args.set:
+        key, value = item.split('=', 1)
+        overrides[key] = yaml.safe_load(value)
+
+    runs = [boot_once(overrides, args.whitelist_latency, args.timeout) for _ in range(args.runs)]
+    decisions = [r['first_decision_ms'] for r in runs if r['first_decision_ms'] is not None]
+    subscribes = [r['subscribed_ms'] for r in runs if r['subscribed_ms'] is not None]
+
+    report = {
+        'runs': runs,
+        'budget_ms': args.budget_ms,
+        'median_subscribed_ms': round(statistics.median(subscribes), 1) if subscribes else None,
+        'median_first_decision_ms': round(statistics.median(decisions), 1) if decisions else None,
+        'max_first_decision_ms': max(decisions) if decisions else None,
+        'failed_runs': len(runs) - len(decisions)
+    }
+    passed = bool(decisions) and not report['failed_runs'] and report['median_first_decision_ms'] <= args.budget_ms
+    report['passed'] = passed
+
+    print("=" * 60)
+    print("Boot to first decision")
+    print("=" * 60)
+    for i, run in enumerate(runs, 1):
+        print(f"Run {i}: MQTT subscribed {run['subscribed_ms']} ms, first decision {run['first_decision_ms']} ms")
+    print(f"Median:  subscribed {report['median_subscribed_ms']} ms, "
+          f"first decision {report['median_first_decision_ms']} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"Result:  {'PASS' if passed else 'FAIL'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
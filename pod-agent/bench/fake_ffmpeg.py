@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Fake ffmpeg/ffprobe for running the agent headless (CI, benchmarks).
+
+  ffmpeg ... -t N ... out.mp4   sleeps N * FAKE_FFMPEG_SPEED seconds, writes
+                                N * FAKE_FFMPEG_BITRATE bytes (fewer if
+                                interrupted with SIGINT)
+  ffmpeg ... -f hls ... x.m3u8  writes a rolling playlist and segments until
+                                terminated
+  ffprobe ...                   prints a canned H.264 stream description
+
+FAKE_FFMPEG_STDERR sets how many bytes of progress output each HLS segment
+writes to stderr, like real ffmpeg's `frame= ... speed=` lines; a caller
+that pipes stderr without draining it stalls the pipeline just as it would
+with the real thing.
+
+install() drops `ffmpeg` and `ffprobe` wrappers into a directory that can be
+put first on PATH.
+"""
+
+import json
+import os
+import signal
+import stat
+import sys
+import time
+
+SPEED = float(os.environ.get('FAKE_FFMPEG_SPEED', '1.0'))
+BITRATE = int(os.environ.get('FAKE_FFMPEG_BITRATE', '250000'))
+GOP_SECONDS = float(os.environ.get('FAKE_FFMPEG_GOP', '2.0'))
+STDERR_BYTES = int(os.environ.get('FAKE_FFMPEG_STDERR', '0'))
+
+
+def install(bin_dir: str) -> str:
+    os.makedirs(bin_dir, exist_ok=True)
+    script = os.path.abspath(__file__)
+    for tool in ('ffmpeg', 'ffprobe'):
+        path = os.path.join(bin_dir, tool)
+        with open(path, 'w') as f:
+            f.write(f"#!/bin/sh\nexec {sys.executable} {script} {tool} \"$@\"\n")
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return bin_dir
+
+
+def arg_value(args, flag, default=None):
+    if flag in args:
+        index = args.index(flag)
+        if index + 1 < len(args):
+            return args[index + 1]
+    return default
+
+
+def ffprobe(args):
+    if 'packet=pts_time,flags' in args:
+        packets = []
+        frame = 1 / 15
+        for i in range(int(6 / frame)):
+            pts = i * frame
+            keyframe = (i % int(GOP_SECONDS / frame)) == 0
+            packets.append({'pts_time': f"{pts:.6f}", 'flags': 'K_' if keyframe else '__'})
+        print(json.dumps({'packets': packets}))
+        return 0
+
+    print(json.dumps({'streams': [{
+        'codec_type': 'video',
+        'codec_name': 'h264',
+        'width': 1920,
+        'height': 1080,
+        'avg_frame_rate': '15/1',
+        'r_frame_rate': '15/1'
+    }]}))
+    return 0
+
+
+def write_clip(output, duration):
+    # SIGINT/SIGTERM stop the clip early, like ffmpeg finalizing on 'q'
+    stopping = [False]
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopping.__setitem__(0, True))
+
+    started = time.time()
+    deadline = started + duration * SPEED
+    while not stopping[0] and time.time() < deadline:
+        time.sleep(min(0.05, max(0.0, deadline - time.time())))
+
+    if SPEED > 0:
+        duration = min(duration, (time.time() - started) / SPEED)
+
+    with open(output, 'wb') as f:
+        remaining = int(duration * BITRATE)
+        block = b'\x00' * 65536
+        while remaining > 0:
+            f.write(block[:min(remaining, len(block))])
+            remaining -= len(block)
+    return 0
+
+
+def write_hls(args, output):
+    hls_time = float(arg_value(args, '-hls_time', '2'))
+    list_size = int(arg_value(args, '-hls_list_size', '5'))
+    pattern = arg_value(args, '-hls_segment_filename', os.path.join(os.path.dirname(output), 'segment_%03d.ts'))
+
+    running = [True]
+    signal.signal(signal.SIGTERM, lambda *_: running.__setitem__(0, False))
+
+    segments = []
+    index = 0
+    while running[0]:
+        time.sleep(hls_time * SPEED)
+        segment = pattern % index
+        with open(segment, 'wb') as f:
+            f.write(b'\x47' * int(hls_time * BITRATE))
+        segments.append(os.path.basename(segment))
+        if len(segments) > list_size:
+            old = segments.pop(0)
+            try:
+                os.remove(os.path.join(os.path.dirname(segment), old))
+            except OSError:
+                pass
+
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', f"#EXT-X-TARGETDURATION:{int(hls_time + 0.999)}",
+                 f"#EXT-X-MEDIA-SEQUENCE:{index - len(segments) + 1}"]
+        for name in segments:
+            lines += [f"#EXTINF:{hls_time:.3f},", name]
+        tmp = output + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp, output)
+        index += 1
+
+        if STDERR_BYTES:
+            line = f"frame={index * 30:5d} fps=15 q=-1.0 size=N/A time=00:00:{index * hls_time:05.2f} speed=1x"
+            sys.stderr.write((line.ljust(STDERR_BYTES - 1) + '\r')[:STDERR_BYTES])
+            sys.stderr.flush()
+
+    return 0
+
+
+def ffmpeg(args):
+    output = args[-1]
+    if arg_value(args, '-f') == 'hls':
+        return write_hls(args, output)
+    return write_clip(output, float(arg_value(args, '-t', '10')))
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return 1
+    tool, args = sys.argv[1], sys.argv[2:]
+    if tool == 'ffprobe':
+        return ffprobe(args)
+    return ffmpeg(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Shared plumbing for pod agent benchmarks.
+
+BenchEnvironment sets up everything the agent needs to run headless: a temp
+working directory, fake ffmpeg/ffprobe on PATH, a stub portal (which also
+serves Frigate snapshots) and a generated config.yaml. Replayer feeds Frigate
+MQTT payloads into the agent through a single dispatcher thread, the same
+way paho delivers them, and measures decision latency and backlog.
+"""
+
+import json
+import os
+import queue
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import psutil
+import yaml
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, AGENT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import complete_pod_agent  # noqa: E402
+import fake_ffmpeg  # noqa: E402
+import stub_portal  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def latency_summary(values: List[float]) -> Dict[str, Any]:
+    """Seconds in, milliseconds out"""
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        'count': len(values),
+        'p50_ms': ms(percentile(values, 50)),
+        'p95_ms': ms(percentile(values, 95)),
+        'p99_ms': ms(percentile(values, 99)),
+        'max_ms': ms(max(values) if values else None)
+    }
+
+
+class FakeMessage:
+    def __init__(self, payload: Dict[str, Any], topic: str = 'frigate/events'):
+        self.topic = topic
+        self.payload = json.dumps(payload).encode()
+
+
+def synthetic_event(plate: str, camera: str = 'gate', score: float = 0.9) -> Dict[str, Any]:
+    now = time.time()
+    return {
+        'type': 'new',
+        'after': {
+            'id': f"{now:.6f}-{random.randint(0, 999999):06d}",
+            'label': 'license_plate',
+            'sub_label': plate,
+            'score': score,
+            'camera': camera,
+            'start_time': now
+        }
+    }
+
+
+def synthetic_events(count: int, known_plates: List[str], known_ratio: float = 0.7,
+                     repeat_ratio: float = 0.2) -> Iterable[Dict[str, Any]]:
+    """Mix of whitelisted plates, strangers and repeated reads of the previous car"""
+    previous = None
+    for i in range(count):
+        roll = random.random()
+        if previous and roll < repeat_ratio:
+            plate = previous
+        elif roll < repeat_ratio + known_ratio * (1 - repeat_ratio):
+            plate = random.choice(known_plates)
+        else:
+            plate = f"UNK{random.randint(0, 99999):05d}"
+        previous = plate
+        yield synthetic_event(plate)
+
+
+def load_events(path: str) -> List[Dict[str, Any]]:
+    """Recorded MQTT payloads, one JSON object per line"""
+    events = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+    return events
+
+
+class BenchEnvironment:
+    def __init__(self, config_overrides: Optional[Dict[str, Any]] = None,
+                 plates: int = 200, ffmpeg_speed: float = 0.01, keep: bool = False):
+        self.config_overrides = config_overrides or {}
+        self.plates = plates
+        self.ffmpeg_speed = ffmpeg_speed
+        self.keep = keep
+        self.workdir = None
+        self.portal = None
+        self.portal_url = None
+        self.server = None
+        self.config_path = None
+        self._old_cwd = None
+        self._old_env = {}
+
+    def __enter__(self):
+        self.workdir = tempfile.mkdtemp(prefix='platebridge-bench-')
+        self._old_cwd = os.getcwd()
+        os.chdir(self.workdir)
+
+        bin_dir = fake_ffmpeg.install(os.path.join(self.workdir, 'bin'))
+        for key, value in {
+            'PATH': f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+            'FAKE_FFMPEG_SPEED': str(self.ffmpeg_speed),
+            'FAKE_FFMPEG_BITRATE': os.environ.get('FAKE_FFMPEG_BITRATE', '50000')
+        }.items():
+            self._old_env[key] = os.environ.get(key)
+            os.environ[key] = value
+
+        self.server, self.portal, self.portal_url = stub_portal.serve(0, stub_portal.PortalState(self.plates))
+
+        config = {
+            'portal_url': self.portal_url,
+            'pod_api_key': 'pbk_bench',
+            'pod_id': 'bench-pod',
+            'camera_id': 'bench-camera',
+            'camera_name': 'Bench Camera',
+            'camera_rtsp_url': 'rtsp://bench.invalid/stream',
+            'community_id': self.portal.community_id,
+            'frigate_url': self.portal_url,
+            'recordings_dir': os.path.join(self.workdir, 'recordings'),
+            'stream_secret': 'bench-secret',
+            'enable_mqtt': False,
+            'enable_streaming': False,
+            'public_ip': '127.0.0.1'
+        }
+        config.update(self.config_overrides)
+
+        self.config_path = os.path.join(self.workdir, 'config.yaml')
+        with open(self.config_path, 'w') as f:
+            yaml.safe_dump(config, f)
+
+        return self
+
+    def make_agent(self, role: str = 'all'):
+        return complete_pod_agent.CompletePodAgent(self.config_path, role=role)
+
+    def __exit__(self, *exc):
+        if self.server:
+            self.server.shutdown()
+        os.chdir(self._old_cwd)
+        for key, value in self._old_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        if not self.keep:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class Replayer:
+    """Feeds payloads to agent.on_mqtt_message at a fixed rate, with optional bursts"""
+
+    def __init__(self, agent, sample_interval: float = 0.5):
+        self.agent = agent
+        self.sample_interval = sample_interval
+        self.inbox: queue.Queue = queue.Queue()
+        self.latencies: List[float] = []
+        self.queue_samples: List[Dict[str, Any]] = []
+        self.rss_samples: List[int] = []
+        self.processed = 0
+        self.errors = 0
+        self.current_enqueued_at = None
+        self.done = threading.Event()
+        self._instrument()
+
+    def _instrument(self):
+        original = self.agent.send_detection
+        replayer = self
+
+        async def timed_send_detection(*args, **kwargs):
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                if replayer.current_enqueued_at is not None:
+                    replayer.latencies.append(time.perf_counter() - replayer.current_enqueued_at)
+
+        self.agent.send_detection = timed_send_detection
+
+    def _dispatch(self):
+        while True:
+            item = self.inbox.get()
+            if item is None:
+                break
+            enqueued_at, message = item
+            self.current_enqueued_at = enqueued_at
+            try:
+                self.agent.on_mqtt_message(None, None, message)
+            except Exception:
+                self.errors += 1
+            self.current_enqueued_at = None
+            self.processed += 1
+
+    def _sample(self, started: float):
+        process = psutil.Process()
+        while not self.done.wait(self.sample_interval):
+            self.queue_samples.append({
+                't': round(time.perf_counter() - started, 2),
+                'depth': self.inbox.qsize()
+            })
+            self.rss_samples.append(process.memory_info().rss)
+
+    def run(self, events: List[Dict[str, Any]], rate: float, burst: int = 0,
+            burst_at: float = 0.0, drain_timeout: float = 120.0) -> Dict[str, Any]:
+        process = psutil.Process()
+        rss_start = process.memory_info().rss
+        started = time.perf_counter()
+
+        dispatcher = threading.Thread(target=self._dispatch, name='mqtt-dispatch', daemon=True)
+        sampler = threading.Thread(target=self._sample, args=(started,), daemon=True)
+        dispatcher.start()
+        sampler.start()
+
+        steady = events[burst:] if burst else events
+        burst_events = events[:burst] if burst else []
+        interval = 1.0 / rate if rate > 0 else 0
+        next_send = started
+        burst_sent = not burst_events
+
+        for payload in steady:
+            now = time.perf_counter()
+            if not burst_sent and now - started >= burst_at:
+                for burst_payload in burst_events:
+                    self.inbox.put((time.perf_counter(), FakeMessage(burst_payload)))
+                burst_sent = True
+
+            if interval:
+                next_send += interval
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.inbox.put((time.perf_counter(), FakeMessage(payload)))
+
+        if not burst_sent:
+            for burst_payload in burst_events:
+                self.inbox.put((time.perf_counter(), FakeMessage(burst_payload)))
+
+        offered_seconds = time.perf_counter() - started
+        self.inbox.put(None)
+        dispatcher.join(drain_timeout)
+        elapsed = time.perf_counter() - started
+        self.done.set()
+        sampler.join()
+
+        depths = [s['depth'] for s in self.queue_samples]
+        return {
+            'events': len(events),
+            'processed': self.processed,
+            'errors': self.errors,
+            'drained': not dispatcher.is_alive(),
+            'offered_rate': round(len(events) / offered_seconds, 2) if offered_seconds else None,
+            'throughput': round(self.processed / elapsed, 2) if elapsed else None,
+            'elapsed_seconds': round(elapsed, 2),
+            'decision_latency': latency_summary(self.latencies),
+            'queue': {
+                'max_depth': max(depths) if depths else 0,
+                'final_depth': depths[-1] if depths else 0,
+                'samples': self.queue_samples
+            },
+            'memory': {
+                'rss_start_mb': round(rss_start / 1e6, 1),
+                'rss_peak_mb': round(max(self.rss_samples + [rss_start]) / 1e6, 1),
+                'rss_end_mb': round(process.memory_info().rss / 1e6, 1)
+            }
+        }
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Heartbeat bytes on the wire, full JSON vs compressed deltas.
+
+Sends --beats heartbeats from CompletePodAgent to the stub portal twice:
+once with the portal offering only protocol 1 (full JSON every time) and
+once with protocol 2. Plate events are fed in between beats so the stats
+move the way they do on a busy gate. Halfway through the protocol 2 run
+the portal forgets its state (as after a restart) to exercise the resync.
+
+After every protocol 2 beat, the portal's reconstructed state is compared
+with the payload the agent built; any mismatch fails the run.
+
+Examples:
+  python3 bench/heartbeat_size.py --beats 50
+  python3 bench/heartbeat_size.py --beats 200 --events-per-beat 20 --json heartbeats.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import BenchEnvironment, synthetic_event  # noqa: E402
+
+
+def run_protocol(protocol: int, beats: int, events_per_beat: int) -> dict:
+    overrides = {
+        'save_snapshots': False,
+        'record_on_detection': False,
+        'enable_history': False
+    }
+    with BenchEnvironment(overrides) as env:
+        env.portal.heartbeat_protocol = protocol
+        agent = env.make_agent()
+        pod_id = agent.config['pod_id']
+
+        built = []
+        encode = agent.heartbeat.encode
+
+        def capture(payload):
+            built.append(json.loads(json.dumps(payload, default=str)))
+            return encode(payload)
+
+        agent.heartbeat.encode = capture
+
+        mismatches = 0
+        plates = env.portal.plates
+        for beat in range(beats):
+            for i in range(events_per_beat):
+                plate = plates[(beat * events_per_beat + i) % len(plates)] if i % 4 else f"UNK{beat:03d}{i:02d}"
+                agent.handle_plate_event(synthetic_event(plate)['after'])
+
+            if protocol >= 2 and beat == beats // 2:
+                env.portal.forget_pods()
+
+            asyncio.run(agent.send_heartbeat())
+
+            state = env.portal.pod_state(pod_id)
+            if protocol >= 2 and agent.heartbeat.protocol >= 2 and state is not None and state != built[-1]:
+                mismatches += 1
+
+        stats = env.portal.get_stats()
+        wire = stats['bytes_in'].get('heartbeat', 0)
+        requests = stats['requests'].get('heartbeat', 0)
+        full_json = agent.heartbeat.get_stats()['bytes_full_json']
+
+    return {
+        'protocol': protocol,
+        'heartbeats': beats,
+        'requests': requests,
+        'wire_bytes': wire,
+        'bytes_per_heartbeat': round(wire / max(1, beats)),
+        'full_json_bytes_per_heartbeat': round(full_json / max(1, len(built))),
+        'resyncs': stats['heartbeat_resyncs'],
+        'mismatches': mismatches,
+        'agent': agent.heartbeat.get_stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Heartbeat size, protocol 1 vs 2')
+    parser.add_argument('--beats', type=int, default=50)
+    parser.add_argument('--events-per-beat', type=int, default=10)
+    parser.add_argument('--json', help='Write results here')
+    args = parser.parse_args()
+
+    results = [run_protocol(protocol, args.beats, args.events_per_beat) for protocol in (1, 2)]
+
+    print("=" * 60)
+    print(f"Heartbeat size ({args.beats} beats, {args.events_per_beat} events between beats)")
+    print("=" * 60)
+    for result in results:
+        print(f"protocol {result['protocol']}: {result['bytes_per_heartbeat']:>6} B/heartbeat on the wire "
+              f"({result['requests']} requests, {result['resyncs']} resyncs, "
+              f"{result['mismatches']} state mismatches)")
+    saving = 1 - results[1]['wire_bytes'] / max(1, results[0]['wire_bytes'])
+    print(f"Full JSON payload: {results[0]['full_json_bytes_per_heartbeat']} B; protocol 2 saves {saving:.0%}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    return 1 if results[1]['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
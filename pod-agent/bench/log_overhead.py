@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Per-event logging overhead on the detection path.
+
+Runs the same plate events through CompletePodAgent.handle_plate_event
+(stub portal, no snapshots or recordings) three times: with logging off,
+with synchronous handlers (log_async: false, what every pod did before)
+and with the queued pipeline from pod_logging. The console and the log
+file both go to streams whose flush sleeps --write-latency-ms, standing
+in for an SD card that stalls on writes. The overhead is each mode's
+decision latency minus the logging-off run.
+
+Examples:
+  python3 bench/log_overhead.py --events 500
+  python3 bench/log_overhead.py --events 300 --write-latency-ms 20 --json log_overhead.json
+"""
+
+import argparse
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import BenchEnvironment, latency_summary, synthetic_event  # noqa: E402
+
+import pod_logging  # noqa: E402
+
+
+class SlowStream:
+    """File wrapper whose flush stalls like a busy SD card"""
+
+    def __init__(self, stream, latency: float):
+        self.stream = stream
+        self.latency = latency
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def flush(self):
+        self.stream.flush()
+        if self.latency:
+            time.sleep(self.latency)
+
+
+def slow_down(handlers, latency: float):
+    for handler in handlers:
+        if isinstance(handler, logging.handlers.RotatingFileHandler):
+            handler.stream = SlowStream(handler.stream, latency)
+        elif isinstance(handler, logging.StreamHandler):
+            handler.setStream(SlowStream(open(os.devnull, 'w'), latency))
+
+
+def run_mode(env, mode: str, events: int, latency: float) -> dict:
+    log_config = {
+        'log_file': os.path.join(env.workdir, f'agent-{mode}.log'),
+        'log_async': mode == 'async',
+        'log_level': 'CRITICAL' if mode == 'off' else 'INFO'
+    }
+    pipeline = pod_logging.setup_logging(log_config)
+    slow_down(pipeline.handlers if pipeline else logging.getLogger().handlers, latency)
+
+    agent = env.make_agent()
+    agent.log_pipeline = pipeline
+    plates = env.portal.plates
+
+    latencies = []
+    try:
+        for i in range(events):
+            event = synthetic_event(plates[i % len(plates)] if i % 3 else f"UNK{i:05d}")['after']
+            started = time.perf_counter()
+            agent.handle_plate_event(event)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        stats = pipeline.get_stats() if pipeline else None
+        drain_started = time.perf_counter()
+        if pipeline:
+            pipeline.stop()
+        drain = time.perf_counter() - drain_started
+        for handler in list(logging.getLogger().handlers):
+            logging.getLogger().removeHandler(handler)
+            handler.close()
+
+    lines = 0
+    if os.path.exists(log_config['log_file']):
+        with open(log_config['log_file'], 'rb') as f:
+            lines = sum(1 for _ in f)
+
+    return {
+        'mode': mode,
+        'latency': latency_summary(latencies),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'log_lines': lines,
+        'drain_ms': round(drain * 1000, 1),
+        'pipeline': stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-event logging overhead')
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--write-latency-ms', type=float, default=5,
+                        help='Stall added to every flush of the console and log file')
+    parser.add_argument('--json', help='Write results here')
+    args = parser.parse_args()
+
+    latency = args.write_latency_ms / 1000
+    overrides = {
+        'save_snapshots': False,
+        'record_on_detection': False,
+        'enable_history': False,
+        'enable_governor': False
+    }
+
+    results = []
+    with BenchEnvironment(overrides) as env:
+        for mode in ('off', 'sync', 'async'):
+            results.append(run_mode(env, mode, args.events, latency))
+
+    baseline = results[0]['mean_ms']
+    for result in results:
+        result['overhead_ms'] = round(result['mean_ms'] - baseline, 3)
+
+    print("=" * 60)
+    print(f"Logging overhead ({args.events} events, {args.write_latency_ms:g} ms per flush)")
+    print("=" * 60)
+    print(f"{'mode':<6} {'mean':>9} {'p50':>9} {'p99':>9} {'overhead':>9} {'lines':>6} {'drain':>8}")
+    for result in results:
+        print(f"{result['mode']:<6} {result['mean_ms']:>7.2f}ms {result['latency']['p50_ms']:>7.2f}ms "
+              f"{result['latency']['p99_ms']:>7.2f}ms {result['overhead_ms']:>+7.2f}ms {result['log_lines']:>6} "
+              f"{result['drain_ms']:>6.0f}ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'events': args.events, 'write_latency_ms': args.write_latency_ms, 'results': results},
+                      f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
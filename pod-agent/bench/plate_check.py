@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Bulk plate-check throughput on the pod stream server.
+
+Loads a --whitelist sized access list from the stub portal into
+CompletePodAgent, starts its stream server and POSTs batches of plates to
+/plates/check?token=... for each --batch-sizes entry. Half of every batch
+is whitelisted plates written the way guards type them (lowercase, spaces,
+dashes), half unknown plates; any decision that disagrees with the stub
+portal's own whitelist fails the run. Batch size 1 is what checking a list
+one request per plate costs.
+
+Also times the lookup itself in-process: the indexed lookup against the
+linear scan is_plate_whitelisted used to do over the whole whitelist.
+
+Examples:
+  python3 bench/plate_check.py
+  python3 bench/plate_check.py --whitelist 20000 --batch-sizes 1,1000,10000 --json plate_check.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import BenchEnvironment, free_port, latency_summary  # noqa: E402
+from stream_load import STREAM_SECRET, make_token, wait_for_server  # noqa: E402
+
+
+def linear_scan(cache, plate: str) -> bool:
+    """is_plate_whitelisted before the index"""
+    plate_normalized = plate.upper().replace(' ', '').replace('-', '')
+    for cached_plate in cache.keys():
+        if cached_plate.upper().replace(' ', '').replace('-', '') == plate_normalized:
+            return True
+    return False
+
+
+def as_typed(plate: str, rng: random.Random) -> str:
+    """A whitelisted plate the way someone might type it into a visitor list"""
+    middle = len(plate) // 2
+    return rng.choice([
+        plate,
+        plate.lower(),
+        f"{plate[:middle]} {plate[middle:]}",
+        f"{plate[:middle]}-{plate[middle:]}".lower()
+    ])
+
+
+def make_batch(plates, size: int, rng: random.Random):
+    batch = []
+    for i in range(size):
+        if i % 2:
+            batch.append(f"ZZ{rng.randrange(10 ** 6):06d}")
+        else:
+            batch.append(as_typed(rng.choice(plates), rng))
+    return batch
+
+
+def time_lookups(agent, plates, rng: random.Random, lookups: int) -> dict:
+    sample = make_batch(plates, lookups, rng)
+
+    started = time.perf_counter()
+    for plate in sample:
+        agent.is_plate_whitelisted(plate)
+    indexed = time.perf_counter() - started
+
+    # The scan is slow enough that a slice of the sample is plenty
+    scanned_sample = sample[:max(1, lookups // 50)]
+    started = time.perf_counter()
+    for plate in scanned_sample:
+        linear_scan(agent.whitelist_cache, plate)
+    scanned = time.perf_counter() - started
+
+    return {
+        'indexed_us': round(indexed / len(sample) * 1e6, 3),
+        'linear_scan_us': round(scanned / len(scanned_sample) * 1e6, 3)
+    }
+
+
+def run_batches(base_url: str, token: str, plates, plate_set, size: int, total: int, rng: random.Random) -> dict:
+    session = requests.Session()
+    requests_needed = max(1, total // size)
+    latencies = []
+    mismatches = 0
+    checked = 0
+
+    started = time.perf_counter()
+    for _ in range(requests_needed):
+        batch = make_batch(plates, size, rng)
+        sent = time.perf_counter()
+        response = session.post(f"{base_url}/plates/check", params={'token': token},
+                                json={'plates': batch}, timeout=60)
+        latencies.append(time.perf_counter() - sent)
+        response.raise_for_status()
+
+        for plate, result in zip(batch, response.json()['results']):
+            expected = plate.upper().replace(' ', '').replace('-', '') in plate_set
+            if result['allowed'] != expected:
+                mismatches += 1
+        checked += len(batch)
+    elapsed = time.perf_counter() - started
+    session.close()
+
+    return {
+        'batch_size': size,
+        'requests': requests_needed,
+        'plates': checked,
+        'plates_per_second': round(checked / elapsed),
+        'latency': latency_summary(latencies),
+        'mismatches': mismatches
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk plate-check throughput')
+    parser.add_argument('--whitelist', type=int, default=5000, help='Plates on the access list')
+    parser.add_argument('--batch-sizes', default='1,100,1000,10000')
+    parser.add_argument('--plates', type=int, default=20000, help='Plates checked per batch size')
+    parser.add_argument('--lookups', type=int, default=20000, help='In-process lookups timed')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='Write results here')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sizes = [int(size) for size in args.batch_sizes.split(',')]
+    port = free_port()
+    overrides = {
+        'enable_streaming': True,
+        'stream_on_demand': True,
+        'stream_port': port,
+        'stream_secret': STREAM_SECRET,
+        'plate_check_max': max(sizes),
+        'enable_media_probe': False,
+        'enable_history': False,
+        'save_snapshots': False,
+        'record_on_detection': False
+    }
+
+    with BenchEnvironment(overrides, plates=args.whitelist) as env:
+        agent = env.make_agent()
+        agent.apply_access_list(env.portal.access_list(), 'bench')
+        plates = env.portal.plates
+        plate_set = env.portal.plate_set
+
+        lookups = time_lookups(agent, plates, rng, args.lookups)
+
+        threading.Thread(target=agent.run_stream_server, daemon=True).start()
+        base_url = f"http://127.0.0.1:{port}"
+        if not wait_for_server(base_url):
+            print("Stream server did not come up")
+            return 1
+
+        token = make_token(STREAM_SECRET)
+        # Single-plate requests are slow; don't spend the whole run on them
+        results = [run_batches(base_url, token, plates, plate_set, size,
+                               min(args.plates, 500) if size == 1 else args.plates, rng)
+                   for size in sizes]
+
+    print("=" * 60)
+    print(f"Bulk plate check ({args.whitelist} plates on the whitelist)")
+    print("=" * 60)
+    print(f"Lookup: {lookups['indexed_us']:.2f} us indexed, {lookups['linear_scan_us']:.0f} us linear scan "
+          f"({lookups['linear_scan_us'] / max(lookups['indexed_us'], 1e-9):.0f}x)")
+    print(f"{'batch':>6} {'requests':>9} {'plates/s':>10} {'p50':>9} {'p99':>9} {'mismatches':>11}")
+    for result in results:
+        print(f"{result['batch_size']:>6} {result['requests']:>9} {result['plates_per_second']:>10} "
+              f"{result['latency']['p50_ms']:>7.1f}ms {result['latency']['p99_ms']:>7.1f}ms "
+              f"{result['mismatches']:>11}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'whitelist': args.whitelist, 'lookups': lookups, 'results': results}, f, indent=2)
+
+    return 1 if any(result['mismatches'] for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
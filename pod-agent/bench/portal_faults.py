@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Gate-decision latency against a failing portal, before and after the
+budgeted portal client.
+
+Sends plate detections through CompletePodAgent.send_detection while the
+stub portal misbehaves on /api/pod/detect in one of these ways:
+
+  healthy   30-50 ms
+  tail      as healthy, but 5% of requests take 3 s longer
+  degraded  half of all requests take 4 s longer
+  failing   every request answers 503
+  hang      every request takes 12 s (longer than any timeout)
+
+Each scenario runs twice: "legacy" configures the client the way the agent
+used to behave (one request, 10 s timeout, deny on any failure), "budgeted"
+uses the defaults (2.5 s budget, p95 hedging, circuit breaker, local
+whitelist fallback). Reports decision latency percentiles and how each
+decision was made: by the portal, from the local whitelist, or a deny
+because of an error. A decision is correct when it matches the whitelist.
+
+Examples:
+  python3 bench/portal_faults.py --events 200
+  python3 bench/portal_faults.py --scenarios tail,hang --json portal_faults.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import BenchEnvironment, latency_summary  # noqa: E402
+
+SCENARIOS = {
+    'healthy': {'latency': 0.03, 'jitter': 0.02},
+    'tail': {'latency': 0.03, 'jitter': 0.02, 'slow_rate': 0.05, 'slow_latency': 3},
+    'degraded': {'latency': 0.03, 'jitter': 0.02, 'slow_rate': 0.5, 'slow_latency': 4},
+    'failing': {'fail_rate': 1.0},
+    'hang': {'latency': 12},
+}
+
+CLIENTS = {
+    'legacy': {
+        'portal_budgets': {'detect': 10},
+        'portal_hedging': False,
+        'portal_breaker_failures': 10 ** 9,
+        'portal_fallback': 'deny'
+    },
+    'budgeted': {}
+}
+
+
+def run(scenario: str, client: str, events: int) -> dict:
+    overrides = {
+        'save_snapshots': False,
+        'record_on_detection': False,
+        'enable_history': False,
+        'enable_governor': False
+    }
+    overrides.update(CLIENTS[client])
+
+    with BenchEnvironment(overrides) as env:
+        agent = env.make_agent()
+        agent.apply_access_list(env.portal.access_list(), 'bench')
+        plates = env.portal.plates
+        env.portal.configure('detect', **SCENARIOS[scenario])
+
+        latencies = []
+        outcomes = {'portal': 0, 'local': 0, 'error_deny': 0}
+        correct = 0
+        for i in range(events):
+            plate = plates[i % len(plates)] if i % 3 else f"UNK{i:05d}"
+            started = time.perf_counter()
+            result = asyncio.run(agent.send_detection(plate, event_id=f"bench-{i}"))
+            latencies.append(time.perf_counter() - started)
+
+            if result.get('success'):
+                outcomes['portal'] += 1
+            elif result.get('decided_by') == 'local':
+                outcomes['local'] += 1
+            else:
+                outcomes['error_deny'] += 1
+            if (result.get('action') == 'allow') == (plate in env.portal.plate_set):
+                correct += 1
+
+        detect = agent.portal_client.get_stats().get('detect', {})
+        duplicates = env.portal.get_stats()['duplicates']
+        agent.portal_client.stop()
+
+    return {
+        'scenario': scenario,
+        'client': client,
+        'events': events,
+        'latency': latency_summary(latencies),
+        'outcomes': outcomes,
+        'correct': round(correct / max(1, events), 3),
+        'hedged': detect.get('hedged', 0),
+        'hedge_wins': detect.get('hedge_wins', 0),
+        'breaker_opens': detect.get('breaker', {}).get('opens', 0),
+        'duplicates_at_portal': duplicates
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gate-decision latency against a failing portal')
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--hang-events', type=int, default=20,
+                        help='Events for the hang scenario (legacy spends 10 s on each)')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--json', help='Write results here')
+    args = parser.parse_args()
+
+    results = []
+    for scenario in args.scenarios.split(','):
+        events = args.hang_events if scenario == 'hang' else args.events
+        for client in CLIENTS:
+            results.append(run(scenario, client, events))
+
+    print("=" * 96)
+    print(f"Gate decisions against a failing portal ({args.events} events per run)")
+    print("=" * 96)
+    print(f"{'scenario':<9} {'client':<9} {'p50':>8} {'p99':>9} {'max':>9} {'portal':>7} {'local':>6} "
+          f"{'err-deny':>9} {'correct':>8} {'hedged':>7} {'won':>5} {'opens':>6}")
+    for r in results:
+        print(f"{r['scenario']:<9} {r['client']:<9} {r['latency']['p50_ms']:>6.0f}ms {r['latency']['p99_ms']:>7.0f}ms "
+              f"{r['latency']['max_ms']:>7.0f}ms {r['outcomes']['portal']:>7} {r['outcomes']['local']:>6} "
+              f"{r['outcomes']['error_deny']:>9} {r['correct']:>8.1%} {r['hedged']:>7} {r['hedge_wins']:>5} "
+              f"{r['breaker_opens']:>6}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
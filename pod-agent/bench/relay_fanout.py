@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Pod uplink per viewer count, viewers on the pod vs on a relay.
+
+Runs the HLS pipeline (fake ffmpeg) for --duration seconds per run with
+--viewers players, each polling the playlist and fetching every new
+segment once, as a real player does. In "direct" mode they pull from the
+pod's stream server, as through /api/pod/proxy-stream or Tailscale; in
+"relay" mode the pod pushes to the stub relay (stream_push_url) and the
+players pull from the relay. The pod's uplink is the bytes it served
+(direct) or pushed (relay).
+
+Fails if a viewer on the relay ever got a playlist listing a segment the
+relay didn't have yet.
+
+Examples:
+  python3 bench/relay_fanout.py --viewers 1,4,16 --duration 20
+  python3 bench/relay_fanout.py --viewers 8 --fail-rate 0.1 --json relay.json
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stub_relay  # noqa: E402
+from harness import BenchEnvironment, free_port  # noqa: E402
+from stream_load import STREAM_SECRET, make_token, wait_for_server  # noqa: E402
+
+
+def player(playlist_url: str, params: dict, stop_at: float, poll: float, results: queue.Queue):
+    """Poll the playlist, fetch each segment once"""
+    session = requests.Session()
+    base = playlist_url.rsplit('/', 1)[0]
+    fetched = set()
+    received = errors = 0
+
+    while time.time() < stop_at:
+        try:
+            response = session.get(playlist_url, params=params, timeout=10)
+            if response.status_code == 200:
+                received += len(response.content)
+                for line in response.text.splitlines():
+                    if not line or line.startswith('#') or line in fetched:
+                        continue
+                    segment = session.get(f"{base}/{line}", timeout=10)
+                    if segment.status_code == 200:
+                        fetched.add(line)
+                        received += len(segment.content)
+                    else:
+                        errors += 1
+            else:
+                errors += 1
+        except requests.RequestException:
+            errors += 1
+        time.sleep(poll)
+
+    results.put({'bytes': received, 'segments': len(fetched), 'errors': errors})
+
+
+def run(mode: str, viewers: int, duration: float, speed: float, fail_rate: float) -> dict:
+    relay_server, relay, relay_url = stub_relay.serve(0, stub_relay.RelayState(fail_rate))
+    port = free_port()
+    overrides = {
+        'enable_streaming': True,
+        'stream_on_demand': False,
+        'stream_port': port,
+        'stream_secret': STREAM_SECRET,
+        'enable_media_probe': False,
+        'record_on_detection': False,
+        'save_snapshots': False,
+        'enable_history': False
+    }
+    if mode == 'relay':
+        overrides['stream_push_url'] = f"{relay_url}/live"
+
+    with BenchEnvironment(overrides, ffmpeg_speed=speed) as env:
+        agent = env.make_agent()
+        agent.start_ffmpeg_stream()
+
+        if mode == 'relay':
+            agent.relay_pusher.start()
+            playlist_url, params = agent.relay_pusher.playlist_url, {}
+            deadline = time.time() + 10
+            while not agent.relay_pusher.get_stats()['playlists_pushed'] and time.time() < deadline:
+                time.sleep(0.1)
+        else:
+            threading.Thread(target=agent.run_stream_server, daemon=True).start()
+            base_url = f"http://127.0.0.1:{port}"
+            wait_for_server(base_url)
+            playlist_url, params = f"{base_url}/stream", {'token': make_token(STREAM_SECRET)}
+
+        results: queue.Queue = queue.Queue()
+        stop_at = time.time() + duration
+        # Segments are 2 s of fake video, written every 2 * speed seconds; poll twice per segment
+        threads = [threading.Thread(target=player, args=(playlist_url, params, stop_at, speed, results))
+                   for _ in range(viewers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        push_stats = agent.relay_pusher.get_stats() if agent.relay_pusher else None
+        if agent.relay_pusher:
+            agent.relay_pusher.stop()
+        agent.stop_ffmpeg_stream()
+
+    relay_stats = relay.get_stats()
+    relay_server.shutdown()
+
+    players = [results.get() for _ in range(viewers)]
+    viewer_bytes = sum(p['bytes'] for p in players)
+    uplink = relay_stats['bytes_in'] if mode == 'relay' else viewer_bytes
+    return {
+        'mode': mode,
+        'viewers': viewers,
+        'uplink_bytes': uplink,
+        'uplink_kbps': round(uplink * 8 / duration / 1000, 1),
+        'viewer_bytes': viewer_bytes,
+        'segments_per_viewer': round(sum(p['segments'] for p in players) / viewers, 1),
+        'viewer_errors': sum(p['errors'] for p in players),
+        'dangling_playlists': relay_stats['dangling_playlists'] if mode == 'relay' else 0,
+        'push': push_stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pod uplink, direct viewers vs relay push')
+    parser.add_argument('--viewers', default='1,4,16')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--speed', type=float, default=0.5, help='Fake ffmpeg speed (0.5 = a segment per second)')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of relay PUTs that fail')
+    parser.add_argument('--json', help='Write results here')
+    args = parser.parse_args()
+
+    results = []
+    for viewers in [int(v) for v in args.viewers.split(',')]:
+        for mode in ('direct', 'relay'):
+            results.append(run(mode, viewers, args.duration, args.speed, args.fail_rate))
+
+    print("=" * 80)
+    print(f"Pod uplink, {args.duration:g}s per run")
+    print("=" * 80)
+    print(f"{'viewers':>7} {'mode':<7} {'uplink':>12} {'to viewers':>12} {'segs/viewer':>12} {'errors':>7} "
+          f"{'retries':>8} {'lag p95':>8}")
+    for r in results:
+        push = r['push'] or {}
+        print(f"{r['viewers']:>7} {r['mode']:<7} {r['uplink_kbps']:>8.0f}kbps {r['viewer_bytes'] / 1e6:>10.1f}MB "
+              f"{r['segments_per_viewer']:>12} {r['viewer_errors']:>7} {push.get('retries', '-'):>8} "
+              f"{str(push.get('lag_p95_ms', '-')):>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    return 1 if any(r['dangling_playlists'] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
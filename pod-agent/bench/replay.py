@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Replay benchmark for the pod agent.
+
+Replays recorded or synthetic Frigate MQTT events at a fixed rate into
+CompletePodAgent, running against the stub portal with fake ffmpeg, and
+reports throughput, decision latency percentiles, MQTT backlog growth and
+memory. Runs headless; no cameras, broker or portal needed.
+
+Examples:
+  # 5 events/s for 200 events
+  python3 bench/replay.py --rate 5 --events 200
+
+  # Shift change: 50 cars queue up 2 s in, portal answering in ~80 ms
+  python3 bench/replay.py --rate 2 --events 100 --burst 50 --burst-at 2 \\
+      --latency detect=0.08 --jitter detect=0.04
+
+  # Recorded payloads (one MQTT JSON payload per line)
+  python3 bench/replay.py --events-file events.jsonl --rate 10 --json report.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import BenchEnvironment, Replayer, load_events, synthetic_events  # noqa: E402
+from stub_portal import parse_endpoint_values  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay Frigate events into the pod agent')
+    parser.add_argument('--events', type=int, default=200, help='Synthetic events to generate')
+    parser.add_argument('--events-file', help='Recorded MQTT payloads (JSON lines)')
+    parser.add_argument('--rate', type=float, default=5.0, help='Events per second (0 = as fast as possible)')
+    parser.add_argument('--burst', type=int, default=0, help='Events delivered at once, e.g. shift change')
+    parser.add_argument('--burst-at', type=float, default=0.0, help='Seconds into the run for the burst')
+    parser.add_argument('--plates', type=int, default=200, help='Whitelist size on the stub portal')
+    parser.add_argument('--known-ratio', type=float, default=0.7, help='Share of synthetic reads that are whitelisted')
+    parser.add_argument('--latency', action='append', help='Injected portal latency, endpoint=seconds')
+    parser.add_argument('--jitter', action='append', help='Injected portal jitter, endpoint=seconds')
+    parser.add_argument('--fail', action='append', help='Injected portal failure rate, endpoint=rate')
+    parser.add_argument('--ffmpeg-speed', type=float, default=0.01, help='Fake ffmpeg time scale (1.0 = real time)')
+    parser.add_argument('--no-record', action='store_true', help='Disable record_on_detection')
+    parser.add_argument('--set', action='append', default=[], help='Extra agent config, key=yaml-value')
+    parser.add_argument('--json', help='Write the full report here')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    import yaml
+    overrides = {'record_on_detection': not args.no_record}
+    for item in args.set:
+        key, value = item.split('=', 1)
+        overrides[key] = yaml.safe_load(value)
+
+    with BenchEnvironment(overrides, plates=args.plates, ffmpeg_speed=args.ffmpeg_speed) as env:
+        for endpoint, value in parse_endpoint_values(args.latency).items():
+            env.portal.configure(endpoint, latency=value)
+        for endpoint, value in parse_endpoint_values(args.jitter).items():
+            env.portal.configure(endpoint, jitter=value)
+        for endpoint, value in parse_endpoint_values(args.fail).items():
+            env.portal.configure(endpoint, fail_rate=value)
+
+        agent = env.make_agent()
+        asyncio.run(agent.refresh_whitelist())
+
+        if args.events_file:
+            events = load_events(args.events_file)
+        else:
+            events = list(synthetic_events(args.events, env.portal.plates, args.known_ratio))
+
+        agent.recording_scheduler.start()
+        report = Replayer(agent).run(events, args.rate, args.burst, args.burst_at)
+        agent.recording_scheduler.stop()
+        report['recording'] = agent.recording_scheduler.get_stats()
+        report['portal'] = env.portal.get_stats()
+
+    queue_samples = report['queue'].pop('samples')
+    latency = report['decision_latency']
+
+    print("=" * 60)
+    print("Pod agent replay benchmark")
+    print("=" * 60)
+    print(f"Events:        {report['processed']}/{report['events']} processed, {report['errors']} errors")
+    print(f"Offered rate:  {report['offered_rate']} events/s")
+    print(f"Throughput:    {report['throughput']} events/s over {report['elapsed_seconds']} s")
+    print(f"Decision p50:  {latency['p50_ms']} ms   p99: {latency['p99_ms']} ms   max: {latency['max_ms']} ms")
+    print(f"Queue depth:   max {report['queue']['max_depth']}, final {report['queue']['final_depth']}")
+    print(f"Memory (RSS):  {report['memory']['rss_start_mb']} -> {report['memory']['rss_end_mb']} MB "
+          f"(peak {report['memory']['rss_peak_mb']} MB)")
+    print(f"Recording:     {report['recording']['ffmpeg_runs']} ffmpeg runs for "
+          f"{report['recording']['requests']} requests, {report['recording']['recorded_seconds']} s recorded")
+    print(f"Portal:        {report['portal']['requests']}")
+
+    if args.json:
+        report['queue']['samples'] = queue_samples
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+
+    return 0 if report['drained'] and not report['errors'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Long-run soak test for resource leaks.
+
+Runs the whole agent (CompletePodAgent.run: MQTT, heartbeats, whitelist and
+config polling, recording, on-demand HLS) in-process against the stub
+portal, the stub MQTT broker and fake ffmpeg, with every interval shortened
+so an hour of soak covers days of normal traffic. A publisher sends plate
+events (including duplicates and garbage reads) at --rate, and a viewer
+watches the live stream in bursts so the pipeline is started and torn
+down over and over.
+
+Every --sample-interval it records the Python heap (tracemalloc), RSS,
+open fds, threads, child processes and how stale the live playlist is
+while someone is watching. After --warmup the first sample becomes the
+baseline; the run fails if any growth passes its budget, and the report
+lists the allocation sites that grew the most.
+
+Examples:
+  python3 bench/soak.py --duration 3600 --rate 10
+  python3 bench/soak.py --duration 300 --sample-interval 10 --json soak.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+import psutil
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import BenchEnvironment, free_port, synthetic_event  # noqa: E402
+from stream_load import make_token  # noqa: E402
+from stub_mqtt import StubBroker  # noqa: E402
+
+STREAM_SECRET = 'bench-secret'
+GARBAGE_READS = ('I1L', 'O0', '1', 'LLLLLLLLLLLLL', '')
+
+
+class Publisher:
+    """Frigate stand-in: plate events at a steady rate, some repeated, some junk"""
+
+    def __init__(self, broker: StubBroker, plates, rate: float):
+        self.broker = broker
+        self.plates = plates
+        self.rate = rate
+        self.sent = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        interval = 1.0 / self.rate
+        recent = []
+        while not self.stopped.wait(interval):
+            roll = random.random()
+            if roll < 0.05 and recent:
+                # Frigate re-sends 'new' for the same event id on reconnects
+                payload = random.choice(recent)
+            else:
+                plate = random.choice(GARBAGE_READS) if roll < 0.15 else random.choice(self.plates)
+                payload = synthetic_event(plate)
+                recent = (recent + [payload])[-20:]
+            self.broker.publish('frigate/events', json.dumps(payload).encode())
+            self.sent += 1
+
+
+class Viewer:
+    """Watches the live stream for a while, leaves long enough for it to go idle, repeats"""
+
+    def __init__(self, base_url: str, watch: float, away: float):
+        self.base_url = base_url
+        self.watch = watch
+        self.away = away
+        self.watching = False
+        self.requests = 0
+        self.errors = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        session = requests.Session()
+        token = make_token(STREAM_SECRET)
+        while not self.stopped.is_set():
+            self.watching = True
+            until = time.time() + self.watch
+            while time.time() < until and not self.stopped.is_set():
+                try:
+                    playlist = session.get(f"{self.base_url}/stream", params={'token': token}, timeout=10)
+                    self.requests += 1
+                    if playlist.status_code == 200:
+                        segments = [line for line in playlist.text.splitlines() if line and not line.startswith('#')]
+                        if segments:
+                            session.get(f"{self.base_url}/{segments[-1]}", timeout=10)
+                            self.requests += 1
+                    else:
+                        self.errors += 1
+                except requests.RequestException:
+                    self.errors += 1
+                self.stopped.wait(1)
+            self.watching = False
+            self.stopped.wait(self.away)
+
+
+def count_fds(process: psutil.Process) -> int:
+    try:
+        return process.num_fds()
+    except AttributeError:
+        return process.num_handles()
+
+
+def sample(process: psutil.Process, started: float, agent, viewer: Viewer, portal) -> dict:
+    heap, _ = tracemalloc.get_traced_memory()
+    children = process.children(recursive=True)
+    zombies = 0
+    for child in children:
+        try:
+            zombies += child.status() == psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess:
+            pass
+
+    playlist = os.path.join(agent.hls_output_dir, 'stream.m3u8')
+    playlist_age = None
+    running = agent.ffmpeg_process is not None and agent.ffmpeg_process.poll() is None
+    if viewer.watching and running and os.path.exists(playlist):
+        playlist_age = round(time.time() - os.path.getmtime(playlist), 1)
+
+    return {
+        't': round(time.time() - started, 1),
+        'heap_mb': round(heap / 1e6, 2),
+        'rss_mb': round(process.memory_info().rss / 1e6, 1),
+        'fds': count_fds(process),
+        'threads': threading.active_count(),
+        'children': len(children),
+        'zombies': zombies,
+        'playlist_age': playlist_age,
+        'detections': portal.get_stats()['requests'].get('detect', 0)
+    }
+
+
+def trim_portal(portal):
+    """Drop the stub portal's request log; it would otherwise show up as our growth"""
+    with portal.lock:
+        for records in (portal.detections, portal.detection_times, portal.heartbeats, portal.recordings):
+            del records[:]
+        portal.idempotency.clear()
+
+
+def slope_per_hour(samples, key) -> float:
+    """Least-squares growth rate of a metric, per hour"""
+    points = [(s['t'], s[key]) for s in samples if s[key] is not None]
+    if len(points) < 2:
+        return 0.0
+    mean_t = sum(t for t, _ in points) / len(points)
+    mean_v = sum(v for _, v in points) / len(points)
+    var = sum((t - mean_t) ** 2 for t, _ in points)
+    if not var:
+        return 0.0
+    return sum((t - mean_t) * (v - mean_v) for t, v in points) / var * 3600
+
+
+def top_allocations(baseline, final, limit: int):
+    ignore = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ]
+    stats = final.filter_traces(ignore).compare_to(baseline.filter_traces(ignore), 'lineno')
+    return [
+        {
+            'site': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            'growth_kb': round(stat.size_diff / 1024, 1),
+            'size_kb': round(stat.size / 1024, 1),
+            'count_diff': stat.count_diff
+        }
+        for stat in stats[:limit]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Long-run soak test for leaks')
+    parser.add_argument('--duration', type=float, default=3600, help='Seconds to run')
+    parser.add_argument('--rate', type=float, default=10.0, help='Plate events per second')
+    parser.add_argument('--sample-interval', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=60, help='Seconds before the baseline sample')
+    parser.add_argument('--watch', type=float, default=20, help='Seconds a viewer watches per visit')
+    parser.add_argument('--away', type=float, default=10, help='Seconds between visits (> idle timeout)')
+    parser.add_argument('--max-heap-growth-mb', type=float, default=10)
+    parser.add_argument('--max-rss-growth-mb', type=float, default=40)
+    parser.add_argument('--max-fd-growth', type=int, default=10)
+    parser.add_argument('--max-thread-growth', type=int, default=5)
+    parser.add_argument('--max-children', type=int, default=4, help='Live ffmpeg children allowed at once')
+    parser.add_argument('--max-playlist-age', type=float, default=15,
+                        help='Seconds the live playlist may go without an update while watched')
+    parser.add_argument('--top', type=int, default=15, help='Allocation sites to report')
+    parser.add_argument('--set', action='append', default=[], help='Extra agent config, key=yaml-value')
+    parser.add_argument('--json', help='Write the full report here')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    tracemalloc.start(1)
+
+    broker = StubBroker()
+    broker_port = broker.start()
+    stream_port = free_port()
+
+    import yaml
+    overrides = {
+        'enable_mqtt': True,
+        'mqtt_host': '127.0.0.1',
+        'mqtt_port': broker_port,
+        'enable_streaming': True,
+        'stream_on_demand': True,
+        'stream_idle_timeout': 3,
+        'stream_port': stream_port,
+        'stream_secret': STREAM_SECRET,
+        'record_on_detection': True,
+        'recording_duration': 5,
+        'recording_max_length': 20,
+        'heartbeat_interval': 2,
+        'whitelist_refresh_interval': 3,
+        'config_poll_interval': 3,
+        'history_retention_days': 1,
+        'enable_backfill': False
+    }
+    for item in args.set:
+        key, value = item.split('=', 1)
+        overrides[key] = yaml.safe_load(value)
+
+    # Fast fake media, with the stderr chatter real ffmpeg produces
+    os.environ['FAKE_FFMPEG_BITRATE'] = '2000'
+    os.environ.setdefault('FAKE_FFMPEG_STDERR', '4096')
+
+    with BenchEnvironment(overrides, ffmpeg_speed=0.05) as env:
+        agent = env.make_agent()
+        loop = asyncio.new_event_loop()
+        task = loop.create_task(agent.run())
+        agent_thread = threading.Thread(target=loop.run_until_complete, args=(task,), name='agent', daemon=True)
+        agent_thread.start()
+
+        broker.subscribed.wait(20)
+        publisher = Publisher(broker, env.portal.plates, args.rate)
+        viewer = Viewer(f"http://127.0.0.1:{stream_port}", args.watch, args.away)
+        threading.Thread(target=publisher.run, name='publisher', daemon=True).start()
+        threading.Thread(target=viewer.run, name='viewer', daemon=True).start()
+
+        process = psutil.Process()
+        started = time.time()
+        samples = []
+        baseline = baseline_snapshot = None
+        peak_children = 0
+        stalls = []
+
+        print(f"Soaking for {args.duration:.0f}s at {args.rate} events/s "
+              f"(sample every {args.sample_interval:.0f}s, baseline after {args.warmup:.0f}s)")
+
+        try:
+            next_sample = started + min(args.warmup, args.sample_interval)
+            while time.time() - started < args.duration:
+                time.sleep(max(0.0, min(1.0, next_sample - time.time())))
+                # Children are short-lived; check them every second, not just at samples
+                peak_children = max(peak_children, len(process.children(recursive=True)))
+                if time.time() < next_sample:
+                    continue
+                next_sample += args.sample_interval
+
+                trim_portal(env.portal)
+                current = sample(process, started, agent, viewer, env.portal)
+                samples.append(current)
+                if current['playlist_age'] is not None and current['playlist_age'] > args.max_playlist_age:
+                    stalls.append(current['t'])
+
+                if baseline is None and current['t'] >= args.warmup:
+                    baseline = current
+                    baseline_snapshot = tracemalloc.take_snapshot()
+
+                if args.verbose or len(samples) % 10 == 0:
+                    print(f"  t={current['t']:>7.0f}s heap {current['heap_mb']:.1f} MB  rss {current['rss_mb']:.0f} MB  "
+                          f"fds {current['fds']}  threads {current['threads']}  children {current['children']}  "
+                          f"detections {current['detections']}")
+        except KeyboardInterrupt:
+            print("Interrupted, reporting what we have")
+
+        trim_portal(env.portal)
+        final = sample(process, started, agent, viewer, env.portal)
+        samples.append(final)
+        final_snapshot = tracemalloc.take_snapshot()
+
+        publisher.stopped.set()
+        viewer.stopped.set()
+        loop.call_soon_threadsafe(task.cancel)
+        agent_thread.join(30)
+        broker.stop()
+
+    baseline = baseline or samples[0]
+    steady = [s for s in samples if s['t'] >= baseline['t']]
+    growth = {
+        'heap_mb': round(final['heap_mb'] - baseline['heap_mb'], 2),
+        'rss_mb': round(final['rss_mb'] - baseline['rss_mb'], 1),
+        'fds': final['fds'] - baseline['fds'],
+        'threads': final['threads'] - baseline['threads']
+    }
+    checks = {
+        'heap': growth['heap_mb'] <= args.max_heap_growth_mb,
+        'rss': growth['rss_mb'] <= args.max_rss_growth_mb,
+        'fds': growth['fds'] <= args.max_fd_growth,
+        'threads': growth['threads'] <= args.max_thread_growth,
+        'children': peak_children <= args.max_children,
+        'zombies': final['zombies'] == 0,
+        'stream_stalls': not stalls
+    }
+
+    report = {
+        'duration_seconds': final['t'],
+        'events_sent': publisher.sent,
+        'detections': final['detections'],
+        'viewer_requests': viewer.requests,
+        'viewer_errors': viewer.errors,
+        'baseline': baseline,
+        'final': final,
+        'growth': growth,
+        'growth_per_hour': {key: round(slope_per_hour(steady, key), 2) for key in ('heap_mb', 'rss_mb', 'fds', 'threads')},
+        'peak_children': peak_children,
+        'stream_stalls_at': stalls,
+        'checks': checks,
+        'passed': all(checks.values()),
+        'top_allocations': top_allocations(baseline_snapshot, final_snapshot, args.top) if baseline_snapshot else [],
+        'samples': samples
+    }
+
+    print("=" * 60)
+    print("Soak test")
+    print("=" * 60)
+    print(f"Ran {report['duration_seconds']:.0f}s: {publisher.sent} events sent, {final['detections']} decisions, "
+          f"{viewer.requests} stream requests ({viewer.errors} errors)")
+    print(f"Growth since baseline (t={baseline['t']:.0f}s): heap {growth['heap_mb']:+.2f} MB, rss {growth['rss_mb']:+.1f} MB, "
+          f"fds {growth['fds']:+d}, threads {growth['threads']:+d}")
+    print(f"Trend per hour: " + ', '.join(f"{k} {v:+.2f}" for k, v in report['growth_per_hour'].items()))
+    print(f"Peak children {peak_children}, zombies at end {final['zombies']}, "
+          f"stream stalls {len(stalls)}")
+    if report['top_allocations']:
+        print("Top allocation growth:")
+        for site in report['top_allocations']:
+            print(f"  {site['growth_kb']:>+9.1f} KB  {site['count_diff']:>+7d} blocks  {site['site']}")
+    for name, ok in checks.items():
+        if not ok:
+            print(f"FAIL: {name}")
+    print(f"Result: {'PASS' if report['passed'] else 'FAIL'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    return 0 if report['passed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
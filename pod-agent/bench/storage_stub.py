@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for portal/object storage implementing the pod upload protocol.
+
+Chunks are kept on disk under --root and assembled on completion, where the
+whole-file SHA-256 is verified. --fail-rate drops a fraction of chunk PUTs
+with HTTP 503 to exercise retry and resume.
+
+Usage:
+  python3 bench/storage_stub.py --port 9100 --root /tmp/stub-storage
+  # then in config.yaml:
+  #   enable_uploads: true
+  #   upload_url: "http://localhost:9100"
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StorageState:
+    def __init__(self, root: str, fail_rate: float = 0.0):
+        self.root = root
+        self.fail_rate = fail_rate
+        self.sessions = {}
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'parts'), exist_ok=True)
+
+    def part_dir(self, upload_id: str) -> str:
+        return os.path.join(self.root, 'parts', upload_id)
+
+
+class StorageHandler(BaseHTTPRequestHandler):
+    state: StorageState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def _received(self, upload_id: str):
+        return sorted(int(name) for name in os.listdir(self.state.part_dir(upload_id)))
+
+    def do_POST(self):
+        if self.path == '/uploads':
+            request = json.loads(self._body() or b'{}')
+            upload_id = uuid.uuid4().hex
+            with self.state.lock:
+                self.state.sessions[upload_id] = request
+            os.makedirs(self.state.part_dir(upload_id), exist_ok=True)
+            return self._json(200, {'upload_id': upload_id, 'received': []})
+
+        match = re.fullmatch(r'/uploads/(\w+)/complete', self.path)
+        if match:
+            upload_id = match.group(1)
+            session = self.state.sessions.get(upload_id)
+            if not session:
+                return self._json(404, {'error': 'Unknown upload'})
+
+            request = json.loads(self._body() or b'{}')
+            object_path = os.path.join(self.state.root, 'objects', session['key'])
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+
+            digest = hashlib.sha256()
+            with open(object_path, 'wb') as out:
+                for index in self._received(upload_id):
+                    with open(os.path.join(self.state.part_dir(upload_id), str(index)), 'rb') as part:
+                        data = part.read()
+                    digest.update(data)
+                    out.write(data)
+
+            if digest.hexdigest() != request.get('sha256', session['sha256']):
+                os.remove(object_path)
+                shutil.rmtree(self.state.part_dir(upload_id), ignore_errors=True)
+                return self._json(422, {'error': 'Checksum mismatch'})
+
+            shutil.rmtree(self.state.part_dir(upload_id), ignore_errors=True)
+            with self.state.lock:
+                self.state.sessions.pop(upload_id, None)
+
+            return self._json(200, {
+                'key': session['key'],
+                'sha256': digest.hexdigest(),
+                'url': f"http://{self.headers.get('Host')}/objects/{session['key']}"
+            })
+
+        self._json(404, {'error': 'Not found'})
+
+    def do_GET(self):
+        match = re.fullmatch(r'/uploads/(\w+)', self.path)
+        if match and match.group(1) in self.state.sessions:
+            return self._json(200, {'upload_id': match.group(1), 'received': self._received(match.group(1))})
+
+        if self.path.startswith('/objects/'):
+            object_path = os.path.join(self.state.root, 'objects', self.path[len('/objects/'):])
+            if os.path.isfile(object_path):
+                with open(object_path, 'rb') as f:
+                    data = f.read()
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+
+        self._json(404, {'error': 'Not found'})
+
+    def do_PUT(self):
+        match = re.fullmatch(r'/uploads/(\w+)/chunks/(\d+)', self.path)
+        if not match or match.group(1) not in self.state.sessions:
+            return self._json(404, {'error': 'Unknown upload'})
+
+        data = self._body()
+
+        if random.random() < self.state.fail_rate:
+            return self._json(503, {'error': 'Injected failure'})
+
+        if hashlib.sha256(data).hexdigest() != self.headers.get('X-Chunk-SHA256'):
+            return self._json(422, {'error': 'Chunk checksum mismatch'})
+
+        with open(os.path.join(self.state.part_dir(match.group(1)), match.group(2)), 'wb') as f:
+            f.write(data)
+
+        self._json(200, {'index': int(match.group(2))})
+
+
+def serve(port: int, root: str, fail_rate: float = 0.0) -> ThreadingHTTPServer:
+    handler = type('Handler', (StorageHandler,), {'state': StorageState(root, fail_rate)})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in storage server for pod uploads')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--root', default='/tmp/stub-storage')
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    handler = type('Handler', (StorageHandler,), {'state': StorageState(args.root, args.fail_rate)})
+    print(f"Stub storage listening on http://127.0.0.1:{args.port} (root: {args.root})")
+    ThreadingHTTPServer(('127.0.0.1', args.port), handler).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Decision latency under streaming load.
+
+Replays Frigate events into the detection side of the agent while viewer
+processes hammer the HLS endpoints (playlist + every segment, as fast as
+the server answers). Compares single-process mode, where the stream server
+shares the interpreter with detection, against multi-process mode, where
+the stream server runs as a separate --role media process.
+
+Examples:
+  # Both modes, 8 viewers, 5 events/s
+  python3 bench/stream_load.py --viewers 8 --rate 5 --events 100
+
+  # Only multi-process mode, report as JSON
+  python3 bench/stream_load.py --mode multi --json multi.json
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import AGENT_DIR, BenchEnvironment, Replayer, free_port, synthetic_events  # noqa: E402
+
+STREAM_SECRET = 'bench-secret'
+
+
+def make_token(secret: str, ttl: int = 3600) -> str:
+    payload = json.dumps({'exp': int(time.time() + ttl), 'camera_id': 'bench-camera'})
+    signature = hashlib.sha256((payload + secret).encode()).hexdigest()
+    return f"{base64.b64encode(payload.encode()).decode()}.{signature}"
+
+
+def wait_for_server(base_url: str, timeout: float = 20) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def viewer(base_url: str, token: str, stop_at: float, results):
+    """One viewer: refresh the playlist, pull every segment in it, repeat"""
+    session = requests.Session()
+    served = errors = received = 0
+
+    while time.time() < stop_at:
+        try:
+            response = session.get(f"{base_url}/stream", params={'token': token}, timeout=10)
+            if response.status_code != 200:
+                errors += 1
+                time.sleep(0.2)
+                continue
+            served += 1
+
+            for line in response.text.splitlines():
+                if not line or line.startswith('#'):
+                    continue
+                segment = session.get(f"{base_url}/{line}", timeout=10)
+                if segment.status_code == 200:
+                    served += 1
+                    received += len(segment.content)
+                else:
+                    errors += 1
+        except requests.RequestException:
+            errors += 1
+            time.sleep(0.2)
+
+    results.put({'requests': served, 'errors': errors, 'bytes': received})
+
+
+def run_mode(args) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    overrides = {
+        'enable_streaming': True,
+        'stream_on_demand': False,
+        'stream_port': port,
+        'stream_secret': STREAM_SECRET,
+        'record_on_detection': False,
+        'enable_backfill': False
+    }
+
+    os.environ['FAKE_FFMPEG_BITRATE'] = str(args.segment_bitrate)
+
+    with BenchEnvironment(overrides, ffmpeg_speed=1.0) as env:
+        media_process = None
+
+        if args.mode == 'multi':
+            agent = env.make_agent(role='detection')
+            media_process = subprocess.Popen(
+                [sys.executable, os.path.join(AGENT_DIR, 'complete_pod_agent.py'), env.config_path, '--role', 'media'],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+        else:
+            agent = env.make_agent()
+            agent.start_ffmpeg_stream()
+            threading.Thread(target=agent.run_stream_server, daemon=True).start()
+
+        try:
+            if not wait_for_server(base_url):
+                raise RuntimeError("Stream server did not come up")
+
+            asyncio.run(agent.refresh_whitelist())
+
+            # Let the HLS pipeline publish a few segments before viewers arrive
+            time.sleep(args.warmup)
+
+            token = make_token(STREAM_SECRET)
+            events = list(synthetic_events(args.events, env.portal.plates))
+            expected_seconds = args.events / args.rate if args.rate else 10
+            stop_at = time.time() + expected_seconds + 1
+
+            results = multiprocessing.Queue()
+            viewers = [
+                multiprocessing.Process(target=viewer, args=(base_url, token, stop_at, results), daemon=True)
+                for _ in range(args.viewers)
+            ]
+            for process in viewers:
+                process.start()
+
+            report = Replayer(agent).run(events, args.rate)
+
+            viewer_totals = {'requests': 0, 'errors': 0, 'bytes': 0}
+            for _ in viewers:
+                for key, value in results.get(timeout=expected_seconds + 30).items():
+                    viewer_totals[key] += value
+            for process in viewers:
+                process.join(5)
+        finally:
+            if media_process:
+                media_process.terminate()
+                media_process.wait(10)
+            else:
+                agent.stop_ffmpeg_stream()
+
+    report.pop('queue', None)
+    report['mode'] = args.mode
+    report['viewers'] = args.viewers
+    report['viewer_load'] = viewer_totals
+    return report
+
+
+def print_report(report: dict):
+    latency = report['decision_latency']
+    load = report['viewer_load']
+    print(f"[{report['mode']:>6}] {report['viewers']} viewers  "
+          f"p50 {latency['p50_ms']} ms  p95 {latency['p95_ms']} ms  p99 {latency['p99_ms']} ms  "
+          f"max {latency['max_ms']} ms  |  {load['requests']} stream requests, "
+          f"{load['bytes'] / 1e6:.1f} MB served, {load['errors']} errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Decision latency under streaming load')
+    parser.add_argument('--mode', choices=('single', 'multi', 'both'), default='both')
+    parser.add_argument('--viewers', type=int, default=8, help='Concurrent viewer processes')
+    parser.add_argument('--events', type=int, default=100)
+    parser.add_argument('--rate', type=float, default=5.0, help='Events per second')
+    parser.add_argument('--segment-bitrate', type=int, default=500000, help='Fake HLS bytes per second')
+    parser.add_argument('--warmup', type=float, default=5.0, help='Seconds of HLS output before load starts')
+    parser.add_argument('--json', help='Write the report(s) here')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    if args.mode == 'both':
+        # Each mode in a fresh interpreter: Flask routes are registered on a module-level app
+        reports = []
+        for mode in ('single', 'multi'):
+            with tempfile.NamedTemporaryFile(suffix='.json') as out:
+                cmd = [sys.executable, os.path.abspath(__file__), '--mode', mode,
+                       '--viewers', str(args.viewers), '--events', str(args.events),
+                       '--rate', str(args.rate), '--segment-bitrate', str(args.segment_bitrate),
+                       '--warmup', str(args.warmup), '--json', out.name]
+                if subprocess.run(cmd, stdout=subprocess.DEVNULL).returncode != 0:
+                    print(f"{mode} run failed")
+                    return 1
+                reports.append(json.load(open(out.name)))
+    else:
+        reports = [run_mode(args)]
+
+    print("=" * 60)
+    print("Decision latency under streaming load")
+    print("=" * 60)
+    for report in reports:
+        print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports if len(reports) > 1 else reports[0], f, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Minimal MQTT 3.1.1 broker for benchmarks: CONNECT, SUBSCRIBE, PUBLISH (QoS 0
+delivery), PINGREQ and DISCONNECT. Topic filters are matched exactly or with
+a trailing '#'. Enough to stand in for Frigate's Mosquitto in front of the
+pod agent; not a general-purpose broker.
+
+Usage:
+  python3 bench/stub_mqtt.py --port 1883
+"""
+
+import argparse
+import socket
+import struct
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+
+def encode_length(length: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        out.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(out)
+
+
+def read_exact(sock: socket.socket, size: int) -> bytes:
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('closed')
+        data += chunk
+    return data
+
+
+def read_packet(sock: socket.socket) -> Tuple[int, int, bytes]:
+    header = read_exact(sock, 1)[0]
+    multiplier, length = 1, 0
+    while True:
+        byte = read_exact(sock, 1)[0]
+        length += (byte & 0x7F) * multiplier
+        if not byte & 0x80:
+            break
+        multiplier *= 128
+    return header >> 4, header & 0x0F, read_exact(sock, length) if length else b''
+
+
+def read_string(data: bytes, offset: int) -> Tuple[str, int]:
+    length = struct.unpack_from('!H', data, offset)[0]
+    return data[offset + 2:offset + 2 + length].decode(), offset + 2 + length
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    if topic_filter.endswith('#'):
+        return topic.startswith(topic_filter[:-1])
+    return topic_filter == topic
+
+
+class StubBroker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients: List[Tuple[socket.socket, List[str]]] = []
+        self.subscribed = threading.Event()
+        self.first_subscribe_at: Optional[float] = None
+        self.on_subscribe: Optional[Callable[[str], None]] = None
+        self.server = None
+        self.port = None
+
+    def start(self, port: int = 0) -> int:
+        self.server = socket.socket()
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(('127.0.0.1', port))
+        self.server.listen(16)
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self.port
+
+    def stop(self):
+        if self.server:
+            self.server.close()
+        with self.lock:
+            for sock, _ in self.clients:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+            self.clients = []
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, sock: socket.socket):
+        filters: List[str] = []
+        entry = (sock, filters)
+        try:
+            while True:
+                packet_type, flags, body = read_packet(sock)
+
+                if packet_type == CONNECT:
+                    sock.sendall(bytes([CONNACK << 4, 2, 0, 0]))
+                    with self.lock:
+                        self.clients.append(entry)
+
+                elif packet_type == SUBSCRIBE:
+                    packet_id = body[:2]
+                    offset, granted = 2, bytearray()
+                    while offset < len(body):
+                        topic_filter, offset = read_string(body, offset)
+                        offset += 1
+                        filters.append(topic_filter)
+                        granted.append(0)
+                    sock.sendall(bytes([SUBACK << 4]) + encode_length(2 + len(granted)) + packet_id + bytes(granted))
+                    if self.first_subscribe_at is None:
+                        self.first_subscribe_at = time.time()
+                    self.subscribed.set()
+                    if self.on_subscribe:
+                        for topic_filter in filters:
+                            self.on_subscribe(topic_filter)
+
+                elif packet_type == UNSUBSCRIBE:
+                    sock.sendall(bytes([UNSUBACK << 4, 2]) + body[:2])
+
+                elif packet_type == PUBLISH:
+                    topic, offset = read_string(body, 0)
+                    qos = (flags >> 1) & 0x03
+                    if qos:
+                        sock.sendall(bytes([PUBACK << 4, 2]) + body[offset:offset + 2])
+                        offset += 2
+                    self.publish(topic, body[offset:])
+
+                elif packet_type == PINGREQ:
+                    sock.sendall(bytes([PINGRESP << 4, 0]))
+
+                elif packet_type == DISCONNECT:
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self.lock:
+                if entry in self.clients:
+                    self.clients.remove(entry)
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def publish(self, topic: str, payload: bytes) -> int:
+        """Deliver at QoS 0 to every matching subscriber; returns subscriber count"""
+        topic_bytes = topic.encode()
+        body = struct.pack('!H', len(topic_bytes)) + topic_bytes + payload
+        packet = bytes([PUBLISH << 4]) + encode_length(len(body)) + body
+
+        delivered = 0
+        with self.lock:
+            clients = list(self.clients)
+        for sock, filters in clients:
+            if any(topic_matches(f, topic) for f in filters):
+                try:
+                    sock.sendall(packet)
+                    delivered += 1
+                except OSError:
+                    pass
+        return delivered
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Minimal MQTT broker for benchmarks')
+    parser.add_argument('--port', type=int, default=1883)
+    args = parser.parse_args()
+
+    broker = StubBroker()
+    port = broker.start(args.port)
+    print(f"Stub MQTT broker listening on 127.0.0.1:{port}")
+    try:
+        while True:
+            time.sleep(10)
+    except KeyboardInterrupt:
+        broker.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the PlateBridge portal (and the bits of Frigate the agent
+talks to) for benchmarks and load tests.
+
+Endpoints:
+  POST /api/pod/detect                 -> allow/deny from the stub whitelist; backfilled
+                                          events are recorded but never open the gate
+  GET  /api/access/list/<community_id> -> stub whitelist
+  POST /api/pod/heartbeat              -> {community_id, heartbeat}; protocol 2
+                                          (gzip deltas) is applied to a per-pod state
+                                          and the full payload reconstructed
+  POST /api/pod/recordings             -> {recording: {id}}
+  PATCH /api/pod/recordings            -> upload outcome by storage_key (404 if unknown)
+  GET  /api/events/<id>/snapshot.jpg   -> fake JPEG per event (Frigate); ?h= and
+                                          ?crop= give smaller, different bytes
+  GET  /api/events                     -> recorded Frigate events (after/before/limit)
+  GET  /api/pods/config/<pod_id>       -> agent config overrides (?format=agent)
+
+Latency and failures can be injected per endpoint, e.g.
+  --latency detect=0.05 --jitter detect=0.02 --fail detect=0.1
+plus occasional slow requests (a latency tail):
+  --slow-rate detect=0.05 --slow-latency detect=3
+
+Detections repeated with the same Idempotency-Key (hedged requests) get the
+first answer again and are counted as duplicates, not recorded twice.
+
+Usage:
+  python3 bench/stub_portal.py --port 9200 --plates 500
+  python3 bench/stub_portal.py --heartbeat-protocol 1   # behave like an older portal
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pod_heartbeat import apply_heartbeat, reconstruct  # noqa: E402
+
+ENDPOINTS = ('detect', 'access_list', 'heartbeat', 'recordings', 'snapshot', 'events', 'agent_config')
+
+FAKE_JPEG = b'\xff\xd8\xff\xe0' + b'\x00' * 2048 + b'\xff\xd9'
+
+
+def fake_snapshot(event_id: str, height: Optional[int] = None, crop: bool = False) -> bytes:
+    """Same bytes for the same event and size, like Frigate; smaller for smaller heights"""
+    size = len(FAKE_JPEG) if not height else max(256, len(FAKE_JPEG) * height // 1080)
+    seed = f"{event_id}:{height}:{crop}".encode()
+    return FAKE_JPEG[:4] + seed + b'\x00' * max(0, size - len(seed) - 6) + FAKE_JPEG[-2:]
+
+
+def synthetic_plate(index: int) -> str:
+    letters = 'ABCDEFGHJKLMNPRSTUVWXYZ'
+    return f"{letters[index % 23]}{letters[(index // 23) % 23]}{letters[(index // 529) % 23]}{index % 10000:04d}"
+
+
+class PortalState:
+    def __init__(self, plate_count: int = 200, community_id: str = 'bench-community'):
+        self.community_id = community_id
+        self.lock = threading.Lock()
+        self.latency: Dict[str, float] = defaultdict(float)
+        self.jitter: Dict[str, float] = defaultdict(float)
+        self.fail_rate: Dict[str, float] = defaultdict(float)
+        self.slow_rate: Dict[str, float] = defaultdict(float)
+        self.slow_latency: Dict[str, float] = defaultdict(float)
+        self.idempotency: Dict[str, dict] = {}
+        self.duplicates = 0
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.failures: Dict[str, int] = defaultdict(int)
+        self.bytes_in: Dict[str, int] = defaultdict(int)
+        self.detections = []
+        self.detection_times = []
+        self.gate_opens = 0
+        self.backfilled = 0
+        self.heartbeats = []
+        self.recordings = []
+        self.frigate_events = []
+        self.agent_config = {}
+        self.agent_config_version = 0
+        # Newest heartbeat protocol offered to pods, interval hint (None = pod's own)
+        self.heartbeat_protocol = 2
+        self.heartbeat_interval: Optional[float] = None
+        # pod_id -> protocol 2 state; heartbeats holds the reconstructed payloads
+        self.pod_states: Dict[str, dict] = {}
+        self.resyncs = 0
+        self.set_plates([synthetic_plate(i) for i in range(plate_count)])
+
+    def set_plates(self, plates):
+        with self.lock:
+            self.plates = list(plates)
+            self.plate_set = {p.upper().replace(' ', '').replace('-', '') for p in self.plates}
+
+    def configure(self, endpoint: str, latency: Optional[float] = None,
+                  jitter: Optional[float] = None, fail_rate: Optional[float] = None,
+                  slow_rate: Optional[float] = None, slow_latency: Optional[float] = None):
+        if slow_rate is not None:
+            self.slow_rate[endpoint] = slow_rate
+        if slow_latency is not None:
+            self.slow_latency[endpoint] = slow_latency
+        if latency is not None:
+            self.latency[endpoint] = latency
+        if jitter is not None:
+            self.jitter[endpoint] = jitter
+        if fail_rate is not None:
+            self.fail_rate[endpoint] = fail_rate
+
+    def set_agent_config(self, config):
+        with self.lock:
+            self.agent_config = dict(config)
+            self.agent_config_version += 1
+
+    def forget_pods(self):
+        """Drop heartbeat state, as a portal restart would; pods have to resync"""
+        with self.lock:
+            self.pod_states.clear()
+
+    def pod_state(self, pod_id: str) -> Optional[dict]:
+        """Current full heartbeat payload for a pod"""
+        with self.lock:
+            state = self.pod_states.get(pod_id)
+            return reconstruct(state, pod_id) if state else None
+
+    def add_frigate_event(self, event):
+        with self.lock:
+            self.frigate_events.append(event)
+
+    def query_frigate_events(self, after: float = 0, before: Optional[float] = None,
+                             limit: int = 100, label: Optional[str] = None):
+        with self.lock:
+            matches = [
+                e for e in self.frigate_events
+                if e.get('start_time', 0) > after
+                and (before is None or e.get('start_time', 0) < before)
+                and (label is None or e.get('label') == label)
+            ]
+        matches.sort(key=lambda e: e.get('start_time', 0), reverse=True)
+        return matches[:limit]
+
+    def access_list(self):
+        return [
+            {'license_plate': plate, 'is_active': True, 'access_type': 'resident'}
+            for plate in self.plates
+        ]
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'requests': dict(self.requests),
+                'failures': dict(self.failures),
+                'bytes_in': dict(self.bytes_in),
+                'detections': len(self.detections),
+                'gate_opens': self.gate_opens,
+                'backfilled': self.backfilled,
+                'heartbeats': len(self.heartbeats),
+                'heartbeat_resyncs': self.resyncs,
+                'duplicates': self.duplicates,
+                'recordings': len(self.recordings)
+            }
+
+
+class PortalHandler(BaseHTTPRequestHandler):
+    state: PortalState = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = 'application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, body: dict):
+        self._send(status, json.dumps(body).encode())
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def _inject(self, endpoint: str, body_size: int = 0) -> bool:
+        """Apply injected latency; returns False if this request should fail"""
+        state = self.state
+        with state.lock:
+            state.requests[endpoint] += 1
+            state.bytes_in[endpoint] += body_size
+            delay = state.latency[endpoint] + random.uniform(0, state.jitter[endpoint])
+            if random.random() < state.slow_rate[endpoint]:
+                delay += state.slow_latency[endpoint]
+            fail = random.random() < state.fail_rate[endpoint]
+            if fail:
+                state.failures[endpoint] += 1
+
+        if delay > 0:
+            time.sleep(delay)
+
+        if fail:
+            self._json(503, {'error': 'Injected failure'})
+            return False
+        return True
+
+    def route(self, method: str) -> Tuple[Optional[str], Optional[re.Match]]:
+        path = self.path.split('?')[0]
+        routes = {
+            ('POST', r'/api/pod/detect'): 'detect',
+            ('GET', r'/api/access/list/([^/]+)'): 'access_list',
+            ('POST', r'/api/pod/heartbeat'): 'heartbeat',
+            ('POST', r'/api/pod/recordings'): 'recordings',
+            ('PATCH', r'/api/pod/recordings'): 'recording_upload',
+            ('GET', r'/api/events/([^/]+)/snapshot\.jpg'): 'snapshot',
+            ('GET', r'/api/events'): 'events',
+            ('GET', r'/api/pods/config/([^/]+)'): 'agent_config',
+        }
+        for (route_method, pattern), name in routes.items():
+            if route_method == method:
+                match = re.fullmatch(pattern, path)
+                if match:
+                    return name, match
+        return None, None
+
+    def do_GET(self):
+        name, match = self.route('GET')
+        if not name:
+            return self._json(404, {'error': 'Not found'})
+        if not self._inject(name):
+            return
+
+        if name == 'access_list':
+            return self._json(200, {'access_list': self.state.access_list()})
+        if name == 'snapshot':
+            query = parse_qs(urlparse(self.path).query)
+            height = query.get('h', [None])[0]
+            return self._send(200, fake_snapshot(match.group(1), int(height) if height else None,
+                                                 query.get('crop', ['0'])[0] == '1'), 'image/jpeg')
+        if name == 'agent_config':
+            with self.state.lock:
+                return self._json(200, {
+                    'pod_id': match.group(1),
+                    'config_version': self.state.agent_config_version,
+                    'config': self.state.agent_config
+                })
+        if name == 'events':
+            query = parse_qs(urlparse(self.path).query)
+            before = query.get('before', [None])[0]
+            return self._json(200, self.state.query_frigate_events(
+                after=float(query.get('after', ['0'])[0]),
+                before=float(before) if before else None,
+                limit=int(query.get('limit', ['100'])[0]),
+                label=query.get('label', [None])[0]
+            ))
+
+    def do_POST(self):
+        name, match = self.route('POST')
+        body = self._body()
+        if not name:
+            return self._json(404, {'error': 'Not found'})
+        if not self._inject(name, len(body)):
+            return
+
+        try:
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            payload = json.loads(body or b'{}')
+        except (OSError, ValueError):
+            return self._json(400, {'error': 'Invalid JSON'})
+
+        if name == 'detect':
+            plate = (payload.get('plate') or '').upper().replace(' ', '').replace('-', '')
+            allowed = plate in self.state.plate_set
+            # Like the portal: a replayed event is only recorded, the car is long gone
+            backfill = bool(payload.get('backfill'))
+            result = {
+                'success': True,
+                'action': 'allow' if allowed else 'deny',
+                'gate_opened': allowed and not backfill
+            }
+            if backfill:
+                result['backfilled'] = True
+            key = self.headers.get('Idempotency-Key')
+            with self.state.lock:
+                if key and key in self.state.idempotency:
+                    self.state.duplicates += 1
+                    return self._json(200, self.state.idempotency[key])
+                if key:
+                    self.state.idempotency[key] = result
+                self.state.detections.append(payload)
+                self.state.detection_times.append(time.time())
+                self.state.gate_opens += result['gate_opened']
+                self.state.backfilled += backfill
+            return self._json(200, result)
+
+        if name == 'heartbeat':
+            return self._heartbeat(payload)
+
+        if name == 'recordings':
+            with self.state.lock:
+                self.state.recordings.append(payload)
+            return self._json(200, {'success': True, 'recording': {'id': uuid.uuid4().hex}})
+
+    def do_PATCH(self):
+        name, _ = self.route('PATCH')
+        body = self._body()
+        if not name:
+            return self._json(404, {'error': 'Not found'})
+        if not self._inject(name, len(body)):
+            return
+
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            return self._json(400, {'error': 'Invalid JSON'})
+
+        key = payload.get('storage_key')
+        with self.state.lock:
+            for recording in self.state.recordings:
+                metadata = recording.setdefault('metadata', {})
+                for prefix in ('', 'thumbnail_'):
+                    if key and metadata.get(f"{prefix}storage_key") == key:
+                        metadata[f"{prefix}upload_status"] = payload.get('upload_status')
+                        metadata[f"{prefix}storage_url"] = payload.get('storage_url')
+                        return self._json(200, {'success': True})
+        return self._json(404, {'error': 'Recording not found'})
+
+    def _heartbeat(self, payload: dict):
+        state = self.state
+        heartbeat = {'protocol': state.heartbeat_protocol}
+        if state.heartbeat_interval:
+            heartbeat['interval'] = state.heartbeat_interval
+
+        if payload.get('protocol', 1) < 2:
+            with state.lock:
+                state.heartbeats.append(payload)
+            return self._json(200, {'success': True, 'community_id': state.community_id, 'heartbeat': heartbeat})
+
+        if state.heartbeat_protocol < 2:
+            return self._json(400, {'error': 'Unsupported heartbeat protocol'})
+
+        pod_id = payload.get('pod_id')
+        with state.lock:
+            pod_state = apply_heartbeat(state.pod_states.get(pod_id), payload)
+            if pod_state is None:
+                state.resyncs += 1
+            else:
+                state.pod_states[pod_id] = pod_state
+                state.heartbeats.append(reconstruct(pod_state, pod_id))
+
+        if pod_state is None:
+            return self._json(409, {'error': 'Unknown heartbeat base', 'heartbeat': dict(heartbeat, resync=True)})
+        heartbeat['ack'] = pod_state['seq']
+        return self._json(200, {'success': True, 'community_id': state.community_id, 'heartbeat': heartbeat})
+
+
+class PortalServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients (the agent under test) are killed mid-request on purpose
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def serve(port: int = 0, state: Optional[PortalState] = None):
+    """Start the stub in a background thread; returns (server, state, base_url)"""
+    state = state or PortalState()
+    handler = type('Handler', (PortalHandler,), {'state': state})
+    server = PortalServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def parse_endpoint_values(values):
+    parsed = {}
+    for item in values or []:
+        endpoint, value = item.split('=')
+        parsed[endpoint] = float(value)
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in PlateBridge portal')
+    parser.add_argument('--port', type=int, default=9200)
+    parser.add_argument('--plates', type=int, default=200, help='Whitelist size')
+    parser.add_argument('--latency', action='append', help='endpoint=seconds')
+    parser.add_argument('--jitter', action='append', help='endpoint=seconds')
+    parser.add_argument('--fail', action='append', help='endpoint=rate (0-1)')
+    parser.add_argument('--slow-rate', action='append', help='endpoint=rate (0-1) of requests that are slow')
+    parser.add_argument('--slow-latency', action='append', help='endpoint=seconds added to slow requests')
+    parser.add_argument('--heartbeat-protocol', type=int, default=2, choices=(1, 2))
+    parser.add_argument('--heartbeat-interval', type=float, help='Interval hint sent to pods')
+    args = parser.parse_args()
+
+    state = PortalState(args.plates)
+    state.heartbeat_protocol = args.heartbeat_protocol
+    state.heartbeat_interval = args.heartbeat_interval
+    for endpoint, value in parse_endpoint_values(args.latency).items():
+        state.configure(endpoint, latency=value)
+    for endpoint, value in parse_endpoint_values(args.jitter).items():
+        state.configure(endpoint, jitter=value)
+    for endpoint, value in parse_endpoint_values(args.fail).items():
+        state.configure(endpoint, fail_rate=value)
+    for endpoint, value in parse_endpoint_values(args.slow_rate).items():
+        state.configure(endpoint, slow_rate=value)
+    for endpoint, value in parse_endpoint_values(args.slow_latency).items():
+        state.configure(endpoint, slow_latency=value)
+
+    server, state, url = serve(args.port, state)
+    print(f"Stub portal listening on {url}")
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps(state.get_stats()))
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for an HLS relay / object store the pod pushes its live
+stream to.
+
+  PUT    /<path>  -> stored in memory (Content-Type and Cache-Control kept)
+  GET    /<path>  -> served back to viewers, with the stored headers
+  DELETE /<path>  -> removed
+
+Counts bytes in (the pod's uplink) and bytes out (viewer fan-out).
+--fail-rate answers that fraction of PUTs with 503 and --latency delays
+every PUT, to exercise the pod's retries and pipelining. GETs of a playlist
+that lists a segment the relay doesn't have are counted as dangling.
+
+Usage:
+  python3 bench/stub_relay.py --port 9300
+  # then in config.yaml:
+  #   stream_push_url: "http://localhost:9300/live"
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+
+class RelayState:
+    def __init__(self, fail_rate: float = 0.0, latency: float = 0.0):
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.lock = threading.Lock()
+        # path -> (body, content type, cache control)
+        self.objects: Dict[str, Tuple[bytes, str, str]] = {}
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.dangling = 0
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'objects': len(self.objects),
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'dangling_playlists': self.dangling,
+                **dict(self.counts)
+            }
+
+
+class RelayHandler(BaseHTTPRequestHandler):
+    state: RelayState = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _error(self, status: int, message: str):
+        self._send(status, json.dumps({'error': message}).encode(), {'Content-Type': 'application/json'})
+
+    def do_PUT(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        state = self.state
+
+        if state.latency:
+            time.sleep(state.latency)
+        with state.lock:
+            state.counts['puts'] += 1
+            if random.random() < state.fail_rate:
+                state.counts['failed_puts'] += 1
+                fail = True
+            else:
+                fail = False
+                state.bytes_in += len(body)
+                state.objects[self.path] = (
+                    body,
+                    self.headers.get('Content-Type', 'application/octet-stream'),
+                    self.headers.get('Cache-Control', 'no-cache')
+                )
+        if fail:
+            return self._error(503, 'Injected failure')
+        self._send(201, b'')
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        state = self.state
+        with state.lock:
+            state.counts['gets'] += 1
+            stored = state.objects.get(path)
+            if stored and path.endswith('.m3u8'):
+                directory = path.rsplit('/', 1)[0]
+                for line in stored[0].decode(errors='replace').splitlines():
+                    if line and not line.startswith('#') and f"{directory}/{line}" not in state.objects:
+                        state.dangling += 1
+                        break
+            if stored:
+                state.bytes_out += len(stored[0])
+
+        if not stored:
+            return self._error(404, 'Not found')
+        body, content_type, cache_control = stored
+        self._send(200, body, {'Content-Type': content_type, 'Cache-Control': cache_control})
+
+    do_HEAD = do_GET
+
+    def do_DELETE(self):
+        with self.state.lock:
+            self.state.counts['deletes'] += 1
+            found = self.state.objects.pop(self.path, None) is not None
+        self._send(204 if found else 404, b'')
+
+
+class RelayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+def serve(port: int = 0, state: Optional[RelayState] = None):
+    """Start the stub in a background thread; returns (server, state, base_url)"""
+    state = state or RelayState()
+    handler = type('Handler', (RelayHandler,), {'state': state})
+    server = RelayServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in HLS relay')
+    parser.add_argument('--port', type=int, default=9300)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of PUTs answered with 503')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every PUT')
+    args = parser.parse_args()
+
+    server, state, url = serve(args.port, RelayState(args.fail_rate, args.latency))
+    print(f"Stub relay listening on {url}")
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps(state.get_stats()))
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
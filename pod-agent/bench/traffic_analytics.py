@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Cost and accuracy of the on-pod traffic analytics.
+
+Feeds --events synthetic decisions (plates drawn from a Zipf-like
+distribution over --plates plates, so a few residents come and go all
+day; spread over --hours hours and two cameras) into TrafficAnalytics and,
+for comparison, into an exact aggregation that keeps every event the way
+a re-scan of the detection log would.
+
+Reports per-event update cost, the cost of building a heartbeat summary,
+memory held (tracemalloc), the gzipped summary size, the distinct-plate
+error and how many of the exact top-N plates the sketch also reports.
+Fails if the distinct count is off by more than 10% or fewer than
+N - 1 of the top N are found.
+
+Examples:
+  python3 bench/traffic_analytics.py
+  python3 bench/traffic_analytics.py --events 500000 --plates 50000 --json traffic.json
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pod_analytics import TrafficAnalytics  # noqa: E402
+
+
+def make_events(count: int, plates: int, hours: int, seed: int = 1):
+    rng = random.Random(seed)
+    names = [f"{rng.choice('ABCDEFGH')}{i:06d}" for i in range(plates)]
+    # Zipf-like: weight 1/rank
+    weights = [1 / (rank + 1) for rank in range(plates)]
+    # The window is the current hour and the hours - 1 before it
+    now = time.time()
+    start = (int(now // 3600) - hours + 1) * 3600
+    events = []
+    for plate in rng.choices(names, weights, k=count):
+        events.append((
+            plate,
+            start + rng.random() * (now - start),
+            rng.choice(('entry', 'exit')),
+            'allow' if rng.random() < 0.8 else 'deny',
+            rng.lognormvariate(-3, 0.6)
+        ))
+    return events
+
+
+def exact_summary(events, top_n: int) -> dict:
+    """What the portal computes from the raw log"""
+    counts = Counter(event[0] for event in events)
+    hours = Counter(int(event[1] // 3600) for event in events)
+    return {
+        'events': len(events),
+        'distinct_plates': len(counts),
+        'top_plates': counts.most_common(top_n),
+        'hours': len(hours),
+        'denied': sum(1 for event in events if event[3] == 'deny')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='On-pod traffic analytics cost and accuracy')
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--plates', type=int, default=20000)
+    parser.add_argument('--hours', type=int, default=24)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--json', help='Write results here')
+    args = parser.parse_args()
+
+    events = make_events(args.events, args.plates, args.hours)
+    # Decisions arrive in time order
+    events.sort(key=lambda event: event[1])
+
+    traffic = TrafficAnalytics(window_hours=args.hours, top_n=args.top)
+    started = time.perf_counter()
+    for plate, ts, camera, action, latency in events:
+        traffic.record(plate, ts=ts, camera=camera, action=action, latency=latency)
+    record_s = time.perf_counter() - started
+
+    # Again under tracemalloc, which would skew the timing
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    measured = TrafficAnalytics(window_hours=args.hours, top_n=args.top)
+    for plate, ts, camera, action, latency in events:
+        measured.record(plate, ts=ts, camera=camera, action=action, latency=latency)
+    sketch_bytes = tracemalloc.get_traced_memory()[0] - before
+
+    started = time.perf_counter()
+    summary = traffic.summary()
+    summary_ms = (time.perf_counter() - started) * 1000
+
+    before = tracemalloc.get_traced_memory()[0]
+    log = [tuple(event) for event in events]
+    log_bytes = tracemalloc.get_traced_memory()[0] - before
+    started = time.perf_counter()
+    exact = exact_summary(log, args.top)
+    rescan_ms = (time.perf_counter() - started) * 1000
+    tracemalloc.stop()
+
+    distinct_error = (summary['distinct_plates'] - exact['distinct_plates']) / exact['distinct_plates']
+    exact_top = {plate for plate, _ in exact['top_plates']}
+    found = len(exact_top & {plate for plate, _, _ in summary['top_plates']})
+    summary_gz = len(gzip.compress(json.dumps(summary, separators=(',', ':')).encode()))
+
+    result = {
+        'events': args.events,
+        'plates': args.plates,
+        'record_us': round(record_s / args.events * 1e6, 2),
+        'summary_ms': round(summary_ms, 1),
+        'rescan_ms': round(rescan_ms, 1),
+        'sketch_kb': round(sketch_bytes / 1024, 1),
+        'raw_log_kb': round(log_bytes / 1024, 1),
+        'summary_gzip_bytes': summary_gz,
+        'distinct_exact': exact['distinct_plates'],
+        'distinct_estimate': summary['distinct_plates'],
+        'distinct_error': round(distinct_error, 4),
+        'top_found': found,
+        'events_counted': summary['events'],
+        'denied_counted': summary['denied'] == exact['denied'],
+        'latency_p50_ms': summary['latency_ms']['p50'],
+        'latency_p95_ms': summary['latency_ms']['p95']
+    }
+
+    print("=" * 72)
+    print(f"Traffic analytics, {args.events} events over {args.plates} plates, {args.hours}h")
+    print("=" * 72)
+    print(f"update per event:     {result['record_us']:>10} us")
+    print(f"heartbeat summary:    {result['summary_ms']:>10} ms   (re-scan of raw log: {result['rescan_ms']} ms)")
+    print(f"memory held:          {result['sketch_kb']:>10} KB   (raw log: {result['raw_log_kb']} KB)")
+    print(f"summary, gzipped:     {result['summary_gzip_bytes']:>10} bytes")
+    print(f"distinct plates:      {result['distinct_estimate']:>10}      (exact {result['distinct_exact']}, "
+          f"error {result['distinct_error']:+.2%})")
+    print(f"top {args.top} found:         {found:>10}/{len(exact_top)}")
+    print(f"events / denied:      {summary['events']:>10}      (denied exact: {result['denied_counted']})")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    ok = abs(distinct_error) <= 0.1 and found >= len(exact_top) - 1 and summary['events'] == args.events
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
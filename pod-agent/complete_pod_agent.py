@@ -4,23 +4,34 @@ PlateBridge Complete Pod Agent
 Handles: Plate detection, streaming, recording uploads, heartbeats
 """
 
+import argparse
 import json
 import time
 import asyncio
 import logging
 import os
+import signal
 import sys
 import subprocess
 import threading
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, TYPE_CHECKING
 import yaml
 import requests
-import paho.mqtt.client as mqtt
-from flask import Flask, Response, request, jsonify, send_file
 import hashlib
-import psutil
+
+from pod_config import (
+    ConfigFileWatcher, affected_subsystems, diff_config, fetch_portal_config, merge_config, read_config
+)
+from pod_events import EventJournal, fetch_events_since, normalize_frigate_event
+from pod_plates import normalize_plate
+from pod_portal import CircuitOpen, PortalUnavailable
+
+# Flask, paho, psutil and the streaming/recording/upload modules are imported
+# where they are first used, so a pod that doesn't enable them boots faster
+if TYPE_CHECKING:
+    from pod_uploads import UploadQueue
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,77 +39,420 @@ logging.basicConfig(
 )
 logger = logging.getLogger('platebridge-pod')
 
-app = Flask(__name__)
+# Flask app, created when the stream server starts
+app = None
 
 # Global agent instance
 agent = None
 
 
 class CompletePodAgent:
-    def __init__(self, config_path: str = "config.yaml"):
+    def __init__(self, config_path: str = "config.yaml", role: str = 'all'):
         self.config_path = config_path
-        self.config = self.load_config()
+        self.role = role
+        self.handles_detection = role in ('all', 'detection')
+        self.handles_media = role in ('all', 'media')
         self.community_id = None
+        self.config = self.load_config()
+        self.config_lock = threading.Lock()
+        self.config_watcher = ConfigFileWatcher(config_path)
+        self.portal_config = {}
+        self.reload_requested = threading.Event()
+        self.config_stats = {
+            'version': 0,
+            'reloads': 0,
+            'last_reload': None,
+            'last_error': None,
+            'pending_restart': []
+        }
         self.whitelist_cache = {}
+        # Normalized plate -> entry; rebuilt whenever whitelist_cache is replaced
+        self.whitelist_index = {}
         self.cache_path = Path("whitelist_cache.json")
+        self.cache_mtime = None
         self.last_whitelist_refresh = None
+        self.whitelist_refresh_lock = threading.Lock()
         self.mqtt_client = None
         self.ffmpeg_process = None
+        # Held across every start/stop (and stop-then-start) of the main pipeline;
+        # Flask threads, the idle monitor and the governor all reach it
+        self.stream_lock = threading.RLock()
         self.hls_output_dir = '/tmp/hls_output'
 
         os.makedirs(self.hls_output_dir, exist_ok=True)
         os.makedirs(self.config.get('recordings_dir', '/tmp/recordings'), exist_ok=True)
 
+        self.governor = self.create_governor() if self.config.get('enable_governor', True) else None
+        # Every ffmpeg (and upload thread) runs at its work class's CPU/IO priority
+        self.children = self.create_child_launcher()
+        self.upload_queue = self.create_upload_queue() if self.handles_detection else None
+        self.stream_lifecycle = None
+        # Set when running as one role under the supervisor
+        self.shared_state = None
+        if role != 'all':
+            from pod_supervisor import SharedState
+            self.shared_state = SharedState.attach_from_env()
+        self.media_probe = None
+        self.event_journal = EventJournal(self.config.get('event_journal_path', 'event_journal.json'))
+        self.backfill_lock = threading.Lock()
+        self.mqtt_disconnected_at = None
+        self.backfill_stats = {'runs': 0, 'events': 0, 'last_run': None, 'last_error': None}
+        self.recording_scheduler = None
+        self.stream_auth = None
+        # Legacy clip -> 'running' | 'failed' remux for VOD
+        self.vod_remuxes: Dict[str, str] = {}
+        self.vod_remux_lock = threading.Lock()
+        self.peer_group = None
+        self.detection_history = None
+        # Set by main() once the agent owns the process's logging
+        self.log_pipeline = None
+        self.heartbeat = self.create_heartbeat_encoder() if self.handles_detection else None
+        self.portal_client = self.create_portal_client()
+        # unknown: fallbacks after the request went out, which the portal may still have acted on
+        self.fallback_stats = {'local_allow': 0, 'local_deny': 0, 'unknown': 0, 'last_reason': None}
+        self.plate_filter = self.create_plate_filter() if self.handles_detection else None
+        self.traffic = None
+        if self.handles_detection and self.config.get('enable_traffic_analytics', True):
+            self.traffic = self.create_traffic_analytics()
+
+        if self.handles_detection and self.config.get('record_on_detection', True):
+            self.recording_scheduler = self.create_recording_scheduler()
+
+        streaming = self.handles_media and self.config.get('enable_streaming', True)
+        if streaming:
+            self.stream_auth = self.create_stream_auth()
+
+        if self.config.get('enable_media_probe', True) and (streaming or self.recording_scheduler):
+            self.media_probe = self.create_media_probe()
+
+        # Pushing to a relay needs the pipeline running whether or not anyone watches the pod
+        self.relay_pusher = None
+        if streaming and self.config.get('stream_push_url'):
+            self.relay_pusher = self.create_relay_pusher()
+
+        if streaming and self.config.get('stream_on_demand', True) and not self.relay_pusher:
+            from pod_streaming import StreamLifecycle
+            self.stream_lifecycle = StreamLifecycle(
+                start=lambda: self.start_ffmpeg_stream(fast_start=True),
+                stop=self.stop_ffmpeg_stream,
+                get_pid=lambda: self.ffmpeg_process.pid if self.ffmpeg_process else None,
+                idle_timeout=self.config.get('stream_idle_timeout', 60),
+                watts_per_core=self.config.get('stream_watts_per_core', 3.0)
+            )
+
+        self.low_rendition = None
+        self.low_lifecycle = None
+        if streaming and self.config.get('stream_renditions', False):
+            self.low_rendition, self.low_lifecycle = self.create_low_rendition()
+
+        # Detection writes the history; the stream server (maybe another process) reads it
+        if self.config.get('enable_history', True) and (self.handles_detection or streaming):
+            self.detection_history = self.create_detection_history()
+
+        if self.handles_detection and self.config.get('peer_mode', False):
+            self.peer_group = self.create_peer_group()
+
+        # Same split: detection fetches snapshots, the stream server serves them
+        self.snapshot_store = None
+        if self.config.get('save_snapshots', True) and (self.handles_detection or streaming):
+            self.snapshot_store = self.create_snapshot_store()
+
         self.load_whitelist_cache()
 
+    def create_peer_group(self):
+        if not self.config.get('peer_secret'):
+            logger.warning("peer_mode needs peer_secret; fetching the whitelist directly")
+            return None
+
+        from pod_peers import PeerGroup
+        return PeerGroup(
+            self.config['pod_id'],
+            self.config['peer_secret'],
+            port=self.config.get('peer_port', 8765),
+            static_peers=self.config.get('peers', []),
+            discovery_port=self.config.get('peer_discovery_port', 8766),
+            interval=self.config.get('peer_interval', 5),
+            on_update=lambda entries: self.apply_access_list(entries, 'peer'),
+            on_leader=self.refresh_whitelist_in_background
+        )
+
+    def create_relay_pusher(self):
+        from pod_relay import RelayPusher
+        return RelayPusher(
+            self.hls_output_dir,
+            self.config['stream_push_url'],
+            self.config['pod_id'],
+            # Never the portal key: the push URL can be any relay or bucket
+            token=self.config.get('stream_push_token') or None,
+            workers=self.config.get('stream_push_workers', 4),
+            retries=self.config.get('stream_push_retries', 3),
+            max_kbps=self.config.get('stream_push_max_kbps', 0),
+            keep_segments=self.config.get('stream_push_keep_segments', 10)
+        )
+
+    def create_low_rendition(self):
+        from pod_renditions import LowRendition
+        from pod_streaming import StreamLifecycle
+
+        rendition = LowRendition(
+            os.path.join(self.hls_output_dir, 'low'),
+            self.config.get('camera_rtsp_url', ''),
+            substream_url=self.config.get('camera_substream_url'),
+            height=self.config.get('stream_low_height', 360),
+            kbps=self.config.get('stream_low_kbps', 400),
+            fps=self.config.get('stream_low_fps', 10),
+            threads=self.config.get('stream_low_threads', 1),
+            cpu_budget=self.config.get('stream_low_cpu_budget', 50),
+            segment_target=self.config.get('hls_segment_seconds', 2),
+            get_info=lambda url: self.get_stream_info(url, blocking=False),
+            launcher=self.children
+        )
+        # Always on demand, whatever stream_on_demand says for the main rendition
+        lifecycle = StreamLifecycle(
+            start=rendition.start,
+            stop=rendition.stop,
+            get_pid=rendition.pid,
+            idle_timeout=self.config.get('stream_idle_timeout', 60),
+            watts_per_core=self.config.get('stream_watts_per_core', 3.0)
+        )
+        return rendition, lifecycle
+
+    def create_child_launcher(self):
+        from pod_children import ChildLauncher
+        return ChildLauncher(
+            classes=self.config.get('child_classes'),
+            enabled=self.config.get('child_priorities', True),
+            cgroup_root=self.config.get('child_cgroup_root'),
+            sample_interval=self.config.get('child_sample_interval', 2)
+        )
+
+    def create_portal_client(self):
+        from pod_portal import PortalClient
+        return PortalClient(
+            budgets=self.config.get('portal_budgets'),
+            hedging=self.config.get('portal_hedging', True),
+            hedge_min_delay=self.config.get('portal_hedge_min_delay', 0.1),
+            breaker_failures=self.config.get('portal_breaker_failures', 3),
+            breaker_cooldown=self.config.get('portal_breaker_cooldown', 30)
+        )
+
+    def create_heartbeat_encoder(self):
+        from pod_heartbeat import HeartbeatEncoder
+        return HeartbeatEncoder(
+            self.config['pod_id'],
+            protocol=self.config.get('heartbeat_protocol', 'auto'),
+            compress_min_bytes=self.config.get('heartbeat_compress_min_bytes', 256),
+            interval=self.config.get('heartbeat_interval', 60),
+            min_interval=self.config.get('heartbeat_min_interval', 15),
+            max_interval=self.config.get('heartbeat_max_interval', 600)
+        )
+
+    def create_governor(self):
+        from pod_governor import ResourceGovernor
+        return ResourceGovernor(
+            temp_levels=self.config.get('governor_temp_levels', [70, 78, 85]),
+            cpu_levels=self.config.get('governor_cpu_levels', [85, 93, 98]),
+            temp_hysteresis=self.config.get('governor_temp_hysteresis', 5),
+            cpu_hysteresis=self.config.get('governor_cpu_hysteresis', 15),
+            min_dwell=self.config.get('governor_min_dwell', 30),
+            read_temperature=self.read_temperature,
+            on_change=self.apply_resource_level
+        )
+
+    def apply_resource_level(self, old: int, new: int):
+        """Governor changed level: bring the stream pipeline in line with it"""
+        from pod_governor import REDUCE_STREAM_AT
+
+        if not self.handles_media or not self.config.get('enable_streaming', True):
+            return
+
+        running = self.ffmpeg_process is not None and self.ffmpeg_process.poll() is None
+
+        if not self.governor.allows('streaming', count=False):
+            if self.stream_lifecycle:
+                self.stream_lifecycle.shutdown_pipeline('overload')
+            elif running:
+                logger.warning("Stopping stream pipeline (overload)")
+                self.stop_ffmpeg_stream()
+            if self.low_lifecycle:
+                self.low_lifecycle.shutdown_pipeline('overload')
+            return
+
+        if self.low_lifecycle and self.low_rendition.transcodes and not self.governor.allows('transcoding', count=False):
+            # Viewers on the low rendition fall back to the main one
+            self.low_lifecycle.shutdown_pipeline('overload')
+
+        if self.governor.stop_idle_streams and self.stream_lifecycle and not self.stream_lifecycle.active_viewers():
+            self.stream_lifecycle.shutdown_pipeline('overload')
+            return
+
+        if not self.stream_lifecycle and not running:
+            # Always-on pipeline stopped at critical; bring it back
+            self.start_ffmpeg_stream()
+        elif running and (old >= REDUCE_STREAM_AT) != (new >= REDUCE_STREAM_AT):
+            logger.info(f"Restarting stream pipeline ({'reduced' if new >= REDUCE_STREAM_AT else 'full'} rendition)")
+            self.restart_ffmpeg_stream(fast_start=bool(self.stream_lifecycle))
+
+    def create_plate_filter(self):
+        from pod_plates import PlateFilter
+        try:
+            return PlateFilter(
+                regions=self.config.get('plate_regions', ['US']),
+                patterns=self.config.get('plate_patterns', []),
+                mode=self.config.get('plate_filter_mode', 'reject'),
+                min_length=self.config.get('plate_min_length', 2),
+                max_length=self.config.get('plate_max_length', 10),
+                loose=self.config.get('plate_filter_loose', False)
+            )
+        except Exception as e:
+            logger.error(f"Invalid plate filter config, filter disabled: {e}")
+            return None
+
+    def create_traffic_analytics(self):
+        from pod_analytics import TrafficAnalytics
+        return TrafficAnalytics(
+            window_hours=self.config.get('traffic_window_hours', 24),
+            top_n=self.config.get('traffic_top_n', 10)
+        )
+
+    def create_detection_history(self):
+        from pod_history import DetectionHistory
+        try:
+            return DetectionHistory(
+                self.config.get('history_path', 'detection_history.db'),
+                retention_days=self.config.get('history_retention_days', 90)
+            )
+        except Exception as e:
+            logger.error(f"Detection history unavailable: {e}")
+            return None
+
+    def create_snapshot_store(self):
+        from pod_snapshots import SnapshotStore
+        recordings_dir = self.config.get('recordings_dir', '/tmp/recordings')
+        try:
+            return SnapshotStore(
+                self.config.get('snapshot_dir') or os.path.join(recordings_dir, 'snapshots'),
+                frigate_url=self.config.get('frigate_url', 'http://localhost:5000') if self.handles_detection else None,
+                variants=self.config.get('snapshot_variants'),
+                max_bytes=self.config.get('snapshot_max_mb', 500) * 1024 * 1024,
+                workers=self.config.get('snapshot_workers', 2)
+            )
+        except Exception as e:
+            logger.error(f"Snapshot store unavailable: {e}")
+            return None
+
+    def create_recording_scheduler(self):
+        from pod_recording import RecordingScheduler
+        return RecordingScheduler(
+            start=self.start_clip_recording,
+            finish=self.finish_clip_recording,
+            max_length=self.config.get('recording_max_length', 120)
+        )
+
+    def create_stream_auth(self):
+        from pod_stream_auth import StreamAuth
+        return StreamAuth(
+            self.config.get('stream_secret', 'default-secret'),
+            session_ttl=self.config.get('stream_session_ttl', 300),
+            cache_size=self.config.get('stream_token_cache_size', 1024)
+        )
+
+    def create_media_probe(self):
+        from pod_media import MediaProbe
+        return MediaProbe(
+            self.config.get('media_probe_cache', 'media_probe_cache.json'),
+            ttl=self.config.get('media_probe_ttl', 86400),
+            retry_interval=self.config.get('media_probe_retry_interval', 300),
+            launcher=self.children
+        )
+
+    def create_upload_queue(self) -> Optional['UploadQueue']:
+        if not self.config.get('enable_uploads', False):
+            return None
+
+        from pod_uploads import BandwidthLimiter, ChunkedUploader, UploadQueue, UploadSchedule
+        from pod_vod import remux_in_progress
+
+        upload_url = self.config['upload_url']
+        state_dir = self.config.get('upload_state_dir', '/tmp/platebridge-uploads')
+
+        limiter = BandwidthLimiter(self.config.get('upload_max_kbps', 0) * 1000 / 8)
+        uploader = ChunkedUploader(
+            upload_url,
+            self.config['pod_api_key'],
+            os.path.join(state_dir, 'sessions'),
+            chunk_size=self.config.get('upload_chunk_kb', 1024) * 1024,
+            parallel=self.config.get('upload_parallel', 3),
+            limiter=limiter,
+            init_thread=lambda: self.children.lower_current_thread('uploads')
+        )
+        schedule = UploadSchedule(self.config.get('upload_schedule', []))
+
+        logger.info(f"Uploads enabled: {upload_url}")
+        return UploadQueue(
+            uploader, os.path.join(state_dir, 'queue'), schedule,
+            can_run=lambda: not self.governor or self.governor.allows('uploads', count=False),
+            init_thread=lambda: self.children.lower_current_thread('uploads'),
+            on_complete=self.report_upload,
+            is_busy=remux_in_progress
+        )
+
+    def report_upload(self, job: Dict[str, Any], status: str) -> bool:
+        """Record an upload's outcome on the portal's recording row; False to retry"""
+        try:
+            response = self.portal_client.request(
+                'recordings', 'PATCH',
+                f"{self.config['portal_url']}/api/pod/recordings",
+                headers={'Authorization': f"Bearer {self.config['pod_api_key']}"},
+                json={'storage_key': job['object_key'], 'upload_status': status, 'storage_url': job.get('url')}
+            )
+        except requests.RequestException as e:
+            logger.warning(f"Could not report upload of {job['object_key']}: {e}")
+            return False
+        # 404: the recording isn't registered yet
+        return response.status_code == 200
+
+    def start_vod_remux(self, file_path: str) -> str:
+        """Remux a legacy clip for VOD in the background: 'running', 'failed' or 'uploading'"""
+        from pod_uploads import UploadQueue
+
+        queue_dir = os.path.join(self.config.get('upload_state_dir', '/tmp/platebridge-uploads'), 'queue')
+        with self.vod_remux_lock:
+            state = self.vod_remuxes.get(file_path)
+            if state:
+                return state
+            # Rewriting the file under a running upload would corrupt it
+            if self.config.get('enable_uploads', False) and file_path in UploadQueue.queued_files(queue_dir):
+                return 'uploading'
+            self.vod_remuxes[file_path] = 'running'
+
+        def run():
+            from pod_vod import remux_fragmented
+            done = remux_fragmented(file_path, launcher=self.children)
+            with self.vod_remux_lock:
+                if done:
+                    del self.vod_remuxes[file_path]
+                else:
+                    self.vod_remuxes[file_path] = 'failed'
+
+        threading.Thread(target=run, name='vod-remux', daemon=True).start()
+        return 'running'
+
+    def storage_key(self, file_path: str) -> str:
+        return f"{self.config['pod_id']}/{self.config['camera_id']}/{os.path.basename(file_path)}"
+
     def get_system_stats(self) -> Dict[str, Any]:
         """Collect CPU, memory, disk, and temperature information"""
         try:
+            import psutil
+
             stats = {
                 'cpu_usage': psutil.cpu_percent(interval=1),
                 'memory_usage': psutil.virtual_memory().percent,
                 'disk_usage': psutil.disk_usage('/').percent,
-                'temperature': None
+                'temperature': self.read_temperature()
             }
 
-            # Try to get temperature from sensors
-            try:
-                if hasattr(psutil, 'sensors_temperatures'):
-                    temps = psutil.sensors_temperatures()
-                    if temps:
-                        # Try common sensor names
-                        for sensor_name in ['coretemp', 'cpu_thermal', 'k10temp']:
-                            if sensor_name in temps:
-                                sensor_temps = temps[sensor_name]
-                                if sensor_temps:
-                                    stats['temperature'] = sensor_temps[0].current
-                                    break
-
-                        # If no common sensor found, use first available
-                        if stats['temperature'] is None:
-                            first_sensor = next(iter(temps.values()), None)
-                            if first_sensor:
-                                stats['temperature'] = first_sensor[0].current
-            except Exception as e:
-                logger.debug(f"Could not read temperature: {e}")
-
-            # Fallback: try reading from thermal zone files
-            if stats['temperature'] is None:
-                try:
-                    thermal_paths = [
-                        '/sys/class/thermal/thermal_zone0/temp',
-                        '/sys/class/thermal/thermal_zone1/temp'
-                    ]
-                    for path in thermal_paths:
-                        if os.path.exists(path):
-                            with open(path, 'r') as f:
-                                temp = int(f.read().strip())
-                                # Convert from millidegrees to degrees
-                                stats['temperature'] = temp / 1000.0
-                                break
-                except Exception as e:
-                    logger.debug(f"Could not read thermal zone: {e}")
-
             return stats
         except Exception as e:
             logger.error(f"Error getting system stats: {e}")
@@ -109,15 +463,55 @@ class CompletePodAgent:
                 'temperature': None
             }
 
-    def load_config(self) -> Dict[str, Any]:
+    def read_temperature(self) -> Optional[float]:
+        """SoC temperature in degrees C, or None if the pod doesn't expose one"""
+        import psutil
+
+        temperature = None
+
+        # Try to get temperature from sensors
         try:
-            with open(self.config_path, 'r') as f:
-                config = yaml.safe_load(f)
+            if hasattr(psutil, 'sensors_temperatures'):
+                temps = psutil.sensors_temperatures()
+                if temps:
+                    # Try common sensor names
+                    for sensor_name in ['coretemp', 'cpu_thermal', 'k10temp']:
+                        if sensor_name in temps:
+                            sensor_temps = temps[sensor_name]
+                            if sensor_temps:
+                                temperature = sensor_temps[0].current
+                                break
+
+                    # If no common sensor found, use first available
+                    if temperature is None:
+                        first_sensor = next(iter(temps.values()), None)
+                        if first_sensor:
+                            temperature = first_sensor[0].current
+        except Exception as e:
+            logger.debug(f"Could not read temperature: {e}")
+
+        # Fallback: try reading from thermal zone files
+        if temperature is None:
+            try:
+                thermal_paths = [
+                    '/sys/class/thermal/thermal_zone0/temp',
+                    '/sys/class/thermal/thermal_zone1/temp'
+                ]
+                for path in thermal_paths:
+                    if os.path.exists(path):
+                        with open(path, 'r') as f:
+                            temp = int(f.read().strip())
+                            # Convert from millidegrees to degrees
+                            temperature = temp / 1000.0
+                            break
+            except Exception as e:
+                logger.debug(f"Could not read thermal zone: {e}")
+
+        return temperature
 
-            required_fields = ['portal_url', 'pod_api_key', 'pod_id', 'camera_id']
-            missing = [f for f in required_fields if f not in config]
-            if missing:
-                raise ValueError(f"Missing required config fields: {', '.join(missing)}")
+    def load_config(self) -> Dict[str, Any]:
+        try:
+            config = read_config(self.config_path)
 
             # Store community_id if provided in config (optional now)
             if 'community_id' in config:
@@ -131,19 +525,277 @@ class CompletePodAgent:
             logger.error(f"Error loading config: {e}")
             sys.exit(1)
 
+    def reload_config(self, reason: str, portal_config: Optional[Dict[str, Any]] = None) -> bool:
+        """Re-read config.yaml (plus portal overrides) and restart only what changed"""
+        with self.config_lock:
+            try:
+                file_config = read_config(self.config_path)
+            except Exception as e:
+                self.config_stats['last_error'] = str(e)
+                logger.error(f"Config reload ({reason}) rejected, keeping current config: {e}")
+                return False
+
+            if portal_config is not None:
+                self.portal_config = portal_config
+
+            new_config, held = merge_config(self.config, file_config, self.portal_config)
+            changed = diff_config(self.config, new_config)
+            self.config = new_config
+
+            self.config_stats['reloads'] += 1
+            self.config_stats['last_reload'] = datetime.now().isoformat()
+            self.config_stats['last_error'] = None
+            self.config_stats['pending_restart'] = sorted(held)
+
+            if held:
+                logger.warning(f"Config changes to {', '.join(sorted(held))} take effect after a restart")
+
+            if not changed:
+                logger.info(f"Config reloaded ({reason}): no changes")
+                return True
+
+            subsystems = affected_subsystems(changed)
+            logger.info(f"Config reloaded ({reason}): {', '.join(sorted(changed))} changed"
+                        f"{'; restarting ' + ', '.join(sorted(subsystems)) if subsystems else ''}")
+
+            for subsystem in sorted(subsystems):
+                try:
+                    self.apply_config(subsystem, changed)
+                except Exception as e:
+                    self.config_stats['last_error'] = f"{subsystem}: {e}"
+                    logger.error(f"Error applying {subsystem} config: {e}")
+
+            return True
+
+    def apply_config(self, subsystem: str, changed: set):
+        if subsystem == 'stream' and self.handles_media:
+            if not self.config.get('enable_media_probe', True):
+                self.media_probe = None
+            elif self.media_probe:
+                self.media_probe.ttl = self.config.get('media_probe_ttl', 86400)
+                self.media_probe.retry_interval = self.config.get('media_probe_retry_interval', 300)
+            else:
+                self.media_probe = self.create_media_probe()
+
+            if self.stream_lifecycle:
+                self.stream_lifecycle.idle_timeout = self.config.get('stream_idle_timeout', 60)
+                self.stream_lifecycle.watts_per_core = self.config.get('stream_watts_per_core', 3.0)
+
+            renditions = self.config.get('stream_renditions', False) and self.config.get('enable_streaming', True)
+            if self.low_lifecycle and (not renditions or changed & {'camera_rtsp_url', 'camera_substream_url'}):
+                self.low_lifecycle.stop_monitor()
+                self.low_rendition, self.low_lifecycle = None, None
+            if renditions and not self.low_lifecycle:
+                self.low_rendition, self.low_lifecycle = self.create_low_rendition()
+                self.low_lifecycle.start_monitor()
+            elif self.low_lifecycle:
+                self.low_lifecycle.idle_timeout = self.config.get('stream_idle_timeout', 60)
+                self.low_rendition.configure(
+                    height=self.config.get('stream_low_height', 360),
+                    kbps=self.config.get('stream_low_kbps', 400),
+                    fps=self.config.get('stream_low_fps', 10),
+                    threads=self.config.get('stream_low_threads', 1),
+                    cpu_budget=self.config.get('stream_low_cpu_budget', 50)
+                )
+                if changed & {'stream_low_height', 'stream_low_kbps', 'stream_low_fps', 'stream_low_threads'}:
+                    # Picked up by the next viewer of the low rendition
+                    self.low_lifecycle.shutdown_pipeline('reconfigured')
+
+            if changed & {'camera_rtsp_url', 'hls_segment_seconds', 'enable_media_probe'}:
+                running = self.ffmpeg_process is not None and self.ffmpeg_process.poll() is None
+                # On-demand pipelines that are idle pick the new settings up on the next viewer
+                if running or (not self.stream_lifecycle and self.config.get('enable_streaming', True)):
+                    logger.info("Restarting stream pipeline")
+                    self.restart_ffmpeg_stream(fast_start=bool(self.stream_lifecycle))
+
+        elif subsystem == 'stream_push' and self.relay_pusher:
+            self.relay_pusher.stop()
+            self.relay_pusher = self.create_relay_pusher()
+            self.relay_pusher.start()
+
+        elif subsystem == 'stream_auth' and self.stream_auth:
+            if 'stream_secret' in changed:
+                # Old sessions were signed for the old secret's tokens; viewers re-auth on the next playlist
+                self.stream_auth = self.create_stream_auth()
+            else:
+                self.stream_auth.session_ttl = self.config.get('stream_session_ttl', 300)
+                cache_size = self.config.get('stream_token_cache_size', 1024)
+                self.stream_auth.tokens.max_size = cache_size
+                self.stream_auth.sessions.max_size = cache_size
+
+        elif subsystem == 'mqtt' and self.handles_detection:
+            # Bring the new connection up before dropping the old one; the event
+            # journal drops anything both of them deliver
+            old_client = self.mqtt_client
+            self.mqtt_client = None
+            if self.config.get('enable_mqtt', True):
+                self.start_mqtt()
+            if old_client:
+                old_client.loop_stop()
+                old_client.disconnect()
+
+        elif subsystem == 'uploads' and self.handles_detection:
+            if not self.config.get('enable_uploads', False):
+                if self.upload_queue:
+                    self.upload_queue.stop()
+                    self.upload_queue = None
+                    logger.info("Uploads disabled")
+            elif not self.upload_queue:
+                self.upload_queue = self.create_upload_queue()
+                self.upload_queue.start()
+            else:
+                # Queued jobs live on disk; retune the running queue in place
+                from pod_uploads import UploadSchedule
+                uploader = self.upload_queue.uploader
+                uploader.upload_url = self.config['upload_url'].rstrip('/')
+                uploader.chunk_size = self.config.get('upload_chunk_kb', 1024) * 1024
+                uploader.parallel = max(1, self.config.get('upload_parallel', 3))
+                uploader.limiter.set_rate(self.config.get('upload_max_kbps', 0) * 1000 / 8)
+                self.upload_queue.schedule = UploadSchedule(self.config.get('upload_schedule', []))
+                self.upload_queue.wakeup.set()
+
+        elif subsystem == 'recording' and self.handles_detection:
+            if not self.config.get('record_on_detection', True):
+                if self.recording_scheduler:
+                    scheduler, self.recording_scheduler = self.recording_scheduler, None
+                    scheduler.stop()
+            elif not self.recording_scheduler:
+                self.recording_scheduler = self.create_recording_scheduler()
+                self.recording_scheduler.start()
+            else:
+                self.recording_scheduler.max_length = self.config.get('recording_max_length', 120)
+
+        elif subsystem == 'plate_filter' and self.handles_detection:
+            old_filter = self.plate_filter
+            self.plate_filter = self.create_plate_filter()
+            if old_filter and self.plate_filter:
+                self.plate_filter.stats = old_filter.stats
+
+        elif subsystem == 'governor':
+            if not self.config.get('enable_governor', True):
+                if self.governor:
+                    self.governor.stop()
+                    self.governor = None
+            elif not self.governor:
+                self.governor = self.create_governor()
+                self.governor.start()
+            else:
+                self.governor.temp_levels = list(self.config.get('governor_temp_levels', [70, 78, 85]))
+                self.governor.cpu_levels = list(self.config.get('governor_cpu_levels', [85, 93, 98]))
+                self.governor.temp_hysteresis = self.config.get('governor_temp_hysteresis', 5)
+                self.governor.cpu_hysteresis = self.config.get('governor_cpu_hysteresis', 15)
+                self.governor.min_dwell = self.config.get('governor_min_dwell', 30)
+
+        elif subsystem == 'logging' and self.log_pipeline:
+            from pod_logging import parse_level
+            try:
+                self.log_pipeline.set_level(parse_level(self.config.get('log_level', 'INFO')))
+            except ValueError as e:
+                logger.error(str(e))
+            self.log_pipeline.sampler.interval = self.config.get('log_sample_interval', 60)
+
+        elif subsystem == 'heartbeat' and self.heartbeat:
+            if 'heartbeat_protocol' in changed or 'heartbeat_compress_min_bytes' in changed:
+                self.heartbeat = self.create_heartbeat_encoder()
+            else:
+                self.heartbeat.set_intervals(
+                    self.config.get('heartbeat_interval', 60),
+                    self.config.get('heartbeat_min_interval', 15),
+                    self.config.get('heartbeat_max_interval', 600)
+                )
+
+        elif subsystem == 'portal':
+            self.portal_client.configure(
+                budgets=self.config.get('portal_budgets'),
+                hedging=self.config.get('portal_hedging', True),
+                hedge_min_delay=self.config.get('portal_hedge_min_delay', 0.1),
+                breaker_failures=self.config.get('portal_breaker_failures', 3),
+                breaker_cooldown=self.config.get('portal_breaker_cooldown', 30)
+            )
+
+        elif subsystem == 'snapshots' and self.snapshot_store:
+            from pod_snapshots import FULL, VARIANTS
+            variants = self.config.get('snapshot_variants')
+            self.snapshot_store.variants = dict(VARIANTS if variants is None else variants)
+            self.snapshot_store.sizes = list(self.snapshot_store.variants) + [FULL]
+            self.snapshot_store.max_bytes = self.config.get('snapshot_max_mb', 500) * 1024 * 1024
+
+        elif subsystem == 'children':
+            self.children.configure(self.config.get('child_classes'), self.config.get('child_priorities', True))
+            self.children.sample_interval = self.config.get('child_sample_interval', 2)
+
+        elif subsystem == 'traffic' and self.traffic:
+            self.traffic.top_n = self.config.get('traffic_top_n', 10)
+
+        elif subsystem == 'history' and self.detection_history:
+            self.detection_history.retention_days = self.config.get('history_retention_days', 90)
+
+        elif subsystem == 'whitelist' and self.handles_detection:
+            if self.config.get('community_id'):
+                self.community_id = self.config['community_id']
+                self.refresh_whitelist_in_background()
+
+    def check_portal_config(self):
+        try:
+            result = fetch_portal_config(
+                self.config['portal_url'],
+                self.config['pod_id'],
+                self.config['pod_api_key']
+            )
+        except Exception as e:
+            logger.debug(f"Portal config check failed: {e}")
+            return
+
+        if not result:
+            return
+
+        version, overrides = result
+        if version <= self.config_stats['version']:
+            return
+
+        if self.reload_config(f"portal version {version}", overrides):
+            self.config_stats['version'] = version
+
+    def set_whitelist(self, cache: Dict[str, Any]):
+        index = {}
+        for plate, entry in cache.items():
+            # First entry wins, as the linear scan used to
+            index.setdefault(normalize_plate(plate), entry)
+        self.whitelist_cache = cache
+        self.whitelist_index = index
+
     def load_whitelist_cache(self):
         if self.cache_path.exists():
             try:
+                mtime = self.cache_path.stat().st_mtime
                 with open(self.cache_path, 'r') as f:
                     cache_data = json.load(f)
-                    self.whitelist_cache = {
+                # Portal format ({access_list: [{license_plate}]}); older caches used {entries: [{plate}]}
+                if 'access_list' in cache_data:
+                    self.set_whitelist({
+                        item['license_plate']: item
+                        for item in cache_data['access_list']
+                        if item.get('is_active', True)
+                    })
+                else:
+                    self.set_whitelist({
                         item['plate']: item
                         for item in cache_data.get('entries', [])
-                    }
+                    })
+                self.cache_mtime = mtime
                 logger.info(f"Loaded {len(self.whitelist_cache)} plates from cache")
             except Exception as e:
                 logger.error(f"Error loading whitelist cache: {e}")
 
+    def reload_whitelist_cache_if_changed(self):
+        """Media process: pick up the cache the detection process last wrote"""
+        try:
+            mtime = self.cache_path.stat().st_mtime
+        except OSError:
+            return
+        if mtime != self.cache_mtime:
+            self.load_whitelist_cache()
+
     def save_whitelist_cache(self, data):
         try:
             with open(self.cache_path, 'w') as f:
@@ -151,33 +803,43 @@ class CompletePodAgent:
         except Exception as e:
             logger.error(f"Error saving whitelist cache: {e}")
 
+    def apply_access_list(self, access_list: list, source: str):
+        self.set_whitelist({
+            entry['license_plate']: entry
+            for entry in access_list
+            if entry.get('is_active', True)
+        })
+        self.save_whitelist_cache({'access_list': access_list})
+        self.last_whitelist_refresh = datetime.now().isoformat()
+        logger.info(f"Whitelist refreshed from {source}: {len(self.whitelist_cache)} plates",
+                    extra={'sample': f'whitelist-{source}'})
+
     async def refresh_whitelist(self) -> bool:
         try:
             if not self.community_id:
                 logger.warning("No community_id available yet, skipping whitelist refresh")
                 return False
 
+            if self.peer_group:
+                self.peer_group.community_id = self.community_id
+                # Followers take the leader's copy; the portal is the fallback
+                if self.peer_group.sync_from_leader():
+                    return True
+
             url = f"{self.config['portal_url']}/api/access/list/{self.community_id}"
             headers = {
                 'Authorization': f"Bearer {self.config['pod_api_key']}",
                 'Content-Type': 'application/json'
             }
 
-            logger.info("Fetching whitelist from portal...")
-            response = requests.get(url, headers=headers, timeout=10)
+            logger.info("Fetching whitelist from portal...", extra={'sample': 'whitelist-fetch'})
+            response = self.portal_client.request('access_list', 'GET', url, headers=headers)
 
             if response.status_code == 200:
-                data = response.json()
-                access_list = data.get('access_list', [])
-
-                self.whitelist_cache = {
-                    entry['license_plate']: entry
-                    for entry in access_list
-                    if entry.get('is_active', True)
-                }
-
-                self.save_whitelist_cache(data)
-                logger.info(f"Whitelist refreshed: {len(self.whitelist_cache)} plates")
+                access_list = response.json().get('access_list', [])
+                self.apply_access_list(access_list, 'portal')
+                if self.peer_group:
+                    self.peer_group.publish(access_list)
                 return True
             else:
                 logger.error(f"Failed to fetch whitelist: HTTP {response.status_code}")
@@ -187,17 +849,34 @@ class CompletePodAgent:
             logger.error(f"Error refreshing whitelist: {e}")
             return False
 
-    def is_plate_whitelisted(self, plate: str) -> bool:
-        plate_normalized = plate.upper().replace(' ', '').replace('-', '')
+    def refresh_whitelist_in_background(self):
+        """Refresh without holding up the caller; the cached whitelist serves meanwhile"""
+        if not self.whitelist_refresh_lock.acquire(blocking=False):
+            return
 
-        for cached_plate in self.whitelist_cache.keys():
-            cached_normalized = cached_plate.upper().replace(' ', '').replace('-', '')
-            if cached_normalized == plate_normalized:
-                return True
+        def refresh():
+            try:
+                asyncio.run(self.refresh_whitelist())
+            finally:
+                self.whitelist_refresh_lock.release()
 
-        return False
+        threading.Thread(target=refresh, name='whitelist-refresh', daemon=True).start()
 
-    async def send_detection(self, plate: str, confidence: float = 0.95) -> dict:
+    def is_plate_whitelisted(self, plate: str) -> bool:
+        return normalize_plate(plate) in self.whitelist_index
+
+    def check_plates(self, plates: List[str]) -> List[Dict[str, Any]]:
+        """Whitelist decision and matching entry for each plate, in order"""
+        index = self.whitelist_index
+        results = []
+        for plate in plates:
+            entry = index.get(normalize_plate(plate))
+            results.append({'plate': plate, 'allowed': entry is not None, 'entry': entry})
+        return results
+
+    async def send_detection(self, plate: str, confidence: float = 0.95,
+                             event_time: Optional[float] = None, backfill: bool = False,
+                             event_id: str = '') -> dict:
         try:
             url = f"{self.config['portal_url']}/api/pod/detect"
             headers = {
@@ -212,128 +891,309 @@ class CompletePodAgent:
                 'pod_name': self.config['pod_id']
             }
 
-            logger.info(f"Sending detection to portal: {plate}")
-            response = requests.post(url, headers=headers, json=payload, timeout=10)
+            if backfill:
+                payload['backfill'] = True
+                payload['confidence'] = confidence
+                if event_time:
+                    payload['timestamp'] = datetime.fromtimestamp(event_time, timezone.utc).isoformat()
+
+            started = time.monotonic()
+            try:
+                # Hedged: a slow portal gets a second copy of the request racing the first
+                response = self.portal_client.request('detect', 'POST', url, hedge=not backfill,
+                                                      headers=headers, json=payload)
+            except PortalUnavailable as e:
+                if backfill:
+                    raise
+                return self.local_decision(plate, event_id, str(e), started, sent=not isinstance(e, CircuitOpen))
 
             if response.status_code == 200:
                 result = response.json()
                 action = result.get('action', 'unknown')
                 gate_opened = result.get('gate_opened', False)
 
-                logger.info(f"Portal response: action={action}, gate_opened={gate_opened}")
-
-                if gate_opened:
-                    logger.info(f"✓ GATE OPENED for plate: {plate}")
+                # One line per decision, with the context as fields for the JSON log
+                context = {
+                    'event_id': event_id or None,
+                    'plate': plate,
+                    'action': action,
+                    'gate_opened': gate_opened,
+                    'latency_ms': round((time.monotonic() - started) * 1000, 1)
+                }
+                if backfill:
+                    logger.info(f"Backfilled plate: {plate} (action={action})", extra=context)
+                elif gate_opened:
+                    logger.info(f"✓ GATE OPENED for plate: {plate}", extra=context)
                 else:
-                    logger.info(f"✗ Access denied for plate: {plate}")
+                    logger.info(f"✗ Access denied for plate: {plate} (action={action})", extra=context)
 
                 return result
             else:
-                logger.error(f"Failed to send detection: HTTP {response.status_code}")
+                logger.error(f"Failed to send detection: HTTP {response.status_code}",
+                             extra={'event_id': event_id or None, 'plate': plate})
+                if response.status_code >= 500:
+                    if backfill:
+                        raise PortalUnavailable(f"detect: HTTP {response.status_code}")
+                    return self.local_decision(plate, event_id, f"HTTP {response.status_code}", started)
                 return {'success': False, 'action': 'deny'}
 
         except Exception as e:
+            if backfill:
+                # No decision; backfill_missed_events stops and replays this event later
+                raise
             logger.error(f"Error sending detection: {e}")
             return {'success': False, 'action': 'deny'}
 
-    def start_ffmpeg_stream(self):
+    def local_decision(self, plate: str, event_id: str, reason: str, started: float,
+                       sent: bool = True) -> dict:
+        """Whitelist decision when the portal can't give one within its budget.
+
+        `sent` means the request went out: the portal may still decide and open
+        the gate after the budget has run out (its Gatewise call alone can take
+        10 s), so the outcome is recorded as unknown rather than as a deny.
+        """
+        if self.config.get('portal_fallback', 'local') != 'local':
+            result = {'success': False, 'action': 'deny'}
+        else:
+            allowed = self.is_plate_whitelisted(plate)
+            action = 'allow' if allowed else 'deny'
+            self.fallback_stats['local_allow' if allowed else 'local_deny'] += 1
+            self.fallback_stats['last_reason'] = reason
+
+            logger.warning(f"Portal unavailable ({reason}), local whitelist decision for {plate}: {action}"
+                           f"{' (portal outcome unknown)' if sent else ''}",
+                           extra={'event_id': event_id or None, 'plate': plate, 'action': action,
+                                  'latency_ms': round((time.monotonic() - started) * 1000, 1)})
+            # The pod has no gate output of its own; the portal opens gates
+            result = {'success': False, 'action': action, 'gate_opened': False, 'decided_by': 'local'}
+
+        if sent:
+            self.fallback_stats['unknown'] += 1
+            result['outcome'] = 'unknown'
+        return result
+
+    def get_stream_info(self, rtsp_url: str, blocking: bool = True) -> Optional[Dict[str, Any]]:
+        if not self.media_probe:
+            return None
+        if blocking:
+            return self.media_probe.get(rtsp_url)
+        return self.media_probe.peek(rtsp_url)
+
+    def start_ffmpeg_stream(self, fast_start: bool = False):
+        with self.stream_lock:
+            self._start_ffmpeg_stream(fast_start)
+
+    def _start_ffmpeg_stream(self, fast_start: bool):
         if self.ffmpeg_process and self.ffmpeg_process.poll() is None:
             return
 
+        from pod_media import hls_codec_args, hls_segment_seconds
+
         rtsp_url = self.config.get('camera_rtsp_url')
         if not rtsp_url:
             logger.warning("No RTSP URL configured, streaming disabled")
             return
 
+        if self.ffmpeg_process and self.ffmpeg_process.returncode and self.media_probe:
+            # Last pipeline died on its own; the camera may have changed format
+            self.media_probe.refresh_async(rtsp_url, refresh=True)
+
+        # A waiting viewer should not sit through ffprobe; use whatever is cached
+        info = self.get_stream_info(rtsp_url, blocking=not fast_start)
+        segment_seconds = hls_segment_seconds(info, self.config.get('hls_segment_seconds', 2))
+
         output_file = os.path.join(self.hls_output_dir, 'stream.m3u8')
 
-        cmd = [
-            'ffmpeg',
-            '-rtsp_transport', 'tcp',
-            '-i', rtsp_url,
-            '-c:v', 'copy',
-            '-c:a', 'aac',
+        # Never serve a playlist left over from a previous run
+        for filename in os.listdir(self.hls_output_dir):
+            if filename.endswith(('.m3u8', '.ts')):
+                try:
+                    os.remove(os.path.join(self.hls_output_dir, filename))
+                except OSError:
+                    pass
+
+        cmd = ['ffmpeg']
+
+        if fast_start:
+            # Viewer is waiting: skip input buffering and long stream probing
+            cmd += ['-fflags', 'nobuffer', '-probesize', '500000', '-analyzeduration', '500000']
+
+        cmd += ['-rtsp_transport', 'tcp', '-i', rtsp_url]
+        cmd += hls_codec_args(info, segment_seconds, reduced=bool(self.governor and self.governor.reduce_stream))
+        cmd += [
             '-f', 'hls',
-            '-hls_time', '2',
+            '-hls_time', str(segment_seconds),
             '-hls_list_size', '5',
             '-hls_flags', 'delete_segments',
             '-hls_segment_filename', os.path.join(self.hls_output_dir, 'segment_%03d.ts'),
-            output_file
         ]
 
+        if fast_start:
+            # Publish the playlist after the first keyframe-bounded second
+            cmd += ['-hls_init_time', '1']
+
+        cmd.append(output_file)
+
         logger.info(f"Starting stream: {rtsp_url} -> HLS")
 
         try:
-            self.ffmpeg_process = subprocess.Popen(
+            # Nothing reads ffmpeg's output; a pipe would fill with progress
+            # lines and block the encoder after a few minutes
+            self.ffmpeg_process = self.children.popen(
+                'streaming',
                 cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
             )
             logger.info("Stream started successfully")
         except Exception as e:
             logger.error(f"Failed to start stream: {e}")
 
-    def validate_stream_token(self, token: str) -> bool:
-        try:
-            parts = token.split('.')
-            if len(parts) != 2:
-                return False
+    def stop_ffmpeg_stream(self):
+        with self.stream_lock:
+            if not self.ffmpeg_process:
+                return
 
-            import base64
-            payload_b64, signature = parts
-            payload_json = base64.b64decode(payload_b64).decode('utf-8')
-            payload = json.loads(payload_json)
+            if self.ffmpeg_process.poll() is None:
+                self.ffmpeg_process.terminate()
+                try:
+                    self.ffmpeg_process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.ffmpeg_process.kill()
+                    self.ffmpeg_process.wait()
 
-            secret = self.config.get('stream_secret', 'default-secret')
-            expected_data = payload_json + secret
-            expected_hash = hashlib.sha256(expected_data.encode()).hexdigest()
+            self.ffmpeg_process = None
+        logger.info("Stream stopped")
 
-            if signature != expected_hash:
-                return False
+    def restart_ffmpeg_stream(self, fast_start: bool = False):
+        with self.stream_lock:
+            self.stop_ffmpeg_stream()
+            self.start_ffmpeg_stream(fast_start=fast_start)
 
-            if payload.get('exp', 0) < time.time():
+    def wait_for_playlist(self, timeout: float, playlist_path: Optional[str] = None) -> bool:
+        playlist_path = playlist_path or os.path.join(self.hls_output_dir, 'stream.m3u8')
+        deadline = time.time() + timeout
+
+        while not os.path.exists(playlist_path):
+            if time.time() >= deadline:
                 return False
+            time.sleep(0.1)
 
-            return True
-        except Exception as e:
-            logger.error(f"Token validation error: {e}")
-            return False
+        return True
 
-    def record_clip(self, duration: int = 30) -> Optional[str]:
-        rtsp_url = self.config.get('camera_rtsp_url')
-        if not rtsp_url:
-            return None
+    def validate_stream_token(self, token: str) -> bool:
+        return self.stream_auth.validate_token(token)
+
+    def render_playlist(self, playlist_path: str, session: str, prefix: str = 'stream/segment/') -> str:
+        """Point segment URIs at the segment route with the viewer's session attached"""
+        with open(playlist_path, 'r') as f:
+            lines = f.read().splitlines()
+
+        rendered = []
+        for line in lines:
+            if line and not line.startswith('#'):
+                line = f"{prefix}{os.path.basename(line)}?session={session}"
+            rendered.append(line)
 
+        return '\n'.join(rendered) + '\n'
+
+    def new_recording_path(self) -> str:
         recordings_dir = self.config.get('recordings_dir', '/tmp/recordings')
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         output_file = os.path.join(recordings_dir, f'recording_{timestamp}.mp4')
 
+        suffix = 1
+        while os.path.exists(output_file):
+            output_file = os.path.join(recordings_dir, f'recording_{timestamp}_{suffix}.mp4')
+            suffix += 1
+
+        return output_file
+
+    def build_clip_command(self, rtsp_url: str, duration: float, output_file: str) -> list:
+        from pod_media import clip_codec_args
+        from pod_vod import FRAGMENTED_MP4_FLAGS
+
+        # Runs under the recording scheduler's lock on the MQTT thread: never wait
+        # on ffprobe here. Without cached info the clip is stream-copied as is.
+        info = self.get_stream_info(rtsp_url, blocking=False)
+        if self.media_probe:
+            self.media_probe.refresh_async(rtsp_url)
+
         cmd = [
             'ffmpeg',
             '-rtsp_transport', 'tcp',
             '-i', rtsp_url,
             '-t', str(duration),
-            '-c', 'copy',
-            '-y',
-            output_file
         ]
+        cmd += clip_codec_args(info)
+        # Fragment at every keyframe so the clip can be served as byte-range HLS
+        cmd += FRAGMENTED_MP4_FLAGS
+        cmd += ['-y', output_file]
+        return cmd
+
+    def start_clip_recording(self, max_duration: float):
+        """Start an open-ended recording for the scheduler; it stops ffmpeg when the window closes"""
+        rtsp_url = self.config.get('camera_rtsp_url')
+        if not rtsp_url:
+            return None, None
+
+        output_file = self.new_recording_path()
+        cmd = self.build_clip_command(rtsp_url, max_duration, output_file)
+
+        logger.info("Recording clip...")
+
+        try:
+            process = self.children.popen(
+                'recording',
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+            return process, output_file
+        except Exception as e:
+            logger.error(f"Recording error: {e}")
+            return None, None
+
+    def finish_clip_recording(self, window, duration: float):
+        asyncio.run(self.register_recording(
+            window.output_file,
+            window.plates[0] if window.plates else None,
+            snapshot_path=window.snapshots[0] if window.snapshots else None,
+            duration=duration,
+            plates=window.plates,
+            event_ids=window.event_ids
+        ))
+
+    def record_clip(self, duration: int = 30) -> Optional[str]:
+        rtsp_url = self.config.get('camera_rtsp_url')
+        if not rtsp_url:
+            return None
+
+        output_file = self.new_recording_path()
+        cmd = self.build_clip_command(rtsp_url, duration, output_file)
 
         logger.info(f"Recording {duration}s clip...")
 
         try:
-            result = subprocess.run(cmd, capture_output=True, timeout=duration + 10)
+            result = self.children.run('recording', cmd, capture_output=True, timeout=duration + 10)
 
             if result.returncode == 0 and os.path.exists(output_file):
                 logger.info(f"Clip saved: {output_file}")
                 return output_file
             else:
                 logger.error(f"Recording failed: {result.stderr}")
+                if self.media_probe:
+                    self.media_probe.invalidate(rtsp_url)
                 return None
         except Exception as e:
             logger.error(f"Recording error: {e}")
             return None
 
-    async def register_recording(self, file_path: str, plate_number: Optional[str] = None, snapshot_path: Optional[str] = None):
+    async def register_recording(self, file_path: str, plate_number: Optional[str] = None, snapshot_path: Optional[str] = None,
+                                 duration: Optional[float] = None, plates: Optional[list] = None,
+                                 event_ids: Optional[list] = None):
         try:
             filename = os.path.basename(file_path)
             camera_id = self.config['camera_id']
@@ -350,15 +1210,42 @@ class CompletePodAgent:
                 'camera_id': camera_id,
                 'file_path': file_path,
                 'file_size_bytes': file_size,
-                'duration_seconds': 30,
+                'duration_seconds': round(duration) if duration else self.config.get('recording_duration', 30),
                 'event_type': 'plate_detection' if plate_number else 'manual',
-                'plate_number': plate_number
+                'plate_number': plate_number,
+                'metadata': {}
             }
 
             if snapshot_path:
                 payload['thumbnail_path'] = snapshot_path
 
-            response = requests.post(
+            # Thumbnails come from the snapshot store at /thumbnail/<recording>?size=small
+            if self.snapshot_store and event_ids:
+                alias = os.path.splitext(filename)[0]
+                snapshot_event = next((e for e in event_ids if self.snapshot_store.link(alias, e)), None)
+                if snapshot_event:
+                    payload['metadata']['snapshot_event_id'] = snapshot_event
+
+            # Coalesced recordings cover every plate/event that asked for them
+            if plates:
+                payload['metadata']['plates'] = plates
+            if event_ids:
+                payload['metadata']['event_ids'] = event_ids
+
+            if self.upload_queue:
+                delete_after = self.config.get('delete_after_upload', False)
+                payload['metadata']['storage_key'] = self.storage_key(file_path)
+                payload['metadata']['upload_status'] = 'queued'
+                self.upload_queue.enqueue(file_path, self.storage_key(file_path), 'video/mp4', delete_after)
+
+                if snapshot_path:
+                    payload['metadata']['thumbnail_storage_key'] = self.storage_key(snapshot_path)
+                    # Store images can be shared by several events; the store prunes them itself
+                    self.upload_queue.enqueue(snapshot_path, self.storage_key(snapshot_path), 'image/jpeg',
+                                              delete_after and not self.snapshot_store)
+
+            response = self.portal_client.request(
+                'recordings', 'POST',
                 f"{self.config['portal_url']}/api/pod/recordings",
                 headers=headers,
                 json=payload
@@ -375,6 +1262,81 @@ class CompletePodAgent:
             logger.error(f"Registration error: {e}")
             return False
 
+    def detection_stats(self) -> Dict[str, Any]:
+        if not self.handles_detection:
+            return self.shared_state.read('detection') if self.shared_state else {}
+
+        return {
+            'backfill': self.backfill_stats,
+            'recording': self.recording_scheduler.get_stats() if self.recording_scheduler else None,
+            'uploads': self.upload_queue.get_stats() if self.upload_queue else None,
+            'whitelist': {
+                'plates': len(self.whitelist_cache),
+                'last_refresh': self.last_whitelist_refresh
+            },
+            'peers': self.peer_group.get_stats() if self.peer_group else None,
+            'history': self.detection_history.get_stats() if self.detection_history else None,
+            'plate_filter': self.plate_filter_stats(),
+            # Reads held back for review; /health only, not the heartbeat
+            'plate_quarantine': self.plate_filter.recent_quarantine()
+            if self.plate_filter and self.plate_filter.mode == 'quarantine' else None,
+            'snapshots': self.snapshot_store.get_stats() if self.snapshot_store else None,
+            'portal': {**self.portal_client.get_stats(), 'fallback': self.fallback_stats},
+            'traffic': self.traffic.summary() if self.traffic else None,
+            # Published for the media process; child_stats() merges both roles
+            'children': self.children.get_stats() if self.role == 'detection' else None
+        }
+
+    def plate_filter_stats(self) -> Optional[Dict[str, Any]]:
+        if not self.plate_filter:
+            return None
+
+        stats = self.plate_filter.get_stats()
+        dropped = stats['rejected'] + stats['quarantined']
+        # Upper bound: overlapping recordings would have been coalesced
+        stats['saved'] = {
+            'portal_calls': dropped,
+            'snapshots': dropped if self.config.get('save_snapshots', True) else 0,
+            'recording_seconds': dropped * self.config.get('recording_duration', 30)
+            if self.recording_scheduler else 0
+        }
+        return stats
+
+    def media_stats(self) -> Dict[str, Any]:
+        if not self.handles_media:
+            return self.shared_state.read('media') if self.shared_state else {}
+
+        return {
+            'streaming': self.ffmpeg_process is not None and self.ffmpeg_process.poll() is None,
+            'stream_lifecycle': self.stream_lifecycle.get_stats() if self.stream_lifecycle else None,
+            'stream_renditions': {
+                'low': {**self.low_rendition.get_stats(), 'lifecycle': self.low_lifecycle.get_stats()}
+            } if self.low_lifecycle else None,
+            'stream_auth': self.stream_auth.get_stats() if self.stream_auth else None,
+            'stream_push': self.relay_pusher.get_stats() if self.relay_pusher else None,
+            'children': self.children.get_stats() if self.role == 'media' else None
+        }
+
+    def child_stats(self) -> Dict[str, Any]:
+        """Per-class usage of this process's children and, under the supervisor, the other role's"""
+        stats = self.children.get_stats()
+        if self.shared_state:
+            other = (self.media_stats() if self.handles_detection else self.detection_stats()).get('children')
+            if other:
+                stats['classes'] = {**other.get('classes', {}), **stats['classes']}
+        return stats
+
+    def publish_state(self):
+        if not self.shared_state:
+            return
+        try:
+            if self.handles_detection:
+                self.shared_state.publish('detection', self.detection_stats())
+            if self.handles_media:
+                self.shared_state.publish('media', self.media_stats())
+        except Exception as e:
+            logger.error(f"Error publishing shared state: {e}")
+
     def list_local_recordings(self):
         recordings_dir = self.config.get('recordings_dir', '/tmp/recordings')
         recordings = []
@@ -393,6 +1355,18 @@ class CompletePodAgent:
 
         return recordings
 
+    def find_recording(self, recording_id: str) -> Optional[str]:
+        recordings_dir = self.config.get('recordings_dir', '/tmp/recordings')
+
+        for filename in os.listdir(recordings_dir):
+            if filename.endswith('.mp4'):
+                file_path = os.path.join(recordings_dir, filename)
+                if recording_id in filename or os.path.basename(file_path) == recording_id:
+                    if os.path.exists(file_path):
+                        return file_path
+
+        return None
+
     async def send_heartbeat(self):
         try:
             url = f"{self.config['portal_url']}/api/pod/heartbeat"
@@ -413,7 +1387,7 @@ class CompletePodAgent:
                                       capture_output=True, text=True, timeout=2)
                 if result.returncode == 0 and result.stdout.strip():
                     tailscale_ip = result.stdout.strip()
-                    logger.info(f"Tailscale IP detected: {tailscale_ip}")
+                    logger.info(f"Tailscale IP detected: {tailscale_ip}", extra={'sample': 'tailscale-ip'})
 
                     # Get Tailscale hostname and check for funnel
                     try:
@@ -428,7 +1402,8 @@ class CompletePodAgent:
                             tailnet = status_data.get('CurrentTailnet', {}).get('Name', '')
                             if tailscale_hostname and tailnet:
                                 tailscale_funnel_url = f"https://{tailscale_hostname}.{tailnet}.ts.net"
-                                logger.info(f"Tailscale Funnel URL: {tailscale_funnel_url}")
+                                logger.info(f"Tailscale Funnel URL: {tailscale_funnel_url}",
+                                            extra={'sample': 'tailscale-funnel'})
                     except:
                         pass
             except Exception as e:
@@ -479,15 +1454,77 @@ class CompletePodAgent:
             if tailscale_funnel_url:
                 payload['tailscale_funnel_url'] = tailscale_funnel_url
 
-            response = requests.post(url, headers=headers, json=payload, timeout=5)
+            media = self.media_stats()
+            if media.get('stream_lifecycle'):
+                payload['streaming'] = media['stream_lifecycle']
+            if media.get('stream_renditions'):
+                payload['stream_renditions'] = media['stream_renditions']
+            if media.get('stream_push'):
+                # Where the portal can send viewers instead of proxying to the pod
+                payload['stream_push'] = media['stream_push']
+
+            if self.recording_scheduler:
+                payload['recording'] = self.recording_scheduler.get_stats()
+
+            if self.peer_group:
+                payload['peers'] = self.peer_group.get_stats()
+
+            if self.plate_filter:
+                payload['plate_filter'] = self.plate_filter_stats()
+
+            if self.snapshot_store and self.handles_detection:
+                payload['snapshots'] = self.snapshot_store.get_stats()
+
+            if self.governor:
+                payload['governor'] = self.governor.get_stats()
+
+            if self.traffic:
+                payload['traffic'] = self.traffic.summary()
+
+            payload['children'] = self.child_stats()
+
+            if self.log_pipeline:
+                payload['logging'] = self.log_pipeline.get_stats()
+
+            payload['heartbeat'] = self.heartbeat.get_stats()
+            payload['portal'] = {**self.portal_client.get_stats(), 'fallback': self.fallback_stats}
+            payload['config'] = self.config_stats
+
+            if self.shared_state:
+                payload['processes'] = self.shared_state.read('supervisor').get('processes')
+
+            # Full JSON until the portal offers deltas; at most one immediate resend
+            # when it asks for full state
+            for attempt in range(2):
+                body, encoding_headers = self.heartbeat.encode(payload)
+                try:
+                    response = self.portal_client.request('heartbeat', 'POST', url,
+                                                          headers={**headers, **encoding_headers}, data=body)
+                except requests.RequestException:
+                    self.heartbeat.handle_error()
+                    raise
+                self.heartbeat.record_sent(len(body))
+
+                try:
+                    result = response.json()
+                except ValueError:
+                    result = {}
+                retry_after = response.headers.get('Retry-After')
+                resend = self.heartbeat.handle_response(
+                    response.status_code,
+                    result if isinstance(result, dict) else {},
+                    float(retry_after) if retry_after and retry_after.isdigit() else None
+                )
+                if not resend:
+                    break
 
             if response.status_code == 200:
-                result = response.json()
 
                 # Store community_id from response if not already set
                 if not self.community_id and 'community_id' in result:
                     self.community_id = result['community_id']
                     logger.info(f"Community ID obtained: {self.community_id}")
+                    self.refresh_whitelist_in_background()
 
                 logger.debug("Heartbeat sent")
                 return True
@@ -500,6 +1537,12 @@ class CompletePodAgent:
             return False
 
     def get_frigate_snapshot(self, event_id: str) -> Optional[str]:
+        if self.snapshot_store:
+            path = self.snapshot_store.ingest(event_id)
+            if path:
+                logger.info(f"Saved snapshot: {path}")
+            return path
+
         try:
             frigate_url = self.config.get('frigate_url', 'http://localhost:5000')
             snapshot_url = f"{frigate_url}/api/events/{event_id}/snapshot.jpg"
@@ -529,43 +1572,182 @@ class CompletePodAgent:
             topic = self.config.get('mqtt_topic', 'frigate/events')
             client.subscribe(topic)
             logger.info(f"Subscribed to: {topic}")
+
+            if self.config.get('enable_backfill', True):
+                threading.Thread(target=self.backfill_missed_events, name='backfill', daemon=True).start()
         else:
             logger.error(f"MQTT connection failed: {rc}")
 
+    def on_mqtt_disconnect(self, client, userdata, rc):
+        self.mqtt_disconnected_at = time.time()
+        self.event_journal.save(force=True)
+        if rc != 0:
+            logger.warning(f"Disconnected from MQTT broker ({rc}), reconnecting...")
+        else:
+            logger.info("Disconnected from MQTT broker")
+
+    def handle_plate_event(self, event: Dict[str, Any], backfill: bool = False):
+        event_id = event.get('id', '')
+        camera = event.get('camera', 'unknown')
+        plate, confidence = normalize_frigate_event(event)
+
+        min_confidence = self.config.get('min_confidence', 0.7)
+
+        if not plate or confidence < min_confidence:
+            return
+
+        if event_id and not self.event_journal.claim(event_id):
+            logger.debug(f"Skipping already handled event: {event_id}")
+            return
+
+        # Garbage reads stop here, before the portal call, snapshot and recording
+        if self.plate_filter:
+            normalized, plausible = self.plate_filter.check(plate, event_id, camera)
+            if not plausible:
+                if self.plate_filter.mode == 'quarantine' and self.detection_history:
+                    self.detection_history.record(
+                        normalized or plate, ts=event.get('start_time'), camera=camera, action='quarantine',
+                        confidence=confidence, backfill=backfill, event_id=event_id
+                    )
+                self.event_journal.complete(event.get('start_time'))
+                return
+
+        logger.info(f"[{camera}] Plate detected: {plate} ({confidence:.2%}){' [backfill]' if backfill else ''}",
+                    extra={'event_id': event_id or None, 'camera': camera, 'plate': plate,
+                           'confidence': round(confidence, 3), 'backfill': backfill or None})
+
+        # Decide first; the snapshot is only needed for the recording
+        started = time.monotonic()
+        try:
+            result = asyncio.run(self.send_detection(plate, confidence, event.get('start_time'), backfill, event_id))
+        except Exception:
+            # Only a backfill gets here, with no answer from the portal
+            if event_id:
+                self.event_journal.release(event_id)
+            raise
+        decision_latency = time.monotonic() - started
+        self.event_journal.complete(event.get('start_time'))
+
+        action = (result or {}).get('action')
+        if (result or {}).get('outcome') == 'unknown':
+            # Whatever the local whitelist said, the portal may have opened the gate
+            action = 'unknown'
+
+        if self.detection_history:
+            self.detection_history.record(
+                plate,
+                ts=event.get('start_time'),
+                camera=camera,
+                action=action,
+                gate_opened=(result or {}).get('gate_opened', False),
+                confidence=confidence,
+                backfill=backfill,
+                event_id=event_id
+            )
+
+        if self.traffic:
+            self.traffic.record(
+                normalize_plate(plate),
+                ts=event.get('start_time'),
+                camera=camera,
+                action=action,
+                # A backfilled decision's latency says nothing about the gate
+                latency=None if backfill else decision_latency,
+                local=(result or {}).get('decided_by') == 'local'
+            )
+
+        snapshot_path = None
+        if self.config.get('save_snapshots', True) and event_id and \
+                (not self.governor or self.governor.allows('snapshots')):
+            snapshot_path = self.get_frigate_snapshot(event_id)
+
+        # A clip recorded now would not show a car that passed during the outage
+        if self.recording_scheduler and not backfill and \
+                (not self.governor or self.governor.allows('recording')):
+            self.recording_scheduler.request(
+                self.config.get('recording_duration', 30),
+                plate=plate,
+                event_id=event_id,
+                snapshot_path=snapshot_path
+            )
+
+    def backfill_missed_events(self):
+        if not self.backfill_lock.acquire(blocking=False):
+            return
+
+        try:
+            # A backfill that stopped part way resumes where it stopped, even if
+            # live events have moved last_event_time on since
+            since = self.event_journal.backfill_since or self.event_journal.last_event_time
+            if since is None:
+                logger.info("No event journal yet, nothing to backfill")
+                return
+
+            max_age = self.config.get('backfill_max_age', 21600)
+            since = max(since, time.time() - max_age)
+
+            frigate_url = self.config.get('frigate_url', 'http://localhost:5000')
+            # Bounded rate so a long outage doesn't swamp the portal
+            interval = 1.0 / max(0.1, self.config.get('backfill_rate', 2.0))
+            self.backfill_stats['runs'] += 1
+            self.backfill_stats['last_run'] = datetime.now().isoformat()
+
+            # A gap longer than backfill_max_events is replayed a batch at a time, oldest first
+            while True:
+                events, truncated = fetch_events_since(
+                    frigate_url,
+                    since,
+                    max_events=self.config.get('backfill_max_events', 500)
+                )
+                missed = [e for e in events if e.get('id') and not self.event_journal.has_seen(e['id'])]
+
+                if missed:
+                    logger.info(f"Backfill: replaying {len(missed)} missed events since "
+                                f"{datetime.fromtimestamp(since).isoformat()}")
+                    self.event_journal.set_backfill_since(since)
+
+                for event in missed:
+                    started = time.time()
+                    try:
+                        self.handle_plate_event(event, backfill=True)
+                    except Exception as e:
+                        # Everything from here on is still missed; try again later
+                        self.backfill_stats['last_error'] = str(e)
+                        retry = self.config.get('backfill_retry_interval', 60)
+                        logger.warning(f"Backfill stopped at {event['id']} ({e}); retrying in {retry}s")
+                        timer = threading.Timer(retry, self.backfill_missed_events)
+                        timer.daemon = True
+                        timer.start()
+                        return
+                    self.backfill_stats['events'] += 1
+                    time.sleep(max(0.0, interval - (time.time() - started)))
+
+                # Events sharing the newest start time come back and are skipped as seen
+                resume = (events[-1].get('start_time', since) if events else since) - 0.001
+                if not truncated or resume <= since:
+                    break
+                since = resume
+                self.event_journal.set_backfill_since(since)
+
+            self.event_journal.set_backfill_since(None)
+            logger.info("Backfill complete")
+
+        except Exception as e:
+            self.backfill_stats['last_error'] = str(e)
+            logger.error(f"Backfill error: {e}")
+        finally:
+            self.backfill_lock.release()
+
     def on_mqtt_message(self, client, userdata, msg):
         try:
             payload = json.loads(msg.payload.decode())
 
             if payload.get('type') == 'new' and 'after' in payload:
                 event = payload['after']
-                event_id = event.get('id', '')
                 label = event.get('label', '')
-                camera = event.get('camera', 'unknown')
 
                 if label.lower() == 'license_plate':
-                    plate = event.get('sub_label', '')
-                    confidence = event.get('score', 0.0)
-
-                    min_confidence = self.config.get('min_confidence', 0.7)
-
-                    if plate and confidence >= min_confidence:
-                        logger.info(f"[{camera}] Plate detected: {plate} ({confidence:.2%})")
-
-                        snapshot_path = None
-                        if self.config.get('save_snapshots', True) and event_id:
-                            snapshot_path = self.get_frigate_snapshot(event_id)
-
-                        asyncio.run(self.send_detection(plate, confidence))
-
-                        if self.config.get('record_on_detection', True):
-                            logger.info("Recording clip...")
-                            clip_path = self.record_clip(duration=30)
-                            if clip_path:
-                                asyncio.run(self.register_recording(
-                                    clip_path,
-                                    plate,
-                                    snapshot_path=snapshot_path
-                                ))
+                    self.handle_plate_event(event)
 
             elif payload.get('type') == 'end' and 'before' in payload:
                 event = payload['before']
@@ -581,58 +1763,164 @@ class CompletePodAgent:
         logger.info(f"Portal: {self.config['portal_url']}")
         logger.info(f"Pod ID: {self.config['pod_id']}")
         logger.info(f"Camera ID: {self.config['camera_id']}")
+        if self.role != 'all':
+            logger.info(f"Role: {self.role}")
         logger.info("=" * 60)
 
-        await self.refresh_whitelist()
+        if self.governor:
+            self.governor.start()
+        self.children.start()
 
-        if self.config.get('enable_streaming', True):
-            self.start_ffmpeg_stream()
+        if self.role == 'media':
+            # On a small pod, viewers should lose out to plate decisions, not the other way round
+            try:
+                os.nice(self.config.get('media_process_nice', 10))
+            except OSError as e:
+                logger.warning(f"Could not lower media process priority: {e}")
+
+        if self.handles_detection:
+            # Listen for plates straight away; decisions don't need the portal
+            # refresh, the cached whitelist covers until it lands
+            if self.config.get('enable_mqtt', True):
+                self.start_mqtt()
+            if self.peer_group:
+                self.peer_group.community_id = self.community_id
+                self.peer_group.start()
+            self.refresh_whitelist_in_background()
+
+            if self.upload_queue:
+                self.upload_queue.start()
+
+            if self.recording_scheduler:
+                self.recording_scheduler.start()
+
+            if self.detection_history:
+                self.detection_history.start()
+
+        if self.media_probe and self.config.get('camera_rtsp_url'):
+            # Warm the probe cache so the first viewer gets a tuned pipeline
+            self.media_probe.refresh_async(self.config['camera_rtsp_url'])
+
+        if self.handles_media and self.config.get('enable_streaming', True):
+            if self.stream_lifecycle:
+                self.stream_lifecycle.start_monitor()
+            else:
+                self.start_ffmpeg_stream()
+            if self.low_lifecycle:
+                self.low_lifecycle.start_monitor()
+            if self.relay_pusher:
+                self.relay_pusher.start()
             threading.Thread(target=self.run_stream_server, daemon=True).start()
 
-        if self.config.get('enable_mqtt', True):
-            mqtt_host = self.config.get('mqtt_host', 'localhost')
-            mqtt_port = self.config.get('mqtt_port', 1883)
-
-            self.mqtt_client = mqtt.Client()
-            self.mqtt_client.on_connect = self.on_mqtt_connect
-            self.mqtt_client.on_message = self.on_mqtt_message
-
-            logger.info(f"Connecting to MQTT: {mqtt_host}:{mqtt_port}")
-            self.mqtt_client.connect(mqtt_host, mqtt_port, 60)
-            self.mqtt_client.loop_start()
-
-        refresh_interval = self.config.get('whitelist_refresh_interval', 300)
-        heartbeat_interval = self.config.get('heartbeat_interval', 60)
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self.reload_requested.set)
+        except (NotImplementedError, RuntimeError, ValueError, AttributeError):
+            # Not the main thread (e.g. embedded in a benchmark); file and portal checks still run
+            pass
 
         last_heartbeat = 0
-        last_refresh = 0
+        last_refresh = time.time()
+        last_config_check = time.time()
+        last_config_poll = 0
 
         try:
             while True:
                 current_time = time.time()
+                # Read every pass so reloaded intervals apply without a restart
+                refresh_interval = self.config.get('whitelist_refresh_interval', 300)
+                # Adapted to the portal's hints and failures when detection runs here
+                heartbeat_interval = self.heartbeat.interval if self.heartbeat else self.config.get('heartbeat_interval', 60)
+                config_poll_interval = self.config.get('config_poll_interval', 300)
+
+                if self.reload_requested.is_set():
+                    self.reload_requested.clear()
+                    self.reload_config('SIGHUP')
+
+                if self.config.get('config_watch', True) and current_time - last_config_check >= 5:
+                    last_config_check = current_time
+                    if self.config_watcher.changed():
+                        self.reload_config('file changed')
+
+                if config_poll_interval and current_time - last_config_poll >= config_poll_interval:
+                    last_config_poll = current_time
+                    self.check_portal_config()
+
+                if self.handles_detection:
+                    if current_time - last_heartbeat >= heartbeat_interval:
+                        await self.send_heartbeat()
+                        last_heartbeat = current_time
 
-                if current_time - last_heartbeat >= heartbeat_interval:
-                    await self.send_heartbeat()
-                    last_heartbeat = current_time
+                    if current_time - last_refresh >= refresh_interval:
+                        self.refresh_whitelist_in_background()
+                        last_refresh = current_time
 
-                if current_time - last_refresh >= refresh_interval:
-                    await self.refresh_whitelist()
-                    last_refresh = current_time
+                self.publish_state()
 
                 await asyncio.sleep(1)
 
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, asyncio.CancelledError):
             logger.info("Shutting down...")
             if self.mqtt_client:
                 self.mqtt_client.loop_stop()
                 self.mqtt_client.disconnect()
-            if self.ffmpeg_process:
-                self.ffmpeg_process.terminate()
+            if self.stream_lifecycle:
+                self.stream_lifecycle.stop_monitor()
+            if self.low_lifecycle:
+                self.low_lifecycle.stop_monitor()
+            if self.relay_pusher:
+                self.relay_pusher.stop()
+            self.stop_ffmpeg_stream()
+            if self.recording_scheduler:
+                # Finishing a clip registers it with asyncio.run(), which can't
+                # nest inside this loop
+                await asyncio.get_running_loop().run_in_executor(None, self.recording_scheduler.stop)
+            if self.upload_queue:
+                self.upload_queue.stop()
+            if self.peer_group:
+                self.peer_group.stop()
+            if self.detection_history and self.handles_detection:
+                self.detection_history.stop()
+            if self.snapshot_store:
+                self.snapshot_store.stop()
+            if self.governor:
+                self.governor.stop()
+            self.children.stop()
+            self.portal_client.stop()
+            self.event_journal.save(force=True)
             logger.info("Agent stopped")
 
+    def start_mqtt(self):
+        import paho.mqtt.client as mqtt
+
+        mqtt_host = self.config.get('mqtt_host', 'localhost')
+        mqtt_port = self.config.get('mqtt_port', 1883)
+
+        self.mqtt_client = mqtt.Client()
+        self.mqtt_client.on_connect = self.on_mqtt_connect
+        self.mqtt_client.on_message = self.on_mqtt_message
+        self.mqtt_client.on_disconnect = self.on_mqtt_disconnect
+        self.mqtt_client.reconnect_delay_set(min_delay=1, max_delay=60)
+
+        logger.info(f"Connecting to MQTT: {mqtt_host}:{mqtt_port}")
+        # Connect from the network thread so a broker that is still booting
+        # doesn't hold up (or kill) the agent; paho keeps retrying
+        self.mqtt_client.connect_async(mqtt_host, mqtt_port, 60)
+        self.mqtt_client.loop_start()
+
+    def stream_viewer_id(self, session: Optional[str]) -> str:
+        """One ID per viewer, from their stream session; several viewers can share an address (the portal proxy)"""
+        if session:
+            return self.stream_auth.session_viewer(session)
+        from flask import request
+        return f"{request.remote_addr}|{request.headers.get('User-Agent', '')}"
+
     def run_stream_server(self):
-        @app.route('/stream')
-        def stream():
+        global app
+        from flask import Flask, Response, request, jsonify, send_file
+
+        app = Flask(__name__)
+
+        def serve_playlist(playlist_path: str, lifecycle, prefix: str, work_class: str = 'streaming'):
             token = request.args.get('token')
 
             if not token:
@@ -641,22 +1929,128 @@ class CompletePodAgent:
             if not self.validate_stream_token(token):
                 return jsonify({'error': 'Invalid token'}), 403
 
-            playlist_path = os.path.join(self.hls_output_dir, 'stream.m3u8')
+            if self.governor and not self.governor.allows(work_class):
+                response = jsonify({'error': 'Pod overloaded, stream paused'})
+                response.headers['Retry-After'] = '60'
+                return response, 503
+
+            session = self.stream_auth.issue_session(token)
+
+            if lifecycle:
+                lifecycle.touch(self.stream_viewer_id(session))
+                self.wait_for_playlist(self.config.get('stream_start_timeout', 8), playlist_path)
 
             if not os.path.exists(playlist_path):
                 return jsonify({'error': 'Stream not ready'}), 503
 
-            return send_file(playlist_path, mimetype='application/vnd.apple.mpegurl')
+            try:
+                playlist = self.render_playlist(playlist_path, session, prefix)
+            except FileNotFoundError:
+                return jsonify({'error': 'Stream not ready'}), 503
 
-        @app.route('/stream/segment/<filename>')
-        def stream_segment(filename):
-            segment_path = os.path.join(self.hls_output_dir, filename)
+            response = Response(playlist, mimetype='application/vnd.apple.mpegurl')
+            response.headers['Cache-Control'] = 'no-cache'
+            response.set_cookie('pb_stream_session', session, max_age=int(self.stream_auth.session_ttl),
+                                httponly=True, secure=request.is_secure,
+                                samesite='None' if request.is_secure else 'Lax')
+            return response
+
+        def serve_segment(directory: str, filename: str, lifecycle):
+            session = request.args.get('session') or request.cookies.get('pb_stream_session')
+            if self.config.get('stream_segment_auth', True) and not self.stream_auth.validate_session(session):
+                return jsonify({'error': 'Invalid session'}), 403
+
+            if self.governor and not self.governor.allows('streaming', count=False):
+                return jsonify({'error': 'Pod overloaded, stream paused'}), 503
+
+            if lifecycle:
+                lifecycle.touch(self.stream_viewer_id(session))
+
+            if filename != os.path.basename(filename) or not filename.endswith('.ts'):
+                return jsonify({'error': 'Segment not found'}), 404
+
+            segment_path = os.path.join(directory, filename)
 
             if not os.path.exists(segment_path):
                 return jsonify({'error': 'Segment not found'}), 404
 
             return send_file(segment_path, mimetype='video/MP2T')
 
+        def low_rendition_available() -> bool:
+            if not self.low_rendition:
+                return False
+            # Copying the sub-stream costs nothing; a transcode is shed with the rest
+            return not self.low_rendition.transcodes or not self.governor or \
+                self.governor.allows('transcoding', count=False)
+
+        @app.route('/stream')
+        def stream():
+            return serve_playlist(os.path.join(self.hls_output_dir, 'stream.m3u8'),
+                                  self.stream_lifecycle, 'stream/segment/')
+
+        @app.route('/stream/segment/<filename>')
+        def stream_segment(filename):
+            return serve_segment(self.hls_output_dir, filename, self.stream_lifecycle)
+
+        @app.route('/stream/master.m3u8')
+        def stream_master():
+            token = request.args.get('token')
+
+            if not token:
+                return jsonify({'error': 'Missing token'}), 401
+
+            if not self.validate_stream_token(token):
+                return jsonify({'error': 'Invalid token'}), 403
+
+            if not self.low_rendition:
+                return jsonify({'error': 'Renditions not enabled'}), 404
+
+            from urllib.parse import quote
+            from pod_renditions import master_playlist, playlist_bandwidth
+
+            # Starts nothing: the player picks a variant and that one starts
+            rtsp_url = self.config.get('camera_rtsp_url', '')
+            info = self.get_stream_info(rtsp_url, blocking=False) or {}
+            running = self.ffmpeg_process is not None and self.ffmpeg_process.poll() is None
+            measured = playlist_bandwidth(os.path.join(self.hls_output_dir, 'stream.m3u8')) if running else None
+            main = {
+                'uri': f"main.m3u8?token={quote(token)}",
+                'bandwidth': measured or self.config.get('stream_main_kbps', 4000) * 1000,
+                'resolution': f"{info['width']}x{info['height']}" if info.get('width') and info.get('height') else None
+            }
+            variants = [main]
+            if low_rendition_available():
+                variants.append({
+                    'uri': f"low.m3u8?token={quote(token)}",
+                    'bandwidth': self.low_rendition.bandwidth(),
+                    'resolution': self.low_rendition.resolution()
+                })
+
+            response = Response(master_playlist(variants), mimetype='application/vnd.apple.mpegurl')
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+        @app.route('/stream/main.m3u8')
+        def stream_main():
+            return serve_playlist(os.path.join(self.hls_output_dir, 'stream.m3u8'),
+                                  self.stream_lifecycle, 'segment/')
+
+        @app.route('/stream/low.m3u8')
+        def stream_low():
+            if not self.low_rendition:
+                return jsonify({'error': 'Renditions not enabled'}), 404
+            if self.low_rendition.transcodes and self.governor and not self.governor.allows('transcoding'):
+                response = jsonify({'error': 'Pod overloaded, low rendition paused'})
+                response.headers['Retry-After'] = '60'
+                return response, 503
+            return serve_playlist(self.low_rendition.playlist_path, self.low_lifecycle, 'low/segment/')
+
+        @app.route('/stream/low/segment/<filename>')
+        def stream_low_segment(filename):
+            if not self.low_rendition:
+                return jsonify({'error': 'Segment not found'}), 404
+            return serve_segment(self.low_rendition.output_dir, filename, self.low_lifecycle)
+
         @app.route('/recordings/list')
         def list_recordings():
             token = request.args.get('token')
@@ -674,17 +2068,71 @@ class CompletePodAgent:
             if not token or not self.validate_stream_token(token):
                 return jsonify({'error': 'Invalid token'}), 403
 
-            recordings_dir = self.config.get('recordings_dir', '/tmp/recordings')
-
-            for filename in os.listdir(recordings_dir):
-                if filename.endswith('.mp4'):
-                    file_path = os.path.join(recordings_dir, filename)
-                    if recording_id in filename or os.path.basename(file_path) == recording_id:
-                        if os.path.exists(file_path):
-                            return send_file(file_path, mimetype='video/mp4')
+            file_path = self.find_recording(recording_id)
+            if file_path:
+                return send_file(file_path, mimetype='video/mp4')
 
             return jsonify({'error': 'Recording not found'}), 404
 
+        @app.route('/recording/<recording_id>/vod.m3u8')
+        def get_recording_vod(recording_id):
+            from pod_vod import NotFragmented, load_index, render_vod_playlist
+
+            token = request.args.get('token')
+
+            if not token or not self.validate_stream_token(token):
+                return jsonify({'error': 'Invalid token'}), 403
+
+            file_path = self.find_recording(recording_id)
+            if not file_path:
+                return jsonify({'error': 'Recording not found'}), 404
+
+            try:
+                index = load_index(file_path, remux=False)
+            except NotFragmented:
+                # Recorded before fragmenting; remuxed once, off the request thread
+                state = self.start_vod_remux(file_path)
+                if state == 'failed':
+                    return jsonify({'error': 'Recording can not be served as HLS, use /recording/<id>'}), 415
+                if state == 'uploading':
+                    response = jsonify({'error': 'Recording is being uploaded, try again later'})
+                    response.headers['Retry-After'] = '60'
+                    return response, 409
+                response = jsonify({'status': 'preparing'})
+                response.headers['Retry-After'] = '5'
+                return response, 202
+            except Exception as e:
+                logger.error(f"Error indexing {file_path}: {e}")
+                return jsonify({'error': 'Recording can not be indexed'}), 500
+
+            # Byte-range requests carry the session, not the portal token
+            session = self.stream_auth.issue_session(token)
+            playlist = render_vod_playlist(
+                index,
+                f"media?session={session}",
+                self.config.get('vod_segment_seconds', 2)
+            )
+
+            response = Response(playlist, mimetype='application/vnd.apple.mpegurl')
+            # Still recording: the player reloads it for new fragments
+            response.headers['Cache-Control'] = 'private, max-age=60' if index['complete'] else 'no-cache'
+            return response
+
+        @app.route('/recording/<recording_id>/media')
+        def get_recording_media(recording_id):
+            session = request.args.get('session') or request.cookies.get('pb_stream_session')
+            if not self.stream_auth.validate_session(session):
+                return jsonify({'error': 'Invalid session'}), 403
+
+            file_path = self.find_recording(recording_id)
+            if not file_path:
+                return jsonify({'error': 'Recording not found'}), 404
+
+            # conditional=True answers Range requests with 206 partial content
+            response = send_file(file_path, mimetype='video/mp4', conditional=True)
+            response.headers['Cache-Control'] = 'private, max-age=86400'
+            return response
+
         @app.route('/thumbnail/<recording_id>')
         def get_thumbnail(recording_id):
             token = request.args.get('token')
@@ -698,36 +2146,170 @@ class CompletePodAgent:
             if os.path.exists(thumbnail_path):
                 return send_file(thumbnail_path, mimetype='image/jpeg')
 
+            recording_path = self.find_recording(recording_id) if self.snapshot_store else None
+            if recording_path:
+                alias = os.path.splitext(os.path.basename(recording_path))[0]
+                response = send_snapshot(alias, request.args.get('size', 'small'))
+                if response is not None:
+                    return response
+
             return jsonify({'error': 'Thumbnail not found'}), 404
 
+        def send_snapshot(key: str, size: str):
+            """Snapshot response, None if the store has nothing for `key`"""
+            try:
+                found = self.snapshot_store.lookup(key, size)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if not found or not os.path.exists(found[0]):
+                return None
+            path, digest = found
+            # Content-addressed, so the hash is a strong validator and the bytes never change
+            response = send_file(path, mimetype='image/jpeg', etag=digest, conditional=True, max_age=86400)
+            response.headers['Cache-Control'] = 'private, max-age=86400, immutable'
+            return response
+
+        @app.route('/snapshot/<event_id>')
+        def get_snapshot(event_id):
+            token = request.args.get('token')
+
+            if not token or not self.validate_stream_token(token):
+                return jsonify({'error': 'Invalid token'}), 403
+
+            if not self.snapshot_store:
+                return jsonify({'error': 'Snapshots disabled'}), 404
+
+            response = send_snapshot(event_id, request.args.get('size', 'full'))
+            if response is None:
+                return jsonify({'error': 'Snapshot not found'}), 404
+            return response
+
+        @app.route('/detections')
+        def query_detections():
+            token = request.args.get('token')
+
+            if not token or not self.validate_stream_token(token):
+                return jsonify({'error': 'Invalid token'}), 403
+
+            if not self.detection_history:
+                return jsonify({'error': 'Detection history disabled'}), 404
+
+            try:
+                page = self.detection_history.query(
+                    plate_prefix=request.args.get('plate'),
+                    camera=request.args.get('camera'),
+                    since=request.args.get('since', type=float),
+                    until=request.args.get('until', type=float),
+                    action=request.args.get('action'),
+                    limit=request.args.get('limit', 50, type=int),
+                    cursor=request.args.get('cursor')
+                )
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+
+            return jsonify(page)
+
+        @app.route('/plates/check', methods=['POST'])
+        def check_plates():
+            token = request.args.get('token')
+
+            if not token or not self.validate_stream_token(token):
+                return jsonify({'error': 'Invalid token'}), 403
+
+            data = request.get_json(silent=True)
+            plates = data.get('plates') if isinstance(data, dict) else None
+            if not isinstance(plates, list) or not all(isinstance(plate, str) for plate in plates):
+                return jsonify({'error': 'Expected {"plates": ["ABC123", ...]}'}), 400
+
+            max_plates = self.config.get('plate_check_max', 10000)
+            if len(plates) > max_plates:
+                return jsonify({'error': f"At most {max_plates} plates per request"}), 413
+
+            if not self.handles_detection:
+                self.reload_whitelist_cache_if_changed()
+
+            results = self.check_plates(plates)
+            return jsonify({
+                'results': results,
+                'checked': len(results),
+                'allowed': sum(1 for result in results if result['allowed']),
+                'whitelist_plates': len(self.whitelist_index),
+                'last_refresh': self.last_whitelist_refresh
+            })
+
         @app.route('/health')
         def health():
             recordings = self.list_local_recordings()
-            return jsonify({
+            health = {
                 'status': 'ok',
                 'pod_id': self.config['pod_id'],
-                'streaming': self.ffmpeg_process and self.ffmpeg_process.poll() is None,
+                **self.media_stats(),
+                **self.detection_stats(),
                 'recording_count': len(recordings)
-            })
+            }
+            health['config'] = self.config_stats
+            health['children'] = self.child_stats()
+            if self.governor:
+                health['governor'] = self.governor.get_stats()
+            if self.log_pipeline:
+                health['logging'] = self.log_pipeline.get_stats()
+            if self.shared_state:
+                health['processes'] = self.shared_state.read('supervisor').get('processes')
+            return jsonify(health)
 
         stream_port = self.config.get('stream_port', 8000)
         logger.info(f"Starting stream server on port {stream_port}")
         app.run(host='0.0.0.0', port=stream_port, threaded=True)
 
 
+def read_config_quietly(config_path: str) -> Dict[str, Any]:
+    try:
+        with open(config_path, 'r') as f:
+            config = yaml.safe_load(f) or {}
+        return config if isinstance(config, dict) else {}
+    except Exception:
+        # Let the agent report config problems
+        return {}
+
+
 def main():
     global agent
 
-    config_path = sys.argv[1] if len(sys.argv) > 1 else "config.yaml"
-    agent = CompletePodAgent(config_path)
+    parser = argparse.ArgumentParser(description='PlateBridge Complete Pod Agent')
+    parser.add_argument('config', nargs='?', default='config.yaml')
+    parser.add_argument('--role', choices=('all', 'detection', 'media'),
+                        help='Run one half of multi-process mode (started by the supervisor)')
+    args = parser.parse_args()
+
+    raw_config = read_config_quietly(args.config)
+    multi = not args.role and raw_config.get('process_mode', 'single') == 'multi'
+
+    from pod_logging import setup_logging
+    try:
+        log_pipeline = setup_logging(raw_config, 'supervisor' if multi else args.role)
+    except (OSError, ValueError) as e:
+        log_pipeline = None
+        logger.error(f"Logging setup failed, using console logging: {e}")
 
     try:
-        asyncio.run(agent.run())
-    except KeyboardInterrupt:
-        logger.info("Stopped by user")
-    except Exception as e:
-        logger.error(f"Fatal error: {e}")
-        sys.exit(1)
+        if multi:
+            from pod_supervisor import PodSupervisor
+            PodSupervisor(args.config, os.path.abspath(__file__)).run()
+            return
+
+        agent = CompletePodAgent(args.config, role=args.role or 'all')
+        agent.log_pipeline = log_pipeline
+
+        try:
+            asyncio.run(agent.run())
+        except KeyboardInterrupt:
+            logger.info("Stopped by user")
+        except Exception as e:
+            logger.error(f"Fatal error: {e}")
+            sys.exit(1)
+    finally:
+        if log_pipeline:
+            log_pipeline.stop()
 
 
 if __name__ == "__main__":
@@ -862,6 +862,7 @@ RUN pip install --no-cache-dir -r requirements.txt
 
 # Copy application files
 COPY complete_pod_agent.py agent.py
+COPY pod_*.py ./
 COPY config.yaml .
 
 # Create directories
@@ -1192,7 +1193,8 @@ EOF
     # Copy Python agent
     if [ -f "$SCRIPT_DIR/complete_pod_agent.py" ]; then
         cp "$SCRIPT_DIR/complete_pod_agent.py" $INSTALL_DIR/docker/
-        print_success "Agent Python file copied"
+        cp "$SCRIPT_DIR"/pod_*.py $INSTALL_DIR/docker/
+        print_success "Agent Python files copied"
     else
         print_warning "complete_pod_agent.py not found in $SCRIPT_DIR"
         print_warning "Docker build will fail without this file"
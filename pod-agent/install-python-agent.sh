@@ -63,6 +63,7 @@ deactivate
 
 print_step "Copying agent files..."
 cp "$SCRIPT_DIR/complete_pod_agent.py" $INSTALL_DIR/agent.py
+cp "$SCRIPT_DIR"/pod_*.py $INSTALL_DIR/
 cp "$SCRIPT_DIR/config.example.yaml" $INSTALL_DIR/config.yaml
 
 print_success "Agent files installed"
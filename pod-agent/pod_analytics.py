@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Traffic Analytics
+Streaming summaries of the pod's decisions, shipped with every heartbeat.
+
+Each decision updates, in constant time and fixed memory: a ring of hourly
+counters (events, allowed, denied, local decisions) with a per-camera split
+and a HyperLogLog of the plates seen that hour; a Space-Saving sketch of the
+most frequent plates; and a fixed-bucket histogram of decision latency.
+The summary gives entries per hour, denial rates, distinct plates and
+repeat visits over the window, peak hour and heavy hitters, without the
+portal re-scanning raw detections. Hours are keyed by their start time, so
+a heartbeat delta only carries the hour that changed.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Any, List, Optional
+
+# Upper bounds of the decision latency buckets; anything slower lands in the last one
+LATENCY_BOUNDS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Cameras past this many are counted together as "other"
+MAX_CAMERAS = 32
+
+# 2^-rank for every register value
+INVERSE_POWERS = [2.0 ** -rank for rank in range(65)]
+
+
+def plate_hash(plate: str) -> int:
+    """Stable 64-bit hash (Python's hash() differs per process)"""
+    return int.from_bytes(hashlib.blake2b(plate.encode(), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """Approximate distinct count; 2^precision one-byte registers, ~1.04/sqrt(2^precision) error"""
+
+    def __init__(self, precision: int = 10):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        self.rest_bits = 64 - precision
+
+    def add_hash(self, value: int):
+        index = value >> self.rest_bits
+        rest = value & ((1 << self.rest_bits) - 1)
+        # Position of the first 1 bit after the index bits
+        rank = self.rest_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(map(INVERSE_POWERS.__getitem__, self.registers))
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range: linear counting is more accurate
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class TopPlates:
+    """Space-Saving heavy hitters.
+
+    Keeps `capacity` counters; a new plate when full takes over the smallest
+    counter (and its count, recorded as the error bound). Counters are
+    grouped by count so the smallest is found without a scan.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        # plate -> [count, error]
+        self.counters: Dict[str, List[int]] = {}
+        # count -> plates with that count
+        self.buckets: Dict[int, set] = {}
+        self.min_count = 0
+
+    def _bucket_add(self, plate: str, count: int):
+        bucket = self.buckets.get(count)
+        if bucket is None:
+            bucket = self.buckets[count] = set()
+        bucket.add(plate)
+
+    def _bucket_remove(self, plate: str, count: int):
+        bucket = self.buckets[count]
+        bucket.discard(plate)
+        if not bucket:
+            del self.buckets[count]
+            if count == self.min_count:
+                # Whatever left this bucket now has count + 1
+                self.min_count = count + 1
+
+    def add(self, plate: str):
+        counter = self.counters.get(plate)
+        if counter is not None:
+            self._bucket_remove(plate, counter[0])
+            counter[0] += 1
+            self._bucket_add(plate, counter[0])
+        elif len(self.counters) < self.capacity:
+            self.counters[plate] = [1, 0]
+            self._bucket_add(plate, 1)
+            self.min_count = 1
+        else:
+            floor = self.min_count
+            victim = next(iter(self.buckets[floor]))
+            self._bucket_remove(victim, floor)
+            del self.counters[victim]
+            self.counters[plate] = [floor + 1, floor]
+            self._bucket_add(plate, floor + 1)
+
+    def top(self, n: int) -> List[List[Any]]:
+        """[[plate, count, max overcount], ...], most frequent first"""
+        ranked = sorted(self.counters.items(), key=lambda item: -item[1][0])[:n]
+        return [[plate, count, error] for plate, (count, error) in ranked]
+
+
+class HourBucket:
+    __slots__ = ('hour', 'events', 'allowed', 'denied', 'local', 'cameras', 'plates')
+
+    def __init__(self, hour: int, precision: int):
+        self.hour = hour
+        self.events = 0
+        self.allowed = 0
+        self.denied = 0
+        self.local = 0
+        # camera -> [events, allowed, denied]
+        self.cameras: Dict[str, List[int]] = {}
+        self.plates = HyperLogLog(precision)
+
+
+class TrafficAnalytics:
+    def __init__(self, window_hours: int = 24, top_n: int = 10, top_capacity: int = 100,
+                 hll_precision: int = 10):
+        self.window_hours = window_hours
+        self.top_n = top_n
+        self.hll_precision = hll_precision
+        self.lock = threading.Lock()
+        self.hours: List[Optional[HourBucket]] = [None] * window_hours
+        # Heavy hitters and latency cover everything since `since`
+        self.top = TopPlates(top_capacity)
+        self.latency = [0] * (len(LATENCY_BOUNDS_MS) + 1)
+        self.since = time.time()
+        self.stats = {'recorded': 0, 'too_old': 0}
+
+    def _bucket(self, hour: int, now_hour: int) -> Optional[HourBucket]:
+        if hour <= now_hour - self.window_hours:
+            return None
+        slot = hour % self.window_hours
+        bucket = self.hours[slot]
+        if bucket is None or bucket.hour < hour:
+            bucket = self.hours[slot] = HourBucket(hour, self.hll_precision)
+        elif bucket.hour > hour:
+            # Slot already reused by a later hour
+            return None
+        return bucket
+
+    def record(self, plate: str, ts: Optional[float] = None, camera: Optional[str] = None,
+               action: Optional[str] = None, latency: Optional[float] = None, local: bool = False):
+        """One decision; `plate` should already be normalized"""
+        now = time.time()
+        hour = int((ts or now) // 3600)
+        hashed = plate_hash(plate)
+        allowed = action == 'allow'
+        denied = action == 'deny'
+
+        with self.lock:
+            bucket = self._bucket(hour, int(now // 3600))
+            if bucket is None:
+                # Backfilled from before the window
+                self.stats['too_old'] += 1
+                return
+            self.stats['recorded'] += 1
+
+            bucket.events += 1
+            bucket.allowed += allowed
+            bucket.denied += denied
+            bucket.local += local
+            bucket.plates.add_hash(hashed)
+
+            camera = camera or 'unknown'
+            counts = bucket.cameras.get(camera)
+            if counts is None:
+                if len(bucket.cameras) >= MAX_CAMERAS:
+                    camera = 'other'
+                counts = bucket.cameras.setdefault(camera, [0, 0, 0])
+            counts[0] += 1
+            counts[1] += allowed
+            counts[2] += denied
+
+            self.top.add(plate)
+            if latency is not None:
+                self.latency[bisect_left(LATENCY_BOUNDS_MS, latency * 1000)] += 1
+
+    def latency_percentile(self, pct: float) -> Optional[float]:
+        """Upper bound of the bucket holding the percentile (None past the last bound)"""
+        total = sum(self.latency)
+        if not total:
+            return None
+        target = total * pct / 100
+        seen = 0
+        for index, count in enumerate(self.latency):
+            seen += count
+            if seen >= target:
+                return LATENCY_BOUNDS_MS[index] if index < len(LATENCY_BOUNDS_MS) else None
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        now_hour = int(time.time() // 3600)
+        with self.lock:
+            buckets = sorted((b for b in self.hours if b and b.hour > now_hour - self.window_hours),
+                             key=lambda b: b.hour)
+            distinct = HyperLogLog(self.hll_precision)
+            hours = {}
+            cameras: Dict[str, List[int]] = {}
+            totals = [0, 0, 0, 0]
+            for bucket in buckets:
+                distinct.merge(bucket.plates)
+                hours[str(bucket.hour * 3600)] = [bucket.events, bucket.allowed, bucket.denied,
+                                                  bucket.plates.count()]
+                totals[0] += bucket.events
+                totals[1] += bucket.allowed
+                totals[2] += bucket.denied
+                totals[3] += bucket.local
+                for camera, counts in bucket.cameras.items():
+                    merged = cameras.setdefault(camera, [0, 0, 0])
+                    for i in range(3):
+                        merged[i] += counts[i]
+            top = self.top.top(self.top_n)
+            latency = list(self.latency)
+            p50 = self.latency_percentile(50)
+            p95 = self.latency_percentile(95)
+            stats = dict(self.stats)
+
+        events, allowed, denied, local = totals
+        unique = min(distinct.count(), events)
+        peak = max(buckets, key=lambda b: b.events) if buckets else None
+        return {
+            'window_hours': self.window_hours,
+            'events': events,
+            'allowed': allowed,
+            'denied': denied,
+            'local_decisions': local,
+            'deny_rate': round(denied / events, 3) if events else None,
+            'distinct_plates': unique,
+            # Share of events from a plate already seen in the window
+            'repeat_rate': round(1 - unique / events, 3) if events else None,
+            'peak_hour': peak.hour * 3600 if peak else None,
+            # hour start (epoch seconds) -> [events, allowed, denied, distinct plates]
+            'hours': hours,
+            # camera -> [events, allowed, denied]
+            'cameras': cameras,
+            'top_plates': top,
+            'top_since': round(self.since),
+            'latency_ms': {'bounds': list(LATENCY_BOUNDS_MS), 'counts': latency, 'p50': p50, 'p95': p95},
+            **stats
+        }
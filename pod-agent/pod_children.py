@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Child Processes
+Runs ffmpeg and other heavy work at a lower CPU and I/O priority than the agent.
+
+Every child is started for a work class (the governor's names: streaming,
+transcoding, recording, uploads, plus maintenance for one-off remuxes and probes).
+Right after it starts, it gets the class's nice value (added to the
+agent's own) and I/O priority (ioprio_set, or the `ionice` tool where the
+syscall number isn't known). When `cgroup_root` points at a delegated
+cgroup v2 directory, the child is also moved into `<root>/<class>` with the
+class's cpu.weight and io.weight. The defaults keep live HLS segment
+writes ahead of the agent's own disk writes, and both ahead of
+recordings and maintenance, so a recording burst can't stall the stream
+or the MQTT loop. I/O priorities and io.weight only take effect with the
+BFQ scheduler; with "none" or mq-deadline only the CPU side applies.
+
+Upload workers are threads, not processes; they lower their own thread's
+priority the same way (nice and ioprio are per thread on Linux).
+
+A sampler records each live child's CPU time and disk bytes every
+`sample_interval` seconds and adds them to its class when it exits, so a
+child shorter than one interval shows up in `launched` but not in
+usage. With cgroups, the per-class totals come from cpu.stat and io.stat
+and are exact.
+"""
+
+import ctypes
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+import psutil
+
+logger = logging.getLogger('platebridge-pod.children')
+
+# nice is added to the agent's own; ioclass is best-effort (levels 0-7,
+# 0 first) or idle; the weights are cgroup v2 cpu.weight / io.weight (default 100)
+WORK_CLASSES = {
+    'streaming': {'nice': 0, 'ioclass': 'best-effort', 'iolevel': 2, 'cpu_weight': 100, 'io_weight': 200},
+    'transcoding': {'nice': 10, 'ioclass': 'best-effort', 'iolevel': 4, 'cpu_weight': 50, 'io_weight': 100},
+    'recording': {'nice': 10, 'ioclass': 'best-effort', 'iolevel': 7, 'cpu_weight': 50, 'io_weight': 50},
+    'uploads': {'nice': 10, 'ioclass': 'best-effort', 'iolevel': 7, 'cpu_weight': 50, 'io_weight': 50},
+    'maintenance': {'nice': 15, 'ioclass': 'idle', 'iolevel': 7, 'cpu_weight': 20, 'io_weight': 10},
+}
+
+IOPRIO_CLASSES = {'realtime': 1, 'best-effort': 2, 'idle': 3}
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_WHO_PROCESS = 1
+# ioprio_set syscall numbers; Python has no wrapper
+IOPRIO_SET = {'x86_64': 251, 'aarch64': 30, 'armv7l': 314, 'armv6l': 314, 'i686': 289}
+
+
+class ChildLauncher:
+    def __init__(self, classes: Optional[Dict[str, Dict[str, Any]]] = None, enabled: bool = True,
+                 cgroup_root: Optional[str] = None, sample_interval: float = 2):
+        self.enabled = enabled
+        self.classes = self.merge_classes(classes)
+        self.sample_interval = sample_interval
+
+        self.lock = threading.Lock()
+        # pid -> (work class, process handle, last cpu seconds, last read bytes, last write bytes)
+        self.children: Dict[int, List[Any]] = {}
+        self.usage: Dict[str, Dict[str, float]] = {}
+        self.errors = 0
+
+        self.libc = None
+        self.ioprio_set = IOPRIO_SET.get(platform.machine())
+        self.ionice_tool = shutil.which('ionice')
+        if self.ioprio_set is not None:
+            try:
+                self.libc = ctypes.CDLL(None, use_errno=True)
+            except OSError:
+                self.ioprio_set = None
+
+        self.cgroup_root = None
+        if enabled and cgroup_root:
+            self.cgroup_root = self.setup_cgroups(cgroup_root)
+
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @staticmethod
+    def merge_classes(overrides: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        classes = {name: dict(settings) for name, settings in WORK_CLASSES.items()}
+        for name, settings in (overrides or {}).items():
+            classes.setdefault(name, dict(WORK_CLASSES['maintenance'])).update(settings or {})
+        return classes
+
+    def configure(self, classes: Optional[Dict[str, Dict[str, Any]]], enabled: bool):
+        """New settings; running children are moved to them too"""
+        with self.lock:
+            self.classes = self.merge_classes(classes)
+            self.enabled = enabled
+            running = [(pid, child[0]) for pid, child in self.children.items()]
+        if self.cgroup_root:
+            for work_class in self.classes:
+                self._write_cgroup_weights(work_class)
+        for pid, work_class in running:
+            self.apply(work_class, pid)
+
+    def setup_cgroups(self, root: str) -> Optional[str]:
+        """Create <root>/<class> groups; the root must be delegated to us and hold no processes"""
+        try:
+            if not os.path.exists(os.path.join(root, 'cgroup.controllers')):
+                raise OSError(f"{root} is not a cgroup v2 directory")
+            for controller in ('+cpu', '+io'):
+                try:
+                    with open(os.path.join(root, 'cgroup.subtree_control'), 'w') as f:
+                        f.write(controller)
+                except OSError as e:
+                    logger.warning(f"cgroup controller {controller[1:]} unavailable under {root}: {e}")
+            for work_class in self.classes:
+                os.makedirs(os.path.join(root, work_class), exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Child cgroups disabled: {e}")
+            return None
+
+        self.cgroup_root = root
+        for work_class in self.classes:
+            self._write_cgroup_weights(work_class)
+        logger.info(f"Child processes grouped under {root}")
+        return root
+
+    def _write_cgroup_weights(self, work_class: str):
+        settings = self.classes[work_class]
+        path = os.path.join(self.cgroup_root, work_class)
+        try:
+            os.makedirs(path, exist_ok=True)
+        except OSError:
+            return
+        for filename, value in (('cpu.weight', settings.get('cpu_weight')),
+                                ('io.weight', f"default {settings.get('io_weight')}")):
+            if settings.get(filename.replace('.', '_')) is None:
+                continue
+            try:
+                with open(os.path.join(path, filename), 'w') as f:
+                    f.write(str(value))
+            except OSError:
+                pass
+
+    def _set_ioprio(self, tid: int, ioclass: str, level: int) -> bool:
+        value = (IOPRIO_CLASSES.get(ioclass, 2) << IOPRIO_CLASS_SHIFT) | max(0, min(7, level))
+        if self.ioprio_set is not None:
+            return self.libc.syscall(self.ioprio_set, IOPRIO_WHO_PROCESS, tid, value) == 0
+        if self.ionice_tool:
+            result = subprocess.run([self.ionice_tool, '-c', str(IOPRIO_CLASSES.get(ioclass, 2)),
+                                     '-n', str(level), '-p', str(tid)], capture_output=True)
+            return result.returncode == 0
+        return False
+
+    def apply(self, work_class: str, pid: int, thread: bool = False) -> bool:
+        """Give a process (or, with thread=True, a thread ID) its class's priorities"""
+        if not self.enabled:
+            return False
+        settings = self.classes.get(work_class) or self.classes['maintenance']
+        ok = True
+        try:
+            # Relative to the agent, which may already be niced (media_process_nice)
+            nice = min(19, os.getpriority(os.PRIO_PROCESS, 0) + settings.get('nice', 0))
+            os.setpriority(os.PRIO_PROCESS, pid, nice)
+        except OSError as e:
+            logger.debug(f"Could not renice {pid} ({work_class}): {e}")
+            ok = False
+        if not self._set_ioprio(pid, settings.get('ioclass', 'best-effort'), settings.get('iolevel', 4)):
+            ok = False
+        if self.cgroup_root and not thread:
+            try:
+                with open(os.path.join(self.cgroup_root, work_class, 'cgroup.procs'), 'w') as f:
+                    f.write(str(pid))
+            except OSError as e:
+                logger.debug(f"Could not move {pid} to cgroup {work_class}: {e}")
+                ok = False
+        if not ok:
+            with self.lock:
+                self.errors += 1
+        return ok
+
+    def lower_current_thread(self, work_class: str) -> bool:
+        return self.apply(work_class, threading.get_native_id(), thread=True)
+
+    def popen(self, work_class: str, cmd: List[str], **kwargs) -> subprocess.Popen:
+        process = subprocess.Popen(cmd, **kwargs)
+        self.apply(work_class, process.pid)
+        try:
+            handle = psutil.Process(process.pid)
+        except psutil.Error:
+            handle = None
+        with self.lock:
+            usage = self._class_usage(work_class)
+            usage['launched'] += 1
+            if handle:
+                self.children[process.pid] = [work_class, handle, 0.0, 0, 0]
+        return process
+
+    def run(self, work_class: str, cmd: List[str], timeout: Optional[float] = None,
+            capture_output: bool = False, **kwargs) -> subprocess.CompletedProcess:
+        """subprocess.run for a work class"""
+        if capture_output:
+            kwargs['stdout'] = subprocess.PIPE
+            kwargs['stderr'] = subprocess.PIPE
+        with self.popen(work_class, cmd, **kwargs) as process:
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise
+        return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+    def _class_usage(self, work_class: str) -> Dict[str, float]:
+        usage = self.usage.get(work_class)
+        if usage is None:
+            usage = self.usage[work_class] = {
+                'launched': 0, 'cpu_seconds': 0.0, 'read_bytes': 0, 'write_bytes': 0, 'cpu_percent': 0.0
+            }
+        return usage
+
+    def sample(self, elapsed: Optional[float] = None):
+        """Read every live child's counters; fold exited children into their class"""
+        with self.lock:
+            children = list(self.children.items())
+
+        readings = {}
+        for pid, (work_class, handle, _, _, _) in children:
+            try:
+                if handle.status() == psutil.STATUS_ZOMBIE:
+                    raise psutil.NoSuchProcess(pid)
+                times = handle.cpu_times()
+                cpu = times.user + times.system + getattr(times, 'children_user', 0) + \
+                    getattr(times, 'children_system', 0)
+                try:
+                    io = handle.io_counters()
+                    read, written = io.read_bytes, io.write_bytes
+                except (psutil.AccessDenied, AttributeError):
+                    read = written = 0
+                readings[pid] = (cpu, read, written)
+            except psutil.Error:
+                readings[pid] = None
+
+        with self.lock:
+            cpu_by_class: Dict[str, float] = {}
+            for pid, reading in readings.items():
+                child = self.children.get(pid)
+                if child is None:
+                    continue
+                if reading is None:
+                    del self.children[pid]
+                    continue
+                work_class = child[0]
+                usage = self._class_usage(work_class)
+                cpu, read, written = reading
+                cpu_delta = max(0.0, cpu - child[2])
+                usage['cpu_seconds'] += cpu_delta
+                usage['read_bytes'] += max(0, read - child[3])
+                usage['write_bytes'] += max(0, written - child[4])
+                cpu_by_class[work_class] = cpu_by_class.get(work_class, 0.0) + cpu_delta
+                child[2:] = [cpu, read, written]
+            if elapsed:
+                for work_class, usage in self.usage.items():
+                    usage['cpu_percent'] = round(cpu_by_class.get(work_class, 0.0) / elapsed * 100, 1)
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name='child-sampler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def _run(self):
+        last = time.monotonic()
+        while not self.stopped.wait(self.sample_interval):
+            now = time.monotonic()
+            try:
+                self.sample(now - last)
+            except Exception as e:
+                logger.error(f"Child sampling error: {e}")
+            last = now
+
+    def cgroup_usage(self, work_class: str) -> Optional[Dict[str, float]]:
+        path = os.path.join(self.cgroup_root, work_class)
+        usage = {'cpu_seconds': 0.0, 'read_bytes': 0, 'write_bytes': 0}
+        try:
+            with open(os.path.join(path, 'cpu.stat'), 'r') as f:
+                for line in f:
+                    key, _, value = line.partition(' ')
+                    if key == 'usage_usec':
+                        usage['cpu_seconds'] = int(value) / 1e6
+            if os.path.exists(os.path.join(path, 'io.stat')):
+                with open(os.path.join(path, 'io.stat'), 'r') as f:
+                    for field in f.read().split():
+                        key, _, value = field.partition('=')
+                        if key == 'rbytes':
+                            usage['read_bytes'] += int(value)
+                        elif key == 'wbytes':
+                            usage['write_bytes'] += int(value)
+        except (OSError, ValueError):
+            return None
+        return usage
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            running: Dict[str, List[int]] = {}
+            for pid, child in self.children.items():
+                running.setdefault(child[0], []).append(pid)
+            usage = {work_class: dict(values) for work_class, values in self.usage.items()}
+            errors = self.errors
+
+        classes = {}
+        for work_class, values in usage.items():
+            settings = self.classes.get(work_class, {})
+            if self.cgroup_root:
+                values.update(self.cgroup_usage(work_class) or {})
+            classes[work_class] = {
+                'nice': settings.get('nice') if self.enabled else None,
+                'io': f"{settings.get('ioclass')}/{settings.get('iolevel')}" if self.enabled else None,
+                'running': len(running.get(work_class, ())),
+                'pids': running.get(work_class, []),
+                'launched': values['launched'],
+                'cpu_seconds': round(values['cpu_seconds'], 2),
+                'cpu_percent': values['cpu_percent'],
+                'read_mb': round(values['read_bytes'] / 1e6, 2),
+                'write_mb': round(values['write_bytes'] / 1e6, 2)
+            }
+
+        return {
+            'enabled': self.enabled,
+            'ioprio': 'syscall' if self.ioprio_set is not None else ('ionice' if self.ionice_tool else None),
+            'cgroup_root': self.cgroup_root,
+            'errors': errors,
+            'classes': classes
+        }
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Config Reload
+Works out what a config change touches so the agent can restart only that.
+
+Config can change three ways: config.yaml is edited (polled by mtime and
+content hash), the agent gets SIGHUP, or the portal publishes a newer
+agent config version at /api/pods/config/<pod_id>?format=agent. The portal
+config is overlaid on config.yaml. Keys read on every use (thresholds,
+intervals) just take effect; keys owned by a running subsystem restart
+that subsystem; identity/port keys need a full restart and are kept at
+their old value until then.
+"""
+
+import hashlib
+import logging
+import os
+from typing import Dict, Any, Optional, Set, Tuple
+
+import requests
+import yaml
+
+logger = logging.getLogger('platebridge-pod.config')
+
+REQUIRED_FIELDS = ['portal_url', 'pod_api_key', 'pod_id', 'camera_id']
+
+# Subsystem -> keys it reads once at start
+SUBSYSTEM_KEYS = {
+    'stream': (
+        'camera_rtsp_url', 'hls_segment_seconds', 'stream_idle_timeout',
+        'stream_watts_per_core', 'enable_media_probe', 'media_probe_ttl', 'stream_renditions',
+        'media_probe_retry_interval', 'camera_substream_url', 'stream_main_kbps', 'stream_low_height',
+        'stream_low_kbps', 'stream_low_fps', 'stream_low_threads', 'stream_low_cpu_budget'
+    ),
+    'stream_auth': ('stream_secret', 'stream_session_ttl', 'stream_token_cache_size'),
+    'stream_push': (
+        'stream_push_token', 'stream_push_workers', 'stream_push_retries', 'stream_push_max_kbps',
+        'stream_push_keep_segments'
+    ),
+    'mqtt': ('enable_mqtt', 'mqtt_host', 'mqtt_port', 'mqtt_topic', 'mqtt_username', 'mqtt_password'),
+    'uploads': (
+        'enable_uploads', 'upload_url', 'upload_chunk_kb', 'upload_parallel',
+        'upload_max_kbps', 'upload_schedule'
+    ),
+    'recording': ('record_on_detection', 'recording_max_length'),
+    'history': ('history_retention_days',),
+    'traffic': ('traffic_top_n',),
+    'children': ('child_priorities', 'child_classes', 'child_sample_interval'),
+    'governor': (
+        'enable_governor', 'governor_temp_levels', 'governor_cpu_levels', 'governor_temp_hysteresis',
+        'governor_cpu_hysteresis', 'governor_min_dwell'
+    ),
+    # The default plate_regions ["US"] only enforces length (2-8 letters/digits)
+    # plus the confusable check; a state region or plate_patterns checks the format
+    'plate_filter': (
+        'plate_filter_mode', 'plate_regions', 'plate_patterns', 'plate_min_length', 'plate_max_length',
+        'plate_filter_loose'
+    ),
+    'whitelist': ('community_id',),
+    'logging': ('log_level', 'log_sample_interval'),
+    'snapshots': ('snapshot_variants', 'snapshot_max_mb'),
+    'portal': (
+        'portal_budgets', 'portal_hedging', 'portal_hedge_min_delay', 'portal_breaker_failures',
+        'portal_breaker_cooldown'
+    ),
+    'heartbeat': (
+        'heartbeat_interval', 'heartbeat_min_interval', 'heartbeat_max_interval', 'heartbeat_protocol',
+        'heartbeat_compress_min_bytes'
+    ),
+}
+
+# Only take effect after the agent restarts
+RESTART_KEYS = (
+    'portal_url', 'pod_api_key', 'pod_id', 'camera_id', 'stream_port', 'enable_streaming',
+    'stream_on_demand', 'process_mode', 'media_process_nice', 'recordings_dir',
+    'upload_state_dir', 'event_journal_path', 'media_probe_cache', 'peer_mode', 'peers',
+    'peer_port', 'peer_discovery_port', 'peer_secret', 'peer_interval', 'enable_history', 'history_path',
+    'log_async', 'log_format', 'log_file', 'log_max_mb', 'log_backups', 'log_queue_size',
+    'snapshot_dir', 'snapshot_workers', 'stream_push_url',
+    'enable_traffic_analytics', 'traffic_window_hours', 'child_cgroup_root'
+)
+
+
+def read_config(path: str) -> Dict[str, Any]:
+    """Parse and validate config.yaml; raises on any problem"""
+    with open(path, 'r') as f:
+        config = yaml.safe_load(f) or {}
+
+    if not isinstance(config, dict):
+        raise ValueError("Config must be a mapping")
+
+    missing = [f for f in REQUIRED_FIELDS if f not in config]
+    if missing:
+        raise ValueError(f"Missing required config fields: {', '.join(missing)}")
+
+    # The portal has no storage endpoint of its own
+    if config.get('enable_uploads') and not config.get('upload_url'):
+        raise ValueError("enable_uploads needs upload_url")
+
+    return config
+
+
+def diff_config(old: Dict[str, Any], new: Dict[str, Any]) -> Set[str]:
+    return {key for key in set(old) | set(new) if old.get(key) != new.get(key)}
+
+
+def affected_subsystems(changed: Set[str]) -> Set[str]:
+    return {
+        subsystem for subsystem, keys in SUBSYSTEM_KEYS.items()
+        if changed.intersection(keys)
+    }
+
+
+def merge_config(old: Dict[str, Any], file_config: Dict[str, Any],
+                 portal_config: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Set[str]]:
+    """New effective config, with restart-only keys held at their running value"""
+    merged = dict(file_config)
+    merged.update(portal_config or {})
+
+    held = set()
+    for key in RESTART_KEYS:
+        if merged.get(key) != old.get(key):
+            held.add(key)
+            if key in old:
+                merged[key] = old[key]
+            else:
+                merged.pop(key, None)
+
+    return merged, held
+
+
+class ConfigFileWatcher:
+    """Cheap change check for config.yaml: stat every call, hash only when stat moves"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stat_key = self._stat()
+        self.digest = self._digest()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size, st.st_ino
+        except OSError:
+            return None
+
+    def _digest(self) -> Optional[str]:
+        try:
+            with open(self.path, 'rb') as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+
+    def changed(self) -> bool:
+        stat_key = self._stat()
+        if stat_key is None or stat_key == self.stat_key:
+            return False
+        self.stat_key = stat_key
+
+        digest = self._digest()
+        if digest == self.digest:
+            return False
+        self.digest = digest
+        return True
+
+
+def fetch_portal_config(portal_url: str, pod_id: str, api_key: str,
+                        timeout: int = 10) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """(version, overrides) from the portal, or None if it has nothing for this pod"""
+    response = requests.get(
+        f"{portal_url}/api/pods/config/{pod_id}",
+        params={'format': 'agent'},
+        headers={'Authorization': f"Bearer {api_key}"},
+        timeout=timeout
+    )
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+
+    data = response.json()
+    config = data.get('config') or {}
+    if not isinstance(config, dict):
+        raise ValueError("Portal config must be a mapping")
+    return int(data.get('config_version') or 0), config
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Event Journal and Frigate Backfill
+
+The journal remembers which Frigate events the agent has already handled
+(the newest start_time plus a bounded set of recent event ids) and persists
+it, so that after an MQTT outage or an agent restart the gap can be
+recovered from Frigate's /api/events without handling anything twice.
+An event is claimed while it is being decided, but only moves
+last_event_time once it has a decision; a backfill that stops part way
+keeps its resume point in backfill_since.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+import requests
+
+logger = logging.getLogger('platebridge-pod.events')
+
+
+class EventJournal:
+    def __init__(self, path: str = 'event_journal.json', max_ids: int = 2000,
+                 save_interval: float = 5.0):
+        self.path = Path(path)
+        self.max_ids = max_ids
+        self.save_interval = save_interval
+        self.lock = threading.Lock()
+        self.seen: OrderedDict = OrderedDict()
+        self.last_event_time: Optional[float] = None
+        # Start of a gap that a backfill hasn't finished replaying
+        self.backfill_since: Optional[float] = None
+        self.last_saved = 0.0
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self.last_event_time = data.get('last_event_time')
+            self.backfill_since = data.get('backfill_since')
+            for event_id in data.get('recent_ids', [])[-self.max_ids:]:
+                self.seen[event_id] = True
+            logger.info(f"Event journal loaded: last event at {self.last_event_time}")
+        except Exception as e:
+            logger.error(f"Error loading event journal: {e}")
+
+    def save(self, force: bool = False):
+        with self.lock:
+            if not self.dirty or (not force and time.time() - self.last_saved < self.save_interval):
+                return
+            data = {
+                'last_event_time': self.last_event_time,
+                'backfill_since': self.backfill_since,
+                'recent_ids': list(self.seen.keys())
+            }
+            self.dirty = False
+            self.last_saved = time.time()
+
+        try:
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving event journal: {e}")
+
+    def claim(self, event_id: str) -> bool:
+        """Mark an event as being handled; False if it already is (or was)"""
+        with self.lock:
+            if event_id in self.seen:
+                return False
+            self.seen[event_id] = True
+            while len(self.seen) > self.max_ids:
+                self.seen.popitem(last=False)
+            self.dirty = True
+
+        self.save()
+        return True
+
+    def release(self, event_id: str):
+        """Un-claim an event that got no decision, so a later backfill replays it"""
+        with self.lock:
+            self.seen.pop(event_id, None)
+            self.dirty = True
+
+    def complete(self, event_time: Optional[float]):
+        """An event has its decision; backfills start after the newest one"""
+        with self.lock:
+            if event_time and (self.last_event_time is None or event_time > self.last_event_time):
+                self.last_event_time = event_time
+                self.dirty = True
+
+        self.save()
+
+    def set_backfill_since(self, since: Optional[float]):
+        with self.lock:
+            self.backfill_since = since
+            self.dirty = True
+
+        self.save(force=True)
+
+    def has_seen(self, event_id: str) -> bool:
+        with self.lock:
+            return event_id in self.seen
+
+
+def normalize_frigate_event(event: Dict[str, Any]) -> Tuple[str, float]:
+    """Plate text and score from either an MQTT payload or an /api/events record"""
+    sub_label = event.get('sub_label') or ''
+    score = event.get('score')
+
+    # Newer Frigate reports sub_label as [label, score]
+    if isinstance(sub_label, (list, tuple)):
+        if len(sub_label) > 1 and score is None:
+            score = sub_label[1]
+        sub_label = sub_label[0] if sub_label else ''
+
+    if score is None:
+        data = event.get('data') or {}
+        score = event.get('top_score') or data.get('top_score') or data.get('score') or 0.0
+
+    return sub_label or '', float(score or 0.0)
+
+
+def fetch_events_since(frigate_url: str, since: float, label: str = 'license_plate',
+                       page_size: int = 100, max_events: int = 1000,
+                       timeout: int = 10) -> Tuple[List[Dict[str, Any]], bool]:
+    """The oldest `max_events` events after `since`, oldest first, and whether there were more.
+
+    Frigate pages newest first, so this pages back to `since` and keeps the
+    oldest; the caller replays those and asks again from the newest one.
+    """
+    # Pages run newest to oldest: a full deque drops the newest
+    kept: deque = deque(maxlen=max_events)
+    total = 0
+    before = None
+    session = requests.Session()
+
+    while True:
+        params = {'label': label, 'after': since, 'limit': page_size, 'include_thumbnails': 0}
+        if before is not None:
+            params['before'] = before
+
+        response = session.get(f"{frigate_url}/api/events", params=params, timeout=timeout)
+        response.raise_for_status()
+        page = response.json()
+        if not page:
+            break
+
+        page.sort(key=lambda e: e.get('start_time', 0), reverse=True)
+        kept.extend(page)
+        total += len(page)
+        oldest = page[-1].get('start_time', since)
+        if len(page) < page_size or oldest <= since or oldest == before:
+            break
+        before = oldest
+
+    events = sorted(kept, key=lambda e: e.get('start_time', 0))
+    truncated = total > len(events)
+    if truncated:
+        logger.warning(f"{total} events since {since}, replaying the oldest {len(events)} first")
+    return events, truncated
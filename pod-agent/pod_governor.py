@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Resource Governor
+Sheds lower-priority work when the pod runs hot, so gate decisions stay fast.
+
+CPU load (smoothed) and SoC temperature are sampled every few seconds and
+mapped to a level: normal, warm, hot, critical. Each work class has the
+level at which it is shed, lowest priority first:
+
+  warm      live stream drops to a reduced rendition
+  hot       snapshots and uploads are deferred, idle streams are stopped,
+            the low-bitrate transcode stops
+  critical  streaming and clip recording stop
+
+Gate decisions are never shed. The level rises as soon as a threshold is
+crossed, but only steps back down once the readings are a hysteresis
+margin below the threshold and the current level has held for
+`min_dwell` seconds, so a pod hovering at a threshold doesn't flap.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Sequence
+
+import psutil
+
+logger = logging.getLogger('platebridge-pod.governor')
+
+LEVELS = ('normal', 'warm', 'hot', 'critical')
+
+# Work class -> first level at which it is shed
+SHED_AT = {
+    'streaming': 3,
+    'recording': 3,
+    'snapshots': 2,
+    'uploads': 2,
+    'transcoding': 2,
+}
+REDUCE_STREAM_AT = 1
+STOP_IDLE_STREAMS_AT = 2
+
+
+class ResourceGovernor:
+    def __init__(self, temp_levels: Sequence[float] = (70, 78, 85),
+                 cpu_levels: Sequence[float] = (85, 93, 98),
+                 temp_hysteresis: float = 5, cpu_hysteresis: float = 15,
+                 min_dwell: float = 30, interval: float = 5, smoothing: float = 0.3,
+                 read_temperature: Optional[Callable[[], Optional[float]]] = None,
+                 on_change: Optional[Callable[[int, int], None]] = None):
+        self.temp_levels = list(temp_levels)
+        self.cpu_levels = list(cpu_levels)
+        self.temp_hysteresis = temp_hysteresis
+        self.cpu_hysteresis = cpu_hysteresis
+        self.min_dwell = min_dwell
+        self.interval = interval
+        self.smoothing = smoothing
+        self.read_temperature = read_temperature or (lambda: None)
+        self.on_change = on_change
+
+        self.lock = threading.Lock()
+        self.level = 0
+        self.changed_at = time.monotonic()
+        self.cpu: Optional[float] = None
+        self.temperature: Optional[float] = None
+        self.reasons: List[str] = []
+        self.transitions = 0
+        self.time_in_level = [0.0] * len(LEVELS)
+        self.shed = {work_class: 0 for work_class in SHED_AT}
+
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @staticmethod
+    def _level_for(value: Optional[float], thresholds: List[float], margin: float = 0) -> int:
+        if value is None:
+            return 0
+        return sum(1 for threshold in thresholds if value >= threshold - margin)
+
+    def update(self, cpu: Optional[float], temperature: Optional[float]) -> int:
+        """Feed one reading; returns the (possibly new) level"""
+        with self.lock:
+            if cpu is not None:
+                self.cpu = cpu if self.cpu is None else self.cpu + self.smoothing * (cpu - self.cpu)
+            self.temperature = temperature
+
+            target = max(self._level_for(self.cpu, self.cpu_levels),
+                         self._level_for(self.temperature, self.temp_levels))
+            # Level the readings still justify with the hysteresis margin applied
+            holding = max(self._level_for(self.cpu, self.cpu_levels, self.cpu_hysteresis),
+                          self._level_for(self.temperature, self.temp_levels, self.temp_hysteresis))
+
+            old = self.level
+            now = time.monotonic()
+            if target > old:
+                new = target
+            elif holding < old and now - self.changed_at >= self.min_dwell:
+                new = old - 1
+            else:
+                new = old
+
+            if new != old:
+                self.time_in_level[old] += now - self.changed_at
+                self.level = new
+                self.changed_at = now
+                self.transitions += 1
+                self.reasons = self._reasons()
+
+        if new != old:
+            log = logger.warning if new > old else logger.info
+            log(f"Resource level {LEVELS[old]} -> {LEVELS[new]} "
+                f"(cpu {self.cpu or 0:.0f}%, temp {temperature if temperature is not None else 'n/a'})")
+            if self.on_change:
+                try:
+                    self.on_change(old, new)
+                except Exception as e:
+                    logger.error(f"Error applying resource level: {e}")
+        return new
+
+    def _reasons(self) -> List[str]:
+        reasons = []
+        if self._level_for(self.cpu, self.cpu_levels):
+            reasons.append(f"cpu {self.cpu:.0f}%")
+        if self._level_for(self.temperature, self.temp_levels):
+            reasons.append(f"temperature {self.temperature:.0f}C")
+        return reasons
+
+    def allows(self, work_class: str, count: bool = True) -> bool:
+        """False when this class of work should be skipped or deferred right now"""
+        if self.level < SHED_AT.get(work_class, len(LEVELS)):
+            return True
+        if count:
+            with self.lock:
+                self.shed[work_class] += 1
+        return False
+
+    @property
+    def reduce_stream(self) -> bool:
+        return self.level >= REDUCE_STREAM_AT
+
+    @property
+    def stop_idle_streams(self) -> bool:
+        return self.level >= STOP_IDLE_STREAMS_AT
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        psutil.cpu_percent(None)
+        self.thread = threading.Thread(target=self._run, name='resource-governor', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.update(psutil.cpu_percent(None), self.read_temperature())
+            except Exception as e:
+                logger.error(f"Resource governor error: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            now = time.monotonic()
+            time_in_level = list(self.time_in_level)
+            time_in_level[self.level] += now - self.changed_at
+            return {
+                'level': LEVELS[self.level],
+                'since_seconds': round(now - self.changed_at, 1),
+                'reasons': list(self.reasons),
+                'cpu': round(self.cpu, 1) if self.cpu is not None else None,
+                'temperature': self.temperature,
+                'shedding': sorted(c for c, level in SHED_AT.items() if self.level >= level),
+                'stream_reduced': self.level >= REDUCE_STREAM_AT,
+                'transitions': self.transitions,
+                'shed': dict(self.shed),
+                'seconds_by_level': {LEVELS[i]: round(t, 1) for i, t in enumerate(time_in_level)}
+            }
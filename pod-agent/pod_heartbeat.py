@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Heartbeat Protocol
+Keeps heartbeats small: static facts only when they change, stats as deltas.
+
+Protocol 1 is the original full JSON payload. A portal that understands
+protocol 2 says so in its heartbeat response ({"heartbeat": {"protocol": 2}})
+and from then on each heartbeat is a gzip-compressed envelope:
+
+  {"protocol": 2, "pod_id", "session", "seq",
+   "base":    seq the delta applies to, or null for a full state,
+   "static":  cameras, IPs, Tailscale, firmware - only when changed,
+   "stats":   {"dotted.path": value} changed since base (all when base is null),
+   "removed": ["dotted.path", ...] gone since base}
+
+The portal keeps the last state per pod and answers with the seq it now
+holds ("ack"); deltas are always computed against the last acknowledged
+state, so a lost response only costs a resync. When the portal can't apply
+a delta (restarted, different session, base mismatch) it answers 409 with
+"resync": true and the pod sends its full state. The portal can also set
+"interval" to slow the fleet down; failures back off up to max_interval.
+apply_heartbeat/reconstruct below are mirrored by the portal's
+app/api/pod/heartbeat/route.ts.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger('platebridge-pod.heartbeat')
+
+PROTOCOL = 2
+
+# Payload keys that describe the pod rather than its current load
+STATIC_KEYS = (
+    'ip_address', 'firmware_version', 'status', 'cameras',
+    'tailscale_ip', 'tailscale_hostname', 'tailscale_funnel_url'
+)
+
+
+def flatten(data: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
+    """{'a': {'b': 1}} -> {'a.b': 1}; lists and empty dicts are leaves"""
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            flat.update(flatten(value, f"{path}."))
+        else:
+            flat[path] = value
+    return flat
+
+
+def unflatten(flat: Dict[str, Any]) -> Dict[str, Any]:
+    data: Dict[str, Any] = {}
+    for path, value in flat.items():
+        node = data
+        *parents, leaf = path.split('.')
+        for part in parents:
+            node = node.setdefault(part, {})
+        node[leaf] = value
+    return data
+
+
+def static_hash(static: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(static, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class HeartbeatEncoder:
+    def __init__(self, pod_id: str, protocol: str = 'auto', compress_min_bytes: int = 256,
+                 interval: float = 60, min_interval: float = 15, max_interval: float = 600):
+        if str(protocol) not in ('auto', '1', '2'):
+            raise ValueError(f"Unknown heartbeat_protocol: {protocol}")
+
+        self.pod_id = pod_id
+        self.mode = str(protocol)
+        # Until the portal advertises protocol 2 (unless pinned)
+        self.protocol = 2 if self.mode == '2' else 1
+        self.compress_min_bytes = compress_min_bytes
+        self.base_interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.portal_interval: Optional[float] = None
+        self.interval = interval
+
+        self.session = uuid.uuid4().hex[:12]
+        self.seq = 0
+        # What the portal has acknowledged holding
+        self.acked_seq: Optional[int] = None
+        self.acked_stats: Dict[str, Any] = {}
+        self.acked_static: Optional[str] = None
+        # What the request in flight would make it hold
+        self.pending: Optional[Tuple[int, Dict[str, Any], str]] = None
+
+        self.stats = {
+            'sent': 0,
+            'full': 0,
+            'deltas': 0,
+            'resyncs': 0,
+            'failures': 0,
+            'bytes_sent': 0,
+            'bytes_full_json': 0
+        }
+
+    def set_intervals(self, interval: float, min_interval: float, max_interval: float):
+        self.base_interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = self._target_interval()
+
+    def _target_interval(self) -> float:
+        """The configured interval, unless the portal asked for another (within bounds)"""
+        if not self.portal_interval:
+            return self.base_interval
+        return max(self.min_interval, min(self.max_interval, self.portal_interval))
+
+    def reset(self):
+        """Forget what the portal holds; the next heartbeat carries full state"""
+        self.acked_seq = None
+        self.acked_stats = {}
+        self.acked_static = None
+
+    def encode(self, payload: Dict[str, Any]) -> Tuple[bytes, Dict[str, str]]:
+        """Request body and headers for this heartbeat"""
+        full_json = json.dumps(payload, default=str).encode()
+        self.stats['bytes_full_json'] += len(full_json)
+
+        if self.protocol < 2:
+            self.pending = None
+            return full_json, {'Content-Type': 'application/json'}
+
+        static = {key: payload[key] for key in STATIC_KEYS if key in payload}
+        stats = flatten({key: value for key, value in payload.items() if key not in STATIC_KEYS and key != 'pod_id'})
+        static_id = static_hash(static)
+
+        self.seq += 1
+        envelope: Dict[str, Any] = {
+            'protocol': PROTOCOL,
+            'pod_id': self.pod_id,
+            'session': self.session,
+            'seq': self.seq,
+            'base': self.acked_seq
+        }
+        if self.acked_seq is None:
+            envelope['static'] = static
+            envelope['stats'] = stats
+            self.stats['full'] += 1
+        else:
+            if static_id != self.acked_static:
+                envelope['static'] = static
+            envelope['stats'] = {
+                path: value for path, value in stats.items()
+                if path not in self.acked_stats or self.acked_stats[path] != value
+            }
+            removed = [path for path in self.acked_stats if path not in stats]
+            if removed:
+                envelope['removed'] = removed
+            self.stats['deltas'] += 1
+        self.pending = (self.seq, stats, static_id)
+
+        body = json.dumps(envelope, default=str, separators=(',', ':')).encode()
+        headers = {'Content-Type': 'application/json', 'X-Heartbeat-Protocol': str(PROTOCOL)}
+        if len(body) >= self.compress_min_bytes:
+            body = gzip.compress(body, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+        return body, headers
+
+    def handle_response(self, status: int, result: Optional[Dict[str, Any]],
+                        retry_after: Optional[float] = None) -> bool:
+        """Update protocol, acknowledged state and interval; True when a resync is needed now"""
+        info = (result or {}).get('heartbeat') or {}
+        resync = False
+
+        if status == 200:
+            self.stats['sent'] += 1
+            advertised = info.get('protocol', 1)
+            if self.mode == 'auto' and advertised >= PROTOCOL and self.protocol < PROTOCOL:
+                logger.info(f"Portal supports heartbeat protocol {PROTOCOL}, switching to deltas")
+                self.protocol = PROTOCOL
+                self.reset()
+            elif self.protocol >= PROTOCOL and self.pending and info.get('ack') == self.pending[0]:
+                self.acked_seq, self.acked_stats, self.acked_static = self.pending
+            if info.get('interval'):
+                self.portal_interval = float(info['interval'])
+            self.interval = self._target_interval()
+
+        elif status == 409 and info.get('resync'):
+            logger.info("Portal lost heartbeat state, sending full state")
+            self.stats['resyncs'] += 1
+            self.reset()
+            resync = True
+
+        elif status in (400, 415) and self.protocol >= PROTOCOL and self.mode == 'auto':
+            # Portal rolled back to a version without protocol 2
+            logger.warning(f"Portal rejected heartbeat protocol {PROTOCOL} (HTTP {status}), falling back to full heartbeats")
+            self.protocol = 1
+            self.reset()
+            resync = True
+
+        else:
+            self.stats['failures'] += 1
+            self.interval = max(self.interval, min(self.max_interval, max(self.interval * 2, retry_after or 0)))
+
+        self.pending = None
+        return resync
+
+    def handle_error(self):
+        self.stats['failures'] += 1
+        self.pending = None
+        self.interval = max(self.interval, min(self.max_interval, self.interval * 2))
+
+    def record_sent(self, size: int):
+        self.stats['bytes_sent'] += size
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats['protocol'] = self.protocol
+        stats['interval'] = self.interval
+        if stats['bytes_full_json']:
+            stats['bytes_ratio'] = round(stats['bytes_sent'] / stats['bytes_full_json'], 3)
+        return stats
+
+
+def apply_heartbeat(state: Optional[Dict[str, Any]], envelope: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Portal side: new per-pod state after a protocol 2 heartbeat, or None if it needs a resync"""
+    base = envelope.get('base')
+    if base is None:
+        stats = dict(envelope.get('stats') or {})
+        static = dict(envelope.get('static') or {})
+    else:
+        if not state or state.get('session') != envelope.get('session') or state.get('seq') != base:
+            return None
+        stats = dict(state['stats'])
+        stats.update(envelope.get('stats') or {})
+        for path in envelope.get('removed') or []:
+            stats.pop(path, None)
+        static = envelope['static'] if 'static' in envelope else state['static']
+
+    return {
+        'session': envelope.get('session'),
+        'seq': envelope.get('seq'),
+        'static': static,
+        'stats': stats
+    }
+
+
+def reconstruct(state: Dict[str, Any], pod_id: str) -> Dict[str, Any]:
+    """The protocol 1 payload a pod state corresponds to"""
+    payload = {'pod_id': pod_id}
+    payload.update(state['static'])
+    payload.update(unflatten(state['stats']))
+    return payload
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Detection History
+Local SQLite log of every plate decision, queryable while the portal is away.
+
+Detections are appended by a writer thread in small batches (WAL mode, so
+readers - including the stream server in multi-process mode - never block
+the detection path). Rows are indexed by normalized plate, time and camera;
+queries are newest-first with keyset pagination, so page N costs the same
+as page 1. Rows older than the retention window are pruned in the
+background.
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from pod_plates import normalize_plate
+
+logger = logging.getLogger('platebridge-pod.history')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    plate TEXT NOT NULL,
+    plate_norm TEXT NOT NULL,
+    camera TEXT,
+    action TEXT,
+    gate_opened INTEGER NOT NULL DEFAULT 0,
+    confidence REAL,
+    backfill INTEGER NOT NULL DEFAULT 0,
+    event_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_detections_plate_ts ON detections (plate_norm, ts);
+CREATE INDEX IF NOT EXISTS idx_detections_ts ON detections (ts);
+CREATE INDEX IF NOT EXISTS idx_detections_camera_ts ON detections (camera, ts);
+"""
+
+COLUMNS = ('id', 'ts', 'plate', 'camera', 'action', 'gate_opened', 'confidence', 'backfill', 'event_id')
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(ts: float, row_id: int) -> str:
+    return f"{ts!r}:{row_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    ts, row_id = cursor.rsplit(':', 1)
+    return float(ts), int(row_id)
+
+
+class DetectionHistory:
+    def __init__(self, path: str, retention_days: float = 90, batch_size: int = 200,
+                 flush_interval: float = 0.5, prune_interval: float = 3600):
+        self.path = path
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.prune_interval = prune_interval
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        self.pending: 'queue.Queue' = queue.Queue()
+        self.local = threading.local()
+        self.thread = None
+        self.stopped = threading.Event()
+        self.stats = {'recorded': 0, 'pruned': 0, 'queries': 0, 'write_errors': 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+        return conn
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name='detection-history', daemon=True)
+        self.thread.start()
+        logger.info(f"Detection history at {self.path} ({self.retention_days} day retention)")
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join(10)
+
+    def record(self, plate: str, ts: Optional[float] = None, camera: Optional[str] = None,
+               action: Optional[str] = None, gate_opened: bool = False, confidence: Optional[float] = None,
+               backfill: bool = False, event_id: Optional[str] = None):
+        """Queue one decision; never blocks on disk"""
+        self.pending.put((
+            ts or time.time(), plate, normalize_plate(plate), camera, action,
+            int(bool(gate_opened)), confidence, int(bool(backfill)), event_id or None
+        ))
+
+    def _run(self):
+        conn = self._connect()
+        last_prune = 0.0
+
+        while not self.stopped.is_set() or not self.pending.empty():
+            try:
+                rows = [self.pending.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                rows = []
+            while rows and len(rows) < self.batch_size:
+                try:
+                    rows.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+
+            if rows:
+                try:
+                    with conn:
+                        conn.executemany(
+                            'INSERT INTO detections (ts, plate, plate_norm, camera, action, gate_opened, '
+                            'confidence, backfill, event_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                            rows
+                        )
+                    self.stats['recorded'] += len(rows)
+                except sqlite3.Error as e:
+                    self.stats['write_errors'] += 1
+                    logger.error(f"Error writing detection history: {e}")
+
+            if self.retention_days and time.time() - last_prune >= self.prune_interval:
+                last_prune = time.time()
+                self.prune(conn)
+
+        conn.close()
+
+    def prune(self, conn: Optional[sqlite3.Connection] = None):
+        conn = conn or self._reader()
+        cutoff = time.time() - self.retention_days * 86400
+        try:
+            # Small batches so a long-overdue prune doesn't hold the write lock for long
+            while True:
+                with conn:
+                    deleted = conn.execute(
+                        'DELETE FROM detections WHERE id IN '
+                        '(SELECT id FROM detections WHERE ts < ? ORDER BY ts LIMIT 5000)',
+                        (cutoff,)
+                    ).rowcount
+                self.stats['pruned'] += deleted
+                if deleted < 5000:
+                    break
+        except sqlite3.Error as e:
+            logger.error(f"Error pruning detection history: {e}")
+
+    def query(self, plate_prefix: Optional[str] = None, camera: Optional[str] = None,
+              since: Optional[float] = None, until: Optional[float] = None, action: Optional[str] = None,
+              limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Newest-first page of detections plus the cursor for the next page"""
+        clauses: List[str] = []
+        params: List[Any] = []
+
+        if plate_prefix:
+            prefix = normalize_plate(plate_prefix)
+            # Range instead of LIKE so SQLite can walk the plate index
+            clauses.append('plate_norm >= ? AND plate_norm < ?')
+            params += [prefix, prefix + '\uffff']
+        if camera:
+            clauses.append('camera = ?')
+            params.append(camera)
+        if since is not None:
+            clauses.append('ts >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('ts < ?')
+            params.append(until)
+        if action:
+            clauses.append('action = ?')
+            params.append(action)
+        if cursor:
+            cursor_ts, cursor_id = decode_cursor(cursor)
+            clauses.append('(ts < ? OR (ts = ? AND id < ?))')
+            params += [cursor_ts, cursor_ts, cursor_id]
+
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        sql = f"SELECT {', '.join(COLUMNS)} FROM detections"
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY ts DESC, id DESC LIMIT ?'
+        params.append(limit + 1)
+
+        rows = self._reader().execute(sql, params).fetchall()
+        self.stats['queries'] += 1
+
+        detections = [dict(zip(COLUMNS, row)) for row in rows[:limit]]
+        for detection in detections:
+            detection['gate_opened'] = bool(detection['gate_opened'])
+            detection['backfill'] = bool(detection['backfill'])
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = detections[-1]
+            next_cursor = encode_cursor(last['ts'], last['id'])
+
+        return {'detections': detections, 'next_cursor': next_cursor}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, pending=self.pending.qsize())
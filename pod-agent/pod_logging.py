@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Logging
+Keeps log formatting and disk writes off the detection path.
+
+Every handler call in the agent only drops the record on a bounded queue;
+a single listener thread formats it and writes it out (console, and
+optionally a size-capped rotating file). On SD-card pods a write can stall
+for tens of milliseconds, and that used to land on the MQTT thread before
+the portal call. When the queue is full, records are dropped and counted
+rather than blocking the caller.
+
+Lines tagged with `extra={'sample': key}` (heartbeat chatter, whitelist
+refreshes) are let through at most once per `log_sample_interval` seconds
+per key; the next one that gets through says how many were suppressed.
+Context passed in `extra` (event_id, camera, plate, ...) becomes fields of
+the JSON output.
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# `extra` keys copied into JSON records
+CONTEXT_FIELDS = ('event_id', 'camera', 'plate', 'action', 'gate_opened', 'confidence', 'backfill', 'latency_ms')
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        return f"{text} ({suppressed} similar suppressed)" if suppressed else text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SampleFilter(logging.Filter):
+    """Let a tagged line through once per interval per key, counting the rest"""
+
+    def __init__(self, interval: float = 60):
+        super().__init__()
+        self.interval = interval
+        self.lock = threading.Lock()
+        # key -> [last emitted at, suppressed since]
+        self.keys: Dict[str, list] = {}
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, 'sample', None)
+        if key is None or self.interval <= 0 or record.levelno >= logging.WARNING:
+            return True
+
+        now = time.monotonic()
+        with self.lock:
+            state = self.keys.get(key)
+            if state and now - state[0] < self.interval:
+                state[1] += 1
+                self.suppressed += 1
+                return False
+            record.suppressed = state[1] if state else 0
+            self.keys[key] = [now, 0]
+        return True
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener untouched and never blocks the caller"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same process, so the record (args, exc_info) can cross as-is;
+        # formatting happens on the listener thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    def __init__(self, handlers, queue_size: int = 10000, sample_interval: float = 60,
+                 level: int = logging.INFO):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = AsyncQueueHandler(self.queue)
+        self.sampler = SampleFilter(sample_interval)
+        self.handler.addFilter(self.sampler)
+        self.handlers = handlers
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.level = level
+
+    def start(self):
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+        self.listener.start()
+
+    def stop(self):
+        """Flush what's queued and put a plain synchronous handler back"""
+        root = logging.getLogger()
+        root.removeHandler(self.handler)
+        if self.listener._thread:
+            self.listener.stop()
+        for handler in self.handlers:
+            handler.close()
+        fallback = logging.StreamHandler()
+        fallback.setFormatter(TextFormatter())
+        root.addHandler(fallback)
+
+    def set_level(self, level: int):
+        self.level = level
+        logging.getLogger().setLevel(level)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'queued': self.queue.qsize(),
+            'dropped': self.handler.dropped,
+            'suppressed': self.sampler.suppressed,
+            'sample_interval': self.sampler.interval
+        }
+
+
+def parse_level(value) -> int:
+    if isinstance(value, int):
+        return value
+    level = logging.getLevelName(str(value).upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log_level: {value}")
+    return level
+
+
+def build_handlers(config: Dict[str, Any], role: Optional[str] = None):
+    console = logging.StreamHandler(sys.stderr)
+    if config.get('log_format', 'text') == 'json':
+        console.setFormatter(JsonFormatter())
+    else:
+        console.setFormatter(TextFormatter())
+    handlers = [console]
+
+    log_file = config.get('log_file')
+    if log_file:
+        if role and role != 'all':
+            # Each process of multi-process mode rotates its own file
+            stem, dot, ext = log_file.rpartition('.')
+            log_file = f"{stem}-{role}.{ext}" if dot else f"{log_file}-{role}"
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=config.get('log_max_mb', 10) * 1024 * 1024,
+            backupCount=config.get('log_backups', 3),
+            encoding='utf-8'
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    return handlers
+
+
+def setup_logging(config: Dict[str, Any], role: Optional[str] = None) -> Optional[LogPipeline]:
+    """Route all logging through the queue; None when log_async is off (no sampling then)"""
+    level = parse_level(config.get('log_level', 'INFO'))
+    if not config.get('log_async', True):
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in build_handlers(config, role):
+            root.addHandler(handler)
+        root.setLevel(level)
+        return None
+
+    pipeline = LogPipeline(
+        build_handlers(config, role),
+        queue_size=config.get('log_queue_size', 10000),
+        sample_interval=config.get('log_sample_interval', 60),
+        level=level
+    )
+    pipeline.start()
+    return pipeline
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Media Probe
+Probes each camera stream once with ffprobe and caches what it finds
+(codecs, resolution, fps, keyframe interval) so ffmpeg pipelines can copy
+instead of transcoding wherever the output container allows it.
+
+Results are cached on disk keyed by a hash of the RTSP URL (URLs usually
+carry credentials) and refreshed after `ttl` seconds, or sooner when a
+pipeline fails and the caller invalidates the entry. A stream that fails to
+probe isn't probed again for `retry_interval` seconds, and callers that
+can't wait (a viewer, a recording under the scheduler lock) peek at the
+cache and leave the probe to refresh_async. Given the agent's
+ChildLauncher, ffprobe runs in the maintenance work class.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger('platebridge-pod.media')
+
+# Video codecs every HLS player handles in MPEG-TS segments
+HLS_COPY_VIDEO = {'h264'}
+# Codecs that can be stream-copied into an MP4 container
+MP4_COPY_VIDEO = {'h264', 'hevc', 'mpeg4', 'av1'}
+MP4_COPY_AUDIO = {'aac', 'mp3', 'opus'}
+
+
+def _parse_rate(rate: Optional[str]) -> Optional[float]:
+    if not rate or rate in ('0/0', '0'):
+        return None
+    try:
+        if '/' in rate:
+            num, den = rate.split('/')
+            return float(num) / float(den) if float(den) else None
+        return float(rate)
+    except ValueError:
+        return None
+
+
+class MediaProbe:
+    def __init__(self, cache_path: str = 'media_probe_cache.json', ttl: float = 86400,
+                 gop_sample_seconds: int = 6, timeout: int = 20, retry_interval: float = 300,
+                 launcher=None):
+        self.cache_path = Path(cache_path)
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.gop_sample_seconds = gop_sample_seconds
+        self.timeout = timeout
+        self.launcher = launcher
+        self.lock = threading.Lock()
+        self.cache: Dict[str, Dict[str, Any]] = {}
+        # cache key -> when its last probe failed
+        self.failed_at: Dict[str, float] = {}
+        # cache keys with a background probe running
+        self.probing = set()
+        self.probe_count = 0
+        self.load_cache()
+
+    @staticmethod
+    def cache_key(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()[:16]
+
+    def load_cache(self):
+        if self.cache_path.exists():
+            try:
+                with open(self.cache_path, 'r') as f:
+                    self.cache = json.load(f)
+                logger.info(f"Loaded media probe cache: {len(self.cache)} streams")
+            except Exception as e:
+                logger.error(f"Error loading media probe cache: {e}")
+
+    def save_cache(self):
+        try:
+            with open(self.cache_path, 'w') as f:
+                json.dump(self.cache, f, indent=2)
+        except Exception as e:
+            logger.error(f"Error saving media probe cache: {e}")
+
+    def get(self, url: str, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Cached stream info, probing when missing, stale or refresh is requested"""
+        key = self.cache_key(url)
+
+        with self.lock:
+            info = self.cache.get(key)
+            if not refresh and (self.is_fresh(info) or self.recently_failed(key)):
+                return info
+
+        probed = self.probe(url)
+        if not probed:
+            with self.lock:
+                self.failed_at[key] = time.time()
+            # Keep serving the last known answer rather than nothing
+            return info
+
+        with self.lock:
+            self.failed_at.pop(key, None)
+            if info and self.fingerprint(info) != self.fingerprint(probed):
+                logger.info(f"Stream {key} changed: {self.fingerprint(info)} -> {self.fingerprint(probed)}")
+            self.cache[key] = probed
+            self.save_cache()
+
+        return probed
+
+    def peek(self, url: str) -> Optional[Dict[str, Any]]:
+        """Cached stream info without ever blocking on ffprobe"""
+        with self.lock:
+            return self.cache.get(self.cache_key(url))
+
+    def refresh_async(self, url: str, refresh: bool = False):
+        """Probe in the background if the cached info is missing or stale; one probe per stream at a time"""
+        key = self.cache_key(url)
+        with self.lock:
+            if key in self.probing:
+                return
+            if not refresh and (self.is_fresh(self.cache.get(key)) or self.recently_failed(key)):
+                return
+            self.probing.add(key)
+
+        def run():
+            try:
+                self.get(url, refresh)
+            finally:
+                with self.lock:
+                    self.probing.discard(key)
+
+        threading.Thread(target=run, name='media-probe', daemon=True).start()
+
+    def is_fresh(self, info: Optional[Dict[str, Any]]) -> bool:
+        return bool(info) and time.time() - info.get('probed_at', 0) < self.ttl
+
+    def recently_failed(self, key: str) -> bool:
+        return time.time() - self.failed_at.get(key, 0) < self.retry_interval
+
+    def invalidate(self, url: str):
+        with self.lock:
+            if self.cache.pop(self.cache_key(url), None) is not None:
+                self.save_cache()
+
+    @staticmethod
+    def fingerprint(info: Dict[str, Any]) -> str:
+        return (f"{info.get('video_codec')} {info.get('width')}x{info.get('height')}"
+                f"@{info.get('fps')} gop={info.get('gop_seconds')} audio={info.get('audio_codec')}")
+
+    def _run_ffprobe(self, url: str, args: List[str]) -> Optional[Dict[str, Any]]:
+        cmd = ['ffprobe', '-v', 'error', '-of', 'json']
+        if url.startswith('rtsp'):
+            cmd += ['-rtsp_transport', 'tcp']
+        cmd += args + [url]
+        try:
+            if self.launcher:
+                # Background work; never ahead of the live stream or recordings
+                result = self.launcher.run('maintenance', cmd, stdin=subprocess.DEVNULL, capture_output=True,
+                                           text=True, timeout=self.timeout)
+            else:
+                result = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True, text=True,
+                                        timeout=self.timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"ffprobe failed: {e}")
+            return None
+
+        if result.returncode != 0:
+            logger.warning(f"ffprobe failed: {result.stderr.strip()[:200]}")
+            return None
+
+        try:
+            return json.loads(result.stdout)
+        except ValueError:
+            return None
+
+    def probe(self, url: str) -> Optional[Dict[str, Any]]:
+        data = self._run_ffprobe(url, ['-show_streams'])
+        if not data:
+            return None
+
+        self.probe_count += 1
+        streams = data.get('streams', [])
+        video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+        audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+
+        info = {
+            'video_codec': video.get('codec_name') if video else None,
+            'width': video.get('width') if video else None,
+            'height': video.get('height') if video else None,
+            'fps': None,
+            'gop_seconds': None,
+            'audio_codec': audio.get('codec_name') if audio else None,
+            'probed_at': time.time()
+        }
+
+        if video:
+            fps = _parse_rate(video.get('avg_frame_rate')) or _parse_rate(video.get('r_frame_rate'))
+            info['fps'] = round(fps, 2) if fps else None
+            info['gop_seconds'] = self.probe_gop(url)
+
+        logger.info(f"Probed stream {self.cache_key(url)}: {self.fingerprint(info)}")
+        return info
+
+    def probe_gop(self, url: str) -> Optional[float]:
+        """Median spacing of keyframes over a short sample of the stream"""
+        data = self._run_ffprobe(url, [
+            '-select_streams', 'v:0',
+            '-show_entries', 'packet=pts_time,flags',
+            '-read_intervals', f"%+{self.gop_sample_seconds}"
+        ])
+        if not data:
+            return None
+
+        keyframes = []
+        for packet in data.get('packets', []):
+            if 'K' in packet.get('flags', '') and packet.get('pts_time') not in (None, 'N/A'):
+                keyframes.append(float(packet['pts_time']))
+
+        if len(keyframes) < 2:
+            return None
+
+        gaps = sorted(b - a for a, b in zip(keyframes, keyframes[1:]) if b > a)
+        if not gaps:
+            return None
+        return round(gaps[len(gaps) // 2], 3)
+
+
+def hls_copies_video(info: Optional[Dict[str, Any]]) -> bool:
+    return not info or info.get('video_codec') in HLS_COPY_VIDEO
+
+
+def hls_segment_seconds(info: Optional[Dict[str, Any]], target: float = 2) -> float:
+    """Smallest multiple of the keyframe interval that reaches the target length"""
+    gop = info.get('gop_seconds') if info else None
+    if not hls_copies_video(info) or not gop or gop <= 0:
+        # Transcoded output gets keyframes forced at the target instead
+        return target
+    return round(max(1, math.ceil(target / gop - 1e-6)) * gop, 3)
+
+
+def hls_codec_args(info: Optional[Dict[str, Any]], segment_seconds: float = 2,
+                   reduced: bool = False) -> List[str]:
+    """ffmpeg codec args for the live stream; `reduced` trades quality for CPU on a hot pod"""
+    if not info:
+        # Unknown stream: the original safe defaults
+        return ['-c:v', 'copy', '-an'] if reduced else ['-c:v', 'copy', '-c:a', 'aac']
+
+    if hls_copies_video(info):
+        args = ['-c:v', 'copy']
+    elif reduced:
+        args = ['-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'zerolatency',
+                '-vf', 'scale=-2:min(ih\\,480)', '-r', '10',
+                '-force_key_frames', f"expr:gte(t,n_forced*{segment_seconds})"]
+    else:
+        args = ['-c:v', 'libx264', '-preset', 'veryfast', '-tune', 'zerolatency',
+                '-force_key_frames', f"expr:gte(t,n_forced*{segment_seconds})"]
+
+    audio = info.get('audio_codec')
+    if not audio or reduced:
+        args.append('-an')
+    elif audio == 'aac':
+        args += ['-c:a', 'copy']
+    else:
+        args += ['-c:a', 'aac']
+
+    return args
+
+
+def clip_codec_args(info: Optional[Dict[str, Any]]) -> List[str]:
+    if not info:
+        return ['-c', 'copy']
+
+    args = ['-c:v', 'copy'] if info.get('video_codec') in MP4_COPY_VIDEO else \
+        ['-c:v', 'libx264', '-preset', 'veryfast']
+
+    audio = info.get('audio_codec')
+    if not audio:
+        args.append('-an')
+    elif audio in MP4_COPY_AUDIO:
+        args += ['-c:a', 'copy']
+    else:
+        # e.g. G.711 (pcm_mulaw/pcm_alaw) from IP cameras is not valid in MP4
+        args += ['-c:a', 'aac']
+
+    return args
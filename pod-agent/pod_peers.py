@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Peer Whitelist Sharing
+Lets the pods at one site share a single portal whitelist fetch over the LAN.
+
+Pods find each other from a static `peers` list and/or UDP broadcast
+announcements, and agree on a leader (the live pod with the lowest pod_id
+in the same community). Only the leader pulls /api/access/list from the
+portal. It keeps a versioned snapshot plus a short history of deltas, and
+followers pull whatever they are missing from it over HTTP:
+
+  GET /peer/status                          -> {pod_id, community_id, epoch, version, leader}
+  GET /peer/whitelist?epoch=<e>&since=<v>   -> delta since v, or full snapshot
+
+`epoch` identifies one leader process, so a follower that switches leader
+(or misses too many versions) gets a snapshot instead of a delta. If the
+leader disappears, the next pod in line takes over; if a follower can't
+reach the leader, the agent falls back to fetching from the portal itself.
+Peer requests carry the site's shared `peer_secret`.
+"""
+
+import hmac
+import json
+import logging
+import socket
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Any, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+logger = logging.getLogger('platebridge-pod.peers')
+
+
+def plate_key(entry: Dict[str, Any]) -> str:
+    return entry.get('license_plate') or entry.get('plate') or ''
+
+
+class WhitelistVersions:
+    """Leader-side snapshot with a bounded delta history"""
+
+    def __init__(self, history: int = 20):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.deltas = deque(maxlen=history)
+
+    def publish(self, access_list: List[Dict[str, Any]]) -> bool:
+        """Record a fresh portal list; True if it changed"""
+        entries = {plate_key(e): e for e in access_list if plate_key(e)}
+        with self.lock:
+            upserts = {k: v for k, v in entries.items() if self.entries.get(k) != v}
+            removed = [k for k in self.entries if k not in entries]
+            if not upserts and not removed and self.version:
+                return False
+            self.version += 1
+            self.entries = entries
+            self.deltas.append((self.version, upserts, removed))
+            return True
+
+    def since(self, version: int) -> Optional[Dict[str, Any]]:
+        """Merged delta from `version` to now, or None if history doesn't reach back that far"""
+        with self.lock:
+            if version == self.version:
+                return {'upserts': {}, 'removed': []}
+            if not self.deltas or version < self.deltas[0][0] - 1 or version > self.version:
+                return None
+
+            upserts: Dict[str, Any] = {}
+            removed = set()
+            for delta_version, delta_upserts, delta_removed in self.deltas:
+                if delta_version <= version:
+                    continue
+                for key, entry in delta_upserts.items():
+                    upserts[key] = entry
+                    removed.discard(key)
+                for key in delta_removed:
+                    upserts.pop(key, None)
+                    removed.add(key)
+            return {'upserts': upserts, 'removed': sorted(removed)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {'version': self.version, 'entries': list(self.entries.values())}
+
+
+class PeerHandler(BaseHTTPRequestHandler):
+    group: 'PeerGroup' = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status: int, body: Dict[str, Any]):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        group = self.group
+        auth = self.headers.get('Authorization', '')
+        if not hmac.compare_digest(auth.encode(), f"Bearer {group.secret}".encode()):
+            return self._json(401, {'error': 'Invalid peer secret'})
+
+        url = urlparse(self.path)
+        if url.path == '/peer/status':
+            return self._json(200, group.status())
+
+        if url.path == '/peer/whitelist':
+            if not group.is_leader():
+                return self._json(409, {'error': 'Not the leader', 'leader': group.leader_id})
+
+            query = parse_qs(url.query)
+            epoch = query.get('epoch', [''])[0]
+            try:
+                since = int(query.get('since', ['0'])[0])
+            except ValueError:
+                since = 0
+
+            group.stats['served'] += 1
+            delta = group.versions.since(since) if epoch == group.epoch else None
+            if delta is not None:
+                return self._json(200, {'type': 'delta', 'epoch': group.epoch,
+                                        'version': group.versions.version, 'base': since, **delta})
+            return self._json(200, {'type': 'snapshot', 'epoch': group.epoch, **group.versions.snapshot()})
+
+        return self._json(404, {'error': 'Not found'})
+
+
+class PeerGroup:
+    def __init__(self, pod_id: str, secret: str, port: int = 8765,
+                 static_peers: Optional[List[str]] = None, discovery_port: int = 0,
+                 interval: float = 5, timeout: float = 20,
+                 on_update: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                 on_leader: Optional[Callable[[], None]] = None):
+        self.pod_id = pod_id
+        self.secret = secret
+        self.port = port
+        self.static_peers = [p if ':' in p else f"{p}:{port}" for p in (static_peers or [])]
+        self.discovery_port = discovery_port
+        self.interval = interval
+        self.timeout = timeout
+        self.on_update = on_update
+        self.on_leader = on_leader
+
+        self.community_id: Optional[str] = None
+        self.epoch = f"{pod_id}:{int(time.time() * 1000)}"
+        self.versions = WhitelistVersions()
+        self.peers: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.leader_id: Optional[str] = None
+        # Follower side: which leader epoch/version we last applied
+        self.synced_epoch: Optional[str] = None
+        self.synced_version = 0
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.sync_lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f"Bearer {secret}"
+        self.server = None
+        self.stopped = threading.Event()
+        self.stats = {
+            'portal_fetches': 0,
+            'peer_syncs': 0,
+            'snapshots': 0,
+            'deltas': 0,
+            'served': 0,
+            'bytes_from_peers': 0,
+            'sync_errors': 0,
+            'leader_changes': 0
+        }
+
+    def start(self):
+        handler = type('Handler', (PeerHandler,), {'group': self})
+        self.server = ThreadingHTTPServer(('0.0.0.0', self.port), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='peer-server', daemon=True).start()
+
+        if self.discovery_port:
+            threading.Thread(target=self._listen, name='peer-discovery', daemon=True).start()
+        threading.Thread(target=self._run, name='peer-group', daemon=True).start()
+        logger.info(f"Peer mode on port {self.port} ({len(self.static_peers)} static peers"
+                    f"{', broadcast discovery' if self.discovery_port else ''})")
+
+    def stop(self):
+        self.stopped.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def is_leader(self) -> bool:
+        return self.leader_id == self.pod_id
+
+    def status(self) -> Dict[str, Any]:
+        leader = self.is_leader()
+        return {
+            'pod_id': self.pod_id,
+            'community_id': self.community_id,
+            'port': self.port,
+            'leader': leader,
+            'leader_id': self.leader_id,
+            'epoch': self.epoch if leader else self.synced_epoch,
+            'version': self.versions.version if leader else self.synced_version
+        }
+
+    def _seen(self, info: Dict[str, Any], host: str):
+        pod_id = info.get('pod_id')
+        if not pod_id or pod_id == self.pod_id:
+            return
+        if self.community_id and info.get('community_id') != self.community_id:
+            return
+        with self.lock:
+            self.peers[pod_id] = dict(info, address=f"{host}:{info.get('port', self.port)}", last_seen=time.time())
+
+    def _poll_static(self):
+        for address in self.static_peers:
+            try:
+                response = self.session.get(f"http://{address}/peer/status", timeout=2)
+                if response.status_code == 200:
+                    self._seen(response.json(), address.rsplit(':', 1)[0])
+            except requests.RequestException:
+                pass
+
+    def _announce(self):
+        message = json.dumps(self.status()).encode()
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            try:
+                sock.sendto(message, ('<broadcast>', self.discovery_port))
+            except OSError as e:
+                logger.debug(f"Peer announce failed: {e}")
+
+    def _listen(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(('', self.discovery_port))
+        sock.settimeout(1)
+        while not self.stopped.is_set():
+            try:
+                data, (host, _) = sock.recvfrom(4096)
+                self._seen(json.loads(data), host)
+            except socket.timeout:
+                continue
+            except (OSError, ValueError):
+                continue
+        sock.close()
+
+    def elect(self):
+        now = time.time()
+        with self.lock:
+            self.peers = {k: v for k, v in self.peers.items() if now - v['last_seen'] < self.timeout}
+            candidates = [self.pod_id] + list(self.peers)
+
+        # A pod that doesn't know its community yet can't vouch for its peers
+        leader = min(candidates) if self.community_id else self.pod_id
+        if leader != self.leader_id:
+            previous, self.leader_id = self.leader_id, leader
+            self.stats['leader_changes'] += 1
+            logger.info(f"Whitelist leader: {leader}{' (this pod)' if leader == self.pod_id else ''}")
+            if leader == self.pod_id and previous is not None and self.on_leader:
+                self.on_leader()
+
+    def publish(self, access_list: List[Dict[str, Any]]):
+        """Record a portal fetch; served to followers while this pod leads"""
+        self.stats['portal_fetches'] += 1
+        if self.versions.publish(access_list) and self.is_leader():
+            logger.info(f"Whitelist version {self.versions.version} published to peers")
+
+    def sync_from_leader(self) -> bool:
+        """Follower: bring our copy up to the leader's version; False if we should use the portal"""
+        if self.is_leader() or not self.leader_id:
+            return False
+
+        with self.lock:
+            leader = self.peers.get(self.leader_id)
+        if not leader:
+            return False
+
+        with self.sync_lock:
+            return self._sync(leader)
+
+    def _sync(self, leader: Dict[str, Any]) -> bool:
+        try:
+            response = self.session.get(
+                f"http://{leader['address']}/peer/whitelist",
+                params={'epoch': self.synced_epoch or '', 'since': self.synced_version},
+                timeout=5
+            )
+            response.raise_for_status()
+            data = response.json()
+            self.stats['bytes_from_peers'] += len(response.content)
+        except (requests.RequestException, ValueError) as e:
+            self.stats['sync_errors'] += 1
+            logger.warning(f"Whitelist sync from {self.leader_id} failed: {e}")
+            return False
+
+        if not data.get('version'):
+            # Leader hasn't reached the portal yet
+            return False
+
+        if data['type'] == 'snapshot':
+            self.entries = {plate_key(e): e for e in data.get('entries', []) if plate_key(e)}
+            self.stats['snapshots'] += 1
+        else:
+            if data.get('version') == self.synced_version and data.get('epoch') == self.synced_epoch:
+                return True
+            for key in data.get('removed', []):
+                self.entries.pop(key, None)
+            self.entries.update(data.get('upserts', {}))
+            self.stats['deltas'] += 1
+
+        self.synced_epoch = data['epoch']
+        self.synced_version = data['version']
+        self.stats['peer_syncs'] += 1
+        logger.info(f"Whitelist synced from {self.leader_id}: version {self.synced_version} ({data['type']})")
+
+        if self.on_update:
+            self.on_update(list(self.entries.values()))
+        return True
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                if self.discovery_port:
+                    self._announce()
+                self._poll_static()
+                self.elect()
+
+                if not self.is_leader():
+                    with self.lock:
+                        leader = self.peers.get(self.leader_id) or {}
+                    if leader.get('version') and (leader.get('epoch') != self.synced_epoch or
+                                                  leader['version'] > self.synced_version):
+                        self.sync_from_leader()
+            except Exception as e:
+                logger.error(f"Peer group error: {e}")
+
+            self.stopped.wait(self.interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            peers = sorted(self.peers)
+        leader = self.is_leader()
+        return dict(
+            self.stats,
+            role='leader' if leader else 'follower',
+            leader=self.leader_id,
+            peers=peers,
+            version=self.versions.version if leader else self.synced_version
+        )
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Plate Prefilter
+Drops implausible OCR reads before they cost a snapshot, a portal call
+and a recording.
+
+Every read is normalized in one pass (uppercase, separators removed) and
+matched against a single compiled regex built from the configured
+regions' plate formats plus any custom patterns. Reads that fail are
+rejected, or quarantined (kept locally for review, never sent on) when
+plate_filter_mode is "quarantine"; the latest quarantined reads are listed
+as plate_quarantine in /health. Reads arrive on the MQTT thread, so each
+drop is only logged at DEBUG; the counters (per reason and per camera) go
+out with /health and the heartbeat.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger('platebridge-pod.plates')
+
+# Formats as normalized text (A-Z, 0-9 only). Deliberately loose per
+# region: the goal is to stop OCR garbage, not to validate registrations.
+PLATE_FORMATS = {
+    # Any US plate incl. vanity: 2-8 characters. Only a length check; name
+    # the state (US-CA, ...) to check the format
+    'US': [r'[A-Z0-9]{2,8}'],
+    'US-CA': [r'\d[A-Z]{3}\d{3}', r'\d[A-Z]\d{5}'],
+    'US-TX': [r'[A-Z]{3}\d{4}', r'[A-Z]{2}\d[A-Z]\d{3}'],
+    'US-FL': [r'[A-Z]{3,4}[A-Z0-9]\d{2}', r'\d{3}[A-Z0-9]{3}'],
+    'US-NY': [r'[A-Z]{3}\d{4}'],
+    'CA': [r'[A-Z0-9]{2,8}'],
+    'CA-ON': [r'[A-Z]{4}\d{3}', r'\d{3}[A-Z]{3}'],
+    'UK': [r'[A-Z]{2}\d{2}[A-Z]{3}', r'[A-Z]\d{1,3}[A-Z]{3}', r'[A-Z]{3}\d{1,3}[A-Z]', r'[A-Z]{1,3}\d{1,4}',
+           r'\d{1,4}[A-Z]{1,3}'],
+    'EU': [r'[A-Z0-9]{4,10}'],
+    'MX': [r'[A-Z]{3}\d{3,4}', r'[A-Z]{3}\d{2}[A-Z0-9]{1,2}'],
+}
+
+# Vanity and specialty plates, added to a region's standard formats only
+# with plate_filter_loose (they accept almost anything of the right length)
+LOOSE_FORMATS = {
+    'US-CA': [r'[A-Z0-9]{2,7}'],
+    'US-TX': [r'[A-Z0-9]{2,7}'],
+    'US-FL': [r'[A-Z0-9]{2,7}'],
+    'US-NY': [r'[A-Z0-9]{2,8}'],
+    'CA-ON': [r'[A-Z0-9]{2,8}'],
+    'MX': [r'[A-Z0-9]{5,7}'],
+}
+
+# Characters OCR confuses with each other and with plate borders/bolts;
+# a short read made only of these is almost always noise ("I1L", "0O0")
+CONFUSABLE = frozenset('01ILOQ')
+# From this length, an all-digit read of 0s and 1s is taken as a real plate ("1001")
+CONFUSABLE_DIGITS_MIN_LENGTH = 4
+
+SEPARATORS = ' -._·•/\\|:\t'
+NORMALIZE_TABLE = str.maketrans('', '', SEPARATORS)
+
+REASONS = ('empty', 'too_short', 'too_long', 'confusable', 'format')
+
+# Cameras past this many share one "other" drop counter
+MAX_CAMERAS = 32
+
+
+def normalize_plate(plate: str) -> str:
+    return plate.translate(NORMALIZE_TABLE).upper()
+
+
+class PlateFilter:
+    def __init__(self, regions: Iterable[str] = ('US',), patterns: Iterable[str] = (),
+                 mode: str = 'reject', min_length: int = 2, max_length: int = 10,
+                 loose: bool = False, quarantine_size: int = 200):
+        if mode not in ('reject', 'quarantine', 'off'):
+            raise ValueError(f"Unknown plate_filter_mode: {mode}")
+
+        self.mode = mode
+        self.min_length = min_length
+        self.max_length = max_length
+        self.regions = list(regions)
+        self.loose = loose
+
+        formats: List[str] = []
+        for region in self.regions:
+            if region not in PLATE_FORMATS:
+                raise ValueError(f"Unknown plate region: {region} (known: {', '.join(sorted(PLATE_FORMATS))})")
+            formats += PLATE_FORMATS[region]
+            if loose:
+                formats += LOOSE_FORMATS.get(region, [])
+        formats += list(patterns)
+        self.pattern = re.compile('|'.join(f'(?:{f})' for f in dict.fromkeys(formats))) if formats else None
+
+        self.lock = threading.Lock()
+        self.quarantine = deque(maxlen=quarantine_size)
+        self.stats: Dict[str, Any] = {
+            'checked': 0,
+            'passed': 0,
+            'rejected': 0,
+            'quarantined': 0,
+            'reasons': {reason: 0 for reason in REASONS},
+            # camera -> reads dropped (rejected or quarantined)
+            'cameras': {}
+        }
+
+    def classify(self, plate: str) -> Tuple[str, Optional[str]]:
+        """(normalized plate, reason it's implausible or None)"""
+        normalized = normalize_plate(plate)
+
+        if not normalized:
+            return normalized, 'empty'
+        if len(normalized) < self.min_length:
+            return normalized, 'too_short'
+        if len(normalized) > self.max_length:
+            return normalized, 'too_long'
+        if CONFUSABLE.issuperset(normalized) and \
+                (len(normalized) < CONFUSABLE_DIGITS_MIN_LENGTH or not normalized.isdigit()):
+            return normalized, 'confusable'
+        if self.pattern and not self.pattern.fullmatch(normalized):
+            return normalized, 'format'
+        return normalized, None
+
+    def check(self, plate: str, event_id: str = '', camera: str = '') -> Tuple[str, bool]:
+        """(normalized plate, whether to act on it); counts and quarantines"""
+        if self.mode == 'off':
+            return normalize_plate(plate), True
+
+        normalized, reason = self.classify(plate)
+
+        with self.lock:
+            self.stats['checked'] += 1
+            if reason is None:
+                self.stats['passed'] += 1
+                return normalized, True
+
+            self.stats['reasons'][reason] += 1
+            cameras = self.stats['cameras']
+            camera = camera or 'unknown'
+            if camera not in cameras and len(cameras) >= MAX_CAMERAS:
+                camera = 'other'
+            cameras[camera] = cameras.get(camera, 0) + 1
+            if self.mode == 'quarantine':
+                self.stats['quarantined'] += 1
+                self.quarantine.append({
+                    'plate': plate,
+                    'reason': reason,
+                    'event_id': event_id,
+                    'camera': camera,
+                    'time': time.time()
+                })
+            else:
+                self.stats['rejected'] += 1
+
+        logger.debug(f"Ignoring implausible plate read {plate!r} ({reason})")
+        return normalized, False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats, reasons=dict(self.stats['reasons']), cameras=dict(self.stats['cameras']))
+        stats['mode'] = self.mode
+        stats['regions'] = self.regions
+        stats['loose'] = self.loose
+        return stats
+
+    def recent_quarantine(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return list(self.quarantine)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Portal Client
+Bounds how long any portal call can hold up the pod.
+
+Every call goes to a named endpoint (detect, heartbeat, access_list,
+recordings) with a latency budget: whatever happens, the caller has an
+answer or an exception by then. Calls marked hedge=True (the gate decision)
+send a second, identical request once the first has taken longer than the
+endpoint's recent p95, and take whichever answers first; the request
+carries an Idempotency-Key so the portal can drop the duplicate.
+
+Each endpoint has a circuit breaker. After `breaker_failures` consecutive
+failures (timeouts, connection errors, 5xx) it opens and calls fail at once
+with CircuitOpen (a PortalUnavailable), so the agent can fall back to its
+local whitelist instead of waiting. Any other PortalUnavailable means the
+request went out and the portal may still act on it. After `breaker_cooldown` seconds one probe call is let
+through; it closes the breaker, or reopens it for twice as long.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('platebridge-pod.portal')
+
+# Seconds each endpoint may take, end to end
+DEFAULT_BUDGETS = {
+    'detect': 2.5,
+    'heartbeat': 5,
+    'access_list': 15,
+    'recordings': 30,
+}
+LATENCY_WINDOW = 200
+# Successful calls needed before the p95 is trusted for hedging
+MIN_SAMPLES = 20
+
+
+class PortalUnavailable(requests.RequestException):
+    """No usable answer within the budget, or the circuit is open"""
+
+
+class CircuitOpen(PortalUnavailable):
+    """Nothing was sent: the endpoint's circuit is open"""
+
+
+def percentile(values, pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int = 3, cooldown: float = 30, max_cooldown: float = 300):
+        self.failures = failures
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+
+        self.lock = threading.Lock()
+        self.state = 'closed'
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.opens = 0
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record(self, ok: bool):
+        with self.lock:
+            probe = self.probing
+            self.probing = False
+            if ok:
+                if self.state != 'closed':
+                    logger.info("Portal answering again, circuit closed")
+                self.state = 'closed'
+                self.consecutive = 0
+                self.cooldown = self.base_cooldown
+                return
+
+            self.consecutive += 1
+            if probe:
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+            if probe or (self.state == 'closed' and self.consecutive >= self.failures):
+                if self.state == 'closed':
+                    self.opens += 1
+                    logger.warning(f"Portal failing ({self.consecutive} in a row), circuit open "
+                                   f"for {self.cooldown:.0f}s")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {'state': self.state, 'opens': self.opens, 'consecutive_failures': self.consecutive}
+
+
+class PortalClient:
+    def __init__(self, budgets: Optional[Dict[str, float]] = None, hedging: bool = True,
+                 hedge_min_delay: float = 0.1, breaker_failures: int = 3, breaker_cooldown: float = 30,
+                 workers: int = 8):
+        self.budgets = dict(DEFAULT_BUDGETS)
+        self.budgets.update(budgets or {})
+        self.hedging = hedging
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+
+        self.lock = threading.Lock()
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        # endpoint -> latencies of successful attempts (for the hedge delay)
+        self.attempt_latency: Dict[str, deque] = {}
+        # endpoint -> latencies the caller saw, any outcome
+        self.call_latency: Dict[str, deque] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=2, pool_maxsize=workers))
+        self.session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=workers))
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='portal')
+
+    def configure(self, budgets: Optional[Dict[str, float]], hedging: bool, hedge_min_delay: float,
+                  breaker_failures: int, breaker_cooldown: float):
+        with self.lock:
+            self.budgets = dict(DEFAULT_BUDGETS)
+            self.budgets.update(budgets or {})
+            self.hedging = hedging
+            self.hedge_min_delay = hedge_min_delay
+            self.breaker_failures = breaker_failures
+            self.breaker_cooldown = breaker_cooldown
+            for breaker in self.breakers.values():
+                breaker.failures = breaker_failures
+                breaker.base_cooldown = breaker_cooldown
+
+    def _endpoint(self, endpoint: str):
+        with self.lock:
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker(self.breaker_failures, self.breaker_cooldown)
+                self.attempt_latency[endpoint] = deque(maxlen=LATENCY_WINDOW)
+                self.call_latency[endpoint] = deque(maxlen=LATENCY_WINDOW)
+                self.stats[endpoint] = {
+                    'calls': 0, 'ok': 0, 'hedged': 0, 'hedge_wins': 0,
+                    'errors': 0, 'timeouts': 0, 'rejected': 0
+                }
+            return self.breakers[endpoint], self.stats[endpoint]
+
+    def budget(self, endpoint: str) -> float:
+        return self.budgets.get(endpoint, 10)
+
+    def hedge_delay(self, endpoint: str) -> float:
+        """Recent p95 of successful attempts; a third of the budget until there is one"""
+        budget = self.budget(endpoint)
+        with self.lock:
+            samples = list(self.attempt_latency.get(endpoint, ()))
+        p95 = percentile(samples, 95) if len(samples) >= MIN_SAMPLES else None
+        delay = p95 if p95 is not None else budget / 3
+        return min(max(delay, self.hedge_min_delay), budget * 0.6)
+
+    def _attempt(self, endpoint: str, method: str, url: str, kwargs: Dict[str, Any]):
+        started = time.monotonic()
+        response = self.session.request(method, url, **kwargs)
+        return response, time.monotonic() - started
+
+    def request(self, endpoint: str, method: str, url: str, hedge: bool = False, **kwargs) -> requests.Response:
+        """The first usable response within the endpoint's budget; raises PortalUnavailable otherwise.
+
+        A 5xx is returned (after counting as a failure) if nothing better arrives in time.
+        """
+        breaker, stats = self._endpoint(endpoint)
+        with self.lock:
+            stats['calls'] += 1
+
+        if not breaker.allow():
+            with self.lock:
+                stats['rejected'] += 1
+            raise CircuitOpen(f"{endpoint}: circuit open")
+
+        budget = self.budget(endpoint)
+        started = time.monotonic()
+        deadline = started + budget
+        kwargs['timeout'] = kwargs.get('timeout') or budget
+        hedge = hedge and self.hedging
+        if hedge:
+            headers = dict(kwargs.get('headers') or {})
+            headers.setdefault('Idempotency-Key', uuid.uuid4().hex)
+            kwargs['headers'] = headers
+
+        attempts = [self.executor.submit(self._attempt, endpoint, method, url, kwargs)]
+        pending = set(attempts)
+        hedge_at = started + self.hedge_delay(endpoint) if hedge else None
+
+        response = None
+        winner = None
+        server_error = None
+        error = None
+        while True:
+            timeout = (min(deadline, hedge_at) if hedge_at else deadline) - time.monotonic()
+            done, pending = wait(pending, timeout=max(0.0, timeout), return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result, latency = future.result()
+                except requests.RequestException as e:
+                    error = e
+                    continue
+                if result.status_code >= 500:
+                    server_error = result
+                    continue
+                response, winner = result, future
+                with self.lock:
+                    self.attempt_latency[endpoint].append(latency)
+                break
+
+            if response is not None or time.monotonic() >= deadline:
+                break
+            if hedge and len(attempts) < 2 and (not pending or time.monotonic() >= hedge_at):
+                # Slower than usual (or already failed): race a second copy
+                attempts.append(self.executor.submit(self._attempt, endpoint, method, url, kwargs))
+                pending.add(attempts[-1])
+                hedge_at = None
+                with self.lock:
+                    stats['hedged'] += 1
+            elif not pending:
+                break
+
+        elapsed = time.monotonic() - started
+        with self.lock:
+            self.call_latency[endpoint].append(elapsed)
+            if response is not None:
+                stats['ok'] += 1
+                if winner is not attempts[0]:
+                    stats['hedge_wins'] += 1
+            elif server_error is not None or error is not None:
+                stats['errors'] += 1
+            else:
+                stats['timeouts'] += 1
+        breaker.record(response is not None)
+
+        if response is not None:
+            return response
+        if server_error is not None:
+            return server_error
+        if error is not None:
+            raise PortalUnavailable(f"{endpoint}: {error}")
+        raise PortalUnavailable(f"{endpoint}: no answer within {budget:g}s")
+
+    def available(self, endpoint: str) -> bool:
+        breaker, _ = self._endpoint(endpoint)
+        with breaker.lock:
+            return breaker.state == 'closed'
+
+    def stop(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {}
+        with self.lock:
+            endpoints = list(self.stats)
+        for endpoint in endpoints:
+            breaker, counters = self._endpoint(endpoint)
+            with self.lock:
+                entry = dict(counters)
+                latencies = list(self.call_latency[endpoint])
+            for pct in (50, 95, 99):
+                value = percentile(latencies, pct)
+                entry[f'p{pct}_ms'] = round(value * 1000, 1) if value is not None else None
+            entry['budget'] = self.budget(endpoint)
+            entry['hedge_delay_ms'] = round(self.hedge_delay(endpoint) * 1000, 1)
+            entry['breaker'] = breaker.get_stats()
+            stats[endpoint] = entry
+        return stats
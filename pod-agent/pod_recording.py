@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Recording Scheduler
+Coalesces overlapping clip requests into a single recording window.
+
+Two cars ten seconds apart, or three reads of the same car, used to start
+three independent ffmpeg/RTSP sessions writing mostly the same footage. Here
+the first request opens a window and starts ffmpeg; later requests that
+arrive while it is still recording extend the window (up to max_length) and
+attach their plate/event to it. ffmpeg is stopped with SIGINT when the
+window closes, so the MP4 is finalized normally.
+"""
+
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger('platebridge-pod.recording')
+
+
+@dataclass
+class RecordingWindow:
+    started_at: float
+    end_at: float
+    max_end_at: float
+    process: Optional[subprocess.Popen] = None
+    output_file: Optional[str] = None
+    plates: List[str] = field(default_factory=list)
+    event_ids: List[str] = field(default_factory=list)
+    snapshots: List[str] = field(default_factory=list)
+    requested_seconds: float = 0.0
+    carry_over_until: float = 0.0
+    stopping: bool = False
+
+    def attach(self, plate: Optional[str], event_id: Optional[str], snapshot_path: Optional[str]):
+        if plate and plate not in self.plates:
+            self.plates.append(plate)
+        if event_id and event_id not in self.event_ids:
+            self.event_ids.append(event_id)
+        if snapshot_path:
+            self.snapshots.append(snapshot_path)
+
+
+class RecordingScheduler:
+    def __init__(self, start: Callable[[float], Tuple[Optional[subprocess.Popen], Optional[str]]],
+                 finish: Callable[[RecordingWindow, float], None],
+                 max_length: float = 120, stop_timeout: float = 10):
+        self._start = start
+        self._finish = finish
+        self.max_length = max_length
+        self.stop_timeout = stop_timeout
+
+        self.lock = threading.Lock()
+        self.active: Optional[RecordingWindow] = None
+        self.closing: List[RecordingWindow] = []
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+        self.requests = 0
+        self.ffmpeg_runs = 0
+        self.recorded_seconds = 0.0
+        self.requested_seconds = 0.0
+        self.bytes_written = 0
+
+    def request(self, duration: float, plate: Optional[str] = None, event_id: Optional[str] = None,
+                snapshot_path: Optional[str] = None):
+        """Ask for `duration` seconds of footage from now; returns immediately"""
+        now = time.time()
+        with self.lock:
+            self.requests += 1
+            window = self.active
+
+            if window and not window.stopping and window.process and window.process.poll() is None:
+                window.attach(plate, event_id, snapshot_path)
+                window.requested_seconds += duration
+                wanted_end = now + duration
+                if wanted_end > window.max_end_at:
+                    window.end_at = window.max_end_at
+                    window.carry_over_until = max(window.carry_over_until, wanted_end)
+                else:
+                    window.end_at = max(window.end_at, wanted_end)
+                logger.info(f"Merged into current recording (now {window.end_at - window.started_at:.0f}s, "
+                            f"{len(window.plates)} plates)")
+                return
+
+            if window and not window.stopping:
+                # ffmpeg died or hit -t on its own; the monitor finalizes it
+                self.closing.append(window)
+                self.active = None
+
+            window = self._open_window(now, now + duration)
+            if window:
+                window.attach(plate, event_id, snapshot_path)
+                window.requested_seconds += duration
+
+        self.wakeup.set()
+
+    def _open_window(self, now: float, end_at: float) -> Optional[RecordingWindow]:
+        """Start ffmpeg for a new window; caller holds the lock"""
+        max_end_at = now + self.max_length
+        process, output_file = self._start(self.max_length)
+        if not process:
+            return None
+
+        self.ffmpeg_runs += 1
+        self.active = RecordingWindow(
+            started_at=now,
+            end_at=min(end_at, max_end_at),
+            max_end_at=max_end_at,
+            process=process,
+            output_file=output_file
+        )
+        if end_at > max_end_at:
+            self.active.carry_over_until = end_at
+        return self.active
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name='recording-scheduler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=self.stop_timeout)
+        with self.lock:
+            windows = self.closing + ([self.active] if self.active else [])
+            self.closing = []
+        for window in windows:
+            self._close(window)
+
+    def _run(self):
+        while not self.stopped.is_set():
+            with self.lock:
+                window = self.active
+                closing, self.closing = self.closing, []
+
+            for old in closing:
+                self._close(old)
+
+            if not window:
+                self.wakeup.wait(1)
+                self.wakeup.clear()
+                continue
+
+            if time.time() >= window.end_at or window.process.poll() is not None:
+                self._close(window)
+            else:
+                self.wakeup.wait(0.2)
+                self.wakeup.clear()
+
+    def _close(self, window: RecordingWindow):
+        with self.lock:
+            if window.stopping:
+                return
+            window.stopping = True
+
+        process = window.process
+        if process.poll() is None:
+            # SIGINT lets ffmpeg write the MP4 trailer
+            process.send_signal(signal.SIGINT)
+            try:
+                process.wait(timeout=self.stop_timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+        duration = time.time() - window.started_at
+        carry_over = window.carry_over_until
+
+        with self.lock:
+            if self.active is window:
+                self.active = None
+            self.recorded_seconds += duration
+            self.requested_seconds += window.requested_seconds
+            if window.output_file and os.path.exists(window.output_file):
+                self.bytes_written += os.path.getsize(window.output_file)
+            if carry_over > time.time() and not self.stopped.is_set():
+                # Requests that didn't fit under max_length continue in a fresh clip,
+                # linked to the same plates and events
+                continuation = self._open_window(time.time(), carry_over)
+                if continuation:
+                    continuation.plates = list(window.plates)
+                    continuation.event_ids = list(window.event_ids)
+                    continuation.snapshots = list(window.snapshots)
+
+        if process.returncode not in (0, 255, -signal.SIGINT):
+            logger.error(f"Recording ffmpeg exited with {process.returncode}")
+
+        if window.output_file and os.path.exists(window.output_file) and os.path.getsize(window.output_file) > 0:
+            logger.info(f"Clip saved: {window.output_file} ({duration:.0f}s, plates: {', '.join(window.plates) or '-'})")
+            try:
+                self._finish(window, duration)
+            except Exception as e:
+                logger.error(f"Recording finish error: {e}")
+        else:
+            logger.error(f"Recording failed: {window.output_file}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            bytes_per_second = self.bytes_written / self.recorded_seconds if self.recorded_seconds else 0
+            seconds_saved = max(0.0, self.requested_seconds - self.recorded_seconds)
+            return {
+                'requests': self.requests,
+                'ffmpeg_runs': self.ffmpeg_runs,
+                'ffmpeg_runs_saved': max(0, self.requests - self.ffmpeg_runs),
+                'recorded_seconds': round(self.recorded_seconds, 1),
+                'seconds_saved': round(seconds_saved, 1),
+                'bytes_written': self.bytes_written,
+                'bytes_saved_estimate': int(seconds_saved * bytes_per_second),
+                'recording': self.active is not None
+            }
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod HLS Relay Push
+Uploads the live stream once to a relay; viewers fan out from there.
+
+The pusher watches the HLS output directory. Each new segment is PUT to
+`<push_url>/<pod_id>/` as soon as ffmpeg lists it, on a pool of keep-alive
+connections, so a backlog (after a stall or a slow PUT) goes up several at
+a time instead of one round trip after another. The playlist is PUT only
+once every segment it lists has been uploaded (or has given up), so a
+viewer never gets a playlist pointing at a segment the relay doesn't have.
+Playlists superseded while waiting are skipped.
+
+Remote segment names carry a random run ID, new whenever ffmpeg restarts
+and its numbering starts over, so relay caches can treat segments as
+immutable. Requests carry a bearer token only if one is configured; the
+pod's portal key is never sent to the relay. Failed PUTs are retried with backoff; segments that have left
+the playlist are deleted from the relay after `keep_segments` more.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pod_uploads import BandwidthLimiter
+
+logger = logging.getLogger('platebridge-pod.relay')
+
+PLAYLIST = 'stream.m3u8'
+
+
+def parse_playlist(text: str) -> Tuple[Optional[int], List[str]]:
+    """(media sequence, segment names) of a live playlist"""
+    sequence = None
+    segments = []
+    for line in text.splitlines():
+        if line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+            try:
+                sequence = int(line.split(':', 1)[1])
+            except ValueError:
+                pass
+        elif line and not line.startswith('#'):
+            segments.append(os.path.basename(line))
+    return sequence, segments
+
+
+class RelayPusher:
+    def __init__(self, source_dir: str, push_url: str, pod_id: str, token: Optional[str] = None,
+                 workers: int = 4, retries: int = 3, timeout: float = 10, max_kbps: float = 0,
+                 keep_segments: int = 10, delete: bool = True, poll_interval: float = 0.2):
+        self.source_dir = source_dir
+        self.base_url = f"{push_url.rstrip('/')}/{pod_id}"
+        self.headers = {'Authorization': f"Bearer {token}"} if token else {}
+        self.retries = retries
+        self.timeout = timeout
+        self.keep_segments = keep_segments
+        self.delete = delete
+        self.poll_interval = poll_interval
+        self.limiter = BandwidthLimiter(max_kbps * 1000 / 8)
+
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='relay-push')
+
+        self.lock = threading.Lock()
+        # Unique across agent restarts too, since relay caches outlive them
+        self.run = self.new_run_id()
+        self.last_sequence: Optional[int] = None
+        self.playlist_mtime = None
+        # local segment name -> upload future, for the current run
+        self.uploads: Dict[str, Future] = {}
+        # (playlist text, segments, seen at) waiting for its segments
+        self.pending_playlist: Optional[Tuple[str, List[str], float]] = None
+        self.playlist_future: Optional[Future] = None
+        self.pushed: deque = deque()
+        self.lag: deque = deque(maxlen=200)
+
+        self.stats = {
+            'segments_pushed': 0,
+            'playlists_pushed': 0,
+            'playlists_skipped': 0,
+            'bytes_pushed': 0,
+            'retries': 0,
+            'failures': 0,
+            'deleted': 0,
+            'runs': 0
+        }
+
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @property
+    def playlist_url(self) -> str:
+        return f"{self.base_url}/{PLAYLIST}"
+
+    def remote_name(self, segment: str) -> str:
+        return f"r{self.run}-{segment}"
+
+    def _put(self, name: str, data: bytes, content_type: str, cache_control: str) -> bool:
+        headers = dict(self.headers, **{'Content-Type': content_type, 'Cache-Control': cache_control})
+        for attempt in range(self.retries + 1):
+            if self.stopped.is_set():
+                return False
+            if attempt:
+                with self.lock:
+                    self.stats['retries'] += 1
+                time.sleep(min(2.0, 0.25 * 2 ** (attempt - 1)))
+            self.limiter.consume(len(data))
+            try:
+                response = self.session.put(f"{self.base_url}/{name}", data=data, headers=headers,
+                                            timeout=self.timeout)
+            except requests.RequestException as e:
+                logger.debug(f"Relay PUT {name} failed: {e}")
+                continue
+            if response.status_code < 300:
+                with self.lock:
+                    self.stats['bytes_pushed'] += len(data)
+                return True
+            if response.status_code < 500 and response.status_code not in (408, 429):
+                logger.warning(f"Relay rejected {name}: HTTP {response.status_code}")
+                break
+
+        with self.lock:
+            self.stats['failures'] += 1
+        return False
+
+    def _push_segment(self, segment: str, remote: str) -> bool:
+        try:
+            with open(os.path.join(self.source_dir, segment), 'rb') as f:
+                data = f.read()
+        except OSError:
+            # ffmpeg already rotated it out
+            with self.lock:
+                self.stats['failures'] += 1
+            return False
+
+        ok = self._put(remote, data, 'video/MP2T', 'public, max-age=3600, immutable')
+        if ok:
+            with self.lock:
+                self.stats['segments_pushed'] += 1
+        return ok
+
+    def _push_playlist(self, text: str, seen_at: float) -> bool:
+        ok = self._put(PLAYLIST, text.encode(), 'application/vnd.apple.mpegurl', 'no-cache')
+        if ok:
+            with self.lock:
+                self.stats['playlists_pushed'] += 1
+                self.lag.append(time.monotonic() - seen_at)
+        return ok
+
+    @staticmethod
+    def new_run_id() -> str:
+        return os.urandom(6).hex()
+
+    def new_run(self):
+        self.run = self.new_run_id()
+        self.uploads.clear()
+        self.playlist_mtime = None
+        self.last_sequence = None
+        self.pending_playlist = None
+        with self.lock:
+            self.stats['runs'] += 1
+
+    def _delete(self, name: str):
+        try:
+            response = self.session.delete(f"{self.base_url}/{name}", headers=self.headers, timeout=self.timeout)
+            if response.status_code < 300 or response.status_code == 404:
+                with self.lock:
+                    self.stats['deleted'] += 1
+        except requests.RequestException:
+            pass
+
+    def poll(self):
+        """One pass: queue new segments, push the newest complete playlist, expire old segments"""
+        playlist_path = os.path.join(self.source_dir, PLAYLIST)
+        try:
+            mtime = os.stat(playlist_path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        if mtime is None and self.playlist_mtime is not None:
+            # Removed by a pipeline (re)start; the next playlist is a new run
+            self.new_run()
+
+        if mtime is not None and mtime != self.playlist_mtime:
+            self.playlist_mtime = mtime
+            try:
+                with open(playlist_path, 'r') as f:
+                    text = f.read()
+            except OSError:
+                text = ''
+            sequence, segments = parse_playlist(text)
+            if segments:
+                if self.last_sequence is not None and sequence is not None and sequence < self.last_sequence:
+                    # ffmpeg restarted and numbers segments from 0 again
+                    self.new_run()
+                self.last_sequence = sequence
+
+                for segment in segments:
+                    if segment not in self.uploads:
+                        remote = self.remote_name(segment)
+                        self.uploads[segment] = self.executor.submit(self._push_segment, segment, remote)
+                        self.pushed.append(remote)
+
+                lines = []
+                for line in text.splitlines():
+                    if line and not line.startswith('#'):
+                        line = self.remote_name(os.path.basename(line))
+                    lines.append(line)
+                if self.pending_playlist:
+                    with self.lock:
+                        self.stats['playlists_skipped'] += 1
+                self.pending_playlist = ('\n'.join(lines) + '\n', segments, time.monotonic())
+
+                for segment in [s for s in self.uploads if s not in segments]:
+                    if self.uploads[segment].done():
+                        del self.uploads[segment]
+
+        if self.pending_playlist and (self.playlist_future is None or self.playlist_future.done()):
+            text, segments, seen_at = self.pending_playlist
+            if all(self.uploads[s].done() for s in segments if s in self.uploads):
+                self.pending_playlist = None
+                self.playlist_future = self.executor.submit(self._push_playlist, text, seen_at)
+
+        if self.delete:
+            while len(self.pushed) > self.keep_segments + len(self.uploads):
+                self.executor.submit(self._delete, self.pushed.popleft())
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name='relay-push', daemon=True)
+        self.thread.start()
+        logger.info(f"Pushing HLS to {self.playlist_url}")
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def _run(self):
+        while not self.stopped.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Relay push error: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats)
+            lag = sorted(self.lag)
+        stats['playlist_url'] = self.playlist_url
+        stats['in_flight'] = sum(1 for future in self.uploads.values() if not future.done())
+        if lag:
+            stats['lag_p50_ms'] = round(lag[len(lag) // 2] * 1000, 1)
+            stats['lag_p95_ms'] = round(lag[min(len(lag) - 1, int(len(lag) * 0.95))] * 1000, 1)
+        return stats
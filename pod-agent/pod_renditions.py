@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Stream Renditions
+A second, low-bitrate HLS rendition for viewers on slow uplinks.
+
+With stream_renditions on, /stream/master.m3u8 lists the camera's stream
+and a low rendition, and the player switches between them on its own as
+its bandwidth changes. The low rendition is the camera's sub-stream when
+one is configured (copied when it is H.264, so nothing is encoded),
+otherwise a capped libx264 transcode of the main stream. It runs under its
+own StreamLifecycle, so it starts when a player asks for it and stops once
+no player has fetched it for the idle timeout: a pod with nobody on a slow
+link never transcodes.
+
+Transcoding is held to a CPU budget (percent of one core). ffmpeg gets one
+thread and the ultrafast preset; if it still runs over budget, the frame
+rate and then the height are stepped down and the encoder restarted.
+"""
+
+import logging
+import math
+import os
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional
+
+import psutil
+
+from pod_media import hls_copies_video, hls_segment_seconds
+
+logger = logging.getLogger('platebridge-pod.renditions')
+
+MIN_FPS = 5
+MIN_HEIGHT = 180
+
+
+def playlist_bandwidth(playlist_path: str) -> Optional[int]:
+    """Peak bits per second over the segments a live playlist lists, or None"""
+    try:
+        with open(playlist_path, 'r') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+
+    directory = os.path.dirname(playlist_path)
+    peak = None
+    duration = None
+    for line in lines:
+        if line.startswith('#EXTINF:'):
+            try:
+                duration = float(line[8:].split(',')[0])
+            except ValueError:
+                duration = None
+        elif line and not line.startswith('#') and duration:
+            try:
+                size = os.path.getsize(os.path.join(directory, os.path.basename(line)))
+            except OSError:
+                continue
+            rate = int(size * 8 / duration)
+            peak = rate if peak is None else max(peak, rate)
+    return peak
+
+
+def master_playlist(variants: List[Dict[str, Any]]) -> str:
+    """Master playlist for [{'uri', 'bandwidth', 'resolution'}], highest bandwidth first"""
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-INDEPENDENT-SEGMENTS']
+    for variant in sorted(variants, key=lambda v: v['bandwidth'], reverse=True):
+        attributes = f"BANDWIDTH={variant['bandwidth']}"
+        if variant.get('resolution'):
+            attributes += f",RESOLUTION={variant['resolution']}"
+        lines += [f"#EXT-X-STREAM-INF:{attributes}", variant['uri']]
+    return '\n'.join(lines) + '\n'
+
+
+class LowRendition:
+    def __init__(self, output_dir: str, source_url: str, substream_url: Optional[str] = None,
+                 height: int = 360, kbps: int = 400, fps: int = 10, threads: int = 1,
+                 cpu_budget: float = 50, segment_target: float = 2,
+                 get_info: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+                 budget_interval: float = 5, budget_checks: int = 3, launcher=None):
+        self.output_dir = output_dir
+        # pod_children.ChildLauncher; runs the transcode at the transcoding priority
+        self.launcher = launcher
+        self.playlist_path = os.path.join(output_dir, 'stream.m3u8')
+        self.source_url = source_url
+        self.substream_url = substream_url or None
+        self.height = height
+        self.kbps = kbps
+        self.fps = fps
+        self.threads = threads
+        self.cpu_budget = cpu_budget
+        self.segment_target = segment_target
+        self.get_info = get_info or (lambda url: None)
+        self.budget_interval = budget_interval
+        self.budget_checks = budget_checks
+
+        # Current settings; stepped down when over budget, reset by configure()
+        self.current_height = height
+        self.current_fps = fps
+
+        self.lock = threading.Lock()
+        self.process: Optional[subprocess.Popen] = None
+        self.stopped = threading.Event()
+        self.thread = None
+        self.cpu_percent: Optional[float] = None
+
+        self.stats = {
+            'starts': 0,
+            'budget_steps': 0,
+            'budget_restarts': 0
+        }
+
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def configure(self, height: int, kbps: int, fps: int, threads: int, cpu_budget: float):
+        self.height, self.kbps, self.fps, self.threads, self.cpu_budget = height, kbps, fps, threads, cpu_budget
+        self.current_height, self.current_fps = height, fps
+
+    @property
+    def transcodes(self) -> bool:
+        """Whether running this rendition costs an encoder"""
+        if not self.substream_url:
+            return True
+        return not hls_copies_video(self.get_info(self.substream_url))
+
+    def pid(self) -> Optional[int]:
+        process = self.process
+        return process.pid if process else None
+
+    def command(self) -> List[str]:
+        url = self.substream_url or self.source_url
+        info = self.get_info(url)
+        # Cut on the main stream's boundaries so players switch cleanly
+        segment_seconds = hls_segment_seconds(self.get_info(self.source_url), self.segment_target)
+
+        cmd = ['ffmpeg', '-fflags', 'nobuffer', '-probesize', '500000', '-analyzeduration', '500000',
+               '-rtsp_transport', 'tcp', '-i', url, '-map', '0:v:0']
+
+        if self.substream_url and hls_copies_video(info):
+            cmd += ['-c:v', 'copy']
+            segment_seconds = hls_segment_seconds(info, self.segment_target)
+        else:
+            cmd += [
+                '-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'zerolatency',
+                '-threads', str(self.threads),
+                '-vf', f"scale=-2:min(ih\\,{self.current_height}),fps={self.current_fps}",
+                '-b:v', f"{self.kbps}k", '-maxrate', f"{self.kbps}k", '-bufsize', f"{self.kbps * 2}k",
+                '-force_key_frames', f"expr:gte(t,n_forced*{segment_seconds})"
+            ]
+
+        cmd += [
+            '-an',
+            '-f', 'hls',
+            '-hls_time', str(segment_seconds),
+            '-hls_list_size', '5',
+            '-hls_flags', 'delete_segments',
+            '-hls_segment_filename', os.path.join(self.output_dir, 'segment_%03d.ts'),
+            self.playlist_path
+        ]
+        return cmd
+
+    def start(self):
+        with self.lock:
+            if self.process and self.process.poll() is None:
+                return
+
+            for filename in os.listdir(self.output_dir):
+                if filename.endswith(('.m3u8', '.ts')):
+                    try:
+                        os.remove(os.path.join(self.output_dir, filename))
+                    except OSError:
+                        pass
+
+            cmd = self.command()
+            try:
+                popen = (lambda c, **kw: self.launcher.popen('transcoding', c, **kw)) if self.launcher \
+                    else subprocess.Popen
+                self.process = popen(
+                    cmd,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
+            except Exception as e:
+                logger.error(f"Failed to start low rendition: {e}")
+                self.process = None
+                return
+            self.stats['starts'] += 1
+            self.cpu_percent = None
+
+        logger.info(f"Low rendition started ({'sub-stream' if self.substream_url else 'transcode'}, "
+                    f"{self.current_height}p {self.current_fps}fps {self.kbps}k)")
+
+        if not self.thread or not self.thread.is_alive():
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self._watch_budget, name='low-rendition', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=self.budget_interval + 1)
+        with self.lock:
+            process, self.process = self.process, None
+        if process and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        self.cpu_percent = None
+
+    def step_down(self) -> bool:
+        """Cheaper encoder settings; False when already at the floor"""
+        if self.current_fps > MIN_FPS:
+            self.current_fps = max(MIN_FPS, self.current_fps - math.ceil(self.current_fps / 3))
+        elif self.current_height > MIN_HEIGHT:
+            self.current_height = max(MIN_HEIGHT, int(self.current_height * 0.75) // 2 * 2)
+        else:
+            return False
+        self.stats['budget_steps'] += 1
+        return True
+
+    def _watch_budget(self):
+        over = 0
+        sampled = None
+        while not self.stopped.wait(self.budget_interval):
+            pid = self.pid()
+            if not pid:
+                continue
+            try:
+                if sampled is None or sampled.pid != pid:
+                    sampled = psutil.Process(pid)
+                    sampled.cpu_percent(None)
+                    continue
+                cpu = sampled.cpu_percent(None)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                sampled = None
+                continue
+
+            self.cpu_percent = cpu if self.cpu_percent is None else 0.5 * self.cpu_percent + 0.5 * cpu
+            if not self.transcodes or not self.cpu_budget:
+                continue
+
+            over = over + 1 if self.cpu_percent > self.cpu_budget else 0
+            if over < self.budget_checks:
+                continue
+            over = 0
+
+            if not self.step_down():
+                logger.warning(f"Low rendition at {self.cpu_percent:.0f}% CPU, over its "
+                               f"{self.cpu_budget:.0f}% budget even at {self.current_height}p {self.current_fps}fps")
+                continue
+
+            logger.info(f"Low rendition over its {self.cpu_budget:.0f}% CPU budget ({self.cpu_percent:.0f}%), "
+                        f"restarting at {self.current_height}p {self.current_fps}fps")
+            self.stats['budget_restarts'] += 1
+            with self.lock:
+                process, self.process = self.process, None
+            if process and process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+            if not self.stopped.is_set():
+                self.start()
+            sampled = None
+
+    def running(self) -> bool:
+        process = self.process
+        return process is not None and process.poll() is None
+
+    def bandwidth(self) -> int:
+        measured = playlist_bandwidth(self.playlist_path) if self.running() else None
+        return measured or self.kbps * 1000
+
+    def resolution(self) -> Optional[str]:
+        info = self.get_info(self.substream_url or self.source_url)
+        width, height = (info or {}).get('width'), (info or {}).get('height')
+        if not width or not height:
+            return None
+        if self.substream_url and hls_copies_video(info):
+            return f"{width}x{height}"
+        scaled = min(height, self.current_height)
+        return f"{int(width * scaled / height) // 2 * 2}x{scaled}"
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats['source'] = 'substream' if self.substream_url else 'transcode'
+        stats['transcoding'] = self.transcodes
+        stats['running'] = self.running()
+        stats['height'] = self.current_height
+        stats['fps'] = self.current_fps
+        stats['kbps'] = self.kbps
+        stats['cpu_budget'] = self.cpu_budget
+        stats['cpu_percent'] = round(self.cpu_percent, 1) if self.cpu_percent is not None else None
+        return stats
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Snapshot Store
+Keeps event snapshots content-addressed, in the sizes the portal shows.
+
+Each event's snapshot is fetched from Frigate once per size: the full image
+right away (uploads and recordings need it), and the smaller variants in
+the background, scaled and cropped by Frigate itself (?h=...&crop=1), so
+the pod never decodes a JPEG. Images are stored by SHA-256 under
+objects/ab/<hash>.jpg, so identical bytes (Frigate re-serving the same
+frame for a parked car, a backfilled event, a variant Frigate couldn't
+scale) share one file. An index maps event ids, and aliases such as
+recording names, to the hash of each size.
+
+Once the store passes max_bytes, the oldest events are dropped and objects
+nothing refers to any more are deleted.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('platebridge-pod.snapshots')
+
+# Frigate snapshot.jpg query parameters per size, smallest first
+VARIANTS = {
+    'small': {'h': 180, 'crop': 1, 'quality': 70},
+    'medium': {'h': 480, 'quality': 80},
+}
+FULL = 'full'
+
+
+class SnapshotStore:
+    def __init__(self, root: str, frigate_url: Optional[str] = None,
+                 variants: Optional[Dict[str, Dict[str, Any]]] = None,
+                 max_bytes: int = 500 * 1024 * 1024, workers: int = 2, timeout: float = 10,
+                 save_interval: float = 5.0):
+        self.root = Path(root)
+        self.objects_dir = self.root / 'objects'
+        self.index_path = self.root / 'index.json'
+        # Without a Frigate URL the store only serves (the media process in multi-process mode)
+        self.frigate_url = frigate_url.rstrip('/') if frigate_url else None
+        self.variants = dict(VARIANTS if variants is None else variants)
+        self.sizes = list(self.variants) + [FULL]
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.save_interval = save_interval
+
+        self.lock = threading.Lock()
+        # event id -> {'time': t, 'variants': {size: hash}}
+        self.events: Dict[str, Dict[str, Any]] = {}
+        self.aliases: Dict[str, str] = {}
+        # hash -> bytes on disk
+        self.objects: Dict[str, int] = {}
+        self.index_mtime = None
+        self.last_saved = 0.0
+        self.dirty = False
+
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=workers + 1))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=workers + 1))
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='snapshot') \
+            if self.frigate_url else None
+
+        self.stats = {
+            'downloads': 0,
+            'download_errors': 0,
+            'bytes_downloaded': 0,
+            'dedup_hits': 0,
+            'bytes_deduplicated': 0,
+            'evicted_events': 0
+        }
+
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.load()
+
+    def object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / f"{digest}.jpg"
+
+    def load(self):
+        try:
+            mtime = self.index_path.stat().st_mtime
+        except OSError:
+            return
+        if mtime == self.index_mtime:
+            return
+
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading snapshot index: {e}")
+            return
+
+        with self.lock:
+            self.events = data.get('events', {})
+            self.aliases = data.get('aliases', {})
+            self.objects = {}
+            for entry in self.events.values():
+                for digest in entry['variants'].values():
+                    if digest not in self.objects:
+                        try:
+                            self.objects[digest] = self.object_path(digest).stat().st_size
+                        except OSError:
+                            pass
+            self.index_mtime = mtime
+        logger.info(f"Snapshot index loaded: {len(self.events)} events, {len(self.objects)} images")
+
+    def save(self, force: bool = False):
+        with self.lock:
+            if not self.dirty or (not force and time.time() - self.last_saved < self.save_interval):
+                return
+            data = json.dumps({'events': self.events, 'aliases': self.aliases})
+            self.dirty = False
+            self.last_saved = time.time()
+
+        try:
+            tmp_path = self.index_path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, self.index_path)
+            self.index_mtime = self.index_path.stat().st_mtime
+        except Exception as e:
+            logger.error(f"Error saving snapshot index: {e}")
+
+    def put(self, event_id: str, size: str, content: bytes) -> str:
+        """Store one size of an event's snapshot; returns its hash"""
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.object_path(digest)
+
+        with self.lock:
+            known = digest in self.objects
+        if known and path.exists():
+            with self.lock:
+                self.stats['dedup_hits'] += 1
+                self.stats['bytes_deduplicated'] += len(content)
+        else:
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_suffix(f'.{threading.get_ident()}.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+        with self.lock:
+            self.objects[digest] = len(content)
+            entry = self.events.setdefault(event_id, {'time': time.time(), 'variants': {}})
+            entry['variants'][size] = digest
+            self.dirty = True
+        return digest
+
+    def fetch(self, event_id: str, size: str) -> Optional[str]:
+        params = self.variants.get(size) if size != FULL else None
+        url = f"{self.frigate_url}/api/events/{event_id}/snapshot.jpg"
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            with self.lock:
+                self.stats['download_errors'] += 1
+            logger.warning(f"Snapshot {size} for {event_id} failed: {e}")
+            return None
+
+        if response.status_code != 200 or not response.content:
+            with self.lock:
+                self.stats['download_errors'] += 1
+            logger.warning(f"Snapshot {size} for {event_id} failed: HTTP {response.status_code}")
+            return None
+
+        with self.lock:
+            self.stats['downloads'] += 1
+            self.stats['bytes_downloaded'] += len(response.content)
+        return self.put(event_id, size, response.content)
+
+    def ingest(self, event_id: str) -> Optional[str]:
+        """Fetch the full snapshot now and the smaller sizes in the background; returns the full image's path"""
+        if not self.executor:
+            return None
+
+        digest = self.fetch(event_id, FULL)
+        if not digest:
+            return None
+
+        for size in self.variants:
+            self.executor.submit(self._fetch_variant, event_id, size)
+
+        self.prune()
+        self.save()
+        return str(self.object_path(digest))
+
+    def _fetch_variant(self, event_id: str, size: str):
+        try:
+            self.fetch(event_id, size)
+            self.save()
+        except Exception as e:
+            logger.error(f"Snapshot variant error: {e}")
+
+    def link(self, alias: str, event_id: str) -> bool:
+        """Let `alias` (e.g. a recording name) stand for an event's snapshots"""
+        with self.lock:
+            if event_id not in self.events:
+                return False
+            self.aliases[alias] = event_id
+            self.dirty = True
+        self.save()
+        return True
+
+    def has(self, event_id: str) -> bool:
+        with self.lock:
+            return event_id in self.events
+
+    def lookup(self, key: str, size: str = FULL) -> Optional[Tuple[str, str]]:
+        """(path, hash) of the requested size, or the next larger one that exists"""
+        if size not in self.sizes:
+            raise ValueError(f"Unknown snapshot size: {size}")
+
+        # Another process may be the one writing
+        self.load()
+        with self.lock:
+            entry = self.events.get(key) or self.events.get(self.aliases.get(key, ''))
+            if not entry:
+                return None
+            for candidate in self.sizes[self.sizes.index(size):]:
+                digest = entry['variants'].get(candidate)
+                if digest:
+                    path = self.object_path(digest)
+                    return str(path), digest
+        return None
+
+    def prune(self):
+        """Drop the oldest events until the store is back under max_bytes"""
+        with self.lock:
+            if sum(self.objects.values()) <= self.max_bytes:
+                return
+
+            refs = Counter(digest for entry in self.events.values() for digest in set(entry['variants'].values()))
+            orphans = [digest for digest in self.objects if digest not in refs]
+            total = sum(self.objects.get(digest, 0) for digest in refs)
+
+            target = self.max_bytes * 0.9
+            evicted = 0
+            for event_id in sorted(self.events, key=lambda e: self.events[e]['time']):
+                if total <= target:
+                    break
+                for digest in set(self.events.pop(event_id)['variants'].values()):
+                    refs[digest] -= 1
+                    if not refs[digest]:
+                        total -= self.objects.get(digest, 0)
+                        orphans.append(digest)
+                evicted += 1
+
+            for digest in orphans:
+                self.objects.pop(digest, None)
+            self.aliases = {alias: event_id for alias, event_id in self.aliases.items() if event_id in self.events}
+            self.stats['evicted_events'] += evicted
+            self.dirty = True
+
+        for digest in orphans:
+            try:
+                self.object_path(digest).unlink()
+            except OSError:
+                pass
+        logger.info(f"Snapshot store over its cap: dropped {evicted} events, {len(orphans)} images")
+
+    def stop(self):
+        if self.executor:
+            self.executor.shutdown(wait=True)
+        self.save(force=True)
+        self.session.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            by_size = {size: {'images': 0, 'bytes': 0} for size in self.sizes}
+            counted = set()
+            for entry in self.events.values():
+                for size, digest in entry['variants'].items():
+                    # A shared image counts once, under the first size it turns up in
+                    if size in by_size and digest not in counted:
+                        counted.add(digest)
+                        by_size[size]['images'] += 1
+                        by_size[size]['bytes'] += self.objects.get(digest, 0)
+
+            stats = dict(self.stats)
+            stats['events'] = len(self.events)
+            stats['images'] = len(self.objects)
+            stats['disk_bytes'] = sum(self.objects.values())
+            stats['by_size'] = by_size
+        return stats
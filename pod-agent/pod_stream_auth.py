@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Stream Auth
+Verifies portal stream tokens and issues short-lived session credentials
+for HLS segment requests.
+
+Portal tokens (base64(payload).sha256(payload + secret)) are only decoded
+and hashed the first time they are seen; after that they sit in a bounded
+LRU cache until they expire. A valid playlist request is answered with a
+session credential, HMAC-signed with a per-process key, which is embedded
+in the segment URLs so every segment fetch is authenticated with a single
+cheap HMAC check instead of a full token verification. The session's nonce
+is derived from the token's user, so it also identifies the viewer across
+playlist refreshes (the portal proxy mints a new token for each one).
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger('platebridge-pod.stream-auth')
+
+
+class ExpiringLRU:
+    """Bounded LRU of key -> expiry timestamp"""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, now: float) -> bool:
+        with self.lock:
+            exp = self.entries.get(key)
+            if exp is None:
+                self.misses += 1
+                return False
+            if exp < now:
+                del self.entries[key]
+                self.misses += 1
+                return False
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def put(self, key: str, exp: float):
+        with self.lock:
+            self.entries[key] = exp
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class StreamAuth:
+    def __init__(self, secret: str, session_ttl: float = 300, cache_size: int = 1024):
+        self.secret = secret
+        self.session_ttl = session_ttl
+        self.session_key = os.urandom(32)
+        self.tokens = ExpiringLRU(cache_size)
+        self.sessions = ExpiringLRU(cache_size)
+
+    def decode_token(self, token: str) -> Optional[Dict[str, Any]]:
+        """Full verification of a portal token; returns its payload if valid"""
+        parts = token.split('.')
+        if len(parts) != 2:
+            return None
+
+        payload_b64, signature = parts
+        try:
+            payload_json = base64.b64decode(payload_b64).decode('utf-8')
+            payload = json.loads(payload_json)
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+        expected = hashlib.sha256((payload_json + self.secret).encode()).hexdigest()
+        if not hmac.compare_digest(signature.encode(), expected.encode()):
+            return None
+
+        if not isinstance(payload, dict) or payload.get('exp', 0) < time.time():
+            return None
+
+        return payload
+
+    def validate_token(self, token: str) -> bool:
+        now = time.time()
+        if self.tokens.get(token, now):
+            return True
+
+        try:
+            payload = self.decode_token(token)
+        except Exception as e:
+            logger.error(f"Token validation error: {e}")
+            return False
+
+        if not payload:
+            return False
+
+        self.tokens.put(token, float(payload['exp']))
+        return True
+
+    def token_expiry(self, token: str) -> Optional[float]:
+        with self.tokens.lock:
+            return self.tokens.entries.get(token)
+
+    def _sign(self, message: str) -> str:
+        return hmac.new(self.session_key, message.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def issue_session(self, token: str) -> str:
+        """Session credential for a token that already passed validate_token"""
+        exp = int(time.time() + self.session_ttl)
+        token_exp = self.token_expiry(token)
+        if token_exp:
+            exp = min(exp, int(token_exp))
+
+        message = f"{exp}.{self._sign(f'viewer:{self.token_viewer(token)}')[:12]}"
+        return f"{message}.{self._sign(message)}"
+
+    @staticmethod
+    def token_viewer(token: str) -> str:
+        """Who a (validated) token was minted for; the token itself if it doesn't say"""
+        try:
+            payload = json.loads(base64.b64decode(token.split('.')[0]))
+        except (ValueError, UnicodeDecodeError):
+            return token
+        if isinstance(payload, dict) and payload.get('user_id'):
+            return f"{payload['user_id']}|{payload.get('camera_id', '')}"
+        return token
+
+    @staticmethod
+    def session_viewer(session: str) -> str:
+        """Viewer ID of a session credential (its nonce)"""
+        parts = session.split('.')
+        return parts[1] if len(parts) == 3 else session
+
+    def validate_session(self, session: Optional[str]) -> bool:
+        if not session:
+            return False
+
+        now = time.time()
+        if self.sessions.get(session, now):
+            return True
+
+        parts = session.split('.')
+        if len(parts) != 3:
+            return False
+
+        exp, nonce, signature = parts
+        try:
+            exp_value = int(exp)
+        except ValueError:
+            return False
+
+        if exp_value < now:
+            return False
+
+        if not hmac.compare_digest(signature.encode(), self._sign(f"{exp}.{nonce}").encode()):
+            return False
+
+        self.sessions.put(session, exp_value)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'cached_tokens': len(self.tokens),
+            'token_cache_hits': self.tokens.hits,
+            'token_cache_misses': self.tokens.misses,
+            'cached_sessions': len(self.sessions),
+            'session_cache_hits': self.sessions.hits
+        }
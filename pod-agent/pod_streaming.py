@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Stream Lifecycle
+Runs the HLS pipeline only while someone is watching.
+
+Every playlist or segment request counts as viewer activity. The first viewer
+starts ffmpeg, and once no viewer has been seen for `idle_timeout` seconds
+the pipeline is torn down again. Time spent stopped is reported as CPU and
+power savings, estimated from the CPU rate ffmpeg used while it was running.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Any, Optional
+
+import psutil
+
+logger = logging.getLogger('platebridge-pod.streaming')
+
+
+class StreamLifecycle:
+    def __init__(self, start: Callable[[], None], stop: Callable[[], None],
+                 get_pid: Callable[[], Optional[int]],
+                 idle_timeout: float = 60, viewer_window: float = 15,
+                 watts_per_core: float = 3.0):
+        self._start = start
+        self._stop = stop
+        self._get_pid = get_pid
+        self.idle_timeout = idle_timeout
+        self.viewer_window = viewer_window
+        self.watts_per_core = watts_per_core
+
+        self.lock = threading.Lock()
+        self.viewers: Dict[str, float] = {}
+        self.last_activity = 0.0
+        self.running = False
+        self.started_at = None
+        self.created_at = time.monotonic()
+
+        self.starts = 0
+        self.running_seconds = 0.0
+        self.ffmpeg_cpu_seconds = 0.0
+        self._cpu_at_start = 0.0
+
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def touch(self, viewer_id: str):
+        """Record playlist/segment activity; starts the pipeline for the first viewer"""
+        now = time.monotonic()
+        with self.lock:
+            self.viewers[viewer_id] = now
+            self.last_activity = now
+            needs_start = not self.running
+
+        if needs_start:
+            self.ensure_running()
+
+    def active_viewers(self) -> int:
+        cutoff = time.monotonic() - self.viewer_window
+        with self.lock:
+            for viewer_id in [v for v, seen in self.viewers.items() if seen < cutoff]:
+                del self.viewers[viewer_id]
+            return len(self.viewers)
+
+    def ensure_running(self):
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.started_at = time.monotonic()
+            self.starts += 1
+
+        logger.info("Viewer connected, starting stream pipeline")
+        self._start()
+        self._cpu_at_start = self._process_cpu()
+
+    def shutdown_pipeline(self, reason: str = 'idle'):
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            self.running_seconds += time.monotonic() - self.started_at
+            self.started_at = None
+
+        self.ffmpeg_cpu_seconds += max(0.0, self._process_cpu() - self._cpu_at_start)
+        logger.info(f"Stopping stream pipeline ({reason})")
+        self._stop()
+
+    def _process_cpu(self) -> float:
+        pid = self._get_pid()
+        if not pid:
+            return 0.0
+        try:
+            times = psutil.Process(pid).cpu_times()
+            return times.user + times.system
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return 0.0
+
+    def start_monitor(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._monitor, name='stream-lifecycle', daemon=True)
+        self.thread.start()
+
+    def stop_monitor(self):
+        self.stopped.set()
+        self.shutdown_pipeline('shutdown')
+
+    def _monitor(self):
+        while not self.stopped.wait(1):
+            if self.running and time.monotonic() - self.last_activity >= self.idle_timeout:
+                self.shutdown_pipeline('idle')
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self.lock:
+            running_seconds = self.running_seconds
+            if self.running and self.started_at:
+                running_seconds += now - self.started_at
+            running = self.running
+
+        cpu_seconds = self.ffmpeg_cpu_seconds
+        if running:
+            cpu_seconds += max(0.0, self._process_cpu() - self._cpu_at_start)
+
+        uptime = now - self.created_at
+        idle_seconds = max(0.0, uptime - running_seconds)
+
+        # Estimate what an always-on pipeline would have burned while idle
+        cpu_rate = cpu_seconds / running_seconds if running_seconds > 0 else 0.0
+        cpu_seconds_saved = cpu_rate * idle_seconds
+
+        return {
+            'mode': 'on_demand',
+            'running': running,
+            'active_viewers': self.active_viewers(),
+            'starts': self.starts,
+            'running_seconds': round(running_seconds, 1),
+            'idle_seconds': round(idle_seconds, 1),
+            'duty_cycle': round(running_seconds / uptime, 4) if uptime > 0 else 0.0,
+            'cpu_seconds_saved': round(cpu_seconds_saved, 1),
+            'energy_saved_wh': round(cpu_seconds_saved * self.watts_per_core / 3600, 3)
+        }
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Supervisor
+Runs detection and media serving as separate processes.
+
+In single-process mode the Flask stream server, the MQTT thread and the
+detection loop share one interpreter, so a few busy viewers pulling
+segments compete with plate decisions for the GIL. In multi-process mode
+the supervisor starts complete_pod_agent.py twice, once with
+--role detection (MQTT, whitelist, heartbeat, recordings, uploads) and
+once with --role media (stream server, HLS pipeline), restarts either if
+it dies, and gives them a SharedState to exchange health/metrics.
+
+SharedState is one small shared memory block per section. Each section
+has a single writer (the process that owns it) and is published as JSON
+under a sequence counter, so readers never take a lock that the writer
+could be holding.
+"""
+
+import json
+import logging
+import os
+import signal
+import struct
+import subprocess
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger('platebridge-pod.supervisor')
+
+SHARED_STATE_ENV = 'PLATEBRIDGE_SHARED_STATE'
+SECTIONS = ('supervisor', 'detection', 'media')
+ROLES = ('detection', 'media')
+
+# seq (u64), length (u32)
+HEADER = struct.Struct('<QI')
+
+
+class SharedState:
+    def __init__(self, name: str, sections=SECTIONS, size: int = 65536, create: bool = False):
+        self.name = name
+        self.size = size
+        self.created = create
+        self.blocks: Dict[str, shared_memory.SharedMemory] = {}
+
+        for section in sections:
+            block_name = f"{name}_{section}"
+            if create:
+                block = shared_memory.SharedMemory(name=block_name, create=True, size=size)
+                HEADER.pack_into(block.buf, 0, 0, 0)
+            else:
+                block = shared_memory.SharedMemory(name=block_name)
+                # Only the creator may unlink; stop the tracker doing it when we exit
+                resource_tracker.unregister(block._name, 'shared_memory')
+            self.blocks[section] = block
+
+    @classmethod
+    def attach_from_env(cls) -> Optional['SharedState']:
+        name = os.environ.get(SHARED_STATE_ENV)
+        if not name:
+            return None
+        try:
+            return cls(name)
+        except FileNotFoundError:
+            logger.error(f"Shared state {name} not found")
+            return None
+
+    def publish(self, section: str, data: Dict[str, Any]):
+        block = self.blocks[section]
+        body = json.dumps(data, default=str).encode()
+        if len(body) > self.size - HEADER.size:
+            logger.warning(f"Shared state section {section} too large ({len(body)} bytes), not published")
+            return
+
+        seq, _ = HEADER.unpack_from(block.buf, 0)
+        # Odd sequence = write in progress
+        HEADER.pack_into(block.buf, 0, seq + 1, 0)
+        block.buf[HEADER.size:HEADER.size + len(body)] = body
+        HEADER.pack_into(block.buf, 0, seq + 2, len(body))
+
+    def read(self, section: str, retries: int = 5) -> Dict[str, Any]:
+        block = self.blocks[section]
+        for _ in range(retries):
+            seq, length = HEADER.unpack_from(block.buf, 0)
+            if seq % 2 or not length:
+                if seq == 0:
+                    return {}
+                time.sleep(0.001)
+                continue
+            body = bytes(block.buf[HEADER.size:HEADER.size + length])
+            if HEADER.unpack_from(block.buf, 0)[0] == seq:
+                try:
+                    return json.loads(body)
+                except ValueError:
+                    pass
+        return {}
+
+    def close(self):
+        for block in self.blocks.values():
+            block.close()
+            if self.created:
+                try:
+                    block.unlink()
+                except FileNotFoundError:
+                    pass
+        self.blocks = {}
+
+
+class PodSupervisor:
+    def __init__(self, config_path: str, agent_script: str, roles=ROLES,
+                 max_backoff: float = 60, stable_after: float = 60):
+        self.config_path = config_path
+        self.agent_script = agent_script
+        self.roles = list(roles)
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+
+        self.state = None
+        self.children: Dict[str, subprocess.Popen] = {}
+        self.started_at: Dict[str, float] = {}
+        self.restarts: Dict[str, int] = {role: 0 for role in self.roles}
+        self.backoff: Dict[str, float] = {role: 1.0 for role in self.roles}
+        self.next_start: Dict[str, float] = {role: 0.0 for role in self.roles}
+        self.stopping = False
+
+    def spawn(self, role: str):
+        env = dict(os.environ)
+        env[SHARED_STATE_ENV] = self.state.name
+        cmd = [sys.executable, self.agent_script, self.config_path, '--role', role]
+
+        try:
+            self.children[role] = subprocess.Popen(cmd, env=env)
+            self.started_at[role] = time.time()
+            logger.info(f"Started {role} process (pid {self.children[role].pid})")
+        except Exception as e:
+            logger.error(f"Failed to start {role} process: {e}")
+            self.next_start[role] = time.time() + self.backoff[role]
+
+    def check_children(self):
+        now = time.time()
+        for role in self.roles:
+            process = self.children.get(role)
+
+            if process and process.poll() is None:
+                if now - self.started_at[role] >= self.stable_after:
+                    self.backoff[role] = 1.0
+                continue
+
+            if process:
+                logger.warning(f"{role} process exited with {process.returncode}, "
+                               f"restarting in {self.backoff[role]:.0f}s")
+                self.children.pop(role)
+                self.restarts[role] += 1
+                self.next_start[role] = now + self.backoff[role]
+                self.backoff[role] = min(self.max_backoff, self.backoff[role] * 2)
+
+            if now >= self.next_start[role]:
+                self.spawn(role)
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        processes = {}
+        for role in self.roles:
+            process = self.children.get(role)
+            running = process is not None and process.poll() is None
+            processes[role] = {
+                'pid': process.pid if running else None,
+                'running': running,
+                'restarts': self.restarts[role],
+                'uptime_seconds': round(now - self.started_at[role], 1) if running else 0
+            }
+        return {'pid': os.getpid(), 'processes': processes}
+
+    def handle_signal(self, signum, frame):
+        self.stopping = True
+
+    def handle_reload(self, signum, frame):
+        # Each role diffs the config itself and restarts only what it owns
+        for process in self.children.values():
+            if process.poll() is None:
+                process.send_signal(signal.SIGHUP)
+
+    def stop_children(self, timeout: float = 15):
+        for role, process in self.children.items():
+            if process.poll() is None:
+                # SIGINT takes the agent's normal KeyboardInterrupt shutdown path
+                process.send_signal(signal.SIGINT)
+
+        deadline = time.time() + timeout
+        for role, process in self.children.items():
+            try:
+                process.wait(timeout=max(0.1, deadline - time.time()))
+            except subprocess.TimeoutExpired:
+                logger.warning(f"{role} process did not stop, killing")
+                process.kill()
+                process.wait()
+        self.children = {}
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.handle_signal)
+        signal.signal(signal.SIGINT, self.handle_signal)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+
+        self.state = SharedState(f"platebridge_{os.getpid()}", create=True)
+        logger.info(f"Supervisor started: {', '.join(self.roles)} processes")
+
+        try:
+            while not self.stopping:
+                self.check_children()
+                self.state.publish('supervisor', self.get_stats())
+                time.sleep(1)
+        finally:
+            logger.info("Stopping child processes...")
+            self.stop_children()
+            self.state.close()
+            logger.info("Supervisor stopped")
+
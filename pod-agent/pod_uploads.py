@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Upload Engine
+Pushes recorded clips and snapshots to portal/object storage so they can be
+viewed without the pod being reachable.
+
+Uploads are split into fixed-size chunks that are sent in parallel, verified
+with SHA-256 on both ends and resumed after an interruption. A shared token
+bucket caps the total upload bandwidth and an optional time-of-day schedule
+keeps uploads off the LTE link during busy hours.
+
+Storage protocol (relative to `upload_url`):
+  POST /uploads                        -> create session {upload_id, received}
+  GET  /uploads/<id>                   -> session state {upload_id, received}
+  PUT  /uploads/<id>/chunks/<index>    -> store one chunk (X-Chunk-SHA256)
+  POST /uploads/<id>/complete          -> assemble and verify {key, url}
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional, Dict, Any, List, Tuple
+
+import requests
+
+logger = logging.getLogger('platebridge-pod.uploads')
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+class BandwidthLimiter:
+    """Token bucket shared by every upload worker. A rate of 0 disables it."""
+
+    def __init__(self, bytes_per_second: float = 0, burst_seconds: float = 1.0):
+        self.lock = threading.Lock()
+        self.burst_seconds = burst_seconds
+        self.set_rate(bytes_per_second)
+
+    def set_rate(self, bytes_per_second: float):
+        with self.lock:
+            self.rate = max(0.0, float(bytes_per_second or 0))
+            self.capacity = self.rate * self.burst_seconds
+            self.tokens = self.capacity
+            self.last = time.monotonic()
+
+    def consume(self, nbytes: int):
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+
+                # Large chunks may exceed the bucket; let them through once
+                # the bucket is full and go into debt for the remainder.
+                if self.tokens >= min(nbytes, self.capacity):
+                    self.tokens -= nbytes
+                    return
+
+                wait = (min(nbytes, self.capacity) - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class UploadSchedule:
+    """Time-of-day windows such as ["22:00-06:00"]. No windows means always open."""
+
+    def __init__(self, windows: Optional[List[str]] = None):
+        self.windows = [self._parse_window(w) for w in (windows or [])]
+
+    @staticmethod
+    def _parse_window(window: str) -> Tuple[int, int]:
+        start, end = window.split('-')
+        return UploadSchedule._minutes(start), UploadSchedule._minutes(end)
+
+    @staticmethod
+    def _minutes(value: str) -> int:
+        hours, minutes = value.strip().split(':')
+        return int(hours) * 60 + int(minutes)
+
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        if not self.windows:
+            return True
+
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+
+        for start, end in self.windows:
+            if start <= end:
+                if start <= minute < end:
+                    return True
+            elif minute >= start or minute < end:
+                # Window wraps past midnight
+                return True
+
+        return False
+
+
+class UploadError(Exception):
+    pass
+
+
+class ChunkedUploader:
+    """Resumable, checksummed, parallel chunk upload of a single file"""
+
+    def __init__(self, upload_url: str, api_key: str, state_dir: str,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, parallel: int = 3,
+                 limiter: Optional[BandwidthLimiter] = None,
+                 max_retries: int = 5, timeout: int = 30,
+                 init_thread: Optional[Callable[[], None]] = None):
+        self.upload_url = upload_url.rstrip('/')
+        # Run first in every chunk worker, e.g. to lower its priority
+        self.init_thread = init_thread
+        self.chunk_size = chunk_size
+        self.parallel = max(1, parallel)
+        self.limiter = limiter or BandwidthLimiter(0)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f"Bearer {api_key}"
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.parallel)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.bytes_sent = 0
+        self.stats_lock = threading.Lock()
+
+    def _state_path(self, object_key: str) -> Path:
+        digest = hashlib.sha1(object_key.encode()).hexdigest()
+        return self.state_dir / f"{digest}.json"
+
+    def _load_state(self, object_key: str) -> Optional[Dict[str, Any]]:
+        path = self._state_path(object_key)
+        if path.exists():
+            try:
+                with open(path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.warning(f"Discarding unreadable upload state {path}: {e}")
+        return None
+
+    def _save_state(self, object_key: str, state: Dict[str, Any]):
+        path = self._state_path(object_key)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def _clear_state(self, object_key: str):
+        try:
+            self._state_path(object_key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def checksum_file(self, file_path: str) -> Tuple[str, List[str]]:
+        """Return the whole-file SHA-256 and the SHA-256 of every chunk"""
+        file_hash = hashlib.sha256()
+        chunk_hashes = []
+
+        with open(file_path, 'rb') as f:
+            while True:
+                data = f.read(self.chunk_size)
+                if not data:
+                    break
+                file_hash.update(data)
+                chunk_hashes.append(hashlib.sha256(data).hexdigest())
+
+        return file_hash.hexdigest(), chunk_hashes
+
+    def _open_session(self, object_key: str, size: int, sha256: str,
+                      content_type: str, chunk_count: int) -> Tuple[str, set]:
+        state = self._load_state(object_key)
+
+        if state and state.get('sha256') == sha256 and state.get('chunk_size') == self.chunk_size:
+            try:
+                response = self.session.get(
+                    f"{self.upload_url}/uploads/{state['upload_id']}",
+                    timeout=self.timeout
+                )
+                if response.status_code == 200:
+                    received = set(response.json().get('received', []))
+                    logger.info(f"Resuming upload {object_key}: {len(received)}/{chunk_count} chunks already stored")
+                    return state['upload_id'], received
+                logger.info(f"Upload session for {object_key} expired (HTTP {response.status_code}), starting over")
+            except requests.RequestException as e:
+                raise UploadError(f"Could not query upload session: {e}")
+
+        try:
+            response = self.session.post(
+                f"{self.upload_url}/uploads",
+                json={
+                    'key': object_key,
+                    'size': size,
+                    'sha256': sha256,
+                    'chunk_size': self.chunk_size,
+                    'content_type': content_type
+                },
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise UploadError(f"Could not create upload session: {e}")
+
+        if response.status_code != 200:
+            raise UploadError(f"Could not create upload session: HTTP {response.status_code}")
+
+        result = response.json()
+        upload_id = result['upload_id']
+        self._save_state(object_key, {
+            'upload_id': upload_id,
+            'sha256': sha256,
+            'size': size,
+            'chunk_size': self.chunk_size
+        })
+        return upload_id, set(result.get('received', []))
+
+    def _send_chunk(self, file_path: str, upload_id: str, index: int, checksum: str):
+        with open(file_path, 'rb') as f:
+            f.seek(index * self.chunk_size)
+            data = f.read(self.chunk_size)
+
+        url = f"{self.upload_url}/uploads/{upload_id}/chunks/{index}"
+        last_error = None
+
+        for attempt in range(self.max_retries):
+            self.limiter.consume(len(data))
+            try:
+                response = self.session.put(
+                    url,
+                    data=data,
+                    headers={
+                        'Content-Type': 'application/octet-stream',
+                        'X-Chunk-SHA256': checksum
+                    },
+                    timeout=self.timeout
+                )
+                if response.status_code == 200:
+                    with self.stats_lock:
+                        self.bytes_sent += len(data)
+                    return
+                last_error = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                last_error = str(e)
+
+            time.sleep(min(30, 2 ** attempt))
+
+        raise UploadError(f"Chunk {index} failed after {self.max_retries} attempts: {last_error}")
+
+    def upload(self, file_path: str, object_key: str,
+               content_type: str = 'application/octet-stream') -> Dict[str, Any]:
+        size = os.path.getsize(file_path)
+        sha256, chunk_hashes = self.checksum_file(file_path)
+
+        upload_id, received = self._open_session(
+            object_key, size, sha256, content_type, len(chunk_hashes)
+        )
+
+        pending = [i for i in range(len(chunk_hashes)) if i not in received]
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.parallel, initializer=self.init_thread) as pool:
+                futures = [
+                    pool.submit(self._send_chunk, file_path, upload_id, i, chunk_hashes[i])
+                    for i in pending
+                ]
+                for future in futures:
+                    future.result()
+
+        try:
+            response = self.session.post(
+                f"{self.upload_url}/uploads/{upload_id}/complete",
+                json={'sha256': sha256},
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise UploadError(f"Could not complete upload: {e}")
+
+        if response.status_code == 422:
+            # Server-side checksum mismatch: the stored chunks are unusable
+            self._clear_state(object_key)
+            raise UploadError(f"Checksum mismatch for {object_key}")
+        if response.status_code != 200:
+            raise UploadError(f"Could not complete upload: HTTP {response.status_code}")
+
+        self._clear_state(object_key)
+        result = response.json()
+        if result.get('sha256') and result['sha256'] != sha256:
+            raise UploadError(f"Storage reported checksum {result['sha256']} for {object_key}, expected {sha256}")
+
+        return result
+
+
+class UploadQueue:
+    """Persistent FIFO of pending uploads drained by a background thread.
+
+    A job that fails or has to wait backs off on its own; the oldest job that
+    is due goes next, so one bad upload doesn't hold up the rest.
+    """
+
+    def __init__(self, uploader: ChunkedUploader, queue_dir: str,
+                 schedule: Optional[UploadSchedule] = None, poll_interval: float = 5.0,
+                 max_attempts: int = 10, can_run: Optional[Callable[[], bool]] = None,
+                 init_thread: Optional[Callable[[], None]] = None,
+                 on_complete: Optional[Callable[[Dict[str, Any], str], bool]] = None,
+                 is_busy: Optional[Callable[[str], bool]] = None):
+        self.uploader = uploader
+        self.init_thread = init_thread
+        # Called with (job, 'uploaded' | 'failed'); returns False to be retried later
+        self.on_complete = on_complete
+        # True for a file something else is rewriting (a VOD remux); its upload waits
+        self.is_busy = is_busy or (lambda path: False)
+        # Extra gate besides the schedule, e.g. the resource governor deferring uploads
+        self.can_run = can_run or (lambda: True)
+        self.max_attempts = max_attempts
+        self.schedule = schedule or UploadSchedule()
+        self.poll_interval = poll_interval
+        self.queue_dir = Path(queue_dir)
+        self.queue_dir.mkdir(parents=True, exist_ok=True)
+
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        # job file name -> earliest time it is tried again
+        self.retry_at: Dict[str, float] = {}
+
+        self.completed = 0
+        self.failed = 0
+        self.last_error = None
+
+    def enqueue(self, file_path: str, object_key: str, content_type: str,
+                delete_after: bool = False) -> str:
+        job = {
+            'file_path': file_path,
+            'object_key': object_key,
+            'content_type': content_type,
+            'delete_after': delete_after,
+            'queued_at': time.time(),
+            'attempts': 0
+        }
+        job_path = self.queue_dir / f"{time.time_ns()}.json"
+        with open(job_path, 'w') as f:
+            json.dump(job, f)
+
+        self.wakeup.set()
+        logger.debug(f"Queued upload: {object_key}")
+        return str(job_path)
+
+    def pending(self) -> List[Path]:
+        return sorted(self.queue_dir.glob('*.json'))
+
+    @staticmethod
+    def queued_files(queue_dir: str) -> set:
+        """Files with an upload waiting or in flight; readable from any process"""
+        files = set()
+        for job_path in Path(queue_dir).glob('*.json'):
+            try:
+                with open(job_path, 'r') as f:
+                    job = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not job.get('uploaded'):
+                files.add(job.get('file_path'))
+        return files
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name='upload-queue', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'pending': len(self.pending()),
+            'backing_off': len(self.retry_at),
+            'completed': self.completed,
+            'failed': self.failed,
+            'bytes_sent': self.uploader.bytes_sent,
+            'window_open': self.schedule.is_open(),
+            'last_error': self.last_error
+        }
+
+    def process_one(self, job_path: Path) -> bool:
+        try:
+            with open(job_path, 'r') as f:
+                job = json.load(f)
+        except Exception as e:
+            logger.error(f"Dropping unreadable upload job {job_path}: {e}")
+            job_path.unlink(missing_ok=True)
+            return False
+
+        if not job.get('uploaded'):
+            if not os.path.exists(job['file_path']):
+                logger.warning(f"Upload source is gone, dropping: {job['file_path']}")
+                job_path.unlink(missing_ok=True)
+                return False
+
+            if self.is_busy(job['file_path']):
+                logger.debug(f"Upload source is being rewritten, deferring: {job['file_path']}")
+                self._defer(job_path, 1)
+                return False
+
+            try:
+                result = self.uploader.upload(job['file_path'], job['object_key'], job['content_type'])
+            except Exception as e:
+                job['attempts'] += 1
+                self.last_error = str(e)
+                logger.error(f"Upload failed ({job['attempts']}/{self.max_attempts}): {job['object_key']}: {e}")
+                self._save(job_path, job)
+                if job['attempts'] >= self.max_attempts:
+                    self.failed += 1
+                    if self.on_complete:
+                        self.on_complete(job, 'failed')
+                    # Park it for good
+                    job_path.rename(job_path.with_suffix('.failed'))
+                else:
+                    self._defer(job_path, job['attempts'])
+                return False
+
+            self.completed += 1
+            logger.info(f"Uploaded {job['object_key']} -> {result.get('url', '')}")
+            # Kept until the portal has been told, so a restart doesn't upload it again
+            job['uploaded'] = True
+            job['url'] = result.get('url')
+            self._save(job_path, job)
+
+            if job.get('delete_after'):
+                try:
+                    os.remove(job['file_path'])
+                except OSError as e:
+                    logger.debug(f"Could not remove uploaded file: {e}")
+
+        if self.on_complete and not self.on_complete(job, 'uploaded'):
+            job['notify_attempts'] = job.get('notify_attempts', 0) + 1
+            if job['notify_attempts'] < self.max_attempts:
+                self._save(job_path, job)
+                self._defer(job_path, job['notify_attempts'])
+                return False
+            logger.error(f"Portal never acknowledged upload of {job['object_key']}, giving up")
+
+        job_path.unlink(missing_ok=True)
+        return True
+
+    def _defer(self, job_path: Path, attempts: int):
+        """Back this job off exponentially, up to 5 minutes"""
+        delay = min(self.poll_interval * 2 ** (attempts - 1), 300)
+        self.retry_at[job_path.name] = time.time() + delay
+
+    @staticmethod
+    def _save(job_path: Path, job: Dict[str, Any]):
+        with open(job_path, 'w') as f:
+            json.dump(job, f)
+
+    def _run(self):
+        if self.init_thread:
+            self.init_thread()
+
+        while not self.stopped.is_set():
+            jobs = self.pending()
+
+            if not jobs or not self.schedule.is_open() or not self.can_run():
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+                continue
+
+            names = {job.name for job in jobs}
+            self.retry_at = {name: at for name, at in self.retry_at.items() if name in names}
+            now = time.time()
+            due = next((job for job in jobs if self.retry_at.get(job.name, 0) <= now), None)
+            if due is None:
+                # Everything is backing off; a new job wakes us early
+                self.wakeup.wait(min(self.retry_at.values()) - now)
+                self.wakeup.clear()
+                continue
+
+            if not self.process_one(due):
+                # Storage may be unhappy; don't hammer the uplink with the next job either
+                self.stopped.wait(self.poll_interval)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+PlateBridge Pod Recording VOD
+Serves recorded clips as HLS VOD playlists that byte-range into the MP4.
+
+Clips are recorded as fragmented MP4 (one moof+mdat fragment per
+keyframe), so every fragment is a seek point. The first time a clip is
+played, its boxes are walked once (no decoding) to build a keyframe index:
+the init section (ftyp+moov) and each fragment's offset, size and
+duration. The index is cached next to the clip as <clip>.vod.json and
+rebuilt if the clip changes. Consecutive fragments are grouped into
+segments of about `segment_seconds`, and the playlist addresses them with
+EXT-X-BYTERANGE, so nothing is re-encoded or copied; the player fetches
+just the ranges it needs and can seek straight to any keyframe.
+
+Clips recorded before fragmenting was enabled are remuxed in place once
+(stream copy) the first time they are requested, by a background job
+while the player is told to retry; an upload of the clip waits while it
+runs. A clip that is still being recorded gets an EVENT playlist without
+EXT-X-ENDLIST, so players keep reloading it as fragments are added.
+"""
+
+import json
+import logging
+import math
+import os
+import struct
+import subprocess
+import time
+from typing import BinaryIO, Dict, Any, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger('platebridge-pod.vod')
+
+INDEX_VERSION = 2
+CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'mvex', b'moof', b'traf'}
+
+# ffmpeg output flags for clips the VOD index can address
+FRAGMENTED_MP4_FLAGS = ['-movflags', '+frag_keyframe+empty_moov+default_base_moof']
+
+# A clip whose file changed this recently may still be recording
+GROWING_SECONDS = 10
+# Older leftover .remux files are from a remux that died
+REMUX_STALE_SECONDS = 600
+
+
+class NotFragmented(Exception):
+    """Clip is a plain MP4 with no fragments to index"""
+
+
+def iter_boxes(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int, int]]:
+    """(type, offset, size, header size) of each box between start and end"""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            raise ValueError(f"Corrupt {box_type!r} box at {offset}")
+        yield box_type, offset, size, header_size
+        offset += size
+
+
+def find_boxes(f: BinaryIO, start: int, end: int, path: List[bytes]) -> Iterator[Tuple[int, int, int]]:
+    """(offset, size, header size) of every box at `path` below [start, end)"""
+    for box_type, offset, size, header_size in iter_boxes(f, start, end):
+        if box_type != path[0]:
+            continue
+        if len(path) == 1:
+            yield offset, size, header_size
+        elif box_type in CONTAINER_BOXES:
+            yield from find_boxes(f, offset + header_size, offset + size, path[1:])
+
+
+def read_box(f: BinaryIO, offset: int, size: int, header_size: int) -> bytes:
+    f.seek(offset + header_size)
+    return f.read(size - header_size)
+
+
+def video_track(f: BinaryIO, moov: Tuple[int, int, int]) -> Tuple[int, int, int]:
+    """(track id, timescale, default sample duration) of the first video track"""
+    moov_offset, moov_size, moov_header = moov
+    for trak_offset, trak_size, trak_header in find_boxes(f, moov_offset + moov_header,
+                                                          moov_offset + moov_size, [b'trak']):
+        body_start, body_end = trak_offset + trak_header, trak_offset + trak_size
+
+        hdlr = next(find_boxes(f, body_start, body_end, [b'mdia', b'hdlr']), None)
+        if not hdlr or read_box(f, *hdlr)[8:12] != b'vide':
+            continue
+
+        tkhd = read_box(f, *next(find_boxes(f, body_start, body_end, [b'tkhd'])))
+        track_id = struct.unpack('>I', tkhd[20:24] if tkhd[0] == 1 else tkhd[12:16])[0]
+
+        mdhd = read_box(f, *next(find_boxes(f, body_start, body_end, [b'mdia', b'mdhd'])))
+        timescale = struct.unpack('>I', mdhd[20:24] if mdhd[0] == 1 else mdhd[12:16])[0]
+
+        default_duration = 0
+        for trex in find_boxes(f, moov_offset + moov_header, moov_offset + moov_size, [b'mvex', b'trex']):
+            data = read_box(f, *trex)
+            if struct.unpack('>I', data[4:8])[0] == track_id:
+                default_duration = struct.unpack('>I', data[12:16])[0]
+
+        return track_id, timescale, default_duration
+
+    raise ValueError("No video track")
+
+
+def fragment_duration(f: BinaryIO, moof: Tuple[int, int, int], track_id: int,
+                      default_duration: int) -> Tuple[Optional[int], int]:
+    """(decode time, duration) of the video track in one fragment, in track timescale"""
+    moof_offset, moof_size, moof_header = moof
+    for traf in find_boxes(f, moof_offset + moof_header, moof_offset + moof_size, [b'traf']):
+        traf_start, traf_end = traf[0] + traf[2], traf[0] + traf[1]
+
+        tfhd = read_box(f, *next(find_boxes(f, traf_start, traf_end, [b'tfhd'])))
+        flags = int.from_bytes(tfhd[1:4], 'big')
+        if struct.unpack('>I', tfhd[4:8])[0] != track_id:
+            continue
+
+        pos = 8
+        if flags & 0x01:
+            pos += 8  # base data offset
+        if flags & 0x02:
+            pos += 4  # sample description index
+        sample_duration = default_duration
+        if flags & 0x08:
+            sample_duration = struct.unpack('>I', tfhd[pos:pos + 4])[0]
+
+        decode_time = None
+        tfdt = next(find_boxes(f, traf_start, traf_end, [b'tfdt']), None)
+        if tfdt:
+            data = read_box(f, *tfdt)
+            decode_time = struct.unpack('>Q', data[4:12])[0] if data[0] == 1 else struct.unpack('>I', data[4:8])[0]
+
+        duration = 0
+        for trun in find_boxes(f, traf_start, traf_end, [b'trun']):
+            data = read_box(f, *trun)
+            trun_flags = int.from_bytes(data[1:4], 'big')
+            count = struct.unpack('>I', data[4:8])[0]
+            pos = 8 + (4 if trun_flags & 0x01 else 0) + (4 if trun_flags & 0x04 else 0)
+            if not trun_flags & 0x100:
+                duration += count * sample_duration
+                continue
+            # Per-sample fields, in order: duration, size, flags, composition offset
+            stride = 4 * sum(1 for bit in (0x100, 0x200, 0x400, 0x800) if trun_flags & bit)
+            for i in range(count):
+                duration += struct.unpack('>I', data[pos + i * stride:pos + i * stride + 4])[0]
+
+        return decode_time, duration
+
+    return None, 0
+
+
+def build_index(path: str) -> Dict[str, Any]:
+    """Walk the clip's boxes once and record init and fragment byte ranges"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        top = list(iter_boxes(f, 0, size))
+
+        moov = next(((o, s, h) for t, o, s, h in top if t == b'moov'), None)
+        if not moov:
+            raise ValueError("No moov box")
+        moofs = [(o, s, h) for t, o, s, h in top if t == b'moof']
+        if not moofs:
+            raise NotFragmented(path)
+
+        track_id, timescale, default_duration = video_track(f, moov)
+
+        fragments = []
+        for i, (box_type, offset, box_size, header_size) in enumerate(top):
+            if box_type != b'moof':
+                continue
+            # A fragment is the moof plus the mdat(s) right after it; trailing
+            # boxes such as mfra stay out of the last segment
+            end = offset + box_size
+            for next_type, next_offset, next_size, _ in top[i + 1:]:
+                if next_type != b'mdat':
+                    break
+                end = next_offset + next_size
+            if end > size:
+                # Still being written
+                break
+            moof = (offset, box_size, header_size)
+            start_time, duration = fragment_duration(f, moof, track_id, default_duration)
+            fragments.append({
+                'offset': offset,
+                'length': end - offset,
+                'start': start_time / timescale if start_time is not None else None,
+                'duration': duration / timescale
+            })
+
+    stat = os.stat(path)
+    return {
+        'version': INDEX_VERSION,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        # ffmpeg's trailer (mfra) only goes on once the recording has finished
+        'complete': top[-1][0] not in (b'moof', b'mdat') or is_settled(stat.st_mtime),
+        'init': {'offset': 0, 'length': moofs[0][0]},
+        'fragments': fragments,
+        'duration': round(sum(fr['duration'] for fr in fragments), 3)
+    }
+
+
+def is_settled(mtime: float) -> bool:
+    return time.time() - mtime >= GROWING_SECONDS
+
+
+def remux_path(path: str) -> str:
+    # Not *.mp4, so the half-written file never shows up in the recordings list
+    return f"{path}.remux"
+
+
+def remux_in_progress(path: str) -> bool:
+    try:
+        return time.time() - os.path.getmtime(remux_path(path)) < REMUX_STALE_SECONDS
+    except OSError:
+        return False
+
+
+def remux_fragmented(path: str, timeout: int = 120, launcher=None) -> bool:
+    """Rewrite a plain MP4 as fragmented MP4 in place, stream copy only"""
+    tmp_path = remux_path(path)
+    cmd = ['ffmpeg', '-v', 'error', '-i', path, '-c', 'copy', *FRAGMENTED_MP4_FLAGS, '-f', 'mp4', '-y', tmp_path]
+    try:
+        # Exists from the start, so the upload queue holds off until the clip is replaced
+        open(tmp_path, 'wb').close()
+        if launcher:
+            # Disk-heavy and never urgent
+            result = launcher.run('maintenance', cmd, stdin=subprocess.DEVNULL, capture_output=True, timeout=timeout)
+        else:
+            result = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"Remux failed for {path}: {e}")
+        result = None
+
+    if result is None or result.returncode != 0:
+        if result is not None:
+            logger.warning(f"Remux failed for {path}: {result.stderr.decode(errors='replace').strip()[:200]}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+    os.replace(tmp_path, path)
+    logger.info(f"Remuxed {os.path.basename(path)} to fragmented MP4 for VOD")
+    return True
+
+
+def index_path(path: str) -> str:
+    return f"{path}.vod.json"
+
+
+def load_index(path: str, remux: bool = True, launcher=None) -> Dict[str, Any]:
+    """Cached index for the clip, building (and remuxing legacy clips) as needed"""
+    cached_path = index_path(path)
+    stat = os.stat(path)
+    try:
+        with open(cached_path, 'r') as f:
+            index = json.load(f)
+        if index.get('version') == INDEX_VERSION and index.get('size') == stat.st_size and \
+                index.get('mtime') == stat.st_mtime:
+            # Indexed while recording, and the recording has since stopped
+            index['complete'] = index.get('complete') or is_settled(stat.st_mtime)
+            return index
+    except (OSError, ValueError):
+        pass
+
+    try:
+        index = build_index(path)
+    except NotFragmented:
+        if not remux or not remux_fragmented(path, launcher=launcher):
+            raise
+        index = build_index(path)
+
+    tmp_path = f"{cached_path}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, cached_path)
+    except OSError as e:
+        logger.warning(f"Could not save VOD index for {path}: {e}")
+
+    logger.info(f"Indexed {os.path.basename(path)}: {len(index['fragments'])} keyframes, {index['duration']}s")
+    return index
+
+
+def group_segments(fragments: List[Dict[str, Any]], segment_seconds: float) -> List[Tuple[int, int, float]]:
+    """(offset, length, duration) of contiguous fragment runs of about segment_seconds"""
+    segments = []
+    current = None
+    for fragment in fragments:
+        if current and current[2] < segment_seconds and current[0] + current[1] == fragment['offset']:
+            current = (current[0], current[1] + fragment['length'], current[2] + fragment['duration'])
+            continue
+        if current:
+            segments.append(current)
+        current = (fragment['offset'], fragment['length'], fragment['duration'])
+    if current:
+        segments.append(current)
+    return segments
+
+
+def render_vod_playlist(index: Dict[str, Any], media_url: str, segment_seconds: float = 2) -> str:
+    segments = group_segments(index['fragments'], segment_seconds)
+    target = max((math.ceil(duration) for _, _, duration in segments), default=1)
+    init = index['init']
+
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:7',
+        f'#EXT-X-TARGETDURATION:{max(1, target)}',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+        f"#EXT-X-PLAYLIST-TYPE:{'VOD' if index['complete'] else 'EVENT'}",
+        '#EXT-X-INDEPENDENT-SEGMENTS',
+        f'#EXT-X-MAP:URI="{media_url}",BYTERANGE="{init["length"]}@{init["offset"]}"',
+    ]
+    for offset, length, duration in segments:
+        lines.append(f'#EXTINF:{duration:.3f},')
+        lines.append(f'#EXT-X-BYTERANGE:{length}@{offset}')
+        lines.append(media_url)
+    if index['complete']:
+        lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
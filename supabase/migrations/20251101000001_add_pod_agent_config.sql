@@ -0,0 +1,38 @@
+/*
+  # Add Portal-Managed Agent Config to Pods
+
+  1. Changes
+    - Add `agent_config` JSONB column: settings overlaid on the pod's config.yaml
+    - Add `agent_config_version` column, bumped whenever `agent_config` changes
+    - Served to the pod agent by /api/pods/config/[id]?format=agent
+
+  2. Benefits
+    - Change thresholds, intervals and stream settings from the portal
+    - Pods pick up a newer version on their next poll and restart only the
+      affected subsystem
+*/
+
+-- Add agent config columns to pods table
+ALTER TABLE pods ADD COLUMN IF NOT EXISTS agent_config JSONB NOT NULL DEFAULT '{}'::jsonb;
+ALTER TABLE pods ADD COLUMN IF NOT EXISTS agent_config_version INTEGER NOT NULL DEFAULT 0;
+
+-- Bump the version whenever the config itself changes
+CREATE OR REPLACE FUNCTION bump_pod_agent_config_version()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.agent_config IS DISTINCT FROM OLD.agent_config THEN
+    NEW.agent_config_version := OLD.agent_config_version + 1;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS pods_agent_config_version ON pods;
+CREATE TRIGGER pods_agent_config_version
+  BEFORE UPDATE OF agent_config ON pods
+  FOR EACH ROW
+  EXECUTE FUNCTION bump_pod_agent_config_version();
+
+-- Add comment for documentation
+COMMENT ON COLUMN pods.agent_config IS 'Agent settings overlaid on config.yaml, e.g. {"min_confidence": 0.8}';
+COMMENT ON COLUMN pods.agent_config_version IS 'Incremented on every agent_config change; pods apply newer versions';
@@ -0,0 +1,26 @@
+/*
+  # Add Heartbeat State and Stats to Pods
+
+  1. Changes
+    - Add `heartbeat_state` JSONB column: what the portal holds of a pod on
+      heartbeat protocol 2 (session, acknowledged seq, static facts and
+      flattened stats), so the next delta can be applied to it
+    - Add `heartbeat_stats` JSONB column: the stats blocks (streaming,
+      recording, traffic, portal, ...) from the latest protocol 1 heartbeat or
+      protocol 2 full sync; a delta only updates `heartbeat_state.stats`
+      (flattened paths) and `last_heartbeat`
+
+  2. Benefits
+    - Pods send gzip-compressed deltas instead of the full payload
+    - A delta heartbeat is one narrow update of the pod row, with no camera
+      writes
+    - Dashboards read pod stats without a pod round trip
+*/
+
+-- Add heartbeat columns to pods table
+ALTER TABLE pods ADD COLUMN IF NOT EXISTS heartbeat_state JSONB;
+ALTER TABLE pods ADD COLUMN IF NOT EXISTS heartbeat_stats JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+-- Add comment for documentation
+COMMENT ON COLUMN pods.heartbeat_state IS 'Protocol 2 heartbeat state the next delta applies to; null until a pod sends one';
+COMMENT ON COLUMN pods.heartbeat_stats IS 'Stats blocks from the latest full heartbeat, e.g. {"traffic": {...}, "portal": {...}}; protocol 2 deltas update heartbeat_state.stats only';
@@ -0,0 +1,36 @@
+/*
+  # Create POD Detect Requests Table
+
+  1. New Tables
+    - `pod_detect_requests`
+      - `community_id` (uuid) - Community of the API key that sent the request
+      - `idempotency_key` (text) - Idempotency-Key header sent by the pod
+      - `status` (integer) - HTTP status of the stored answer (null while in progress)
+      - `result` (jsonb) - Answer returned for the key (null while in progress)
+      - `created_at` (timestamptz) - When the first request with the key arrived
+
+  2. Security
+    - Enable RLS; only the service role (the /api/pod/detect route) uses it
+
+  3. Important Notes
+    - Pods send a slow gate decision twice with the same key (hedging); the
+      second copy gets the first one's answer instead of writing another
+      audit row and opening the gate again
+    - Rows are only needed for seconds; anything older than a day is pruned
+      by the route
+*/
+
+CREATE TABLE IF NOT EXISTS pod_detect_requests (
+  community_id uuid NOT NULL REFERENCES communities(id) ON DELETE CASCADE,
+  idempotency_key text NOT NULL,
+  status integer,
+  result jsonb,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (community_id, idempotency_key),
+  CONSTRAINT pod_detect_requests_key_length CHECK (char_length(idempotency_key) <= 200)
+);
+
+CREATE INDEX IF NOT EXISTS idx_pod_detect_requests_created ON pod_detect_requests(created_at);
+
+-- Enable RLS (no policies: service role only)
+ALTER TABLE pod_detect_requests ENABLE ROW LEVEL SECURITY;